@@ -36,6 +36,13 @@ class Settings(BaseSettings):
         return True, "Email configuration valid"
 
     DATABASE_URL: str = os.getenv("DATABASE_URL", "postgresql://postgres:postgres@db:5432/auth_db")
+    # Monthly partitions of user_activity_log
+    DATABASE_PARTITION_MONTHS_AHEAD: int = int(os.getenv("DATABASE_PARTITION_MONTHS_AHEAD", "3"))
+    # Detach partitions older than this many months (0 keeps everything)
+    DATABASE_PARTITION_RETENTION_MONTHS: int = int(os.getenv("DATABASE_PARTITION_RETENTION_MONTHS", "0"))
+    # Detached partitions are moved to this schema; empty drops them instead
+    DATABASE_PARTITION_ARCHIVE_SCHEMA: str = os.getenv("DATABASE_PARTITION_ARCHIVE_SCHEMA", "archive")
+    DATABASE_PARTITION_CHECK_INTERVAL: float = float(os.getenv("DATABASE_PARTITION_CHECK_INTERVAL", "21600"))
 
     SECRET_KEY: str = os.getenv("SECRET_KEY", "your-default-secret")
     ACCESS_TOKEN_EXPIRE_MINUTES: int = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
@@ -45,6 +52,19 @@ class Settings(BaseSettings):
     doctor_service_url: str = Field(..., env="DOCTOR_SERVICE_URL")
     labroom_service_url: str = Field("http://labroom_service:8025", env="LAB_SERVICE_URL")
     service_token: str = Field(default="", env="SERVICE_TOKEN")
+
+    # Inter-service HTTP client pool (per upstream)
+    HTTP_CLIENT_TIMEOUT: float = float(os.getenv("HTTP_CLIENT_TIMEOUT", "10"))
+    HTTP_CLIENT_MAX_CONNECTIONS: int = int(os.getenv("HTTP_CLIENT_MAX_CONNECTIONS", "20"))
+    HTTP_CLIENT_MAX_KEEPALIVE: int = int(os.getenv("HTTP_CLIENT_MAX_KEEPALIVE", "10"))
+    HTTP_CLIENT_RETRIES: int = int(os.getenv("HTTP_CLIENT_RETRIES", "2"))
+    HTTP_CLIENT_BACKOFF: float = float(os.getenv("HTTP_CLIENT_BACKOFF", "0.2"))
+    HTTP2_ENABLED: bool = os.getenv("HTTP2_ENABLED", "false").lower() == "true"
+    
+    # Response compression (app/http_cache.py): smallest body compressed, gzip level, brotli quality
+    COMPRESSION_MINIMUM_SIZE: int = int(os.getenv("COMPRESSION_MINIMUM_SIZE", "1024"))
+    GZIP_LEVEL: int = int(os.getenv("GZIP_LEVEL", "6"))
+    BROTLI_QUALITY: int = int(os.getenv("BROTLI_QUALITY", "4"))
     
     CORS_ORIGINS: List[str] = [
         "http://localhost:3000",
@@ -4,6 +4,7 @@ import logging
 from typing import Optional
 
 from ..config import settings
+from .partitions import PartitionMaintainer
 
 # Set up logging
 logger = logging.getLogger("auth_service.database")
@@ -11,6 +12,19 @@ logger = logging.getLogger("auth_service.database")
 # Global connection pool
 db_pool: Optional[asyncpg.Pool] = None
 
+# Tables partitioned by month, and their partition column
+PARTITIONED_TABLES = {
+    "user_activity_log": "timestamp",
+}
+partition_maintainer = PartitionMaintainer(
+    "auth",
+    PARTITIONED_TABLES,
+    months_ahead=settings.DATABASE_PARTITION_MONTHS_AHEAD,
+    retention_months=settings.DATABASE_PARTITION_RETENTION_MONTHS,
+    archive_schema=settings.DATABASE_PARTITION_ARCHIVE_SCHEMA,
+    interval=settings.DATABASE_PARTITION_CHECK_INTERVAL,
+)
+
 async def init_db():
     """Initialize the database connection pool and tables."""
     global db_pool
@@ -32,6 +46,9 @@ async def init_db():
                 await conn.execute(schema_sql)
                 logger.info("Database schema initialized")
             
+            # Monthly partitions (converts the tables of a fresh database that nothing references)
+            await partition_maintainer.run(conn)
+            
             # Check if admin user exists, create if not
             admin_exists = await conn.fetchval(
                 "SELECT EXISTS(SELECT 1 FROM users WHERE role = 'admin' LIMIT 1)"
@@ -69,6 +86,8 @@ async def init_db():
                     True
                 )
                 logger.info("Default admin user created")
+        
+        await partition_maintainer.start(db_pool)
                 
     except Exception as e:
         logger.error(f"Database initialization error: {e}")
@@ -78,6 +97,7 @@ async def close_db():
     """Close the database connection pool."""
     global db_pool
     
+    await partition_maintainer.stop()
     if db_pool:
         logger.info("Closing database connection pool...")
         await db_pool.close()
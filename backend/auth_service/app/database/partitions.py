@@ -0,0 +1,408 @@
+# auth_service/app/database/partitions.py
+"""
+Monthly range partitioning of high-volume, time-ordered tables.
+
+Each managed table is partitioned by month of a timestamp column: partitions
+are named ``<table>_pYYYYMM`` and ``<table>_default`` catches rows outside
+every month (e.g. far-future dates). ``PartitionMaintainer`` keeps the
+partitions up to date:
+
+* partitions for the current month and ``months_ahead`` months are created
+  ahead of time, at startup and then every ``interval`` seconds;
+* with a retention policy, partitions older than ``retention_months`` are
+  detached and moved to ``archive_schema`` (or dropped when it is empty),
+  which takes them out of every query without deleting data row by row;
+* a table that is not partitioned yet is converted - automatically only while
+  it is empty (fresh installs), otherwise offline with::
+
+      python -m app.database.partitions migrate
+
+Converting copies the table into monthly partitions under an exclusive lock,
+keeping its indexes, triggers and outgoing foreign keys. The primary key
+gains the partition column, so foreign keys *referencing* the table cannot be
+kept. Such tables are never converted automatically: they stay unpartitioned
+(and are reported) until ``migrate --drop-foreign-keys`` is run, which drops
+those foreign keys and with them their checks and cascades. Queries should
+filter on the partition column with plain range conditions
+(``created_at >= $1 AND created_at < $2``) so that Postgres can skip the
+other partitions.
+"""
+import asyncio
+import logging
+import re
+import sys
+import time
+from datetime import date
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_MONTH_SUFFIX = re.compile(r"_p(\d{4})(\d{2})$")
+
+
+def _ident(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def month_start(day: date) -> date:
+    return date(day.year, day.month, 1)
+
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table: str, month: date) -> str:
+    return f"{table}_p{month:%Y%m}"
+
+
+async def current_month(conn) -> date:
+    """First day of the current month in the database time zone, which partition bounds are in"""
+    return await conn.fetchval("SELECT date_trunc('month', CURRENT_DATE)::date")
+
+
+async def is_partitioned(conn, table: str) -> bool:
+    return bool(await conn.fetchval(
+        "SELECT relkind = 'p' FROM pg_class WHERE oid = to_regclass($1)", table
+    ))
+
+
+async def create_partition(conn, table: str, month: date) -> bool:
+    """Create the partition of ``table`` for ``month``; returns whether it was new"""
+    name = partition_name(table, month)
+    if await conn.fetchval("SELECT to_regclass($1) IS NOT NULL", name):
+        return False
+    await conn.execute(
+        f"CREATE TABLE {_ident(name)} PARTITION OF {_ident(table)} "
+        f"FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+    )
+    return True
+
+
+async def ensure_partitions(conn, table: str, first_month: date, last_month: date) -> List[str]:
+    """Create the monthly partitions from ``first_month`` to ``last_month`` and the default partition"""
+    created = []
+    month = month_start(first_month)
+    while month <= last_month:
+        if await create_partition(conn, table, month):
+            created.append(partition_name(table, month))
+        month = add_months(month, 1)
+    await conn.execute(
+        f"CREATE TABLE IF NOT EXISTS {_ident(table + '_default')} PARTITION OF {_ident(table)} DEFAULT"
+    )
+    return created
+
+
+async def referencing_foreign_keys(conn, table: str) -> List[Dict[str, str]]:
+    """The foreign keys of other tables that reference ``table``"""
+    rows = await conn.fetch(
+        """
+        SELECT conrelid::regclass::text AS table_name, conname FROM pg_constraint
+        WHERE confrelid = $1::regclass AND contype = 'f' AND conrelid <> confrelid
+          AND conparentid = 0  -- not the copies on partitions
+        """,
+        table,
+    )
+    return [dict(r) for r in rows]
+
+
+async def convert_table(conn, table: str, key: str, months_ahead: int, drop_foreign_keys: bool = False) -> int:
+    """
+    Replace the plain table ``table`` by one partitioned by month of ``key``,
+    with the same rows, indexes, triggers and outgoing foreign keys.
+
+    Foreign keys referencing the table can't be kept: unless
+    ``drop_foreign_keys`` is set, a referenced table is left alone and
+    ValueError is raised. Must run in a transaction; writes and reads of the
+    table wait until it commits. Returns the number of rows copied.
+    """
+    legacy = f"{table}_unpartitioned"
+    await conn.execute(f"LOCK TABLE {_ident(table)} IN ACCESS EXCLUSIVE MODE")
+
+    primary_key = await conn.fetchrow(
+        """
+        SELECT c.conname, array_agg(a.attname::text ORDER BY k.ord) AS columns
+        FROM pg_constraint c
+        CROSS JOIN LATERAL unnest(c.conkey) WITH ORDINALITY AS k(attnum, ord)
+        JOIN pg_attribute a ON a.attrelid = c.conrelid AND a.attnum = k.attnum
+        WHERE c.conrelid = $1::regclass AND c.contype = 'p'
+        GROUP BY c.conname
+        """,
+        table,
+    )
+    indexes = await conn.fetch(
+        """
+        SELECT i.relname AS name, pg_get_indexdef(i.oid) AS definition, x.indisunique AS is_unique
+        FROM pg_index x JOIN pg_class i ON i.oid = x.indexrelid
+        WHERE x.indrelid = $1::regclass AND NOT x.indisprimary
+        """,
+        table,
+    )
+    triggers = await conn.fetch(
+        "SELECT pg_get_triggerdef(oid) AS definition FROM pg_trigger WHERE tgrelid = $1::regclass AND NOT tgisinternal",
+        table,
+    )
+    outgoing = await conn.fetch(
+        """
+        SELECT conname, pg_get_constraintdef(oid) AS definition FROM pg_constraint
+        WHERE conrelid = $1::regclass AND contype = 'f'
+        """,
+        table,
+    )
+    incoming = await referencing_foreign_keys(conn, table)
+    if incoming and not drop_foreign_keys:
+        raise ValueError(
+            f"{table} is referenced by {', '.join(fk['table_name'] + '.' + fk['conname'] for fk in incoming)}"
+        )
+
+    for fk in incoming:
+        logger.warning(
+            f"Dropping foreign key {fk['conname']} on {fk['table_name']}: "
+            f"{table} is partitioned by {key}, so its ids are no longer unique on their own"
+        )
+        await conn.execute(f"ALTER TABLE {fk['table_name']} DROP CONSTRAINT {_ident(fk['conname'])}")
+    # Free the index and constraint names for the partitioned table
+    for index in indexes:
+        await conn.execute(f"DROP INDEX {_ident(index['name'])}")
+    for fk in outgoing:
+        await conn.execute(f"ALTER TABLE {_ident(table)} DROP CONSTRAINT {_ident(fk['conname'])}")
+    if primary_key:
+        await conn.execute(f"ALTER TABLE {_ident(table)} DROP CONSTRAINT {_ident(primary_key['conname'])}")
+    await conn.execute(f"ALTER TABLE {_ident(table)} RENAME TO {_ident(legacy)}")
+
+    await conn.execute(
+        f"CREATE TABLE {_ident(table)} (LIKE {_ident(legacy)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS "
+        f"INCLUDING GENERATED INCLUDING IDENTITY INCLUDING STORAGE INCLUDING COMMENTS) "
+        f"PARTITION BY RANGE ({_ident(key)})"
+    )
+    current = await current_month(conn)
+    first = await conn.fetchval(f"SELECT date_trunc('month', MIN({_ident(key)}))::date FROM {_ident(legacy)}")
+    await ensure_partitions(conn, table, min(first or current, current), add_months(current, months_ahead))
+
+    # Load before building indexes and triggers: faster, and the triggers must not see the copy
+    status = await conn.execute(f"INSERT INTO {_ident(table)} SELECT * FROM {_ident(legacy)}")
+    rows = int(status.split()[-1])
+    await conn.execute(f"DROP TABLE {_ident(legacy)}")
+
+    if primary_key:
+        columns = list(primary_key["columns"])
+        if key not in columns:
+            columns.append(key)
+        await conn.execute(
+            f"ALTER TABLE {_ident(table)} ADD CONSTRAINT {_ident(primary_key['conname'])} "
+            f"PRIMARY KEY ({', '.join(_ident(c) for c in columns)})"
+        )
+    for index in indexes:
+        if index["is_unique"]:
+            logger.warning(f"Not recreating unique index {index['name']}: it would have to include {key}")
+            continue
+        await conn.execute(index["definition"])
+    for fk in outgoing:
+        await conn.execute(f"ALTER TABLE {_ident(table)} ADD CONSTRAINT {_ident(fk['conname'])} {fk['definition']}")
+    for trigger in triggers:
+        await conn.execute(trigger["definition"])
+    await conn.execute(f"ANALYZE {_ident(table)}")
+    return rows
+
+
+async def archive_partitions(conn, table: str, before: date, archive_schema: str) -> List[str]:
+    """Detach the monthly partitions of ``table`` that end on or before ``before``"""
+    partitions = await conn.fetch(
+        """
+        SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = $1::regclass
+        ORDER BY c.relname
+        """,
+        table,
+    )
+    archived = []
+    for row in partitions:
+        name = row["relname"]
+        match = _MONTH_SUFFIX.search(name)
+        if not match or name != partition_name(table, date(int(match[1]), int(match[2]), 1)):
+            continue
+        if add_months(date(int(match[1]), int(match[2]), 1), 1) > before:
+            continue
+        await conn.execute(f"ALTER TABLE {_ident(table)} DETACH PARTITION {_ident(name)}")
+        if archive_schema:
+            await conn.execute(f"CREATE SCHEMA IF NOT EXISTS {_ident(archive_schema)}")
+            await conn.execute(f"ALTER TABLE {_ident(name)} SET SCHEMA {_ident(archive_schema)}")
+        else:
+            await conn.execute(f"DROP TABLE {_ident(name)}")
+        archived.append(name)
+    return archived
+
+
+class PartitionMaintainer:
+    """Creates, converts and archives the monthly partitions of ``tables`` ({table: partition column})."""
+
+    def __init__(
+        self,
+        name: str,
+        tables: Dict[str, str],
+        months_ahead: int = 3,
+        retention_months: int = 0,
+        archive_schema: str = "archive",
+        interval: float = 21600.0,
+    ):
+        self.name = name
+        self.tables = tables
+        self.months_ahead = months_ahead
+        self.retention_months = retention_months
+        self.archive_schema = archive_schema
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+        # Metrics
+        self.runs = 0
+        self.failures = 0
+        self.last_run: Optional[float] = None
+        self.last_duration: Optional[float] = None
+        self.pending: List[str] = []
+        self.referenced: Dict[str, List[str]] = {}
+        self.created: List[str] = []
+        self.archived: List[str] = []
+        self.default_rows: Dict[str, int] = {}
+
+    async def run(self, conn, wait: bool = True, convert: str = "empty",
+                  drop_foreign_keys: bool = False) -> Dict[str, Any]:
+        """
+        Run maintenance once on ``conn``.
+
+        ``convert`` is ``"empty"`` to convert only empty unpartitioned tables,
+        ``"all"`` to convert every one, or ``"none"``. Tables that other
+        tables reference are only converted with ``drop_foreign_keys``, which
+        drops those foreign keys. Without ``wait``, returns immediately when
+        another worker is already running maintenance.
+        """
+        started = time.monotonic()
+        pending, created, archived, converted, default_rows = [], [], [], {}, {}
+        referenced: Dict[str, List[Dict[str, str]]] = {}
+        async with conn.transaction():
+            if wait:
+                await conn.execute("SELECT pg_advisory_xact_lock(hashtext('partition_maintenance'))")
+            elif not await conn.fetchval("SELECT pg_try_advisory_xact_lock(hashtext('partition_maintenance'))"):
+                return {"skipped": True}
+            current = await current_month(conn)
+
+            for table, key in self.tables.items():
+                if not await is_partitioned(conn, table):
+                    empty = not await conn.fetchval(f"SELECT EXISTS (SELECT 1 FROM {_ident(table)})")
+                    incoming = await referencing_foreign_keys(conn, table)
+                    if incoming and not drop_foreign_keys:
+                        referenced[table] = incoming
+                        pending.append(table)
+                        continue
+                    if convert == "all" or (convert == "empty" and empty):
+                        logger.info(f"{self.name}: partitioning {table} by month of {key}")
+                        converted[table] = await convert_table(
+                            conn, table, key, self.months_ahead, drop_foreign_keys=drop_foreign_keys
+                        )
+                    else:
+                        pending.append(table)
+                        continue
+                created += await ensure_partitions(conn, table, current, add_months(current, self.months_ahead))
+                # Rows outside every month (backdated or far-future); should stay near zero
+                default_rows[table] = await conn.fetchval(f"SELECT COUNT(*) FROM {_ident(table + '_default')}")
+                if self.retention_months > 0:
+                    archived += await archive_partitions(
+                        conn, table, add_months(current, -self.retention_months), self.archive_schema
+                    )
+
+        for table, incoming in referenced.items():
+            logger.warning(
+                f"{self.name}: {table} not partitioned: referenced by "
+                f"{', '.join(fk['table_name'] + '.' + fk['conname'] for fk in incoming)}; "
+                f"'python -m app.database.partitions migrate --drop-foreign-keys' converts it and drops them"
+            )
+        unreferenced = [table for table in pending if table not in referenced]
+        if unreferenced:
+            logger.warning(
+                f"{self.name}: {', '.join(unreferenced)} not partitioned yet; "
+                f"run 'python -m app.database.partitions migrate' during a maintenance window"
+            )
+        for table, rows in converted.items():
+            logger.info(f"{self.name}: {table} partitioned ({rows} rows copied)")
+        if created:
+            logger.info(f"{self.name}: created partitions {', '.join(created)}")
+        for table, rows in default_rows.items():
+            if rows:
+                logger.warning(f"{self.name}: {rows} rows of {table} are outside the monthly partitions")
+        if archived:
+            logger.info(f"{self.name}: detached partitions {', '.join(archived)}")
+
+        self.runs += 1
+        self.last_run = time.time()
+        self.last_duration = time.monotonic() - started
+        self.pending = pending
+        self.referenced = {
+            table: [fk["table_name"] + "." + fk["conname"] for fk in incoming] for table, incoming in referenced.items()
+        }
+        self.created = created
+        self.archived = archived
+        self.default_rows = default_rows
+        return {"pending": pending, "converted": converted, "created": created, "archived": archived}
+
+    async def start(self, pool):
+        """Repeat maintenance every ``interval`` seconds with connections from ``pool``"""
+        self._task = asyncio.create_task(self._watch(pool))
+
+    async def _watch(self, pool):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                async with pool.acquire() as conn:
+                    await self.run(conn, wait=False, convert="none")
+            except Exception as e:
+                self.failures += 1
+                logger.error(f"{self.name}: partition maintenance failed: {e}")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "tables": self.tables,
+            "months_ahead": self.months_ahead,
+            "retention_months": self.retention_months,
+            "archive_schema": self.archive_schema,
+            "runs": self.runs,
+            "failures": self.failures,
+            "last_run": self.last_run,
+            "last_duration_seconds": self.last_duration,
+            "unpartitioned_tables": self.pending,
+            # Kept unpartitioned because of these foreign keys
+            "referenced_tables": self.referenced,
+            "last_created": self.created,
+            "last_archived": self.archived,
+            "default_partition_rows": self.default_rows,
+        }
+
+
+async def main(argv: List[str]) -> int:
+    import asyncpg
+
+    from ..config import settings
+    from . import partition_maintainer
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    command = argv[0] if argv else "maintain"
+    drop_foreign_keys = "--drop-foreign-keys" in argv[1:]
+    if command not in ("migrate", "maintain") or set(argv[1:]) - {"--drop-foreign-keys"}:
+        print("usage: python -m app.database.partitions [migrate [--drop-foreign-keys]|maintain]")
+        return 2
+    conn = await asyncpg.connect(settings.DATABASE_URL)
+    try:
+        result = await partition_maintainer.run(
+            conn, convert="all" if command == "migrate" else "none", drop_foreign_keys=drop_foreign_keys
+        )
+    finally:
+        await conn.close()
+    return 1 if result["pending"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main(sys.argv[1:])))
@@ -6,6 +6,9 @@ from contextlib import asynccontextmanager
 
 from .config import settings
 from .database import init_db, close_db
+from .http_client import http_clients
+from .responses import ORJSONResponse
+from .http_cache import HTTPCacheMiddleware
 from .routers import auth, users, service_auth
 from .routers.analytics import router as analytics_router
 from .websocket import router as ws_router
@@ -26,9 +29,11 @@ async def lifespan(app: FastAPI):
     # Startup events
     logger.info("Starting auth service...")
     await init_db()
+    http_clients.startup()
     yield
     # Shutdown events
     logger.info("Shutting down auth service...")
+    await http_clients.aclose()
     await close_db()
 
 # Initialize FastAPI app
@@ -37,6 +42,15 @@ app = FastAPI(
     description="Authentication and Authorization microservice for AI Doctor for Proactive Patient Management",
     version="1.0.0",
     lifespan=lifespan,
+    default_response_class=ORJSONResponse,
+)
+
+# Compression, ETags and 304s, inside CORS so that 304s carry the CORS headers too
+app.add_middleware(
+    HTTPCacheMiddleware,
+    minimum_size=settings.COMPRESSION_MINIMUM_SIZE,
+    gzip_level=settings.GZIP_LEVEL,
+    brotli_quality=settings.BROTLI_QUALITY,
 )
 
 # Add CORS middleware
@@ -63,6 +77,11 @@ async def health_check():
     """Health check endpoint."""
     return {"status": "healthy", "service": "auth_service"}
 
+@app.get("/health/http-clients", tags=["Health"])
+async def http_clients_health():
+    """Connection reuse and pool-wait metrics for inter-service HTTP clients."""
+    return http_clients.metrics()
+
 # Add to main.py or a separate health check module
 @app.get("/health/email", tags=["Health"])
 async def email_health_check():
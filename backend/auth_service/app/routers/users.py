@@ -22,6 +22,7 @@ from ..exceptions import (
 )
 from ..security import verify_password, get_password_hash, any_authenticated_user
 from ..config import settings
+from ..http_client import get_http_client
 from ..analytics.middleware import route_analytics
 
 # Set up logging
@@ -32,7 +33,7 @@ router = APIRouter()
 
 async def sync_user_to_doctor_service(user_data: dict):
     """Background task to sync user data with doctor service"""
-    url = f"{settings.doctor_service_url}/sync/users"
+    url = "/sync/users"
     
     # Check if service_token exists and is not empty
     if not settings.service_token or settings.service_token.strip() == "":
@@ -40,16 +41,15 @@ async def sync_user_to_doctor_service(user_data: dict):
         return
         
     headers = {"Authorization": f"Bearer {settings.service_token.strip()}"}
-    logger.info(f"Syncing user to doctor service at URL: {url}")
+    logger.info(f"Syncing user to doctor service at URL: {settings.doctor_service_url}{url}")
     logger.debug(f"User data being synced: {user_data}")
     
     try:
-        async with httpx.AsyncClient(timeout=10) as client:
-            logger.debug("Sending HTTP request...")
-            response = await client.post(url, json=user_data, headers=headers)
-            logger.debug(f"Received response status: {response.status_code}")
-            response.raise_for_status()
-            logger.info(f"Successfully synced user {user_data.get('id')} to doctor service")
+        logger.debug("Sending HTTP request...")
+        response = await get_http_client("doctor").post(url, json=user_data, headers=headers)
+        logger.debug(f"Received response status: {response.status_code}")
+        response.raise_for_status()
+        logger.info(f"Successfully synced user {user_data.get('id')} to doctor service")
     except httpx.HTTPStatusError as e:
         logger.error(f"Sync failed: {e.response.status_code} - {e.response.text}")
     except Exception as e:
@@ -57,7 +57,7 @@ async def sync_user_to_doctor_service(user_data: dict):
                 
 async def sync_user_to_labroom_service(user_data: dict):
     """Background task to sync user data with labroom service"""
-    url = f"{settings.labroom_service_url}/sync/users"
+    url = "/sync/users"
     
     # Check if service_token exists and is not empty
     if not settings.service_token or settings.service_token.strip() == "":
@@ -65,16 +65,15 @@ async def sync_user_to_labroom_service(user_data: dict):
         return
         
     headers = {"Authorization": f"Bearer {settings.service_token.strip()}"}
-    logger.info(f"Syncing user to labroom service at URL: {url}")
+    logger.info(f"Syncing user to labroom service at URL: {settings.labroom_service_url}{url}")
     logger.debug(f"User data being synced: {user_data}")
     
     try:
-        async with httpx.AsyncClient(timeout=10) as client:
-            logger.debug("Sending HTTP request...")
-            response = await client.post(url, json=user_data, headers=headers)
-            logger.debug(f"Received response status: {response.status_code}")
-            response.raise_for_status()
-            logger.info(f"Successfully synced user {user_data.get('id')} to labroom service")
+        logger.debug("Sending HTTP request...")
+        response = await get_http_client("labroom").post(url, json=user_data, headers=headers)
+        logger.debug(f"Received response status: {response.status_code}")
+        response.raise_for_status()
+        logger.info(f"Successfully synced user {user_data.get('id')} to labroom service")
     except httpx.HTTPStatusError as e:
         logger.error(f"Sync failed: {e.response.status_code} - {e.response.text}")
     except Exception as e:
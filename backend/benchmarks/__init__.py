@@ -0,0 +1,16 @@
+"""
+Load-test and latency benchmark harnesses for the ADPPM backend services.
+
+Each service is a separate deployable with its own top-level ``app`` package,
+so a benchmark run targets one service at a time and is launched from the
+``backend`` directory inside that service's environment, e.g.::
+
+    python -m benchmarks.ws_load --service labroom --clients 200 --events 500
+    python -m benchmarks.db_pool --requests 2000 --concurrency 50
+    python -m benchmarks.lab_request_writes --rows 100000 --writes 2000
+    python -m benchmarks.partitioning --rows 2000000 --months 24
+    python -m benchmarks.patient_search --rows 1000000 --repeat 30
+    python -m benchmarks.appointment_slots --doctors 200 --window-days 30
+    python -m benchmarks.serialization --service cardroom --rows 100,1000
+    python -m benchmarks.file_serving --service labroom --size 256 --concurrency 8
+"""
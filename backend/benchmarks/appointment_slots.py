@@ -0,0 +1,304 @@
+"""
+Appointment scheduling benchmark for cardroom_service's slot engine.
+
+Builds a synthetic appointments table (``--doctors`` doctors in departments of
+``--department-size``, about ``--occupancy`` percent of their half-hour slots
+booked from 30 days ago to 60 days ahead) in a scratch schema, then runs each
+lookup ``--repeat`` times over random ``--window-days`` day windows:
+
+* legacy_conflict  - the previous check_conflicts ``EXISTS`` on appointment_date
+                     arithmetic, with the indexes the table had before
+* conflict         - check_conflicts on slot, served by appointments_no_overlap
+* schedule_gaps    - the client-side way to find free time: fetch the doctor's
+                     appointments for the window and compute the gaps in Python
+* slots_doctor     - AppointmentModel.available_slots for one doctor
+* slots_department - AppointmentModel.available_slots for a whole department
+
+Reported per lookup: latency percentiles and average rows returned. The
+appointments_no_overlap constraint needs the btree_gist extension; without it
+the benchmark falls back to a GiST index on slot and says so. The scratch
+schema is dropped afterwards.
+
+Needs a reachable Postgres and the permission to create schemas. Usage (from
+``backend/``, inside cardroom_service's environment)::
+
+    python -m benchmarks.appointment_slots --dsn postgresql://postgres@127.0.0.1:5432/postgres
+    python -m benchmarks.appointment_slots --doctors 500 --window-days 30 --repeat 50
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import date, datetime, time as dt_time, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from benchmarks.harness import load_service, percentile, print_table
+
+SCHEMA = "bench_appointment_slots"
+
+DAY_START = dt_time(8, 0)
+DAY_END = dt_time(17, 0)
+
+TABLE_SQL = """
+CREATE TABLE doctors (
+    id UUID PRIMARY KEY,
+    full_name VARCHAR(200) NOT NULL,
+    department VARCHAR(100) NOT NULL,
+    is_available BOOLEAN DEFAULT TRUE,
+    is_deleted BOOLEAN DEFAULT FALSE
+);
+CREATE TABLE appointments (
+    id UUID PRIMARY KEY,
+    patient_id UUID NOT NULL,
+    doctor_id UUID NOT NULL,
+    appointment_date TIMESTAMP WITH TIME ZONE NOT NULL,
+    duration_minutes INTEGER NOT NULL DEFAULT 30,
+    appointment_type VARCHAR(50) NOT NULL,
+    status VARCHAR(20) DEFAULT 'SCHEDULED',
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    is_deleted BOOLEAN DEFAULT FALSE,
+    slot TSTZRANGE
+);
+"""
+
+# The appointments indexes before the slot engine
+LEGACY_INDEX_SQL = """
+CREATE UNIQUE INDEX no_overlapping_appointments ON appointments(doctor_id, appointment_date, duration_minutes);
+CREATE INDEX idx_appointment_date ON appointments(appointment_date);
+"""
+
+# appointments_no_overlap of init.sql
+CONSTRAINT_SQL = """
+ALTER TABLE appointments ADD CONSTRAINT appointments_no_overlap
+    EXCLUDE USING gist (doctor_id WITH =, slot WITH &&)
+    WHERE (is_deleted = FALSE AND status IS DISTINCT FROM 'CANCELLED')
+"""
+FALLBACK_INDEX_SQL = """
+CREATE INDEX appointments_slot ON appointments USING gist (slot)
+    WHERE (is_deleted = FALSE AND status IS DISTINCT FROM 'CANCELLED')
+"""
+
+DOCTORS_SQL = """
+INSERT INTO doctors (id, full_name, department)
+SELECT md5('d' || i)::uuid, 'Doctor ' || i, 'department-' || (i / $2)
+FROM generate_series(0, $1 - 1) AS i
+"""
+
+# Weekday half-hour slots from 8:00 to 17:00 (UTC), some cancelled
+APPOINTMENTS_SQL = """
+INSERT INTO appointments
+    (id, patient_id, doctor_id, appointment_date, duration_minutes, appointment_type, status, slot)
+SELECT md5(d || '/' || day || '/' || k)::uuid, md5('p' || (d * 7 + k) % 50000)::uuid, md5('d' || d)::uuid,
+       ts, 30, 'CONSULTATION',
+       CASE WHEN hashtext(d || ':' || day || ':' || k) % 20 = 0 THEN 'CANCELLED' ELSE 'SCHEDULED' END,
+       tstzrange(ts, ts + INTERVAL '30 minutes')
+FROM generate_series(0, $1 - 1) AS d,
+     generate_series(-30, 60) AS day,
+     generate_series(0, 17) AS k,
+     LATERAL (SELECT (CURRENT_DATE + day + TIME '08:00')::timestamp AT TIME ZONE 'UTC'
+                     + k * INTERVAL '30 minutes' AS ts) t
+WHERE EXTRACT(ISODOW FROM CURRENT_DATE + day) < 6
+  AND abs(hashtext(d || '/' || day || '/' || k)) % 100 < $2
+"""
+
+# uuid_nil() of uuid-ossp, spelled out so the scratch schema needs no extension
+NIL_UUID = "'00000000-0000-0000-0000-000000000000'::uuid"
+
+LEGACY_CONFLICT_SQL = f"""
+    SELECT EXISTS (
+        SELECT 1 FROM appointments
+        WHERE doctor_id = $1
+        AND is_deleted = FALSE
+        AND id != COALESCE($4, {NIL_UUID})
+        AND (
+            appointment_date < $3
+            AND
+            appointment_date + (duration_minutes * INTERVAL '1 minute') > $2
+        )
+    )
+"""
+SCHEDULE_SQL = """
+    SELECT appointment_date, duration_minutes FROM appointments
+    WHERE doctor_id = $1
+    AND appointment_date >= $2
+    AND appointment_date <= $3
+    AND is_deleted = FALSE AND status IS DISTINCT FROM 'CANCELLED'
+    ORDER BY appointment_date ASC
+"""
+
+
+def schedule_gaps(rows, start: date, end: date, minutes: int) -> int:
+    """Free intervals of at least ``minutes`` in the working hours, from a fetched schedule"""
+    booked = [(r["appointment_date"], r["appointment_date"] + timedelta(minutes=r["duration_minutes"])) for r in rows]
+    need = timedelta(minutes=minutes)
+    now = datetime.now(timezone.utc)
+    found = 0
+    i = 0
+    day = start
+    while day <= end:
+        if day.isoweekday() < 6:
+            cursor = max(datetime.combine(day, DAY_START, tzinfo=timezone.utc), now)
+            closing = datetime.combine(day, DAY_END, tzinfo=timezone.utc)
+            while i < len(booked) and booked[i][0] < closing:
+                begin, finish = booked[i]
+                if finish > cursor:
+                    if begin - cursor >= need:
+                        found += 1
+                    cursor = finish
+                i += 1
+            if closing - cursor >= need:
+                found += 1
+        day += timedelta(days=1)
+    return found
+
+
+async def measure(lookup: Callable[[Any], Awaitable[int]], cases: List[Any]) -> Dict[str, Any]:
+    await lookup(cases[0])  # warm the cache
+    latencies: List[float] = []
+    returned: List[int] = []
+    for case in cases:
+        started = time.perf_counter()
+        returned.append(await lookup(case))
+        latencies.append(time.perf_counter() - started)
+    return {
+        "runs": len(latencies),
+        "avg_rows": round(statistics.fmean(returned), 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p90_ms": round(percentile(latencies, 90) * 1000, 3),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 3),
+    }
+
+
+async def run(args) -> int:
+    import asyncpg
+
+    load_service("cardroom")
+    from app.models import AppointmentModel
+
+    conn = await asyncpg.connect(args.dsn)
+    rows = []
+    try:
+        await conn.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        await conn.execute(f"CREATE SCHEMA {SCHEMA}")
+        await conn.execute(f"SET search_path TO {SCHEMA}, public")
+        print(f"building appointments of {args.doctors} doctors...", file=sys.stderr)
+        await conn.execute(TABLE_SQL)
+        await conn.execute(DOCTORS_SQL, args.doctors, args.department_size)
+        await conn.execute(APPOINTMENTS_SQL, args.doctors, args.occupancy)
+        await conn.execute(LEGACY_INDEX_SQL)
+        await conn.execute("ANALYZE doctors; ANALYZE appointments")
+        appointments = await conn.fetchval("SELECT COUNT(*) FROM appointments")
+
+        rng = random.Random(5)
+        doctors = [r["id"] for r in await conn.fetch("SELECT id FROM doctors ORDER BY id")]
+        departments = [r["department"] for r in await conn.fetch("SELECT DISTINCT department FROM doctors")]
+        today = date.today()
+        windows = []
+        for _ in range(args.repeat):
+            start = today + timedelta(days=rng.randrange(0, 30))
+            windows.append((start, start + timedelta(days=args.window_days - 1)))
+        checks = []
+        for _ in range(args.repeat):
+            day = today + timedelta(days=rng.randrange(1, 60))
+            at = datetime.combine(day, DAY_START, tzinfo=timezone.utc) + timedelta(minutes=15 * rng.randrange(36))
+            checks.append((rng.choice(doctors), at))
+
+        async def legacy_conflict(case) -> int:
+            doctor_id, at = case
+            return int(await conn.fetchval(LEGACY_CONFLICT_SQL, doctor_id, at, at + timedelta(minutes=30), None))
+
+        rows.append({"lookup": "legacy_conflict", **await measure(legacy_conflict, checks)})
+
+        async def gaps(case) -> int:
+            doctor_id, (start, end) = case
+            found = await conn.fetch(
+                SCHEDULE_SQL, doctor_id,
+                datetime.combine(start, dt_time.min, tzinfo=timezone.utc),
+                datetime.combine(end, dt_time.max, tzinfo=timezone.utc)
+            )
+            return schedule_gaps(found, start, end, args.duration)
+
+        doctor_windows = [(rng.choice(doctors), window) for window in windows]
+        rows.append({"lookup": "schedule_gaps", **await measure(gaps, doctor_windows)})
+
+        started = time.perf_counter()
+        try:
+            await conn.execute("CREATE EXTENSION IF NOT EXISTS btree_gist")
+            await conn.execute(CONSTRAINT_SQL)
+            index = "appointments_no_overlap"
+        except asyncpg.PostgresError as e:
+            print(f"btree_gist unavailable ({e}), using a GiST index on slot alone", file=sys.stderr)
+            await conn.execute(FALLBACK_INDEX_SQL)
+            index = "appointments_slot (fallback)"
+        await conn.execute("ANALYZE appointments")
+        index_seconds = round(time.perf_counter() - started, 1)
+
+        async def conflict(case) -> int:
+            doctor_id, at = case
+            # check_conflicts takes its own pool connection, so run its query here
+            return int(await conn.fetchval(
+                f"""
+                SELECT EXISTS (
+                    SELECT 1 FROM appointments
+                    WHERE doctor_id = $1
+                    AND is_deleted = FALSE AND status IS DISTINCT FROM 'CANCELLED'
+                    AND slot && tstzrange($2, $3)
+                    AND id != COALESCE($4, {NIL_UUID})
+                )
+                """,
+                doctor_id, at, at + timedelta(minutes=30), None
+            ))
+
+        rows.append({"lookup": "conflict", **await measure(conflict, checks)})
+
+        async def slots(case) -> int:
+            criteria, (start, end) = case
+            found = await AppointmentModel.available_slots(
+                conn, start, end, args.duration, day_start=DAY_START, day_end=DAY_END,
+                timezone="UTC", **criteria
+            )
+            return len(found)
+
+        rows.append({"lookup": "slots_doctor", **await measure(
+            slots, [({"doctor_id": d}, w) for d, w in doctor_windows])})
+        rows.append({"lookup": "slots_department", **await measure(
+            slots, [({"department": rng.choice(departments)}, w) for w in windows])})
+    finally:
+        if not args.keep:
+            await conn.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        await conn.close()
+
+    if args.json:
+        print(json.dumps({
+            "appointments": appointments, "index": index, "index_seconds": index_seconds, "lookups": rows
+        }, indent=2))
+    else:
+        print_table(rows)
+        print(f"\n{appointments} appointments, {index} built in {index_seconds}s")
+    return 0
+
+
+def parse_args(argv: List[str]):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--dsn", default=os.getenv("BENCH_DATABASE_URL", "postgresql://postgres@127.0.0.1:5432/postgres"))
+    parser.add_argument("--doctors", type=int, default=200)
+    parser.add_argument("--department-size", type=int, default=20, help="doctors per department")
+    parser.add_argument("--occupancy", type=int, default=70, help="percent of slots booked")
+    parser.add_argument("--window-days", type=int, default=30, help="date range of the slot lookups")
+    parser.add_argument("--duration", type=int, default=30, help="minutes a free interval must last")
+    parser.add_argument("--repeat", type=int, default=30)
+    parser.add_argument("--keep", action="store_true", help="keep the scratch schema")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    return asyncio.run(run(parse_args(sys.argv[1:] if argv is None else argv)))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
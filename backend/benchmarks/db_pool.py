@@ -0,0 +1,199 @@
+"""
+Database pool benchmark for doctor_service request handling.
+
+Serves a minimal app in-process behind uvicorn with two routes that run the
+same query through different ``get_db_pool`` dependencies:
+
+* legacy - the previous dependency, which created (and closed) an asyncpg
+           pool with ``min_size=5`` for every request
+* pooled - ``app.dependencies.get_db_pool``, the process-wide pool created
+           once per worker
+
+and drives both with N concurrent HTTP clients. Reported per mode: request
+latency percentiles, throughput, failed requests and the number of Postgres
+client backends (peak while running, sampled from ``pg_stat_activity``).
+
+Needs a reachable Postgres; nothing is written to it. Usage (from
+``backend/``, inside doctor_service's environment)::
+
+    python -m benchmarks.db_pool --dsn postgresql://postgres@127.0.0.1:5432/postgres
+    python -m benchmarks.db_pool --requests 2000 --concurrency 50 --mode pooled
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import statistics
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+from benchmarks.harness import load_service, percentile, print_table, serve_app
+
+QUERY = "SELECT count(*) FROM pg_class WHERE relpages >= $1"
+
+
+class BackendSampler:
+    """Samples the number of Postgres client backends on the target database."""
+
+    def __init__(self, dsn: str, interval: float = 0.02):
+        self.dsn = dsn
+        self.interval = interval
+        self.samples: List[int] = []
+        self._conn = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def count(self) -> int:
+        # Excludes the sampler's own connection
+        return await self._conn.fetchval(
+            """
+            SELECT count(*) - 1 FROM pg_stat_activity
+            WHERE datname = current_database() AND backend_type = 'client backend'
+            """
+        )
+
+    async def start(self):
+        import asyncpg
+
+        self._conn = await asyncpg.connect(self.dsn)
+        self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            self.samples.append(await self.count())
+            await asyncio.sleep(self.interval)
+
+    async def stop(self) -> Dict[str, int]:
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        after = await self.count()
+        await self._conn.close()
+        return {"peak_backends": max(self.samples, default=0), "backends_after": after}
+
+
+def build_app(dsn: str):
+    import asyncpg
+    from fastapi import Depends, FastAPI
+
+    from app import dependencies
+
+    async def legacy_get_db_pool():
+        """The per-request pool dependency doctor_service used before"""
+        pool = await asyncpg.create_pool(dsn=dsn, min_size=5, max_size=20)
+        try:
+            yield pool
+        finally:
+            await pool.close()
+
+    app = FastAPI()
+
+    @app.get("/legacy")
+    async def legacy(pool=Depends(legacy_get_db_pool)):
+        async with pool.acquire() as conn:
+            return {"count": await conn.fetchval(QUERY, 0)}
+
+    @app.get("/pooled")
+    async def pooled(pool=Depends(dependencies.get_db_pool)):
+        async with pool.acquire() as conn:
+            return {"count": await conn.fetchval(QUERY, 0)}
+
+    return app
+
+
+async def drive(base_url: str, path: str, requests: int, concurrency: int) -> Dict[str, Any]:
+    import httpx
+
+    latencies: List[float] = []
+    failures = 0
+    remaining = iter(range(requests))
+
+    async with httpx.AsyncClient(
+        base_url=f"http://{base_url}",
+        timeout=60.0,
+        limits=httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency),
+    ) as client:
+
+        async def worker():
+            nonlocal failures
+            for _ in remaining:
+                started = time.perf_counter()
+                try:
+                    response = await client.get(path)
+                    ok = response.status_code == 200
+                except httpx.HTTPError:
+                    ok = False
+                if ok:
+                    latencies.append(time.perf_counter() - started)
+                else:
+                    failures += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    return {
+        "requests": requests,
+        "failed": failures,
+        "req_per_sec": round(len(latencies) / elapsed, 1) if elapsed > 0 else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p90_ms": round(percentile(latencies, 90) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 3) if latencies else 0.0,
+    }
+
+
+async def run(args) -> int:
+    logging.basicConfig(level=args.log_level)
+    os.environ["DATABASE_URL"] = args.dsn
+    load_service("doctor")
+    logging.getLogger().setLevel(args.log_level)
+
+    from app.config import settings
+    from app.database import close_app_pool, get_app_pool
+
+    # The service builds DATABASE_URL from DB_* settings; point it at the benchmark database
+    settings.DATABASE_URL = args.dsn
+    app = build_app(args.dsn)
+    modes = ["legacy", "pooled"] if args.mode == "both" else [args.mode]
+
+    rows = []
+    async with serve_app(app) as base_url:
+        for mode in modes:
+            if mode == "pooled":
+                # What the lifespan does at startup
+                await get_app_pool()
+            sampler = BackendSampler(args.dsn)
+            await sampler.start()
+            result = await drive(base_url, f"/{mode}", args.requests, args.concurrency)
+            rows.append({"mode": mode, "concurrency": args.concurrency, **result, **await sampler.stop()})
+            if mode == "pooled":
+                await close_app_pool()
+
+    if args.json:
+        print(json.dumps(rows, indent=2))
+    else:
+        print_table(rows)
+    return 1 if any(row["failed"] for row in rows) else 0
+
+
+def parse_args(argv: List[str]):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--dsn", default=os.getenv("BENCH_DATABASE_URL", "postgresql://postgres@127.0.0.1:5432/postgres"))
+    parser.add_argument("--mode", choices=["legacy", "pooled", "both"], default="both")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=20, help="concurrent HTTP clients")
+    parser.add_argument("--log-level", default="WARNING", help="service log level during the run")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    return asyncio.run(run(parse_args(sys.argv[1:] if argv is None else argv)))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,133 @@
+"""
+Large file download benchmark.
+
+Writes one file of ``--size`` MB (a stand-in for a DICOM series or scan) and
+serves it through an in-process uvicorn server in three ways:
+
+* static - the previous path: Starlette's StaticFiles, whole file only
+* range  - app.file_serving.RangeStaticFiles, the whole file
+* seek   - RangeStaticFiles, ``--range-kb`` slices at random offsets, as a
+           viewer seeking through the file requests them
+
+``--requests`` downloads run ``--concurrency`` at a time. Reported per
+variant: requests per second, throughput, latency percentiles and the peak
+number of threads. The client runs in the same process, so absolute numbers
+are lower than against a separate server; compare variants. The ASGI
+zero-copy extension isn't offered by uvicorn, so these numbers are for the
+threaded chunk reads (``FILE_CHUNK_SIZE``). Usage (from ``backend/``, inside
+the service's environment)::
+
+    python -m benchmarks.file_serving --service labroom
+    python -m benchmarks.file_serving --service doctor --size 512 --requests 64 --concurrency 16
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from benchmarks.harness import load_service, percentile, print_table, serve_app
+
+
+def write_file(path: str, size: int) -> None:
+    block = os.urandom(1024 * 1024)
+    with open(path, "wb") as f:
+        for _ in range(size // len(block)):
+            f.write(block)
+        f.write(block[:size % len(block)])
+
+
+def build_app(directory: str):
+    from fastapi import FastAPI
+    from fastapi.staticfiles import StaticFiles
+    from app.file_serving import RangeStaticFiles
+
+    app = FastAPI()
+    app.mount("/static", StaticFiles(directory=directory), name="static")
+    app.mount("/range", RangeStaticFiles(directory=directory, immutable=True), name="range")
+    return app
+
+
+async def measure(client, path: str, size: int, requests: int, concurrency: int, range_size: int = 0) -> Dict[str, Any]:
+    samples: List[float] = []
+    received = 0
+    peak_threads = threading.active_count()
+    pending = iter(range(requests))
+
+    async def worker():
+        nonlocal received, peak_threads
+        for _ in pending:
+            headers = {}
+            if range_size:
+                start = random.randrange(0, size - range_size)
+                headers["range"] = f"bytes={start}-{start + range_size - 1}"
+            sent = time.perf_counter()
+            async with client.stream("GET", path, headers=headers) as response:
+                response.raise_for_status()
+                async for chunk in response.aiter_raw():
+                    received += len(chunk)
+                    peak_threads = max(peak_threads, threading.active_count())
+            samples.append(time.perf_counter() - sent)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {
+        "req_per_sec": round(requests / elapsed, 1),
+        "mb_per_sec": round(received / elapsed / (1024 * 1024), 1),
+        "p50_ms": round(percentile(samples, 50) * 1000, 1),
+        "p99_ms": round(percentile(samples, 99) * 1000, 1),
+        "peak_threads": peak_threads,
+    }
+
+
+async def run(args) -> int:
+    load_service(args.service)
+    import httpx
+
+    directory = os.path.abspath("bench-files")
+    os.makedirs(directory, exist_ok=True)
+    size = args.size * 1024 * 1024
+    write_file(os.path.join(directory, "scan.dcm"), size)
+
+    report = []
+    async with serve_app(build_app(directory)) as address:
+        limits = httpx.Limits(max_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=f"http://{address}", limits=limits, timeout=None) as client:
+            for variant, path, range_size in (("static", "/static/scan.dcm", 0), ("range", "/range/scan.dcm", 0),
+                                              ("seek", "/range/scan.dcm", args.range_kb * 1024)):
+                # Warm up (the content hash of the first range request is computed here)
+                await client.get(path, headers={"range": "bytes=0-0"})
+                requests = args.requests * (16 if range_size else 1)
+                report.append({"variant": variant, "requests": requests,
+                               **await measure(client, path, size, requests, args.concurrency, range_size)})
+
+    if args.json:
+        print(json.dumps({"service": args.service, "size_mb": args.size, "concurrency": args.concurrency,
+                          "results": report}, indent=2))
+    else:
+        print_table(report)
+    return 0
+
+
+def parse_args(argv: List[str]):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--service", choices=["doctor", "labroom"], default="labroom")
+    parser.add_argument("--size", type=int, default=256, help="file size in MB")
+    parser.add_argument("--requests", type=int, default=16, help="whole-file downloads per variant (x16 for seek)")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--range-kb", type=int, default=1024, help="size of each seek range")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    return asyncio.run(run(parse_args(sys.argv[1:] if argv is None else argv)))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,214 @@
+"""
+Write throughput benchmark for labroom_service lab_requests maintenance.
+
+Compares the cost that keeping the "recent lab requests" list up to date adds
+to every write on lab_requests:
+
+* legacy - mv_recent_lab_requests with the statement trigger that ran
+           ``REFRESH MATERIALIZED VIEW CONCURRENTLY`` after every write
+* feed   - lab_requests_recent maintained by the row triggers of
+           ``labroom_service/app/database/recent_requests.sql``
+
+Each mode gets its own scratch schema with a lab_requests table prefilled with
+``--rows`` requests, then N concurrent connections insert new requests and
+update the status of existing ones. Reported per mode: write latency
+percentiles, writes per second and failed writes. The scratch schemas are
+dropped afterwards.
+
+Needs a reachable Postgres and the permission to create schemas. Usage (from
+``backend/``, inside labroom_service's environment)::
+
+    python -m benchmarks.lab_request_writes --dsn postgresql://postgres@127.0.0.1:5432/postgres
+    python -m benchmarks.lab_request_writes --rows 100000 --writes 2000 --concurrency 20
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+from benchmarks.harness import BACKEND_DIR, percentile, print_table
+
+FEED_SQL = os.path.join(BACKEND_DIR, "labroom_service", "app", "database", "recent_requests.sql")
+
+# The columns of lab_requests that the recent list and its triggers use
+TABLE_SQL = """
+CREATE TABLE lab_requests (
+    id UUID PRIMARY KEY,
+    patient_id UUID NOT NULL,
+    doctor_id UUID NOT NULL,
+    technician_id UUID,
+    test_type TEXT NOT NULL,
+    priority TEXT NOT NULL,
+    status TEXT NOT NULL,
+    notes TEXT,
+    is_deleted BOOLEAN NOT NULL DEFAULT FALSE,
+    created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW()
+);
+CREATE INDEX idx_lab_requests_created_at ON lab_requests(created_at DESC);
+"""
+
+PREFILL_SQL = """
+INSERT INTO lab_requests (id, patient_id, doctor_id, technician_id, test_type, priority, status, created_at, updated_at)
+SELECT gen_random_uuid(), gen_random_uuid(), gen_random_uuid(),
+       CASE WHEN i % 3 = 0 THEN NULL ELSE gen_random_uuid() END,
+       (ARRAY['complete_blood_count', 'lipid_panel', 'urinalysis'])[1 + i % 3],
+       (ARRAY['low', 'medium', 'high'])[1 + i % 3],
+       (ARRAY['pending', 'in_progress', 'completed'])[1 + i % 3],
+       NOW() - make_interval(secs => i * 10), NOW() - make_interval(secs => i * 10)
+FROM generate_series(1, $1) AS i
+"""
+
+# What optimization.sql installed before the feed replaced it
+LEGACY_SQL = """
+CREATE MATERIALIZED VIEW mv_recent_lab_requests AS
+SELECT
+    id, patient_id, doctor_id, technician_id, test_type,
+    priority, status, created_at, updated_at
+FROM lab_requests
+WHERE is_deleted = FALSE
+ORDER BY created_at DESC
+LIMIT 500;
+
+CREATE UNIQUE INDEX idx_mv_recent_lab_requests ON mv_recent_lab_requests(id);
+
+CREATE OR REPLACE FUNCTION refresh_mv_recent_lab_requests()
+RETURNS TRIGGER AS $$
+BEGIN
+    REFRESH MATERIALIZED VIEW CONCURRENTLY mv_recent_lab_requests;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER refresh_mv_recent_lab_requests_trigger
+AFTER INSERT OR UPDATE OR DELETE ON lab_requests
+FOR EACH STATEMENT
+EXECUTE FUNCTION refresh_mv_recent_lab_requests();
+"""
+
+INSERT_SQL = """
+INSERT INTO lab_requests (id, patient_id, doctor_id, technician_id, test_type, priority, status)
+VALUES ($1, $2, $3, $4, 'lipid_panel', 'medium', 'pending')
+"""
+
+UPDATE_SQL = "UPDATE lab_requests SET status = $2, updated_at = NOW() WHERE id = $1"
+
+
+async def prepare(dsn: str, schema: str, mode: str, rows: int) -> List[uuid.UUID]:
+    """Create the scratch schema for ``mode``; returns the ids of the newest requests"""
+    import asyncpg
+
+    conn = await asyncpg.connect(dsn)
+    try:
+        await conn.execute(f"DROP SCHEMA IF EXISTS {schema} CASCADE")
+        await conn.execute(f"CREATE SCHEMA {schema}")
+        await conn.execute(f"SET search_path TO {schema}, public")
+        await conn.execute(TABLE_SQL)
+        await conn.execute(PREFILL_SQL, rows)
+        await conn.execute("ANALYZE lab_requests")
+        if mode == "legacy":
+            await conn.execute(LEGACY_SQL)
+        else:
+            with open(FEED_SQL, "r") as f:
+                await conn.execute(f.read())
+        # Updates hit recent requests, like technicians working through the queue
+        return [r["id"] for r in await conn.fetch("SELECT id FROM lab_requests ORDER BY created_at DESC LIMIT 2000")]
+    finally:
+        await conn.close()
+
+
+async def drive(dsn: str, schema: str, ids: List[uuid.UUID], writes: int, concurrency: int,
+                update_ratio: float) -> Dict[str, Any]:
+    import asyncpg
+
+    pool = await asyncpg.create_pool(
+        dsn, min_size=concurrency, max_size=concurrency,
+        server_settings={"search_path": f"{schema}, public"},
+    )
+    latencies: List[float] = []
+    failures = 0
+    remaining = iter(range(writes))
+    rng = random.Random(42)
+
+    async def worker():
+        nonlocal failures
+        async with pool.acquire() as conn:
+            for _ in remaining:
+                started = time.perf_counter()
+                try:
+                    if rng.random() < update_ratio:
+                        await conn.execute(UPDATE_SQL, rng.choice(ids), rng.choice(["in_progress", "completed"]))
+                    else:
+                        await conn.execute(INSERT_SQL, uuid.uuid4(), uuid.uuid4(), uuid.uuid4(), None)
+                except asyncpg.PostgresError:
+                    failures += 1
+                    continue
+                latencies.append(time.perf_counter() - started)
+
+    try:
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    finally:
+        await pool.close()
+
+    return {
+        "writes": writes,
+        "failed": failures,
+        "writes_per_sec": round(len(latencies) / elapsed, 1) if elapsed > 0 else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p90_ms": round(percentile(latencies, 90) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 3) if latencies else 0.0,
+    }
+
+
+async def run(args) -> int:
+    import asyncpg
+
+    modes = ["legacy", "feed"] if args.mode == "both" else [args.mode]
+    rows = []
+    for mode in modes:
+        schema = f"bench_lab_request_writes_{mode}"
+        ids = await prepare(args.dsn, schema, mode, args.rows)
+        try:
+            result = await drive(args.dsn, schema, ids, args.writes, args.concurrency, args.update_ratio)
+        finally:
+            conn = await asyncpg.connect(args.dsn)
+            try:
+                await conn.execute(f"DROP SCHEMA IF EXISTS {schema} CASCADE")
+            finally:
+                await conn.close()
+        rows.append({"mode": mode, "rows": args.rows, "concurrency": args.concurrency, **result})
+
+    if args.json:
+        print(json.dumps(rows, indent=2))
+    else:
+        print_table(rows)
+    return 1 if any(row["failed"] for row in rows) else 0
+
+
+def parse_args(argv: List[str]):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--dsn", default=os.getenv("BENCH_DATABASE_URL", "postgresql://postgres@127.0.0.1:5432/postgres"))
+    parser.add_argument("--mode", choices=["legacy", "feed", "both"], default="both")
+    parser.add_argument("--rows", type=int, default=50000, help="lab requests in the table before the run")
+    parser.add_argument("--writes", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=10, help="concurrent database connections")
+    parser.add_argument("--update-ratio", type=float, default=0.5, help="share of writes that are updates")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    return asyncio.run(run(parse_args(sys.argv[1:] if argv is None else argv)))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,214 @@
+"""
+Report and list query benchmark for labroom_service's monthly partitioning.
+
+Builds the same synthetic lab_requests table (``--rows`` requests spread
+evenly over ``--months`` months up to now) twice, in two scratch schemas:
+
+* plain   - a single heap table with labroom's lab_requests indexes
+* monthly - the same table converted with ``app.database.partitions``
+            (the code path of ``python -m app.database.partitions migrate``)
+
+then runs each query ``--repeat`` times on both, over random date windows of
+``--window-days`` days:
+
+* report_legacy - get_report_data's previous ``DATE(created_at) BETWEEN`` filter
+* report        - get_report_data's range filter on created_at
+* list_page     - newest page of the lab request list
+* list_range    - lab request list filtered by a date range
+* count_range   - the total of that list
+
+Reported per query and layout: latency percentiles and average rows returned,
+plus the time the conversion took. The scratch schemas are dropped afterwards.
+
+Needs a reachable Postgres and the permission to create schemas. Usage (from
+``backend/``, inside labroom_service's environment)::
+
+    python -m benchmarks.partitioning --dsn postgresql://postgres@127.0.0.1:5432/postgres
+    python -m benchmarks.partitioning --rows 5000000 --months 36 --repeat 50
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional
+
+from benchmarks.harness import load_service, percentile, print_table
+
+TABLE_SQL = """
+CREATE TABLE lab_requests (
+    id UUID PRIMARY KEY,
+    patient_id UUID NOT NULL,
+    doctor_id UUID NOT NULL,
+    technician_id UUID,
+    test_type TEXT NOT NULL,
+    priority TEXT NOT NULL,
+    status TEXT NOT NULL,
+    notes TEXT,
+    is_read BOOLEAN NOT NULL DEFAULT FALSE,
+    is_deleted BOOLEAN NOT NULL DEFAULT FALSE,
+    created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    completed_at TIMESTAMP WITH TIME ZONE
+)
+"""
+
+# The lab_requests indexes of init.sql
+INDEX_SQL = """
+CREATE INDEX idx_lab_requests_patient_id ON lab_requests(patient_id);
+CREATE INDEX idx_lab_requests_doctor_id ON lab_requests(doctor_id);
+CREATE INDEX idx_lab_requests_technician_id ON lab_requests(technician_id);
+CREATE INDEX idx_lab_requests_status ON lab_requests(status) WHERE is_deleted = FALSE;
+CREATE INDEX idx_lab_requests_created_at ON lab_requests(created_at DESC) WHERE is_deleted = FALSE;
+CREATE INDEX idx_lab_requests_pagination ON lab_requests(created_at DESC, id DESC) WHERE is_deleted = FALSE;
+"""
+
+# Deterministic, so both layouts hold the same rows
+FILL_SQL = """
+INSERT INTO lab_requests
+    (id, patient_id, doctor_id, technician_id, test_type, priority, status, notes,
+     is_read, is_deleted, created_at, updated_at, completed_at)
+SELECT md5('r' || i)::uuid, md5('p' || i % 20000)::uuid, md5('d' || i % 50)::uuid,
+       CASE WHEN i % 4 = 0 THEN NULL ELSE md5('t' || i % 30)::uuid END,
+       (ARRAY['complete_blood_count', 'lipid_panel', 'urinalysis', 'thyroid_panel'])[1 + i % 4],
+       (ARRAY['low', 'medium', 'high'])[1 + i % 3],
+       (ARRAY['pending', 'in_progress', 'completed', 'completed'])[1 + i % 4],
+       'synthetic request ' || i,
+       i % 5 <> 0, i % 50 = 0,
+       ts, ts, CASE WHEN i % 4 >= 2 THEN ts + interval '6 hours' END
+FROM (
+    SELECT i, NOW() - make_interval(secs => i * $2::double precision / $1) AS ts
+    FROM generate_series(1, $1) AS i
+) s
+"""
+
+QUERIES = {
+    "report_legacy": """
+        SELECT id, patient_id, doctor_id, technician_id, test_type, priority, status, notes,
+               created_at, updated_at, completed_at, is_read
+        FROM lab_requests lr
+        WHERE DATE(lr.created_at) BETWEEN $1 AND $2
+        ORDER BY lr.created_at ASC
+    """,
+    "report": """
+        SELECT id, patient_id, doctor_id, technician_id, test_type, priority, status, notes,
+               created_at, updated_at, completed_at, is_read
+        FROM lab_requests lr
+        WHERE lr.created_at >= $1::date AND lr.created_at < $2::date + 1
+        ORDER BY lr.created_at ASC
+    """,
+    "list_page": """
+        SELECT id, patient_id, doctor_id, test_type, priority, status, created_at
+        FROM lab_requests
+        WHERE is_deleted = FALSE
+        ORDER BY created_at DESC, id DESC
+        LIMIT 50
+    """,
+    "list_range": """
+        SELECT id, patient_id, doctor_id, test_type, priority, status, created_at
+        FROM lab_requests
+        WHERE is_deleted = FALSE AND created_at >= $1::date AND created_at <= $2::date
+        ORDER BY created_at DESC, id DESC
+        LIMIT 50
+    """,
+    "count_range": """
+        SELECT COUNT(*) FROM lab_requests
+        WHERE is_deleted = FALSE AND created_at >= $1::date AND created_at <= $2::date
+    """,
+}
+
+
+async def prepare(conn, schema: str, rows: int, months: int):
+    await conn.execute(f"DROP SCHEMA IF EXISTS {schema} CASCADE")
+    await conn.execute(f"CREATE SCHEMA {schema}")
+    await conn.execute(f"SET search_path TO {schema}, public")
+    await conn.execute(TABLE_SQL)
+    await conn.execute(FILL_SQL, rows, months * 30.4 * 86400)
+    await conn.execute(INDEX_SQL)
+    await conn.execute("ANALYZE lab_requests")
+
+
+async def measure(conn, name: str, windows: List[tuple]) -> Dict[str, Any]:
+    query = QUERIES[name]
+    latencies: List[float] = []
+    returned: List[int] = []
+    for start, end in windows:
+        args = (start, end) if "$1" in query else ()
+        started = time.perf_counter()
+        result = await conn.fetch(query, *args)
+        latencies.append(time.perf_counter() - started)
+        returned.append(result[0][0] if name.startswith("count") else len(result))
+    return {
+        "runs": len(latencies),
+        "avg_rows": round(statistics.fmean(returned)),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p90_ms": round(percentile(latencies, 90) * 1000, 3),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 3),
+    }
+
+
+async def run(args) -> int:
+    import asyncpg
+
+    load_service("labroom")
+    from app.database.partitions import convert_table
+
+    rng = random.Random(7)
+    today = date.today()
+    windows = []
+    for _ in range(args.repeat):
+        start = today - timedelta(days=rng.randrange(args.window_days, int(args.months * 30.4)))
+        windows.append((start, start + timedelta(days=args.window_days - 1)))
+
+    conn = await asyncpg.connect(args.dsn)
+    rows = []
+    migration = {}
+    try:
+        for layout in ("plain", "monthly"):
+            schema = f"bench_partitioning_{layout}"
+            print(f"building {layout} ({args.rows} rows)...", file=sys.stderr)
+            await prepare(conn, schema, args.rows, args.months)
+            if layout == "monthly":
+                started = time.perf_counter()
+                async with conn.transaction():
+                    copied = await convert_table(conn, "lab_requests", "created_at", months_ahead=3)
+                migration = {"rows_copied": copied, "seconds": round(time.perf_counter() - started, 1)}
+            for name in QUERIES:
+                # One untimed run to warm the cache
+                await measure(conn, name, windows[:1])
+                rows.append({"query": name, "layout": layout, **await measure(conn, name, windows)})
+            if not args.keep:
+                await conn.execute(f"DROP SCHEMA {schema} CASCADE")
+    finally:
+        await conn.close()
+
+    if args.json:
+        print(json.dumps({"migration": migration, "queries": rows}, indent=2))
+    else:
+        print_table(sorted(rows, key=lambda r: list(QUERIES).index(r["query"])))
+        print(f"\nconversion: {migration.get('rows_copied')} rows in {migration.get('seconds')}s")
+    return 0
+
+
+def parse_args(argv: List[str]):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--dsn", default=os.getenv("BENCH_DATABASE_URL", "postgresql://postgres@127.0.0.1:5432/postgres"))
+    parser.add_argument("--rows", type=int, default=2000000)
+    parser.add_argument("--months", type=int, default=24, help="months of history the rows span")
+    parser.add_argument("--window-days", type=int, default=7, help="date range of the report and list queries")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--keep", action="store_true", help="keep the scratch schemas")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    return asyncio.run(run(parse_args(sys.argv[1:] if argv is None else argv)))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
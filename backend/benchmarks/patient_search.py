@@ -0,0 +1,234 @@
+"""
+Patient search benchmark for cardroom_service's registration desk lookups.
+
+Builds a synthetic patients table (``--rows`` patients, 1M by default) in a
+scratch schema, then runs each lookup ``--repeat`` times over search terms
+taken from the generated patients:
+
+* legacy_name   - the previous name search: ``ILIKE '%term%'`` on first_name and
+                  last_name, newest first, plus its ``COUNT(*)``
+* legacy_phone  - the previous ``phone_number ILIKE '%term%'`` search plus its count
+* search_name   - PatientModel.search by name: trigram matching ranked by
+                  similarity, plus the total
+* search_typo   - the same with one letter of the name changed
+* search_phone  - PatientModel.search on the normalised phone digits
+* autocomplete  - PatientModel.autocomplete on 3 to 6 typed characters
+
+The legacy lookups run against the table with only the indexes it had before
+(idx_patient_name, idx_registration_number), the others after the patient
+search indexes of ``cardroom_service/app/database/init.sql`` are built. The
+search_* lookups need the pg_trgm extension and are skipped without it.
+Reported per lookup: latency percentiles and average rows returned. The
+scratch schema is dropped afterwards.
+
+Needs a reachable Postgres and the permission to create schemas. Usage (from
+``backend/``, inside cardroom_service's environment)::
+
+    python -m benchmarks.patient_search --dsn postgresql://postgres@127.0.0.1:5432/postgres
+    python -m benchmarks.patient_search --rows 200000 --repeat 50
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import statistics
+import sys
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from benchmarks.harness import BACKEND_DIR, load_service, percentile, print_table
+
+INIT_SQL = os.path.join(BACKEND_DIR, "cardroom_service", "app", "database", "init.sql")
+
+SCHEMA = "bench_patient_search"
+
+TABLE_SQL = """
+CREATE TABLE patients (
+    id UUID PRIMARY KEY,
+    registration_number VARCHAR(50) UNIQUE NOT NULL,
+    first_name VARCHAR(100) NOT NULL,
+    last_name VARCHAR(100) NOT NULL,
+    date_of_birth DATE NOT NULL,
+    gender VARCHAR(20) NOT NULL,
+    blood_group VARCHAR(10),
+    phone_number VARCHAR(20) NOT NULL,
+    email VARCHAR(100),
+    address TEXT,
+    emergency_contact_name VARCHAR(100),
+    emergency_contact_phone VARCHAR(20),
+    medical_history JSONB DEFAULT '{}'::jsonb,
+    allergies JSONB DEFAULT '[]'::jsonb,
+    created_at TIMESTAMPTZ DEFAULT NOW(),
+    updated_at TIMESTAMPTZ DEFAULT NOW(),
+    is_deleted BOOLEAN DEFAULT FALSE
+);
+CREATE INDEX idx_patient_name ON patients(first_name, last_name);
+CREATE INDEX idx_registration_number ON patients(registration_number);
+"""
+
+# Names are built from syllables, so there are many distinct ones and a term matches a few rows
+FILL_SQL = """
+WITH syllables AS (
+    SELECT ARRAY['a', 'be', 'ke', 'ta', 'de', 'se', 'ma', 'ha', 'li', 'ra', 'ne', 'to',
+                 'gi', 'lu', 'me', 'wo', 'ye', 'zi', 'chu', 'fa'] AS s
+)
+INSERT INTO patients
+    (id, registration_number, first_name, last_name, date_of_birth, gender, phone_number, created_at, is_deleted)
+SELECT md5('p' || i)::uuid,
+       'P-' || to_char(DATE '2020-01-01' + (i % 1500), 'YYYYMMDD') || '-' || lpad(i::text, 7, '0'),
+       initcap(s[1 + i % 20] || s[1 + (i / 20) % 20] || s[1 + (i / 400) % 20]),
+       initcap(s[1 + (i / 7) % 20] || s[1 + (i / 140) % 20] || s[1 + (i / 2800) % 20] || s[1 + (i / 56000) % 20]),
+       DATE '1950-01-01' + (i % 25000),
+       CASE WHEN i % 2 = 0 THEN 'MALE' ELSE 'FEMALE' END,
+       '+251 9' || lpad(((i::bigint * 7919) % 100000000)::text, 8, '0'),
+       NOW() - make_interval(secs => i),
+       i % 100 = 0
+FROM syllables, generate_series(1, $1) AS i
+"""
+
+LEGACY_NAME_SQL = """
+    SELECT * FROM patients
+    WHERE is_deleted = FALSE AND (first_name ILIKE $1 OR last_name ILIKE $1)
+    ORDER BY created_at DESC
+    LIMIT 20
+"""
+LEGACY_NAME_COUNT_SQL = """
+    SELECT COUNT(*) FROM patients
+    WHERE is_deleted = FALSE AND (first_name ILIKE $1 OR last_name ILIKE $1)
+"""
+LEGACY_PHONE_SQL = """
+    SELECT * FROM patients
+    WHERE is_deleted = FALSE AND phone_number ILIKE $1
+    ORDER BY created_at DESC
+    LIMIT 20
+"""
+LEGACY_PHONE_COUNT_SQL = "SELECT COUNT(*) FROM patients WHERE is_deleted = FALSE AND phone_number ILIKE $1"
+
+
+def search_index_sql() -> List[str]:
+    """The patient search statements of init.sql"""
+    with open(INIT_SQL, "r") as f:
+        sql = f.read()
+    return re.findall(r"CREATE INDEX IF NOT EXISTS idx_patients_\w+_(?:trgm|prefix)\b.*?;", sql, re.S)
+
+
+def typo(term: str, rng: random.Random) -> str:
+    i = rng.randrange(1, len(term))
+    return term[:i] + rng.choice("aeiou") + term[i + 1:]
+
+
+async def measure(lookup: Callable[[str], Awaitable[int]], terms: List[str]) -> Dict[str, Any]:
+    await lookup(terms[0])  # warm the cache
+    latencies: List[float] = []
+    returned: List[int] = []
+    for term in terms:
+        started = time.perf_counter()
+        returned.append(await lookup(term))
+        latencies.append(time.perf_counter() - started)
+    return {
+        "runs": len(latencies),
+        "avg_rows": round(statistics.fmean(returned), 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p90_ms": round(percentile(latencies, 90) * 1000, 3),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 3),
+    }
+
+
+async def run(args) -> int:
+    import asyncpg
+
+    load_service("cardroom")
+    from app.models import PatientModel
+
+    conn = await asyncpg.connect(args.dsn)
+    rows = []
+    try:
+        await conn.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        await conn.execute(f"CREATE SCHEMA {SCHEMA}")
+        await conn.execute(f"SET search_path TO {SCHEMA}, public")
+        print(f"building {args.rows} patients...", file=sys.stderr)
+        await conn.execute(TABLE_SQL)
+        await conn.execute(FILL_SQL, args.rows)
+        await conn.execute("ANALYZE patients")
+
+        rng = random.Random(11)
+        sample = await conn.fetch(
+            "SELECT first_name, last_name, phone_number FROM patients WHERE is_deleted = FALSE "
+            "ORDER BY md5(id::text) LIMIT $1", args.repeat
+        )
+        names = [f"{r['first_name']} {r['last_name']}" for r in sample]
+        last_names = [r["last_name"] for r in sample]
+        phones = [re.sub(r"\D", "", r["phone_number"])[-6:] for r in sample]
+        typed = [name[:rng.randint(3, 6)] for name in names]
+
+        async def legacy(sql: str, count_sql: str, term: str) -> int:
+            pattern = f"%{term}%"
+            found = await conn.fetch(sql, pattern)
+            await conn.fetchval(count_sql, pattern)
+            return len(found)
+
+        rows.append({"lookup": "legacy_name", **await measure(
+            lambda t: legacy(LEGACY_NAME_SQL, LEGACY_NAME_COUNT_SQL, t), last_names)})
+        rows.append({"lookup": "legacy_phone", **await measure(
+            lambda t: legacy(LEGACY_PHONE_SQL, LEGACY_PHONE_COUNT_SQL, t), phones)})
+
+        try:
+            await conn.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+            trigram = True
+        except asyncpg.PostgresError as e:
+            print(f"pg_trgm unavailable ({e}), skipping the search_* lookups", file=sys.stderr)
+            trigram = False
+
+        print("building search indexes...", file=sys.stderr)
+        started = time.perf_counter()
+        for statement in search_index_sql():
+            if trigram or "gin_trgm_ops" not in statement:
+                await conn.execute(statement)
+        await conn.execute("ANALYZE patients")
+        index_seconds = round(time.perf_counter() - started, 1)
+
+        async def search(**criteria) -> int:
+            found, _ = await PatientModel.search(conn, limit=20, **criteria)
+            return len(found)
+
+        if trigram:
+            rows.append({"lookup": "search_name", **await measure(lambda t: search(query=t), names)})
+            rows.append({"lookup": "search_typo", **await measure(
+                lambda t: search(query=t), [typo(name, rng) for name in names])})
+            rows.append({"lookup": "search_phone", **await measure(lambda t: search(phone=t), phones)})
+
+        async def autocomplete(term: str) -> int:
+            return len(await PatientModel.autocomplete(conn, term, limit=10))
+
+        rows.append({"lookup": "autocomplete", **await measure(autocomplete, typed)})
+    finally:
+        if not args.keep:
+            await conn.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        await conn.close()
+
+    if args.json:
+        print(json.dumps({"rows": args.rows, "index_seconds": index_seconds, "lookups": rows}, indent=2))
+    else:
+        print_table(rows)
+        print(f"\nsearch indexes built in {index_seconds}s on {args.rows} patients")
+    return 0
+
+
+def parse_args(argv: List[str]):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--dsn", default=os.getenv("BENCH_DATABASE_URL", "postgresql://postgres@127.0.0.1:5432/postgres"))
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--repeat", type=int, default=30, help="search terms per lookup")
+    parser.add_argument("--keep", action="store_true", help="keep the scratch schema")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    return asyncio.run(run(parse_args(sys.argv[1:] if argv is None else argv)))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
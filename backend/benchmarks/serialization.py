@@ -0,0 +1,238 @@
+"""
+List response serialization benchmark.
+
+Serves the same page of rows (``--rows``, 100 and 1,000 by default) through
+three variants of a list route and requests each ``--requests`` times,
+in-process over ASGI, so the numbers are the cost of FastAPI's response
+handling without network or database time:
+
+* model  - the previous path: ``response_model`` validation of every row and
+           the standard library JSON encoder (JSONResponse)
+* orjson - the same validation, rendered by app.responses.ORJSONResponse
+* lean   - app.responses.lean_response: the rows are projected onto the
+           response model without validation and encoded by orjson
+
+The rows look like what asyncpg returns (its UUIDs, datetimes, json columns
+as text). The list responses benchmarked depend on ``--service``:
+
+* cardroom - PatientsResponse and AppointmentsResponse
+* doctor   - LabRequestsListResponse
+* labroom  - PaginatedResponse of lab requests
+
+Reported per response and page size: requests per second, latency
+percentiles and the body size. Usage (from ``backend/``, inside the chosen
+service's environment)::
+
+    python -m benchmarks.serialization --service cardroom
+    python -m benchmarks.serialization --service doctor --rows 100,1000,5000 --requests 200
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+import uuid
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from benchmarks.harness import load_service, percentile, print_table
+
+STARTED = datetime(2024, 1, 1, 8, 0, tzinfo=timezone.utc)
+
+
+def new_id():
+    # The UUID subclass asyncpg returns for uuid columns
+    from asyncpg.pgproto.pgproto import UUID
+    return UUID(uuid.uuid4().bytes)
+
+
+def patient_row(i: int) -> Dict[str, Any]:
+    return {
+        "id": new_id(),
+        "registration_number": f"P-{i:07d}",
+        "first_name": f"Abebe{i}",
+        "last_name": "Kebede",
+        "date_of_birth": date(1980, 1, 1) + timedelta(days=i % 10000),
+        "gender": "MALE" if i % 2 else "FEMALE",
+        "blood_group": "O+",
+        "phone_number": f"+2519{i:08d}",
+        "email": f"patient{i}@example.com",
+        "address": "Bole, Addis Ababa",
+        "emergency_contact_name": "Almaz Kebede",
+        "emergency_contact_phone": "+251911000000",
+        "medical_history": '{"conditions": ["hypertension"], "surgeries": []}',
+        "allergies": '["Penicillin"]',
+        "created_at": STARTED + timedelta(minutes=i),
+        "updated_at": STARTED + timedelta(minutes=i),
+        "is_deleted": False,
+    }
+
+
+def appointment_row(i: int) -> Dict[str, Any]:
+    return {
+        "id": new_id(),
+        "patient_id": new_id(),
+        "doctor_id": new_id(),
+        "appointment_date": STARTED + timedelta(minutes=30 * i),
+        "duration_minutes": 30,
+        "appointment_type": "FOLLOW_UP",
+        "status": "SCHEDULED",
+        "reason": "Blood pressure review",
+        "notes": None,
+        "created_at": STARTED,
+        "updated_at": STARTED,
+        "is_deleted": False,
+        "doctor_name": "Dr. Tigist Hailu",
+        "department": "Cardiology",
+        "patient_name": f"Abebe{i} Kebede",
+        "patient_registration": f"P-{i:07d}",
+    }
+
+
+def doctor_lab_request_row(i: int) -> Dict[str, Any]:
+    return {
+        "id": new_id(),
+        "patient_id": new_id(),
+        "patient_name": f"Abebe{i} Kebede",
+        "doctor_id": new_id(),
+        "doctor_name": "Dr. Tigist Hailu",
+        "test_type": "complete_blood_count",
+        "urgency": "routine",
+        "notes": "Fasting sample",
+        "status": "pending",
+        "result": None,
+        "result_date": None,
+        "created_at": STARTED + timedelta(minutes=i),
+        "updated_at": STARTED + timedelta(minutes=i),
+        "is_active": True,
+        "file_count": 0,
+    }
+
+
+def labroom_lab_request_row(i: int) -> Dict[str, Any]:
+    return {
+        "id": new_id(),
+        "patient_id": new_id(),
+        "doctor_id": new_id(),
+        "technician_id": None,
+        "test_type": "complete_blood_count",
+        "priority": "medium",
+        "status": "pending",
+        "notes": "Fasting sample",
+        "diagnosis_notes": None,
+        "created_at": STARTED + timedelta(minutes=i),
+        "updated_at": STARTED + timedelta(minutes=i),
+        "completed_at": None,
+        "due_date": None,
+        "is_read": False,
+        "read_at": None,
+    }
+
+
+def page(key: str, **extra: Any) -> Callable[[List[Dict[str, Any]]], Dict[str, Any]]:
+    def envelope(rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+        return {key: rows, "total": len(rows), "page": 1, "pages": 1, **extra}
+    return envelope
+
+
+# name -> (schema name, envelope, row factory, whether the handler built the model itself)
+Scenario = Tuple[str, Callable, Callable[[int], Dict[str, Any]], bool]
+
+
+def scenarios(service: str) -> Dict[str, Scenario]:
+    if service == "cardroom":
+        return {
+            "patients": ("PatientsResponse", page("data", page_size=20, total_exact=True), patient_row, True),
+            "appointments": ("AppointmentsResponse", page("data", page_size=20, total_exact=True), appointment_row, True),
+        }
+    if service == "doctor":
+        return {"lab_requests": ("LabRequestsListResponse", page("lab_requests", success=True), doctor_lab_request_row, False)}
+    if service == "labroom":
+        return {"lab_requests": ("PaginatedResponse", page("items", size=20), labroom_lab_request_row, False)}
+    raise SystemExit(f"Unknown service: {service}")
+
+
+def build_app(model: type, envelope: Callable, rows: List[Dict[str, Any]], construct: bool):
+    from fastapi import FastAPI
+    from app.responses import ORJSONResponse, lean_response
+
+    app = FastAPI()
+    content = envelope(rows)
+
+    async def validated():
+        return model(**content) if construct else content
+
+    async def lean():
+        return lean_response(model, content)
+
+    app.add_api_route("/model", validated, response_model=model)
+    # A second app, as the default response class is set per app
+    orjson_app = FastAPI(default_response_class=ORJSONResponse)
+    orjson_app.add_api_route("/orjson", validated, response_model=model)
+    app.add_api_route("/lean", lean, response_model=model)
+    app.mount("/o", orjson_app)
+    return app
+
+
+async def measure(client, path: str, requests: int) -> Dict[str, Any]:
+    samples: List[float] = []
+    size = 0
+    started = time.perf_counter()
+    for _ in range(requests):
+        sent = time.perf_counter()
+        response = await client.get(path)
+        samples.append(time.perf_counter() - sent)
+        response.raise_for_status()
+        size = len(response.content)
+    elapsed = time.perf_counter() - started
+    return {
+        "req_per_sec": round(requests / elapsed, 1),
+        "p50_ms": round(percentile(samples, 50) * 1000, 3),
+        "p99_ms": round(percentile(samples, 99) * 1000, 3),
+        "bytes": size,
+    }
+
+
+async def run(args) -> int:
+    load_service(args.service)
+    import httpx
+    from app import schemas
+
+    report = []
+    for name, (schema, envelope, row, construct) in scenarios(args.service).items():
+        model = getattr(schemas, schema)
+        for count in args.rows:
+            app = build_app(model, envelope, [row(i) for i in range(count)], construct)
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+                bodies = {}
+                for variant, path in (("model", "/model"), ("orjson", "/o/orjson"), ("lean", "/lean")):
+                    # Warm up (and keep a body to compare)
+                    bodies[variant] = json.loads((await client.get(path)).content)
+                    report.append({"response": name, "rows": count, "variant": variant,
+                                   **await measure(client, path, args.requests)})
+                if bodies["lean"].keys() != bodies["model"].keys():
+                    print(f"warning: {name} lean response has different keys than the model's", file=sys.stderr)
+
+    if args.json:
+        print(json.dumps({"service": args.service, "requests": args.requests, "results": report}, indent=2))
+    else:
+        print_table(report)
+    return 0
+
+
+def parse_args(argv: List[str]):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--service", choices=["cardroom", "doctor", "labroom"], default="cardroom")
+    parser.add_argument("--rows", type=lambda v: [int(n) for n in v.split(",")], default=[100, 1000],
+                        help="comma separated page sizes")
+    parser.add_argument("--requests", type=int, default=100, help="requests per variant and page size")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    return asyncio.run(run(parse_args(sys.argv[1:] if argv is None else argv)))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
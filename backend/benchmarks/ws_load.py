@@ -0,0 +1,439 @@
+"""
+Websocket load test and delivery latency benchmark.
+
+Spins up one service in-process behind uvicorn with a stubbed database pool,
+connects N simulated clients and drives realtime events through the same
+code paths production uses:
+
+* labroom   - ``/ws/lab-requests/{doctor_id}``: a doctor_service producer pushes
+              ``new_lab_request`` messages which are broadcast to every client
+* doctor    - ``/ws/opd/{doctor_id}``: ``broadcast_patient_assignment`` delivers
+              OPD assignments round-robin to the connected doctors
+* cardroom  - ``/ws``: ``broadcast_opd_assignment`` delivers doctor assignments
+              round-robin to the connected doctors
+
+Reported per client group (fast / slow consumers): end-to-end delivery latency
+percentiles, messages/sec, lost messages and memory per connection. The run
+exits non-zero when ``--max-p99-ms`` is exceeded or fast clients lose messages,
+so it can gate a deployment pipeline.
+
+Usage (from ``backend/``, inside the target service's environment)::
+
+    python -m benchmarks.ws_load --service labroom --clients 200 --events 500
+    python -m benchmarks.ws_load --service doctor --clients 500 --events 5000 --slow-consumers 20
+    python -m benchmarks.ws_load --service cardroom --clients 100 --events 2000 --max-p99-ms 50
+"""
+import argparse
+import asyncio
+import json
+import logging
+import re
+import sys
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from benchmarks.harness import (
+    LatencyRecorder,
+    MemoryProbe,
+    StubPool,
+    load_service,
+    print_table,
+    serve_app,
+)
+
+
+class Scenario:
+    """One service's websocket route plus the event source that feeds it."""
+
+    name = ""
+    broadcast = False  # every client receives every event
+
+    def build_app(self):
+        raise NotImplementedError
+
+    def client_path(self, index: int) -> str:
+        raise NotImplementedError
+
+    async def handshake(self, ws):
+        """Consume the messages a client receives right after connecting"""
+        await ws.recv()
+
+    async def start(self, base_url: str):
+        """Prepare the event source once all clients are connected"""
+
+    async def emit(self, event_no: int, target: int, sent_at: Dict[str, float]):
+        raise NotImplementedError
+
+    def message_key(self, message: Dict[str, Any]) -> Optional[str]:
+        raise NotImplementedError
+
+    async def stop(self):
+        pass
+
+
+class LabroomScenario(Scenario):
+    name = "labroom"
+    broadcast = True
+
+    def __init__(self):
+        self.rows: Dict[str, Dict[str, Any]] = {}
+        self.producer = None
+        self.producer_task = None
+        self.acks = LatencyRecorder("producer_ack")
+
+    def _insert(self, query, *args):
+        columns = [c.strip() for c in re.search(r"\(([^)]*)\)", query).group(1).split(",")]
+        row = dict(zip(columns, args))
+        self.rows[str(row["id"])] = row
+        return row["id"]
+
+    def _fetchrow(self, query, *args):
+        return self.rows.get(str(args[0]))
+
+    def build_app(self):
+        from app import database
+        from app.main import app
+
+        database.pool = StubPool(fetchval=self._insert, fetchrow=self._fetchrow)
+        return app
+
+    def client_path(self, index: int) -> str:
+        return f"/ws/lab-requests/technician-{index}"
+
+    async def start(self, base_url: str):
+        import websockets
+
+        self.sent_at: Dict[str, float] = {}
+        self.producer = await websockets.connect(f"ws://{base_url}/ws/lab-requests/doctor-service-bench")
+        await self.producer.recv()
+        self.producer_task = asyncio.create_task(self._read_acks())
+
+    async def _read_acks(self):
+        async for raw in self.producer:
+            message = json.loads(raw)
+            if message.get("type") == "lab_request_received":
+                sent = self.sent_at.get(message.get("request_id"))
+                if sent is not None:
+                    self.acks.record(time.perf_counter() - sent)
+
+    async def emit(self, event_no: int, target: int, sent_at: Dict[str, float]):
+        request_id = str(uuid.uuid4())
+        payload = {
+            "type": "new_lab_request",
+            "data": {
+                "id": request_id,
+                "patient_id": str(uuid.uuid4()),
+                "doctor_id": str(uuid.uuid4()),
+                "test_type": "complete_blood_count",
+                "priority": "high" if event_no % 5 == 0 else "medium",
+                "status": "pending",
+                "notes": f"benchmark event {event_no}",
+                "created_at": datetime.now().isoformat(),
+                "patient_name": "Bench Patient",
+                "doctor_name": "Dr. Bench",
+            },
+        }
+        sent_at[request_id] = self.sent_at[request_id] = time.perf_counter()
+        await self.producer.send(json.dumps(payload))
+
+    def message_key(self, message):
+        if message.get("type") == "new_lab_request":
+            return message.get("lab_request_id")
+        return None
+
+    async def stop(self):
+        self.acks.stop()
+        if self.producer is not None:
+            await self.producer.close()
+        if self.producer_task is not None:
+            self.producer_task.cancel()
+
+
+class DoctorOPDScenario(Scenario):
+    name = "doctor"
+
+    def __init__(self, clients: int):
+        self.doctor_ids = [str(uuid.uuid4()) for _ in range(clients)]
+        self.pool = StubPool()
+
+    def build_app(self):
+        # The doctor app imports the AI model stack at import time, so only the
+        # OPD websocket router is mounted; the connection manager is the real one.
+        from fastapi import FastAPI
+        from app.dependencies import get_db_pool
+        from app.routers import opd_ws
+
+        app = FastAPI()
+        app.include_router(opd_ws.router)
+
+        async def stub_db_pool():
+            yield self.pool
+
+        app.dependency_overrides[get_db_pool] = stub_db_pool
+        self.broadcast_patient_assignment = opd_ws.broadcast_patient_assignment
+        return app
+
+    def client_path(self, index: int) -> str:
+        return f"/ws/opd/{self.doctor_ids[index]}"
+
+    async def emit(self, event_no: int, target: int, sent_at: Dict[str, float]):
+        assignment_id = str(uuid.uuid4())
+        patient_id = str(uuid.uuid4())
+        sent_at[assignment_id] = time.perf_counter()
+        await self.broadcast_patient_assignment(
+            self.doctor_ids[target],
+            patient_id,
+            assignment_id,
+            {
+                "priority": "NORMAL",
+                "status": "PENDING",
+                "patient": {"id": patient_id, "name": "Bench Patient"},
+            },
+            self.pool,
+        )
+
+    def message_key(self, message):
+        if message.get("event") == "patient_assigned":
+            return message.get("assignment_id")
+        return None
+
+
+class CardroomScenario(Scenario):
+    name = "cardroom"
+
+    def __init__(self, clients: int):
+        self.doctor_ids = [uuid.uuid4() for _ in range(clients)]
+
+    def build_app(self):
+        from fastapi import Query
+        from app.config import settings
+        from app.dependencies import get_db_connection
+        from app.main import app
+        from app import websocket
+
+        pool = StubPool(max_size=settings.DB_MAX_CONNECTIONS)
+
+        async def stub_token(token: str = Query(...)):
+            return {"user_id": token, "role": "doctor"}
+
+        async def stub_db_connection():
+            async with pool.acquire() as conn:
+                yield conn
+
+        app.dependency_overrides[websocket.get_token_from_query] = stub_token
+        app.dependency_overrides[get_db_connection] = stub_db_connection
+        self.broadcast_opd_assignment = websocket.broadcast_opd_assignment
+        return app
+
+    def client_path(self, index: int) -> str:
+        return f"/ws?token={self.doctor_ids[index]}"
+
+    async def emit(self, event_no: int, target: int, sent_at: Dict[str, float]):
+        assignment_id = uuid.uuid4()
+        patient_id = uuid.uuid4()
+        sent_at[str(assignment_id)] = time.perf_counter()
+        await self.broadcast_opd_assignment(
+            self.doctor_ids[target],
+            patient_id,
+            assignment_id,
+            {"priority": "NORMAL", "status": "PENDING", "patient": {"id": str(patient_id)}},
+        )
+
+    def message_key(self, message):
+        if message.get("type") == "patient_assignment":
+            return message.get("assignment_id")
+        return None
+
+
+def build_scenario(service: str, clients: int) -> Scenario:
+    load_service(service)
+    if service == "labroom":
+        return LabroomScenario()
+    if service == "doctor":
+        return DoctorOPDScenario(clients)
+    if service == "cardroom":
+        return CardroomScenario(clients)
+    raise SystemExit(f"No websocket scenario for service: {service}")
+
+
+async def run_client(
+    url: str,
+    scenario: Scenario,
+    sent_at: Dict[str, float],
+    recorder: LatencyRecorder,
+    delay: float,
+    connected: asyncio.Queue,
+    progress: Dict[str, int],
+    done: asyncio.Event,
+):
+    import websockets
+
+    try:
+        async with websockets.connect(url) as ws:
+            await scenario.handshake(ws)
+            await connected.put(True)
+            async for raw in ws:
+                key = scenario.message_key(json.loads(raw))
+                sent = sent_at.get(key) if key else None
+                if sent is None:
+                    continue
+                recorder.record(time.perf_counter() - sent)
+                progress["received"] += 1
+                if progress["received"] >= progress["expected"]:
+                    done.set()
+                if delay:
+                    await asyncio.sleep(delay)
+    except asyncio.CancelledError:
+        raise
+    except Exception:
+        await connected.put(False)
+
+
+async def run(args) -> int:
+    import websockets
+
+    scenario = build_scenario(args.service, args.clients)
+    app = scenario.build_app()
+    # The services log every message at INFO; that would dominate the timings
+    logging.getLogger().setLevel(args.log_level)
+    probe = MemoryProbe()
+
+    async with serve_app(app) as base_url:
+        # Warm up lazy imports and first-connection allocations outside the memory probe
+        async with websockets.connect(f"ws://{base_url}{scenario.client_path(0)}") as ws:
+            await scenario.handshake(ws)
+
+        fast = LatencyRecorder("fast")
+        slow = LatencyRecorder("slow")
+        sent_at: Dict[str, float] = {}
+        connected: asyncio.Queue = asyncio.Queue()
+        done = asyncio.Event()
+        per_event = args.clients if scenario.broadcast else 1
+        progress = {"received": 0, "expected": per_event * args.events}
+
+        probe.start()
+        slow_from = args.clients - args.slow_consumers
+        tasks = []
+        connect_started = time.perf_counter()
+        for index in range(args.clients):
+            is_slow = index >= slow_from
+            tasks.append(
+                asyncio.create_task(
+                    run_client(
+                        f"ws://{base_url}{scenario.client_path(index)}",
+                        scenario,
+                        sent_at,
+                        slow if is_slow else fast,
+                        args.slow_delay if is_slow else 0.0,
+                        connected,
+                        progress,
+                        done,
+                    )
+                )
+            )
+
+        connect_failures = 0
+        deadline = connect_started + args.connect_timeout
+        for attempt in range(args.clients):
+            try:
+                ok = await asyncio.wait_for(connected.get(), timeout=max(deadline - time.perf_counter(), 0.001))
+            except asyncio.TimeoutError:
+                # Remaining clients are stuck in the handshake (e.g. pool exhaustion)
+                connect_failures += args.clients - attempt
+                break
+            connect_failures += 0 if ok else 1
+        connect_seconds = time.perf_counter() - connect_started
+        connect_memory = probe.measure()
+
+        await scenario.start(base_url)
+        fast.started = slow.started = time.perf_counter()
+        interval = 1.0 / args.rate if args.rate else 0.0
+        for event_no in range(args.events):
+            await scenario.emit(event_no, event_no % args.clients, sent_at)
+            if interval:
+                await asyncio.sleep(interval)
+            elif event_no % 50 == 0:
+                await asyncio.sleep(0)
+
+        try:
+            await asyncio.wait_for(done.wait(), timeout=args.drain_timeout)
+        except asyncio.TimeoutError:
+            pass
+        fast.stop()
+        slow.stop()
+        retained = probe.measure()
+        probe.stop()
+
+        await scenario.stop()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    if scenario.broadcast:
+        expected_fast = args.events * (args.clients - args.slow_consumers)
+    else:
+        expected_fast = sum(1 for n in range(args.events) if n % args.clients < slow_from)
+    lost_fast = expected_fast - len(fast.samples)
+
+    groups = [fast.summary()]
+    if args.slow_consumers:
+        groups.append(slow.summary())
+    if isinstance(scenario, LabroomScenario):
+        groups.append(scenario.acks.summary())
+
+    report = {
+        "service": scenario.name,
+        "clients": args.clients,
+        "slow_consumers": args.slow_consumers,
+        "events": args.events,
+        "connect_failures": connect_failures,
+        "connect_seconds": round(connect_seconds, 3),
+        "bytes_per_connection": connect_memory["total_bytes"] // max(args.clients, 1),
+        "app_bytes_per_connection": connect_memory["app_bytes"] // max(args.clients, 1),
+        "app_bytes_retained_after_events": retained["app_bytes"],
+        "lost_fast_messages": lost_fast,
+        "groups": groups,
+    }
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        for key, value in report.items():
+            if key != "groups":
+                print(f"{key}: {value}")
+        print()
+        print_table(groups)
+
+    failed = connect_failures > 0 or lost_fast > 0
+    if args.max_p99_ms is not None and fast.summary()["p99_ms"] > args.max_p99_ms:
+        failed = True
+    return 1 if failed else 0
+
+
+def parse_args(argv: List[str]):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--service", required=True, choices=["labroom", "doctor", "cardroom"])
+    parser.add_argument("--clients", type=int, default=100, help="simulated websocket clients")
+    parser.add_argument("--events", type=int, default=1000, help="events to drive through the service")
+    parser.add_argument("--rate", type=float, default=0.0, help="events/sec, 0 = as fast as possible")
+    parser.add_argument("--slow-consumers", type=int, default=0, help="clients that read slowly")
+    parser.add_argument("--slow-delay", type=float, default=0.05, help="seconds a slow consumer sleeps per message")
+    parser.add_argument("--connect-timeout", type=float, default=10.0)
+    parser.add_argument("--drain-timeout", type=float, default=60.0)
+    parser.add_argument("--max-p99-ms", type=float, default=None, help="fail if fast-client p99 exceeds this")
+    parser.add_argument("--log-level", default="WARNING", help="service log level during the run")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args(argv)
+    if args.slow_consumers > args.clients:
+        parser.error("--slow-consumers cannot exceed --clients")
+    return args
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    return asyncio.run(run(parse_args(sys.argv[1:] if argv is None else argv)))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
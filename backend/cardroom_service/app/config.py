@@ -1,6 +1,7 @@
 # cardroom_service/app/config.py
 import os
 from pydantic_settings import BaseSettings
+from datetime import time
 from typing import Optional, Dict, Any, List
 
 class Settings(BaseSettings):
@@ -14,6 +15,50 @@ class Settings(BaseSettings):
     DB_MAX_CONNECTIONS: int = 10
     DB_MIN_CONNECTIONS: int = 5
     
+    # Optional read replica for list and search queries
+    DB_READ_URL: Optional[str] = None
+    DB_READ_MAX_CONNECTIONS: int = 10
+    DB_READ_ACQUIRE_TIMEOUT: float = 2.0
+    # Reads of a session that wrote within this window go to the primary (read-your-writes)
+    DB_READ_STICKY_SECONDS: float = 5.0
+    # Fall back to the primary while the replica lags more than this
+    DB_READ_MAX_LAG_SECONDS: float = 5.0
+    DB_READ_CHECK_INTERVAL: float = 5.0
+    # List totals: exact up to this many rows, estimated or cached (seconds) above
+    COUNT_EXACT_THRESHOLD: int = 10000
+    COUNT_CACHE_TTL: float = 30.0
+    
+    # Working hours offered by the available slots API, in APPOINTMENT_TIMEZONE
+    APPOINTMENT_TIMEZONE: str = "Africa/Addis_Ababa"
+    APPOINTMENT_DAY_START: time = time(8, 0)
+    APPOINTMENT_DAY_END: time = time(17, 0)
+    APPOINTMENT_WORKING_DAYS: List[int] = [1, 2, 3, 4, 5]  # ISO weekdays, Monday = 1
+    
+    # After-commit delivery of notifications and broadcasts (app/outbox.py)
+    OUTBOX_POLL_INTERVAL: float = 5.0
+    OUTBOX_BATCH_SIZE: int = 50
+    OUTBOX_MAX_ATTEMPTS: int = 8
+    OUTBOX_RETRY_DELAY: float = 30.0  # seconds, doubled per attempt
+    
+    # Local doctors table, refreshed from the auth service
+    DOCTOR_DIRECTORY_REFRESH_INTERVAL: float = 300.0
+    
+    # Bulk patient import (app/patient_import.py): rows per COPY, imports at a time
+    PATIENT_IMPORT_CHUNK_SIZE: int = 1000
+    PATIENT_IMPORT_CONCURRENCY: int = 2
+    
+    # Rows fetched per cursor round trip by streaming exports (app/export.py)
+    EXPORT_BATCH_SIZE: int = 500
+    
+    # Response compression (app/http_cache.py): smallest body compressed, gzip level, brotli quality
+    COMPRESSION_MINIMUM_SIZE: int = 1024
+    GZIP_LEVEL: int = 6
+    BROTLI_QUALITY: int = 4
+    
+    # In-memory OPD queues per doctor (app/opd_queue.py)
+    OPD_QUEUE_RECONCILE_INTERVAL: float = 60.0
+    OPD_QUEUE_SUBSCRIBER_BUFFER: int = 100  # diffs a slow websocket may fall behind before it is resynced
+    
     # Security
     SECRET_KEY: str
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
@@ -28,6 +73,14 @@ class Settings(BaseSettings):
     #LABROOM_SERVICE_URL: Optional[str] = None
     SERVICE_TOKEN: str
     
+    # Inter-service HTTP client pool (per upstream)
+    HTTP_CLIENT_TIMEOUT: float = 10.0
+    HTTP_CLIENT_MAX_CONNECTIONS: int = 20
+    HTTP_CLIENT_MAX_KEEPALIVE: int = 10
+    HTTP_CLIENT_RETRIES: int = 2
+    HTTP_CLIENT_BACKOFF: float = 0.2
+    HTTP2_ENABLED: bool = False
+    
     class Config:
         env_file = ".env"
         env_file_encoding = "utf-8"
@@ -1,14 +1,30 @@
 """
 Database connection utilities for asyncpg.
 """
+import asyncio
 import asyncpg
+import contextlib
 import logging
-from typing import Optional
+from typing import Optional, Union
 from app.config import settings
+from app.count_strategy import CountStrategy
+from app.read_routing import LAG_QUERY, ReadRouter
 
 # Global connection pool
 pool: Optional[asyncpg.Pool] = None
 
+# Optional read-replica pool for read-only queries (DB_READ_URL)
+read_pool: Optional[asyncpg.Pool] = None
+read_router = ReadRouter(
+    "cardroom",
+    sticky_seconds=settings.DB_READ_STICKY_SECONDS,
+    max_lag=settings.DB_READ_MAX_LAG_SECONDS,
+    check_interval=settings.DB_READ_CHECK_INTERVAL,
+)
+
+# Totals of paginated lists
+list_counts = CountStrategy(exact_threshold=settings.COUNT_EXACT_THRESHOLD, cache_ttl=settings.COUNT_CACHE_TTL)
+
 async def init_db():
     """Initialize the database connection pool."""
     global pool
@@ -22,6 +38,9 @@ async def init_db():
         )
         logging.info("Database connection pool initialized successfully")
         
+        if settings.DB_READ_URL:
+            await init_read_pool()
+        
         # Apply migrations/initial setup if needed
         await apply_migrations()
         
@@ -52,9 +71,65 @@ async def get_pool() -> asyncpg.Pool:
         await init_db()
     return pool
 
+class ReadPool:
+    """Read-only view of the replica pool that falls back to the primary."""
+
+    def __init__(self, replica: asyncpg.Pool, primary: asyncpg.Pool):
+        self._replica = replica
+        self._primary = primary
+
+    @contextlib.asynccontextmanager
+    async def acquire(self):
+        try:
+            conn = await self._replica.acquire(timeout=settings.DB_READ_ACQUIRE_TIMEOUT)
+        except (OSError, asyncio.TimeoutError, asyncpg.PostgresError, asyncpg.InterfaceError) as e:
+            read_router.replica_failed(e)
+            async with self._primary.acquire() as conn:
+                yield conn
+            return
+        try:
+            yield conn
+        finally:
+            await self._replica.release(conn)
+
+async def init_read_pool():
+    """Initialize the read-replica pool; reads stay on the primary if it is unreachable."""
+    global read_pool
+    logging.info("Initializing read-replica connection pool...")
+    # Connections are opened on demand so startup does not depend on the replica
+    read_pool = await asyncpg.create_pool(
+        settings.DB_READ_URL,
+        min_size=0,
+        max_size=settings.DB_READ_MAX_CONNECTIONS,
+    )
+    await read_router.start(lambda: read_pool.fetchval(LAG_QUERY))
+
+async def get_read_pool() -> Union[ReadPool, asyncpg.Pool]:
+    """
+    Get a pool for read-only queries.
+    
+    Uses the read replica when one is configured, healthy and the current
+    session has not written recently; otherwise the primary pool.
+    """
+    primary = await get_pool()
+    if read_pool is not None and read_router.use_replica():
+        return ReadPool(read_pool, primary)
+    return primary
+
+@contextlib.asynccontextmanager
+async def read_connection():
+    """A connection for read-only queries, from get_read_pool()"""
+    read = await get_read_pool()
+    async with read.acquire() as conn:
+        yield conn
+
 async def close_db():
     """Close the database connection pool."""
-    global pool
+    global pool, read_pool
+    await read_router.stop()
+    if read_pool:
+        await read_pool.close()
+        read_pool = None
     if pool:
         logging.info("Closing database connection pool...")
         await pool.close()
@@ -66,6 +66,29 @@ CREATE TABLE IF NOT EXISTS patients (
 CREATE INDEX IF NOT EXISTS idx_patient_name ON patients(first_name, last_name);
 CREATE INDEX IF NOT EXISTS idx_registration_number ON patients(registration_number);
 
+-- Patient search (see PatientModel.search and PatientModel.autocomplete).
+-- Trigram indexes serve the fuzzy, substring (ILIKE '%term%') and similarity
+-- matches; the text_pattern_ops btrees serve autocomplete's prefix matches in
+-- index order, so a suggestion list reads only the rows it returns. Queries
+-- must use the same expressions (models.NAME_EXPR and models.PHONE_EXPR).
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX IF NOT EXISTS idx_patients_name_trgm
+    ON patients USING gin ((first_name || ' ' || last_name) gin_trgm_ops) WHERE is_deleted = FALSE;
+CREATE INDEX IF NOT EXISTS idx_patients_registration_trgm
+    ON patients USING gin (registration_number gin_trgm_ops) WHERE is_deleted = FALSE;
+CREATE INDEX IF NOT EXISTS idx_patients_phone_trgm
+    ON patients USING gin ((regexp_replace(phone_number, '[^0-9]', '', 'g')) gin_trgm_ops) WHERE is_deleted = FALSE;
+
+CREATE INDEX IF NOT EXISTS idx_patients_name_prefix
+    ON patients (lower(first_name || ' ' || last_name) text_pattern_ops) WHERE is_deleted = FALSE;
+CREATE INDEX IF NOT EXISTS idx_patients_last_name_prefix
+    ON patients (lower(last_name) text_pattern_ops) WHERE is_deleted = FALSE;
+CREATE INDEX IF NOT EXISTS idx_patients_registration_prefix
+    ON patients (lower(registration_number) text_pattern_ops) WHERE is_deleted = FALSE;
+CREATE INDEX IF NOT EXISTS idx_patients_phone_prefix
+    ON patients (regexp_replace(phone_number, '[^0-9]', '', 'g') text_pattern_ops) WHERE is_deleted = FALSE;
+
 -- Doctors reference table (minimal data needed for the cardroom service)
 -- Doctors table remains the same
 CREATE TABLE IF NOT EXISTS doctors (
@@ -109,8 +132,7 @@ CREATE TABLE IF NOT EXISTS appointments (
     notes TEXT,
     created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
     updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
-    is_deleted BOOLEAN DEFAULT FALSE,
-    CONSTRAINT no_overlapping_appointments UNIQUE (doctor_id, appointment_date, duration_minutes)
+    is_deleted BOOLEAN DEFAULT FALSE
 );
 
 
@@ -176,4 +198,103 @@ CREATE TABLE IF NOT EXISTS notifications (
 );
 
 -- Create index for faster lookups
-CREATE INDEX IF NOT EXISTS idx_notifications_recipient ON notifications(recipient_id);
\ No newline at end of file
+CREATE INDEX IF NOT EXISTS idx_notifications_recipient ON notifications(recipient_id);
+-- Change feed (GET /api/changes) for services that keep local copies of patients
+-- and OPD assignments. Every insert or update stamps the row with the writing
+-- transaction (change_xid) and a shared, increasing change_seq. Readers page by
+-- (change_xid, change_seq) and only see transactions older than the oldest one
+-- still running, so a change that commits late can't be skipped past.
+CREATE SEQUENCE IF NOT EXISTS cardroom_change_seq;
+
+-- The defaults stamp new rows, and existing rows once when the columns are added
+ALTER TABLE patients
+    ADD COLUMN IF NOT EXISTS change_seq BIGINT NOT NULL DEFAULT nextval('cardroom_change_seq'),
+    ADD COLUMN IF NOT EXISTS change_xid BIGINT NOT NULL DEFAULT pg_current_xact_id()::text::bigint;
+ALTER TABLE opd_assignments
+    ADD COLUMN IF NOT EXISTS change_seq BIGINT NOT NULL DEFAULT nextval('cardroom_change_seq'),
+    ADD COLUMN IF NOT EXISTS change_xid BIGINT NOT NULL DEFAULT pg_current_xact_id()::text::bigint;
+
+CREATE INDEX IF NOT EXISTS idx_patients_change ON patients(change_xid, change_seq);
+CREATE INDEX IF NOT EXISTS idx_opd_assignments_change ON opd_assignments(change_xid, change_seq);
+
+CREATE OR REPLACE FUNCTION stamp_change()
+RETURNS TRIGGER AS $$
+BEGIN
+    NEW.change_seq := nextval('cardroom_change_seq');
+    NEW.change_xid := pg_current_xact_id()::text::bigint;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE TRIGGER patients_stamp_change
+BEFORE UPDATE ON patients
+FOR EACH ROW EXECUTE FUNCTION stamp_change();
+
+CREATE OR REPLACE TRIGGER opd_assignments_stamp_change
+BEFORE UPDATE ON opd_assignments
+FOR EACH ROW EXECUTE FUNCTION stamp_change();
+
+-- Appointment scheduling. Every appointment occupies slot, the range
+-- [appointment_date, appointment_date + duration_minutes). The exclusion
+-- constraint rejects a live appointment that overlaps another one of the same
+-- doctor, so two concurrent bookings of a slot can't both commit; its GiST
+-- index also serves the overlap lookups of the available slots query.
+CREATE EXTENSION IF NOT EXISTS btree_gist;
+
+ALTER TABLE appointments ADD COLUMN IF NOT EXISTS slot TSTZRANGE;
+
+-- timestamptz arithmetic isn't immutable, so slot is kept by a trigger rather
+-- than generated
+CREATE OR REPLACE FUNCTION set_appointment_slot()
+RETURNS TRIGGER AS $$
+BEGIN
+    NEW.slot := tstzrange(NEW.appointment_date, NEW.appointment_date + make_interval(mins => NEW.duration_minutes));
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE TRIGGER appointments_set_slot
+BEFORE INSERT OR UPDATE OF appointment_date, duration_minutes ON appointments
+FOR EACH ROW EXECUTE FUNCTION set_appointment_slot();
+
+UPDATE appointments
+SET slot = tstzrange(appointment_date, appointment_date + make_interval(mins => duration_minutes))
+WHERE slot IS NULL;
+
+-- Replaced by the exclusion constraint, which also catches partial overlaps
+-- and frees the slots of cancelled appointments
+ALTER TABLE appointments DROP CONSTRAINT IF EXISTS no_overlapping_appointments;
+
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'appointments_no_overlap') THEN
+        ALTER TABLE appointments ADD CONSTRAINT appointments_no_overlap
+            EXCLUDE USING gist (doctor_id WITH =, slot WITH &&)
+            WHERE (is_deleted = FALSE AND status IS DISTINCT FROM 'CANCELLED');
+    END IF;
+EXCEPTION WHEN exclusion_violation THEN
+    RAISE WARNING 'appointments_no_overlap not added: some doctors have overlapping appointments';
+END;
+$$;
+
+-- Transactional outbox: side effects of a write (doctor notifications,
+-- websocket broadcasts) are queued as rows in the write's own transaction and
+-- delivered by app.outbox once it has committed. A failed delivery is retried
+-- after available_at; a rolled back write never notifies anyone.
+CREATE TABLE IF NOT EXISTS outbox (
+    id BIGSERIAL PRIMARY KEY,
+    event_type VARCHAR(50) NOT NULL,
+    payload JSONB NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    available_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_outbox_available ON outbox(available_at, id);
+
+-- Doctors' OPD queues (app/opd_queue.py) are loaded and reconciled from the queued assignments
+CREATE INDEX IF NOT EXISTS idx_opd_queued ON opd_assignments(doctor_id)
+WHERE is_deleted = FALSE AND status IN ('PENDING', 'IN_PROGRESS');
+
+-- Patient exports (GET /api/patients/export) read in registration order, so a cursor starts without a sort
+CREATE INDEX IF NOT EXISTS idx_patients_created ON patients(created_at, id) WHERE is_deleted = FALSE;
@@ -3,8 +3,8 @@ Common dependencies for FastAPI routes.
 """
 from fastapi import Request, Depends, HTTPException, status
 from asyncpg import Connection
-from typing import AsyncGenerator
-from app.database import get_pool
+from typing import AsyncGenerator, Callable
+from app.database import get_pool, get_read_pool
 from app.security import any_authenticated_user, security, TokenValidator
 
 async def get_db_connection(request: Request) -> AsyncGenerator[Connection, None]:
@@ -23,9 +23,20 @@ async def get_db_connection(request: Request) -> AsyncGenerator[Connection, None
         # Release connection back to pool
         await pool.release(conn)
 
+async def get_read_db_connection(request: Request) -> AsyncGenerator[Connection, None]:
+    """
+    Get a connection for read-only routes: from the read replica when it is
+    usable, otherwise from the primary pool.
+    """
+    pool = await get_read_pool()
+    async with pool.acquire() as conn:
+        request.state.connection = conn
+        yield conn
+
 # cardroom_service/app/dependencies.py
 
 async def get_transaction(
+    request: Request,
     conn: Connection = Depends(get_db_connection),
     # Remove the user dependency here as it's now handled by the route
 ) -> AsyncGenerator[Connection, None]:
@@ -33,6 +44,7 @@ async def get_transaction(
     Get a database connection with an active transaction.
     Authentication is now handled at the route level
     """
+    request.state.after_commit = []
     tx = conn.transaction()
     await tx.start()
     
@@ -43,6 +55,12 @@ async def get_transaction(
         raise
     else:
         await tx.commit()
+        for callback in request.state.after_commit:
+            callback()
+
+def after_commit(request: Request, callback: Callable[[], None]):
+    """Call ``callback`` once the request's transaction (get_transaction) has committed"""
+    request.state.after_commit.append(callback)
         
 async def get_current_active_user(
     token_data: dict = Depends(TokenValidator.validate_token)
@@ -0,0 +1,197 @@
+# cardroom_service/app/http_cache.py
+"""
+Response compression and conditional GETs.
+
+``HTTPCacheMiddleware`` compresses responses of compressible types (JSON,
+NDJSON, text) once they reach ``minimum_size``, with brotli when the client
+accepts it and the ``brotli`` package is installed, otherwise gzip. Streamed
+responses (exports) are compressed chunk by chunk and flushed, so rows still
+go out as they are produced.
+
+Successful GET responses get a weak ETag and a request whose If-None-Match
+matches it is answered with 304 and no body. The ETag is, in order:
+
+* one the route set itself (e.g. the OPD queue's version),
+* one the route derived from a version check with ``not_modified``, or
+* a hash of the body, for responses sent in one piece.
+
+A body hash saves the transfer but the route still ran. Polling endpoints
+with a cheap version (row counts, change sequences, updated_at) call
+``not_modified(request, *version)`` first and return its 304 before loading
+or serializing anything. The ETag covers the path and query string, so every
+page and filter combination has its own.
+"""
+import hashlib
+import zlib
+from typing import Any, Dict, List, Optional
+
+from fastapi import Request, Response
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:  # optional; gzip is always available
+    brotli = None
+
+COMPRESSIBLE_TYPES = (
+    "application/json",
+    "application/x-ndjson",
+    "application/javascript",
+    "application/xml",
+    "image/svg+xml",
+    "text/",
+)
+CACHEABLE_METHODS = {"GET", "HEAD"}
+# Headers of the full response that a 304 leaves out
+BODY_HEADERS = {"content-length", "content-type", "content-encoding", "transfer-encoding"}
+
+
+def weak_etag(*parts: Any) -> str:
+    digest = hashlib.blake2b(repr(parts).encode(), digest_size=16).hexdigest()
+    return f'W/"{digest}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison of ``etag`` with an If-None-Match header"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if (candidate[2:] if candidate.startswith("W/") else candidate) == opaque:
+            return True
+    return False
+
+
+def not_modified(request: Request, *version: Any) -> Optional[Response]:
+    """
+    A 304 when the client already has the response for ``version``, else None.
+    The ETag is kept on the request and added to the full response.
+    """
+    etag = weak_etag(request.url.path, request.url.query, *version)
+    request.state.etag = etag
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+    return None
+
+
+def accepted_encoding(accept_encoding: str) -> Optional[str]:
+    encodings = {}
+    for item in accept_encoding.lower().split(","):
+        name, _, params = item.strip().partition(";")
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        encodings[name.strip()] = quality
+    if brotli is not None and encodings.get("br", 0) > 0:
+        return "br"
+    if encodings.get("gzip", 0) > 0:
+        return "gzip"
+    return None
+
+
+class Compressor:
+    def __init__(self, encoding: str, gzip_level: int, brotli_quality: int):
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=brotli_quality)
+        else:
+            self._brotli = None
+            self._zlib = zlib.compressobj(gzip_level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        if self._brotli is not None:
+            out = self._brotli.process(data)
+            return out + (self._brotli.finish() if final else self._brotli.flush())
+        out = self._zlib.compress(data)
+        return out + self._zlib.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+
+class HTTPCacheMiddleware:
+    """Compression, ETags and 304s for every HTTP response (see module docstring)"""
+
+    def __init__(self, app, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4,
+                 etag_max_size: int = 4 * 1024 * 1024):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.etag_max_size = etag_max_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        conditional = scope["method"] in CACHEABLE_METHODS
+        if_none_match = headers.get("if-none-match")
+        encoding = accepted_encoding(headers.get("accept-encoding", ""))
+        start: Dict[str, Any] = {}
+        # Set once the start of the response went out: None or the compressor of the rest
+        streaming: List[Optional[Compressor]] = []
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                start.update(message)
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+            more_body = message.get("more_body", False)
+            if streaming:
+                if streaming[0] is not None:
+                    message = {**message, "body": streaming[0].compress(message.get("body", b""), final=not more_body)}
+                await send(message)
+                return
+
+            response_headers = MutableHeaders(raw=start.setdefault("headers", []))
+            body = message.get("body", b"")
+            status = start["status"]
+            # Files served with byte ranges go out as stored, so ranges stay file offsets
+            compressible = (status not in (204, 206, 304) and "content-encoding" not in response_headers
+                            and "accept-ranges" not in response_headers
+                            and response_headers.get("content-type", "").startswith(COMPRESSIBLE_TYPES))
+            if compressible:
+                response_headers.add_vary_header("Accept-Encoding")
+
+            if conditional and status == 200:
+                etag = response_headers.get("etag")
+                if etag is None:
+                    etag = scope.get("state", {}).get("etag")
+                    if etag is None and not more_body and len(body) <= self.etag_max_size:
+                        etag = f'W/"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+                    if etag is not None:
+                        response_headers["ETag"] = etag
+                        if "cache-control" not in response_headers:
+                            # Cache, but revalidate before every use
+                            response_headers["Cache-Control"] = "no-cache"
+                if etag is not None and not more_body and etag_matches(if_none_match, etag):
+                    await self.send_not_modified(send, response_headers)
+                    return
+
+            compressor = None
+            if compressible and encoding and (more_body or len(body) >= self.minimum_size):
+                compressor = Compressor(encoding, self.gzip_level, self.brotli_quality)
+                body = compressor.compress(body, final=not more_body)
+                response_headers["Content-Encoding"] = encoding
+                if "content-length" in response_headers:
+                    del response_headers["content-length"]
+                if not more_body:
+                    response_headers["Content-Length"] = str(len(body))
+
+            streaming.append(compressor)
+            await send(start)
+            await send({**message, "body": body})
+
+        await self.app(scope, receive, send_wrapper)
+
+    @staticmethod
+    async def send_not_modified(send, headers: MutableHeaders):
+        raw = [(k, v) for k, v in headers.raw if k.decode("latin-1").lower() not in BODY_HEADERS]
+        await send({"type": "http.response.start", "status": 304, "headers": raw})
+        await send({"type": "http.response.body", "body": b""})
@@ -5,10 +5,17 @@ import logging
 from contextlib import asynccontextmanager
 
 from app.config import settings
-from app.database import init_db, close_db
+from app.database import init_db, close_db, get_pool, read_router
+from app.read_routing import ReadRoutingMiddleware
+from app.http_cache import HTTPCacheMiddleware
+from app.responses import ORJSONResponse
+from app.http_client import http_clients
 from app.exceptions import register_exception_handlers, BadRequestException
-from app.routers import patients, opd, appointments, search
-from app.websocket import websocket_endpoint
+from app.routers import patients, opd, appointments, search, changes
+from app.websocket import websocket_endpoint, opd_queue_endpoint
+from app.outbox import outbox
+from app.opd_queue import opd_queue
+from app.services.doctor_directory import doctor_directory
 
 # Configure logging
 logging.basicConfig(
@@ -20,8 +27,17 @@ logging.basicConfig(
 async def lifespan(app: FastAPI):
     logging.info("Starting up cardroom service...")
     await init_db()
+    http_clients.startup()
+    pool = await get_pool()
+    await doctor_directory.start(pool)
+    await outbox.start(pool)
+    await opd_queue.start(pool)
     yield
     logging.info("Shutting down cardroom service...")
+    await opd_queue.stop()
+    await outbox.stop()
+    await doctor_directory.stop()
+    await http_clients.aclose()
     await close_db()
 
 # Initialize FastAPI app
@@ -31,11 +47,20 @@ app = FastAPI(
     description="Card Room Worker service for ADPPM system",
     lifespan=lifespan,
     debug=getattr(settings, 'DEBUG', False),
+    default_response_class=ORJSONResponse,
 )
 
 # Register global exception handlers
 register_exception_handlers(app)
 
+# Compression, ETags and 304s, inside CORS so that 304s carry the CORS headers too
+app.add_middleware(
+    HTTPCacheMiddleware,
+    minimum_size=settings.COMPRESSION_MINIMUM_SIZE,
+    gzip_level=settings.GZIP_LEVEL,
+    brotli_quality=settings.BROTLI_QUALITY,
+)
+
 # CORS configuration
 app.add_middleware(
     CORSMiddleware,
@@ -45,20 +70,54 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Route read-only queries to the read replica, keeping sessions that just wrote on the primary
+app.add_middleware(
+    ReadRoutingMiddleware,
+    router=read_router,
+    read_only_paths=["/api/patients/search", "/api/patients/batch"],
+)
+
 # Routers
 app.include_router(patients.router, prefix="/api")
 app.include_router(opd.router, prefix="/api")
 app.include_router(appointments.router, prefix="/api")
 app.include_router(search.router, prefix="/api")
+app.include_router(changes.router, prefix="/api")
 
 # WebSocket support
 app.websocket("/ws")(websocket_endpoint)
+app.websocket("/ws/opd-queue/{doctor_id}")(opd_queue_endpoint)
 
 # Health check
 @app.get("/health")
 async def health_check():
     return {"status": "healthy", "service": settings.APP_NAME}
 
+@app.get("/health/http-clients")
+async def http_clients_health():
+    """Connection reuse and pool-wait metrics for inter-service HTTP clients"""
+    return http_clients.metrics()
+
+@app.get("/health/db-replica")
+async def db_replica_health():
+    """Read replica health, replication lag and read routing decisions"""
+    return read_router.metrics()
+
+@app.get("/health/outbox")
+async def outbox_health():
+    """After-commit delivery of notifications: throughput, failures and backlog"""
+    return {**outbox.metrics(), "pending": await outbox.pending(await get_pool())}
+
+@app.get("/health/doctor-directory")
+async def doctor_directory_health():
+    """Refreshes of the local doctors table from the auth service"""
+    return doctor_directory.metrics()
+
+@app.get("/health/opd-queue")
+async def opd_queue_health():
+    """In-memory OPD queues: size, subscribers and drift found by reconciliation"""
+    return opd_queue.metrics()
+
 # Run with uvicorn
 if __name__ == "__main__":
     import uvicorn
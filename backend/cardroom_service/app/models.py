@@ -1,24 +1,49 @@
 """Database models and operations for cardroom service."""
+import re
 import uuid
 import json
 from uuid import UUID
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any, Tuple
+from datetime import date, datetime, time, timedelta
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Optional, Any, Tuple
 from asyncpg import Pool, Connection, Record
-from app.database import get_pool
+from app.database import get_pool, get_read_pool, list_counts
 
 # Type alias for database records
 DBRecord = Dict[str, Any]
 
+# Patient search expressions; they must match the patient search indexes in init.sql
+NAME_EXPR = "(first_name || ' ' || last_name)"
+PHONE_EXPR = "regexp_replace(phone_number, '[^0-9]', '', 'g')"
+
+# Appointments that hold their slot; must match the predicate of appointments_no_overlap
+SLOT_TAKEN = "is_deleted = FALSE AND status IS DISTINCT FROM 'CANCELLED'"
+
+# OPD assignments in their doctor's queue; must match idx_opd_queued and opd_queue.QUEUED_STATUSES
+OPD_QUEUED = "o.is_deleted = FALSE AND o.status IN ('PENDING', 'IN_PROGRESS')"
+
+def like_escape(term: str) -> str:
+    """``term`` with the LIKE wildcards escaped"""
+    return term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+@asynccontextmanager
+async def connection(conn: Optional[Connection] = None) -> AsyncIterator[Connection]:
+    """``conn`` when the caller passes one (e.g. the request's transaction), else a pooled connection"""
+    if conn is not None:
+        yield conn
+        return
+    pool = await get_pool()
+    async with pool.acquire() as acquired:
+        yield acquired
+
 class BaseCRUD:
     """Base class for database operations"""
     table_name: str = ""
     
     @classmethod
-    async def get_by_id(cls, id: uuid.UUID) -> Optional[DBRecord]:
+    async def get_by_id(cls, id: uuid.UUID, conn: Optional[Connection] = None) -> Optional[DBRecord]:
         """Get a record by ID"""
-        pool = await get_pool()
-        async with pool.acquire() as conn:
+        async with connection(conn) as conn:
             query = f"""
                 SELECT * FROM {cls.table_name}
                 WHERE id = $1 AND is_deleted = FALSE
@@ -27,10 +52,22 @@ class BaseCRUD:
             return dict(result) if result else None
     
     @classmethod
-    async def create(cls, data: Dict[str, Any]) -> DBRecord:
+    async def get_by_ids(cls, ids: List[uuid.UUID], conn: Optional[Connection] = None) -> List[DBRecord]:
+        """Get all records matching a list of IDs in a single query"""
+        if not ids:
+            return []
+        async with connection(conn) as conn:
+            query = f"""
+                SELECT * FROM {cls.table_name}
+                WHERE id = ANY($1::uuid[]) AND is_deleted = FALSE
+            """
+            results = await conn.fetch(query, list(ids))
+            return [dict(r) for r in results]
+    
+    @classmethod
+    async def create(cls, data: Dict[str, Any], conn: Optional[Connection] = None) -> DBRecord:
         """Generic create method without patient-specific fields"""
-        pool = await get_pool()
-        async with pool.acquire() as conn:
+        async with connection(conn) as conn:
             async with conn.transaction():
                 columns = list(data.keys())
                 values = list(data.values())
@@ -46,17 +83,16 @@ class BaseCRUD:
                 return dict(result)
     
     @classmethod
-    async def update(cls, id: uuid.UUID, data: Dict[str, Any]) -> Optional[DBRecord]:
+    async def update(cls, id: uuid.UUID, data: Dict[str, Any], conn: Optional[Connection] = None) -> Optional[DBRecord]:
         """Update an existing record"""
-        pool = await get_pool()
-        async with pool.acquire() as conn:
+        async with connection(conn) as conn:
             async with conn.transaction():
                 # Remove id from data if present
                 if 'id' in data:
                     del data['id']
                     
                 if not data:
-                    return await cls.get_by_id(id)
+                    return await cls.get_by_id(id, conn)
                 
                 # Handle JSON fields
                 if 'allergies' in data and isinstance(data['allergies'], list):
@@ -77,10 +113,9 @@ class BaseCRUD:
                 return dict(result) if result else None
                 
     @classmethod
-    async def delete(cls, id: uuid.UUID) -> bool:
+    async def delete(cls, id: uuid.UUID, conn: Optional[Connection] = None) -> bool:
         """Soft delete a record"""
-        pool = await get_pool()
-        async with pool.acquire() as conn:
+        async with connection(conn) as conn:
             async with conn.transaction():
                 query = f"""
                     UPDATE {cls.table_name}
@@ -94,7 +129,7 @@ class BaseCRUD:
     @classmethod
     async def list(cls, limit: int = 100, offset: int = 0, **filters) -> Tuple[List[DBRecord], int]:
         """List records with optional filters"""
-        pool = await get_pool()
+        pool = await get_read_pool()
         
         # Build where clause from filters
         where_clauses = ["is_deleted = FALSE"]
@@ -114,12 +149,13 @@ class BaseCRUD:
         where_clause = " AND ".join(where_clauses)
         
         async with pool.acquire() as conn:
-            # Count total results
-            count_query = f"""
-                SELECT COUNT(*) FROM {cls.table_name}
-                WHERE {where_clause}
-            """
-            total = await conn.fetchval(count_query, *filter_values)
+            # Count total results (estimated for large unfiltered lists)
+            total = await list_counts.count(
+                conn,
+                f"SELECT 1 FROM {cls.table_name} WHERE {where_clause}",
+                *filter_values,
+                filtered=bool(filter_values),
+            )
             
             # Get paginated results
             query = f"""
@@ -133,10 +169,9 @@ class BaseCRUD:
             return [dict(r) for r in results], total
         
     @classmethod
-    async def upsert(cls, data: Dict[str, Any], conflict_column: str = "id") -> DBRecord:
+    async def upsert(cls, data: Dict[str, Any], conflict_column: str = "id", conn: Optional[Connection] = None) -> DBRecord:
         """Insert or update a record if conflict occurs on conflict_column"""
-        pool = await get_pool()
-        async with pool.acquire() as conn:
+        async with connection(conn) as conn:
             async with conn.transaction():
                 columns = list(data.keys())
                 values = list(data.values())
@@ -180,34 +215,146 @@ class PatientModel(BaseCRUD):
     
         return await super().create(data)
     
+    @staticmethod
+    def search_conditions(
+        query: Optional[str] = None,
+        registration_number: Optional[str] = None,
+        phone: Optional[str] = None,
+    ) -> Tuple[List[str], List[Any], Optional[str]]:
+        """
+        WHERE conditions and parameters ($1, $2, ...) of a patient search,
+        and the expression ranking the matches (None without a name query).
+
+        Names match as a substring of the full name or, to tolerate typos,
+        by trigram word similarity; phone numbers match on their digits.
+        """
+        conditions = ["is_deleted = FALSE"]
+        params: List[Any] = []
+        rank = None
+
+        if query and query.strip():
+            term = query.strip()
+            params.extend([f"%{like_escape(term)}%", term])
+            conditions.append(f"({NAME_EXPR} ILIKE ${len(params) - 1} OR {NAME_EXPR} %> ${len(params)})")
+            rank = f"word_similarity(${len(params)}, {NAME_EXPR})"
+
+        if registration_number and registration_number.strip():
+            params.append(f"%{like_escape(registration_number.strip())}%")
+            conditions.append(f"registration_number ILIKE ${len(params)}")
+
+        if phone and phone.strip():
+            digits = re.sub(r"\D", "", phone)
+            if digits:
+                params.append(f"%{digits}%")
+                conditions.append(f"{PHONE_EXPR} LIKE ${len(params)}")
+            else:
+                params.append(f"%{like_escape(phone.strip())}%")
+                conditions.append(f"phone_number ILIKE ${len(params)}")
+
+        return conditions, params, rank
+
+    @classmethod
+    async def search(
+        cls,
+        conn: Connection,
+        query: Optional[str] = None,
+        registration_number: Optional[str] = None,
+        phone: Optional[str] = None,
+        limit: int = 20,
+        offset: int = 0,
+    ) -> Tuple[List[DBRecord], int]:
+        """Ranked patient search: best name matches first, then newest"""
+        conditions, params, rank = cls.search_conditions(query, registration_number, phone)
+        where_clause = " AND ".join(conditions)
+
+        # Estimated when no criteria are given and there are many patients
+        total = await list_counts.count(conn, f"SELECT 1 FROM patients WHERE {where_clause}", *params,
+                                        filtered=bool(params))
+
+        order_by = f"{rank} DESC, created_at DESC" if rank else "created_at DESC"
+        results = await conn.fetch(
+            f"""
+            SELECT * FROM patients
+            WHERE {where_clause}
+            ORDER BY {order_by}
+            LIMIT ${len(params) + 1} OFFSET ${len(params) + 2}
+            """,
+            *params, limit, offset
+        )
+        return [dict(r) for r in results], total
+
     @classmethod
     async def search_by_name(cls, name: str, limit: int = 20, offset: int = 0) -> Tuple[List[DBRecord], int]:
         """Search patients by name"""
-        pool = await get_pool()
+        pool = await get_read_pool()
         async with pool.acquire() as conn:
-            # Using pattern matching with ILIKE for case-insensitive search
-            pattern = f"%{name}%"
-            
-            # Count total results
-            count_query = """
-                SELECT COUNT(*) FROM patients
-                WHERE (first_name ILIKE $1 OR last_name ILIKE $1) AND is_deleted = FALSE
-            """
-            total = await conn.fetchval(count_query, pattern)
-            
-            # Get paginated results
-            query = """
-                SELECT * FROM patients
-                WHERE (first_name ILIKE $1 OR last_name ILIKE $1) AND is_deleted = FALSE
-                ORDER BY created_at DESC
-                LIMIT $2 OFFSET $3
-            """
-            results = await conn.fetch(query, pattern, limit, offset)
-            
-            return [dict(r) for r in results], total
+            return await cls.search(conn, query=name, limit=limit, offset=offset)
+
+    @classmethod
+    async def autocomplete(cls, conn: Connection, term: str, limit: int = 10) -> List[DBRecord]:
+        """
+        Up to ``limit`` patients whose full name, last name, registration
+        number or phone digits start with ``term``; no total.
+
+        Each match kind is an index range scan in key order that stops after
+        ``limit`` rows (a range rather than LIKE, so prepared statements keep
+        using the index); name matches come first.
+        """
+        prefix = term.strip().lower()
+        keys = [f"lower({NAME_EXPR})", "lower(last_name)", "lower(registration_number)"]
+        params: List[Any] = [prefix, prefix + "\U0010FFFF", limit]
+        digits = re.sub(r"\D", "", term)
+        if len(digits) >= 3:
+            keys.append(PHONE_EXPR)
+            params.extend([digits, digits + "\U0010FFFF"])
+
+        branches = []
+        for kind, key in enumerate(keys):
+            low, high = ("$4", "$5") if key == PHONE_EXPR else ("$1", "$2")
+            branches.append(f"""
+                (SELECT id, registration_number, first_name, last_name, date_of_birth, gender,
+                        phone_number, {kind} AS kind, {key} AS sort_key
+                 FROM patients
+                 WHERE is_deleted = FALSE AND {key} ~>=~ {low} AND {key} ~<~ {high}
+                 ORDER BY {key} USING ~<~
+                 LIMIT $3)
+            """)
+        query = f"""
+            SELECT id, registration_number, first_name, last_name, date_of_birth, gender, phone_number
+            FROM (
+                SELECT DISTINCT ON (id) *
+                FROM ({" UNION ALL ".join(branches)}) AS matches
+                ORDER BY id, kind
+            ) AS suggestions
+            ORDER BY kind, sort_key USING ~<~
+            LIMIT $3
+        """
+        results = await conn.fetch(query, *params)
+        return [dict(r) for r in results]
 
 # ... rest of your model classes ...
 
+    @staticmethod
+    def export_query(created_from: Optional[date] = None, created_to: Optional[date] = None) -> Tuple[str, List[Any]]:
+        """Query and parameters of a patient export (registered between the dates, inclusive)"""
+        conditions = ["is_deleted = FALSE"]
+        params: List[Any] = []
+        if created_from:
+            params.append(created_from)
+            conditions.append(f"created_at >= ${len(params)}")
+        if created_to:
+            params.append(created_to + timedelta(days=1))
+            conditions.append(f"created_at < ${len(params)}")
+        query = f"""
+            SELECT id, registration_number, first_name, last_name, date_of_birth, gender, blood_group,
+                   phone_number, email, address, emergency_contact_name, emergency_contact_phone,
+                   medical_history, allergies, created_at, updated_at
+            FROM patients
+            WHERE {" AND ".join(conditions)}
+            ORDER BY created_at, id
+        """
+        return query, params
+
 class OPDAssignmentModel(BaseCRUD):
     """OPD Assignment database operations"""
     table_name = "opd_assignments"
@@ -215,7 +362,7 @@ class OPDAssignmentModel(BaseCRUD):
     @classmethod
     async def list(cls, limit: int, offset: int, **filters) -> Tuple[List[DBRecord], int]:
         """List records with joins and filters"""
-        pool = await get_pool()
+        pool = await get_read_pool()
         
         # Build base query with joins
         base_query = """
@@ -244,10 +391,10 @@ class OPDAssignmentModel(BaseCRUD):
         async with pool.acquire() as conn:
             # Count total results
             count_query = f"""
-                SELECT COUNT(*) FROM opd_assignments o
+                SELECT 1 FROM opd_assignments o
                 WHERE {where_clause}
             """
-            total = await conn.fetchval(count_query, *filter_values)
+            total = await list_counts.count(conn, count_query, *filter_values, filtered=bool(filter_values))
             
             # Get paginated results
             query = f"""
@@ -304,11 +451,29 @@ class OPDAssignmentModel(BaseCRUD):
             results = await conn.fetch(query, doctor_id)
             return [dict(r) for r in results]
     
+    @staticmethod
+    async def doctor_version(conn: Connection, doctor_id: uuid.UUID) -> Tuple[Any, ...]:
+        """
+        Changes whenever get_doctor_assignments would return something else: every
+        write gives the assignment or patient a new change_seq, so the sum moves
+        even when a write with a lower change_seq commits last.
+        """
+        row = await conn.fetchrow(
+            """
+            SELECT COUNT(*), COALESCE(SUM(o.change_seq + p.change_seq), 0), MAX(d.updated_at)
+            FROM opd_assignments o
+            JOIN doctors d ON o.doctor_id = d.id
+            JOIN patients p ON o.patient_id = p.id
+            WHERE o.doctor_id = $1 AND o.is_deleted = FALSE
+            """,
+            doctor_id
+        )
+        return tuple(row)
+    
     @classmethod
-    async def get_by_id_with_joins(cls, assignment_id: uuid.UUID) -> Optional[DBRecord]:
+    async def get_by_id_with_joins(cls, assignment_id: uuid.UUID, conn: Optional[Connection] = None) -> Optional[DBRecord]:
         """Get an OPD assignment by ID with joined doctor and patient info."""
-        pool = await get_pool()
-        async with pool.acquire() as conn:
+        async with connection(conn) as conn:
             query = """
                 SELECT 
                     o.*, 
@@ -323,6 +488,101 @@ class OPDAssignmentModel(BaseCRUD):
             """
             result = await conn.fetchrow(query, assignment_id)
             return dict(result) if result else None
+
+    @classmethod
+    async def queued(cls, conn: Connection) -> List[DBRecord]:
+        """All assignments still waiting for their doctor (OPD_QUEUED), with joined doctor and patient info"""
+        query = f"""
+            SELECT
+                o.*,
+                d.full_name as doctor_name,
+                d.department as doctor_specialty,
+                CONCAT(p.first_name, ' ', p.last_name) as patient_name,
+                p.registration_number as patient_registration
+            FROM opd_assignments o
+            JOIN doctors d ON o.doctor_id = d.id
+            JOIN patients p ON o.patient_id = p.id
+            WHERE {OPD_QUEUED}
+        """
+        results = await conn.fetch(query)
+        return [dict(r) for r in results]
+
+    @classmethod
+    async def assign(cls, conn: Connection, data: Dict[str, Any]) -> DBRecord:
+        """
+        Assign a patient to a doctor in one statement: check both exist (the
+        doctor in the local doctors table), insert the assignment, queue its
+        ``opd_assignment`` outbox event and return it with the joined names.
+        ``patient_found``/``doctor_found`` tell why nothing was inserted.
+        """
+        query = """
+            WITH patient AS (
+                SELECT * FROM patients WHERE id = $1 AND is_deleted = FALSE
+            ),
+            doctor AS (
+                SELECT id, full_name, department FROM doctors WHERE id = $2 AND is_deleted = FALSE
+            ),
+            assignment AS (
+                INSERT INTO opd_assignments (patient_id, doctor_id, priority, notes, status)
+                SELECT patient.id, doctor.id, $3, $4, 'PENDING'
+                FROM patient, doctor
+                RETURNING *
+            ),
+            event AS (
+                INSERT INTO outbox (event_type, payload)
+                SELECT 'opd_assignment', jsonb_build_object(
+                    'id', a.id,
+                    'doctor_id', a.doctor_id,
+                    'patient_id', a.patient_id,
+                    'status', a.status,
+                    'priority', a.priority,
+                    'notes', a.notes,
+                    'created_at', a.created_at,
+                    'doctor_name', d.full_name,
+                    'doctor_specialty', d.department,
+                    'patient_name', CONCAT(p.first_name, ' ', p.last_name),
+                    'patient_registration', p.registration_number,
+                    'patient', jsonb_build_object(
+                        'id', p.id,
+                        'registration_number', p.registration_number,
+                        'first_name', p.first_name,
+                        'last_name', p.last_name,
+                        'date_of_birth', p.date_of_birth,
+                        'gender', p.gender,
+                        'blood_group', p.blood_group,
+                        'phone_number', p.phone_number,
+                        'email', p.email,
+                        'address', p.address,
+                        'emergency_contact_name', p.emergency_contact_name,
+                        'emergency_contact_phone', p.emergency_contact_phone,
+                        'allergies', COALESCE(p.allergies, '[]'::jsonb),
+                        'medical_history', COALESCE(p.medical_history, '{}'::jsonb)
+                    )
+                )
+                FROM assignment a, patient p, doctor d
+            )
+            SELECT
+                EXISTS (SELECT 1 FROM patient) AS patient_found,
+                EXISTS (SELECT 1 FROM doctor) AS doctor_found,
+                a.*,
+                d.full_name as doctor_name,
+                d.department as doctor_specialty,
+                CONCAT(p.first_name, ' ', p.last_name) as patient_name,
+                p.registration_number as patient_registration
+            FROM (SELECT 1) AS one
+            LEFT JOIN assignment a ON TRUE
+            LEFT JOIN patient p ON TRUE
+            LEFT JOIN doctor d ON TRUE
+        """
+        priority = data.get("priority") or "NORMAL"
+        result = await conn.fetchrow(
+            query,
+            data["patient_id"],
+            data["doctor_id"],
+            getattr(priority, "value", priority),
+            data.get("notes")
+        )
+        return dict(result)
     
 
 class AppointmentModel(BaseCRUD):
@@ -340,9 +600,8 @@ class AppointmentModel(BaseCRUD):
     # Other methods remain the same
 
     @classmethod
-    async def get_by_id(cls, id: UUID) -> Optional[DBRecord]:
-        pool = await get_pool()
-        async with pool.acquire() as conn:
+    async def get_by_id(cls, id: UUID, conn: Optional[Connection] = None) -> Optional[DBRecord]:
+        async with connection(conn) as conn:
             query = """
                 SELECT 
                     a.*,
@@ -433,7 +692,7 @@ class AppointmentModel(BaseCRUD):
 
     @classmethod
     async def list(cls, limit: int, offset: int, **filters) -> Tuple[List[DBRecord], int]:
-        pool = await get_pool()
+        pool = await get_read_pool()
         base_query = """
             SELECT 
                 a.*,
@@ -461,13 +720,13 @@ class AppointmentModel(BaseCRUD):
         async with pool.acquire() as conn:
             # Count total results with joins
             count_query = f"""
-                SELECT COUNT(*)
+                SELECT 1
                 FROM appointments a
                 JOIN doctors d ON a.doctor_id = d.id
                 JOIN patients p ON a.patient_id = p.id
                 WHERE {where_clause}
             """
-            total = await conn.fetchval(count_query, *filter_values)
+            total = await list_counts.count(conn, count_query, *filter_values, filtered=bool(filter_values))
             
             # Get paginated results
             query = f"""
@@ -488,41 +747,259 @@ class AppointmentModel(BaseCRUD):
         duration_minutes: int, 
         exclude_id: Optional[uuid.UUID] = None
     ) -> bool:
-        """Check if there's a conflicting appointment for the given doctor and time."""
+        """
+        Check if there's a conflicting appointment for the given doctor and time.
+        Only a preview: bookings are guarded by the appointments_no_overlap constraint.
+        """
         pool = await get_pool()
         new_end = appointment_date + timedelta(minutes=duration_minutes)
     
         async with pool.acquire() as conn:
-            query = """
+            query = f"""
                 SELECT EXISTS (
                     SELECT 1 FROM appointments
                     WHERE doctor_id = $1
-                    AND is_deleted = FALSE
+                    AND {SLOT_TAKEN}
+                    AND slot && tstzrange($2, $3)
                     AND id != COALESCE($4, uuid_nil())
-                    AND (
-                        appointment_date < $3  -- Existing appointment starts before new appointment ends
-                        AND 
-                        appointment_date + (duration_minutes * INTERVAL '1 minute') > $2  -- Existing appointment ends after new starts
-                    )
                 )
             """
             result = await conn.fetchval(query, doctor_id, appointment_date, new_end, exclude_id)
             return result
 
+    @classmethod
+    async def create_many(cls, conn: Connection, appointments: List[Dict[str, Any]]) -> List[Optional[DBRecord]]:
+        """
+        Book appointments with one INSERT, in order. An appointment that overlaps a
+        booked one, or an earlier one of the batch, is skipped by the exclusion
+        constraint. Returns the booked appointment (with joins) or None per input.
+        """
+        if not appointments:
+            return []
+        ids = [uuid.uuid4() for _ in appointments]
+        columns = ("patient_id", "doctor_id", "appointment_date", "duration_minutes",
+                   "appointment_type", "reason", "notes")
+        arrays = [[getattr(a.get(c), "value", a.get(c)) for a in appointments] for c in columns]
+        rows = await conn.fetch(
+            """
+            WITH booked AS (
+                INSERT INTO appointments
+                    (id, patient_id, doctor_id, appointment_date, duration_minutes,
+                     appointment_type, reason, notes, status)
+                SELECT id, patient_id, doctor_id, appointment_date, duration_minutes,
+                       appointment_type, reason, notes, 'SCHEDULED'
+                FROM unnest($1::uuid[], $2::uuid[], $3::uuid[], $4::timestamptz[], $5::int[],
+                            $6::text[], $7::text[], $8::text[])
+                     WITH ORDINALITY AS a(id, patient_id, doctor_id, appointment_date, duration_minutes,
+                                          appointment_type, reason, notes, position)
+                ORDER BY position
+                ON CONFLICT DO NOTHING
+                RETURNING *
+            )
+            SELECT
+                b.*,
+                d.full_name as doctor_name,
+                d.department as department,
+                CONCAT(p.first_name, ' ', p.last_name) as patient_name,
+                p.registration_number as patient_registration
+            FROM booked b
+            JOIN doctors d ON b.doctor_id = d.id
+            JOIN patients p ON b.patient_id = p.id
+            """,
+            ids, *arrays
+        )
+        by_id = {r["id"]: dict(r) for r in rows}
+        return [by_id.get(i) for i in ids]
+
+    @classmethod
+    async def available_slots(
+        cls,
+        conn: Connection,
+        start_date: date,
+        end_date: date,
+        duration_minutes: int,
+        doctor_id: Optional[uuid.UUID] = None,
+        department: Optional[str] = None,
+        day_start: time = time(8, 0),
+        day_end: time = time(17, 0),
+        timezone: str = "UTC",
+        working_days: Optional[List[int]] = None,
+    ) -> List[DBRecord]:
+        """
+        Free intervals of at least ``duration_minutes`` for one doctor or all
+        available doctors of a department, between start_date and end_date
+        (inclusive). Working hours are day_start to day_end in ``timezone`` on
+        ``working_days`` (ISO weekdays); past time is never free. One query: the
+        working hours minus each doctor's booked slots, as multiranges.
+        """
+        query = f"""
+            WITH doctor_list AS (
+                SELECT id, full_name, department FROM doctors
+                WHERE is_deleted = FALSE AND is_available = TRUE
+                AND ($1::uuid IS NULL OR id = $1)
+                AND ($2::text IS NULL OR department = $2)
+            ),
+            bounds AS (
+                SELECT tstzrange($3::date::timestamp AT TIME ZONE $7,
+                                 ($4::date + 1)::timestamp AT TIME ZONE $7) AS span
+            ),
+            working AS (
+                SELECT range_agg(tstzrange((d::date + $5::time) AT TIME ZONE $7,
+                                           (d::date + $6::time) AT TIME ZONE $7))
+                       * tstzmultirange(tstzrange(NOW(), NULL)) AS hours
+                FROM generate_series($3::date::timestamp, $4::date::timestamp, INTERVAL '1 day') AS d
+                WHERE EXTRACT(ISODOW FROM d)::int = ANY($8::int[])
+            )
+            SELECT dl.id AS doctor_id, dl.full_name AS doctor_name, dl.department,
+                   lower(free) AS start_time, upper(free) AS end_time
+            FROM doctor_list dl
+            CROSS JOIN bounds b
+            CROSS JOIN working w
+            CROSS JOIN LATERAL unnest(w.hours - COALESCE((
+                SELECT range_agg(a.slot) FROM appointments a
+                WHERE a.doctor_id = dl.id
+                AND {SLOT_TAKEN}
+                AND a.slot && b.span
+            ), '{{}}'::tstzmultirange)) AS free
+            WHERE upper(free) - lower(free) >= make_interval(mins => $9)
+            ORDER BY dl.department, dl.full_name, dl.id, lower(free)
+        """
+        results = await conn.fetch(
+            query, doctor_id, department, start_date, end_date, day_start, day_end,
+            timezone, working_days or [1, 2, 3, 4, 5], duration_minutes
+        )
+        return [dict(r) for r in results]
+
 
         
+    @staticmethod
+    def export_query(
+        from_date: Optional[date] = None,
+        to_date: Optional[date] = None,
+        doctor_id: Optional[UUID] = None,
+        patient_id: Optional[UUID] = None,
+        status: Optional[str] = None,
+    ) -> Tuple[str, List[Any]]:
+        """Query and parameters of an appointment export (appointments between the dates, inclusive)"""
+        conditions = ["a.is_deleted = FALSE"]
+        params: List[Any] = []
+        for column, value in (("doctor_id", doctor_id), ("patient_id", patient_id), ("status", status)):
+            if value is not None:
+                params.append(value)
+                conditions.append(f"a.{column} = ${len(params)}")
+        if from_date:
+            params.append(from_date)
+            conditions.append(f"a.appointment_date >= ${len(params)}")
+        if to_date:
+            params.append(to_date + timedelta(days=1))
+            conditions.append(f"a.appointment_date < ${len(params)}")
+        query = f"""
+            SELECT a.id, a.patient_id, p.registration_number as patient_registration,
+                   CONCAT(p.first_name, ' ', p.last_name) as patient_name,
+                   a.doctor_id, d.full_name as doctor_name, d.department,
+                   a.appointment_date, a.duration_minutes, a.appointment_type, a.status,
+                   a.reason, a.notes, a.created_at, a.updated_at
+            FROM appointments a
+            LEFT JOIN doctors d ON a.doctor_id = d.id
+            JOIN patients p ON a.patient_id = p.id
+            WHERE {" AND ".join(conditions)}
+            ORDER BY a.appointment_date, a.id
+        """
+        return query, params
+
 class DoctorModel(BaseCRUD):
     """Doctor database operations"""
     table_name = "doctors"
 
     @classmethod
-    async def get_by_id(cls, id: uuid.UUID) -> Optional[DBRecord]:
+    async def get_by_id(cls, id: uuid.UUID, conn: Optional[Connection] = None) -> Optional[DBRecord]:
         """Get a doctor by ID with basic info"""
-        pool = await get_pool()
-        async with pool.acquire() as conn:
+        async with connection(conn) as conn:
             query = """
                 SELECT id, full_name, department FROM doctors
                 WHERE id = $1 AND is_deleted = FALSE
             """
             result = await conn.fetchrow(query, id)
-            return dict(result) if result else None
\ No newline at end of file
+            return dict(result) if result else None
+
+    @classmethod
+    async def upsert_many(cls, conn: Connection, doctors: List[Dict[str, Any]]) -> int:
+        """
+        Insert or refresh doctors (id, full_name, department) with one statement;
+        rows that are unchanged aren't rewritten. Returns the number written.
+        """
+        doctors = list({str(d["id"]): d for d in doctors}.values())
+        if not doctors:
+            return 0
+        rows = await conn.fetch(
+            """
+            INSERT INTO doctors (id, full_name, department, is_available)
+            SELECT id, full_name, department, TRUE
+            FROM unnest($1::uuid[], $2::text[], $3::text[]) AS d(id, full_name, department)
+            ON CONFLICT (id) DO UPDATE
+            SET full_name = EXCLUDED.full_name,
+                department = EXCLUDED.department,
+                is_deleted = FALSE,
+                updated_at = NOW()
+            WHERE (doctors.full_name, doctors.department, doctors.is_deleted)
+                IS DISTINCT FROM (EXCLUDED.full_name, EXCLUDED.department, FALSE)
+            RETURNING id
+            """,
+            [uuid.UUID(str(d["id"])) for d in doctors],
+            [d["full_name"] for d in doctors],
+            [d.get("department") or "" for d in doctors]
+        )
+        return len(rows)
+
+class ChangeFeed:
+    """Changed patients and OPD assignments, in commit-safe order (see init.sql)"""
+    tables = ("patients", "opd_assignments")
+
+    @staticmethod
+    def parse_cursor(cursor: Optional[str]) -> Tuple[int, int]:
+        """(change_xid, change_seq) of a cursor; the start of the feed when empty"""
+        if not cursor:
+            return (0, 0)
+        xid, _, seq = cursor.partition(".")
+        return (int(xid), int(seq))
+
+    @staticmethod
+    def format_cursor(xid: int, seq: int) -> str:
+        return f"{xid}.{seq}"
+
+    @classmethod
+    async def since(cls, cursor: Optional[str], limit: int) -> Dict[str, Any]:
+        """
+        Up to ``limit`` rows changed after ``cursor``, grouped by table, with
+        the cursor to continue from. Deleted rows are included (is_deleted).
+        """
+        xid, seq = cls.parse_cursor(cursor)
+        pool = await get_pool()
+        async with pool.acquire() as conn:
+            # One snapshot for the horizon and all tables
+            async with conn.transaction(isolation="repeatable_read", readonly=True):
+                horizon = await conn.fetchval("SELECT pg_snapshot_xmin(pg_current_snapshot())::text::bigint")
+                changes = []
+                for table in cls.tables:
+                    rows = await conn.fetch(
+                        f"""
+                        SELECT * FROM {table}
+                        WHERE (change_xid, change_seq) > ($1, $2) AND change_xid < $3
+                        ORDER BY change_xid, change_seq
+                        LIMIT $4
+                        """,
+                        xid, seq, horizon, limit + 1
+                    )
+                    changes.extend((table, dict(row)) for row in rows)
+
+        changes.sort(key=lambda change: (change[1]["change_xid"], change[1]["change_seq"]))
+        page = changes[:limit]
+        result: Dict[str, Any] = {table: [] for table in cls.tables}
+        for table, row in page:
+            result[table].append(row)
+        if page:
+            last = page[-1][1]
+            xid, seq = last["change_xid"], last["change_seq"]
+        result["cursor"] = cls.format_cursor(xid, seq)
+        result["has_more"] = len(changes) > limit
+        return result
@@ -0,0 +1,291 @@
+# cardroom_service/app/opd_queue.py
+"""
+In-memory OPD queues: each doctor's waiting assignments in priority order.
+
+Doctors' screens poll their queue, and re-querying and re-sorting
+``opd_assignments`` for every poll is wasted work when the queue rarely
+changes. The queues are loaded from the database at startup and kept current
+by the OPD routes (``apply``/``remove`` after each committed write). A queue is
+ordered by priority, then arrival (``created_at``), then id.
+
+Readers get a snapshot whose JSON is encoded once per queue version and served
+with an ETag, or subscribe to a doctor's queue and receive a diff per change.
+Every ``reconcile_interval`` seconds the queues are compared with the database
+and any queue that drifted (writes by another instance, renamed patients) is
+replaced; its subscribers get a fresh snapshot.
+"""
+import asyncio
+import json
+import logging
+import time
+import uuid
+from bisect import bisect_left, insort
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from app.config import settings
+from app.models import OPDAssignmentModel
+from app.schemas import OPDAssignmentResponse
+
+logger = logging.getLogger(__name__)
+
+# Must match models.OPD_QUEUED
+QUEUED_STATUSES = ("PENDING", "IN_PROGRESS")
+PRIORITY_RANK = {"URGENT": 0, "HIGH": 1, "NORMAL": 2, "LOW": 3}
+
+QueueKey = Tuple[int, datetime, str]
+
+
+def is_queued(row: Dict[str, Any]) -> bool:
+    return not row.get("is_deleted") and row.get("status") in QUEUED_STATUSES
+
+
+def encode(message: Dict[str, Any]) -> str:
+    return json.dumps(message, separators=(",", ":"))
+
+
+@lru_cache(maxsize=1024)
+def empty_snapshot(doctor_id: str) -> str:
+    """The snapshot of a doctor without a queue; bounded, as any id can be asked for"""
+    return encode({"type": "opd_queue_snapshot", "doctor_id": doctor_id, "version": 0, "entries": []})
+
+
+class DoctorQueue:
+    """One doctor's queued assignments, kept sorted by QueueKey"""
+
+    def __init__(self):
+        self.keys: List[QueueKey] = []
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self.key_of: Dict[str, QueueKey] = {}
+        self.version = 0
+        self._snapshot: Optional[str] = None
+
+    def put(self, entry: Dict[str, Any], key: QueueKey) -> int:
+        """Insert or move ``entry``; returns its new position"""
+        self.discard(entry["id"])
+        insort(self.keys, key)
+        self.entries[entry["id"]] = entry
+        self.key_of[entry["id"]] = key
+        return bisect_left(self.keys, key)
+
+    def discard(self, assignment_id: str) -> bool:
+        key = self.key_of.pop(assignment_id, None)
+        if key is None:
+            return False
+        del self.keys[bisect_left(self.keys, key)]
+        del self.entries[assignment_id]
+        return True
+
+    def ordered(self) -> List[Dict[str, Any]]:
+        return [self.entries[key[2]] for key in self.keys]
+
+    def changed(self):
+        self.version += 1
+        self._snapshot = None
+
+
+class OPDQueue:
+    """Per-doctor OPD queues with snapshots, diff subscriptions and reconciliation"""
+
+    def __init__(self, reconcile_interval: float = 60.0, subscriber_buffer: int = 100):
+        self.reconcile_interval = reconcile_interval
+        self.subscriber_buffer = subscriber_buffer
+        # Versions restart with the process; the epoch keeps old ETags from matching
+        self.epoch = uuid.uuid4().hex[:8]
+        self.queues: Dict[str, DoctorQueue] = {}
+        self.doctor_of: Dict[str, str] = {}
+        self.subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        self.reconciles = 0
+        self.drifted = 0
+        self.resyncs = 0
+        self.last_error: Optional[str] = None
+        self.last_reconciled: Optional[float] = None
+        self._pool = None
+        self._task: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def entry(row: Dict[str, Any]) -> Tuple[Dict[str, Any], QueueKey]:
+        """The JSON-ready queue entry of an assignment row and its sort key"""
+        entry = OPDAssignmentResponse.model_validate(row).model_dump(mode="json")
+        rank = PRIORITY_RANK.get(entry["priority"], len(PRIORITY_RANK))
+        return entry, (rank, row["created_at"], entry["id"])
+
+    def queue(self, doctor_id: str) -> DoctorQueue:
+        if doctor_id not in self.queues:
+            self.queues[doctor_id] = DoctorQueue()
+        return self.queues[doctor_id]
+
+    def apply(self, row: Optional[Dict[str, Any]]):
+        """Bring the queues in line with a committed assignment row (created, updated or moved)"""
+        if not row:
+            return
+        if not is_queued(row):
+            self.remove(row["id"])
+            return
+
+        entry, key = self.entry(row)
+        previous = self.doctor_of.get(entry["id"])
+        if previous is not None and previous != entry["doctor_id"]:
+            self.remove(entry["id"])
+
+        queue = self.queue(entry["doctor_id"])
+        if queue.entries.get(entry["id"]) == entry:
+            return
+        position = queue.put(entry, key)
+        self.doctor_of[entry["id"]] = entry["doctor_id"]
+        queue.changed()
+        self.publish(entry["doctor_id"], {"op": "upsert", "position": position, "entry": entry})
+
+    def remove(self, assignment_id):
+        """Take an assignment out of its doctor's queue (completed, cancelled, deleted)"""
+        assignment_id = str(assignment_id)
+        doctor_id = self.doctor_of.pop(assignment_id, None)
+        if doctor_id is None:
+            return
+        queue = self.queues[doctor_id]
+        queue.discard(assignment_id)
+        queue.changed()
+        self.publish(doctor_id, {"op": "remove", "id": assignment_id})
+
+    def etag(self, doctor_id) -> str:
+        queue = self.queues.get(str(doctor_id))
+        return f'"{self.epoch}-{queue.version if queue else 0}"'
+
+    def snapshot(self, doctor_id) -> str:
+        """The doctor's queue as JSON, encoded once per version"""
+        doctor_id = str(doctor_id)
+        queue = self.queues.get(doctor_id)
+        if queue is None:
+            return empty_snapshot(doctor_id)
+        if queue._snapshot is None:
+            queue._snapshot = encode({
+                "type": "opd_queue_snapshot",
+                "doctor_id": doctor_id,
+                "version": queue.version,
+                "entries": queue.ordered(),
+            })
+        return queue._snapshot
+
+    def subscribe(self, doctor_id) -> asyncio.Queue:
+        """A queue of JSON messages: the current snapshot, then one diff per change"""
+        doctor_id = str(doctor_id)
+        messages: asyncio.Queue = asyncio.Queue(maxsize=self.subscriber_buffer)
+        messages.put_nowait(self.snapshot(doctor_id))
+        self.subscribers.setdefault(doctor_id, set()).add(messages)
+        return messages
+
+    def unsubscribe(self, doctor_id, messages: asyncio.Queue):
+        doctor_id = str(doctor_id)
+        subscribers = self.subscribers.get(doctor_id)
+        if subscribers is None:
+            return
+        subscribers.discard(messages)
+        if not subscribers:
+            del self.subscribers[doctor_id]
+
+    def publish(self, doctor_id: str, diff: Optional[Dict[str, Any]] = None):
+        """Send a diff (or, without one, a snapshot) to the doctor's subscribers"""
+        subscribers = self.subscribers.get(doctor_id)
+        if not subscribers:
+            return
+        queue = self.queues[doctor_id]
+        if diff is None:
+            message = self.snapshot(doctor_id)
+        else:
+            message = encode({"type": "opd_queue_diff", "doctor_id": doctor_id, "version": queue.version, **diff})
+        for messages in subscribers:
+            try:
+                messages.put_nowait(message)
+            except asyncio.QueueFull:
+                # Too far behind for diffs: start it over from a snapshot
+                self.resyncs += 1
+                while not messages.empty():
+                    messages.get_nowait()
+                messages.put_nowait(self.snapshot(doctor_id))
+
+    async def reconcile(self, pool) -> int:
+        """Replace the queues that differ from the database; returns how many did"""
+        versions = {doctor_id: queue.version for doctor_id, queue in self.queues.items()}
+        async with pool.acquire() as conn:
+            rows = await OPDAssignmentModel.queued(conn)
+
+        loaded: Dict[str, DoctorQueue] = {}
+        for row in rows:
+            entry, key = self.entry(row)
+            loaded.setdefault(entry["doctor_id"], DoctorQueue()).put(entry, key)
+
+        drifted = 0
+        for doctor_id in set(loaded) | set(self.queues):
+            current = self.queues.get(doctor_id)
+            if current is not None and current.version != versions.get(doctor_id):
+                # Changed while we were reading; the next round checks it
+                continue
+            fresh = loaded.get(doctor_id) or DoctorQueue()
+            if current is not None and current.entries == fresh.entries and current.keys == fresh.keys:
+                continue
+            if current is None and not fresh.entries:
+                continue
+
+            if current is not None:
+                for assignment_id in current.entries:
+                    self.doctor_of.pop(assignment_id, None)
+                fresh.version = current.version
+            for assignment_id in fresh.entries:
+                self.doctor_of[assignment_id] = doctor_id
+            fresh.changed()
+            self.queues[doctor_id] = fresh
+            self.publish(doctor_id)
+            drifted += 1
+
+        self.reconciles += 1
+        self.drifted += drifted
+        self.last_reconciled = time.time()
+        return drifted
+
+    async def start(self, pool):
+        self._pool = pool
+        try:
+            await self.reconcile(pool)
+        except Exception as e:
+            self.last_error = str(e)
+            logger.error(f"Loading OPD queues failed: {str(e)}")
+        self._task = asyncio.create_task(self._watch())
+
+    async def _watch(self):
+        while True:
+            await asyncio.sleep(self.reconcile_interval)
+            try:
+                drifted = await self.reconcile(self._pool)
+                if drifted:
+                    logger.info(f"Reconciled {drifted} OPD queues with the database")
+                self.last_error = None
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.last_error = str(e)
+                logger.warning(f"OPD queue reconciliation failed: {str(e)}")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "running": self._task is not None,
+            "doctors": sum(1 for queue in self.queues.values() if queue.entries),
+            "queued": len(self.doctor_of),
+            "subscribers": sum(len(s) for s in self.subscribers.values()),
+            "reconciles": self.reconciles,
+            "drifted": self.drifted,
+            "resyncs": self.resyncs,
+            "last_error": self.last_error,
+            "seconds_since_reconcile": round(time.time() - self.last_reconciled, 1) if self.last_reconciled else None,
+        }
+
+
+opd_queue = OPDQueue(
+    reconcile_interval=settings.OPD_QUEUE_RECONCILE_INTERVAL,
+    subscriber_buffer=settings.OPD_QUEUE_SUBSCRIBER_BUFFER,
+)
@@ -0,0 +1,168 @@
+# cardroom_service/app/outbox.py
+"""
+After-commit delivery of side effects queued in the ``outbox`` table.
+
+A write queues its side effects (notifications, websocket broadcasts) as
+outbox rows in its own transaction, so they exist exactly when the write
+committed. The dispatcher claims due rows with ``FOR UPDATE SKIP LOCKED``
+(several instances can run side by side), pushes each claimed row's
+``available_at`` forward so a crashed dispatcher's claims come back, and hands
+the payload to the handler registered for its ``event_type``. Delivered events
+are deleted; failed ones are retried with exponential backoff and dropped after
+``max_attempts``. Requests wake the dispatcher once their transaction has
+committed (``dependencies.after_commit``), with ``poll_interval`` polling as
+the fallback.
+"""
+import asyncio
+import json
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[[Dict[str, Any]], Awaitable[Any]]
+
+
+class Outbox:
+    """Dispatches committed outbox events to their handlers"""
+
+    def __init__(self, poll_interval: float = 5.0, batch_size: int = 50,
+                 max_attempts: int = 8, retry_delay: float = 30.0):
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.handlers: Dict[str, Handler] = {}
+        self.dispatched = 0
+        self.failures = 0
+        self.dropped = 0
+        self.last_error: Optional[str] = None
+        self.last_dispatch: Optional[float] = None
+        self._pool = None
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup = asyncio.Event()
+
+    def handler(self, event_type: str) -> Callable[[Handler], Handler]:
+        """Register the handler of ``event_type`` events"""
+        def register(func: Handler) -> Handler:
+            self.handlers[event_type] = func
+            return func
+        return register
+
+    def wake(self):
+        """Dispatch now instead of at the next poll"""
+        self._wakeup.set()
+
+    async def claim(self, conn) -> List[Dict[str, Any]]:
+        # The lease: a claimed event isn't due again until its retry delay has passed,
+        # which must outlast a handler's HTTP timeouts
+        rows = await conn.fetch(
+            """
+            UPDATE outbox
+            SET attempts = attempts + 1,
+                available_at = NOW() + make_interval(secs => $2 * power(2, LEAST(attempts, 10)))
+            WHERE id IN (
+                SELECT id FROM outbox
+                WHERE available_at <= NOW()
+                ORDER BY available_at, id
+                LIMIT $1
+                FOR UPDATE SKIP LOCKED
+            )
+            RETURNING id, event_type, payload, attempts
+            """,
+            self.batch_size, self.retry_delay
+        )
+        return [dict(r) for r in sorted(rows, key=lambda r: r["id"])]
+
+    async def deliver(self, event: Dict[str, Any]) -> bool:
+        """Run the event's handler; True when the event is done with"""
+        handler = self.handlers.get(event["event_type"])
+        payload = event["payload"]
+        if isinstance(payload, str):
+            payload = json.loads(payload)
+        try:
+            if handler is None:
+                raise LookupError(f"No outbox handler for {event['event_type']}")
+            await handler(payload)
+            self.dispatched += 1
+            return True
+        except Exception as e:
+            self.failures += 1
+            self.last_error = str(e)
+            if event["attempts"] >= self.max_attempts:
+                self.dropped += 1
+                logger.error(
+                    "Dropping outbox event %s (%s) after %s attempts: %s",
+                    event["id"], event["event_type"], event["attempts"], str(e)
+                )
+                return True
+            logger.warning(
+                "Outbox event %s (%s) failed, attempt %s: %s",
+                event["id"], event["event_type"], event["attempts"], str(e)
+            )
+            return False
+
+    async def dispatch_once(self, pool) -> int:
+        """Deliver one batch of due events; returns the number claimed"""
+        async with pool.acquire() as conn:
+            events = await self.claim(conn)
+        if not events:
+            return 0
+        results = await asyncio.gather(*(self.deliver(event) for event in events))
+        done = [event["id"] for event, finished in zip(events, results) if finished]
+        if done:
+            async with pool.acquire() as conn:
+                await conn.execute("DELETE FROM outbox WHERE id = ANY($1::bigint[])", done)
+        self.last_dispatch = time.time()
+        return len(events)
+
+    async def start(self, pool):
+        self._pool = pool
+        self._task = asyncio.create_task(self._watch())
+
+    async def _watch(self):
+        while True:
+            self._wakeup.clear()
+            try:
+                while await self.dispatch_once(self._pool) >= self.batch_size:
+                    pass
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.last_error = str(e)
+                logger.error(f"Outbox dispatch failed: {str(e)}")
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    async def pending(self, pool) -> int:
+        async with pool.acquire() as conn:
+            return await conn.fetchval("SELECT COUNT(*) FROM outbox")
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "running": self._task is not None,
+            "handlers": sorted(self.handlers),
+            "dispatched": self.dispatched,
+            "failures": self.failures,
+            "dropped": self.dropped,
+            "last_error": self.last_error,
+            "seconds_since_dispatch": round(time.time() - self.last_dispatch, 1) if self.last_dispatch else None,
+        }
+
+
+outbox = Outbox(
+    poll_interval=settings.OUTBOX_POLL_INTERVAL,
+    batch_size=settings.OUTBOX_BATCH_SIZE,
+    max_attempts=settings.OUTBOX_MAX_ATTEMPTS,
+    retry_delay=settings.OUTBOX_RETRY_DELAY,
+)
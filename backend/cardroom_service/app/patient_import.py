@@ -0,0 +1,357 @@
+# cardroom_service/app/patient_import.py
+"""
+Bulk patient import from CSV or NDJSON, e.g. a satellite clinic's records.
+
+The file is read as a stream: rows are parsed and validated
+(``PatientImportRow``) in chunks of ``chunk_size``, and each chunk of valid
+rows is written with ``copy_records_to_table`` into a temporary staging table
+on the import's connection. Once the file is read, one statement inserts the
+first row of every registration number into ``patients`` and reports the rest:
+later rows of the same number are duplicates within the file, and numbers that
+are already registered are skipped (``ON CONFLICT DO NOTHING``). The whole
+import is one transaction; a failure leaves ``patients`` untouched.
+
+CSV files have a header row with the PatientImportRow field names; in CSV,
+``allergies`` is a JSON array or a ``;``-separated list and
+``medical_history`` a JSON object. NDJSON files have one JSON object per line.
+Line numbers in the report count physical lines (the CSV header is line 1).
+
+Imports in progress and the most recent ones are listed by ``imports``; run
+from the command line with::
+
+    python -m app.patient_import patients.csv [--format ndjson] [--chunk-size 1000]
+"""
+import asyncio
+import codecs
+import csv
+import json
+import logging
+import sys
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from asyncpg import Connection
+from pydantic import ValidationError
+
+from app.config import settings
+from app.schemas import PATIENT_IMPORT_MAX_ERRORS, PatientImportRow
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ("csv", "ndjson")
+
+# Staged columns, in copy_records_to_table order; all but line are inserted into patients
+PATIENT_COLUMNS = [
+    "registration_number", "first_name", "last_name", "date_of_birth", "gender", "blood_group",
+    "phone_number", "email", "address", "emergency_contact_name", "emergency_contact_phone",
+    "medical_history", "allergies",
+]
+STAGING_COLUMNS = ["line"] + PATIENT_COLUMNS
+
+STAGING_TABLE = """
+    CREATE TEMP TABLE patient_import_rows (
+        line INTEGER NOT NULL,
+        registration_number VARCHAR(50) NOT NULL,
+        first_name VARCHAR(100) NOT NULL,
+        last_name VARCHAR(100) NOT NULL,
+        date_of_birth DATE NOT NULL,
+        gender VARCHAR(20) NOT NULL,
+        blood_group VARCHAR(10),
+        phone_number VARCHAR(20) NOT NULL,
+        email VARCHAR(100),
+        address TEXT,
+        emergency_contact_name VARCHAR(100),
+        emergency_contact_phone VARCHAR(20),
+        medical_history JSONB NOT NULL,
+        allergies JSONB NOT NULL
+    ) ON COMMIT DROP
+"""
+
+# Inserts the first row of each registration number; returns the staged rows that weren't inserted
+MERGE = f"""
+    WITH firsts AS (
+        SELECT DISTINCT ON (registration_number) *
+        FROM patient_import_rows
+        ORDER BY registration_number, line
+    ),
+    inserted AS (
+        INSERT INTO patients ({", ".join(PATIENT_COLUMNS)})
+        SELECT {", ".join(PATIENT_COLUMNS)} FROM firsts
+        ORDER BY line
+        ON CONFLICT (registration_number) DO NOTHING
+        RETURNING registration_number
+    )
+    SELECT s.line, s.registration_number, f.line AS first_line
+    FROM patient_import_rows s
+    JOIN firsts f ON f.registration_number = s.registration_number
+    WHERE s.line <> f.line
+       OR NOT EXISTS (SELECT 1 FROM inserted i WHERE i.registration_number = s.registration_number)
+    ORDER BY s.line
+"""
+
+
+async def lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, str]]:
+    """Numbered lines of a UTF-8 byte stream, without their line endings"""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    number = 0
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *complete, pending = pending.split("\n")
+        for line in complete:
+            number += 1
+            yield number, line.rstrip("\r")
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield number + 1, pending.rstrip("\r")
+
+
+def csv_list(value: str) -> Any:
+    value = value.strip()
+    if value.startswith("["):
+        return json.loads(value)
+    return [item.strip() for item in value.split(";") if item.strip()]
+
+
+async def csv_rows(chunks: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, Any]]:
+    """(line, field dict) per CSV record; a quoted field may span lines"""
+    header: Optional[List[str]] = None
+    record: List[str] = []
+    start = 0
+    async for number, line in lines(chunks):
+        if not record:
+            start = number
+        record.append(line)
+        text = "\n".join(record)
+        if text.count('"') % 2:
+            continue  # inside a quoted field
+        record = []
+        if not text.strip():
+            continue
+        values = next(csv.reader([text]))
+        if header is None:
+            header = [name.strip() for name in values]
+            continue
+        if len(values) != len(header):
+            yield start, ValueError(f"Expected {len(header)} fields, found {len(values)}")
+            continue
+        fields: Dict[str, Any] = {}
+        try:
+            for name, value in zip(header, values):
+                if value.strip() == "":
+                    continue  # defaults apply
+                if name == "allergies":
+                    fields[name] = csv_list(value)
+                elif name == "medical_history":
+                    fields[name] = json.loads(value)
+                else:
+                    fields[name] = value
+        except ValueError as e:
+            yield start, ValueError(f"{name}: {str(e)}")
+            continue
+        yield start, fields
+    if record:
+        yield start, ValueError("Unterminated quoted field")
+
+
+async def ndjson_rows(chunks: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, Any]]:
+    """(line, object) per non-blank NDJSON line"""
+    async for number, line in lines(chunks):
+        if not line.strip():
+            continue
+        try:
+            yield number, json.loads(line)
+        except ValueError as e:
+            yield number, ValueError(f"Invalid JSON: {str(e)}")
+
+
+def staging_record(line: int, row: PatientImportRow) -> Tuple[Any, ...]:
+    values = row.model_dump()
+    values["medical_history"] = json.dumps(values["medical_history"] or {})
+    values["allergies"] = json.dumps(values["allergies"] or [])
+    return (line,) + tuple(getattr(values[c], "value", values[c]) for c in PATIENT_COLUMNS)
+
+
+class PatientImport:
+    """One import: parses, validates and stages the rows, then merges them into patients"""
+
+    def __init__(self, format: str, source: Optional[str] = None,
+                 chunk_size: int = 1000, max_errors: int = PATIENT_IMPORT_MAX_ERRORS):
+        if format not in FORMATS:
+            raise ValueError(f"Unsupported import format: {format}")
+        self.import_id = str(uuid.uuid4())
+        self.format = format
+        self.source = source
+        self.chunk_size = chunk_size
+        self.max_errors = max_errors
+        self.status = "running"
+        self.rows = 0
+        self.staged = 0
+        self.invalid = 0
+        self.duplicates = 0
+        self.existing = 0
+        self.imported = 0
+        self.errors: List[Dict[str, Any]] = []
+        self.errors_truncated = False
+        self.error: Optional[str] = None
+        self.started_at = datetime.now(timezone.utc)
+        self.finished_at: Optional[datetime] = None
+
+    def reject(self, line: int, registration_number: Optional[str], errors: List[str]):
+        if len(self.errors) < self.max_errors:
+            self.errors.append({"line": line, "registration_number": registration_number, "errors": errors})
+        else:
+            self.errors_truncated = True
+
+    async def stage(self, conn: Connection, records: List[Tuple[Any, ...]]):
+        await conn.copy_records_to_table("patient_import_rows", records=records, columns=STAGING_COLUMNS)
+        self.staged += len(records)
+
+    async def run(self, conn: Connection, chunks: AsyncIterator[bytes]) -> Dict[str, Any]:
+        """Import the file read from ``chunks``; returns the report"""
+        parse = csv_rows if self.format == "csv" else ndjson_rows
+        try:
+            async with conn.transaction():
+                await conn.execute(STAGING_TABLE)
+                records: List[Tuple[Any, ...]] = []
+                async for line, fields in parse(chunks):
+                    self.rows += 1
+                    if isinstance(fields, Exception):
+                        self.invalid += 1
+                        self.reject(line, None, [str(fields)])
+                        continue
+                    if not isinstance(fields, dict):
+                        self.invalid += 1
+                        self.reject(line, None, ["Expected an object"])
+                        continue
+                    try:
+                        records.append(staging_record(line, PatientImportRow.model_validate(fields)))
+                    except ValidationError as e:
+                        self.invalid += 1
+                        self.reject(line, fields.get("registration_number"), [
+                            f"{'.'.join(str(loc) for loc in error['loc'])}: {error['msg']}" for error in e.errors()
+                        ])
+                        continue
+                    if len(records) >= self.chunk_size:
+                        await self.stage(conn, records)
+                        records = []
+                if records:
+                    await self.stage(conn, records)
+
+                for rejected in await conn.fetch(MERGE):
+                    if rejected["line"] != rejected["first_line"]:
+                        self.duplicates += 1
+                        reason = f"Duplicate registration number, first on line {rejected['first_line']}"
+                    else:
+                        self.existing += 1
+                        reason = "Registration number already exists"
+                    self.reject(rejected["line"], rejected["registration_number"], [reason])
+                self.imported = self.staged - self.duplicates - self.existing
+            self.errors.sort(key=lambda error: error["line"])
+            self.status = "completed"
+        except Exception as e:
+            self.status = "failed"
+            self.error = str(e)
+            self.imported = 0
+            raise
+        finally:
+            self.finished_at = datetime.now(timezone.utc)
+        return self.report()
+
+    def progress(self) -> Dict[str, Any]:
+        return {
+            "import_id": self.import_id,
+            "source": self.source,
+            "format": self.format,
+            "status": self.status,
+            "rows": self.rows,
+            "staged": self.staged,
+            "invalid": self.invalid,
+            "duplicates": self.duplicates,
+            "existing": self.existing,
+            "imported": self.imported,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "error": self.error,
+        }
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            **self.progress(),
+            "message": f"Imported {self.imported} of {self.rows} patients",
+            "errors": self.errors,
+            "errors_truncated": self.errors_truncated,
+        }
+
+
+class PatientImports:
+    """Running imports and the last ``keep`` finished ones, for progress reporting"""
+
+    def __init__(self, keep: int = 20):
+        self.keep = keep
+        self._imports: "OrderedDict[str, PatientImport]" = OrderedDict()
+
+    def add(self, patient_import: PatientImport) -> PatientImport:
+        self._imports[patient_import.import_id] = patient_import
+        finished = [i for i, p in self._imports.items() if p.status != "running"]
+        for import_id in finished[:max(len(finished) - self.keep, 0)]:
+            del self._imports[import_id]
+        return patient_import
+
+    def get(self, import_id: str) -> Optional[PatientImport]:
+        return self._imports.get(import_id)
+
+    def list(self) -> List[PatientImport]:
+        return list(reversed(self._imports.values()))
+
+
+imports = PatientImports()
+
+# Each running import holds a pooled connection for the whole upload
+import_slots = asyncio.Semaphore(settings.PATIENT_IMPORT_CONCURRENCY)
+
+
+async def read_file(path: str, size: int = 64 * 1024) -> AsyncIterator[bytes]:
+    with open(path, "rb") as f:
+        while True:
+            chunk = await asyncio.to_thread(f.read, size)
+            if not chunk:
+                return
+            yield chunk
+
+
+async def main(argv: List[str]) -> int:
+    import argparse
+    import asyncpg
+
+    parser = argparse.ArgumentParser(prog="python -m app.patient_import", description="Bulk import patients")
+    parser.add_argument("file")
+    parser.add_argument("--format", choices=FORMATS, help="default: from the file extension")
+    parser.add_argument("--chunk-size", type=int, default=settings.PATIENT_IMPORT_CHUNK_SIZE)
+    args = parser.parse_args(argv)
+    format = args.format or ("ndjson" if args.file.endswith((".ndjson", ".jsonl")) else "csv")
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    patient_import = PatientImport(format, source=args.file, chunk_size=args.chunk_size)
+
+    async def log_progress():
+        while True:
+            await asyncio.sleep(5)
+            logger.info("%s rows read, %s staged, %s invalid", patient_import.rows,
+                        patient_import.staged, patient_import.invalid)
+
+    conn = await asyncpg.connect(settings.DATABASE_URL)
+    progress = asyncio.create_task(log_progress())
+    try:
+        report = await patient_import.run(conn, read_file(args.file))
+    finally:
+        progress.cancel()
+        await conn.close()
+    print(json.dumps(report, default=str, indent=2))
+    return 0 if not report["errors"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main(sys.argv[1:])))
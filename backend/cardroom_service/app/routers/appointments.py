@@ -4,17 +4,25 @@ Router for appointment-related endpoints.
 from fastapi import APIRouter, Depends, Path, Query, HTTPException, status
 from uuid import UUID
 from typing import Optional, List, Dict, Any
-from asyncpg import Connection
+from asyncpg import Connection, ExclusionViolationError
+import asyncio
 import uuid
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 
+from app.config import settings
 from app.schemas import (
     AppointmentCreate, AppointmentUpdate, AppointmentResponse,
-    AppointmentsResponse, BaseResponse, AppointmentDateRange
+    AppointmentsResponse, BaseResponse, AppointmentDateRange,
+    AppointmentBulkCreate, AppointmentBulkResponse, AvailableSlotsResponse
 )
+from app.count_strategy import is_exact
+from app.database import list_counts, read_connection
+from app.export import FORMAT_PATTERN, export_response
+from app.responses import lean_response
+from app.security import card_room_worker_only
 from app.models import AppointmentModel, PatientModel, DoctorModel
 from app.services.auth_service import get_doctor_from_auth
-from app.dependencies import get_db_connection, get_transaction
+from app.dependencies import get_db_connection, get_read_db_connection, get_transaction
 from app.exceptions import ResourceNotFoundException, ConflictException, BadRequestException
 from app.notifications import send_appointment_notification, send_appointment_update_notification
 
@@ -24,6 +32,20 @@ router = APIRouter(
     dependencies=[]  # Clear any router-level security dependencies
 )
 
+SLOT_CONFLICT_MESSAGE = "This time slot conflicts with an existing appointment"
+
+# Longest date range of the available slots API
+AVAILABILITY_MAX_DAYS = 31
+
+async def store_doctor(doctor: Dict[str, Any]):
+    """Keep a local copy of the doctor for joins and department lookups"""
+    await DoctorModel.upsert({
+        "id": doctor["id"],
+        "full_name": doctor["full_name"],
+        "department": doctor["department"],
+        "is_available": True
+    })
+
 @router.post("/", response_model=AppointmentResponse)
 async def create_appointment(
     appointment: AppointmentCreate,
@@ -40,24 +62,21 @@ async def create_appointment(
     if not doctor:
         raise ResourceNotFoundException("Doctor", str(appointment.doctor_id))
 
-    # Check for time conflicts
-    conflict = await AppointmentModel.check_conflicts(
-        doctor_id=appointment.doctor_id,
-        appointment_date=appointment.appointment_date,
-        duration_minutes=appointment.duration_minutes
-    )
-    if conflict:
-        raise ConflictException(
-            message="This time slot conflicts with an existing appointment",
-            details={"appointment_date": appointment.appointment_date.isoformat()}
-        )
+    await store_doctor(doctor)
 
     # Prepare creation data
     appointment_data = appointment.dict()
     appointment_data["status"] = "SCHEDULED"  # Default status
 
-    # Create appointment
-    created = await AppointmentModel.create(appointment_data)
+    # Create appointment; the appointments_no_overlap constraint rejects a taken slot,
+    # also when another booking of it commits first
+    try:
+        created = await AppointmentModel.create(appointment_data)
+    except ExclusionViolationError:
+        raise ConflictException(
+            message=SLOT_CONFLICT_MESSAGE,
+            details={"appointment_date": appointment.appointment_date.isoformat()}
+        )
     if not created:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -84,27 +103,16 @@ async def update_appointment(
     # Get update data
     update_data = appointment.dict(exclude_unset=True)
     
-    # Check for conflicts if date/duration are being changed
-    if "appointment_date" in update_data or "duration_minutes" in update_data:
-        doctor_id = existing["doctor_id"]
-        duration = update_data.get("duration_minutes", existing["duration_minutes"])
+    # Perform the update; moving it onto a taken slot (or reviving a cancelled
+    # appointment whose slot was taken since) violates appointments_no_overlap
+    try:
+        updated = await AppointmentModel.update(appointment_id, update_data)
+    except ExclusionViolationError:
         appointment_date = update_data.get("appointment_date", existing["appointment_date"])
-        
-        conflict = await AppointmentModel.check_conflicts(
-            doctor_id=doctor_id,
-            appointment_date=appointment_date,
-            duration_minutes=duration,
-            exclude_id=appointment_id
+        raise ConflictException(
+            message=SLOT_CONFLICT_MESSAGE,
+            details={"appointment_date": appointment_date.isoformat()}
         )
-        
-        if conflict:
-            raise ConflictException(
-                message="This time slot conflicts with an existing appointment",
-                details={"appointment_date": appointment_date.isoformat()}
-            )
-    
-    # Perform the update
-    updated = await AppointmentModel.update(appointment_id, update_data)
     if not updated:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -119,6 +127,127 @@ async def update_appointment(
     return updated_appointment
 
 
+@router.post("/bulk", response_model=AppointmentBulkResponse)
+async def create_appointments_bulk(
+    request: AppointmentBulkCreate,
+    conn: Connection = Depends(get_transaction),
+):
+    """
+    Book several appointments at once. Each one is booked or rejected on its own:
+    unknown patients and doctors, and slots taken by a booked appointment or an
+    earlier one of the request, are reported in ``rejected`` by their index.
+    """
+    appointments = request.appointments
+    patients = await PatientModel.get_by_ids(list({a.patient_id for a in appointments}))
+    known_patients = {p["id"] for p in patients}
+
+    doctor_ids = list({a.doctor_id for a in appointments})
+    doctors = dict(zip(doctor_ids, await asyncio.gather(*(get_doctor_from_auth(d) for d in doctor_ids))))
+    for doctor in doctors.values():
+        if doctor:
+            await store_doctor(doctor)
+
+    rejected = []
+    bookable = []
+    for index, appointment in enumerate(appointments):
+        if appointment.patient_id not in known_patients:
+            reason = f"Patient not found: {appointment.patient_id}"
+        elif not doctors[appointment.doctor_id]:
+            reason = f"Doctor not found: {appointment.doctor_id}"
+        else:
+            bookable.append((index, appointment))
+            continue
+        rejected.append({"index": index, "appointment_date": appointment.appointment_date, "reason": reason})
+
+    booked = []
+    created = await AppointmentModel.create_many(conn, [a.dict() for _, a in bookable])
+    for (index, appointment), row in zip(bookable, created):
+        if row is None:
+            rejected.append({
+                "index": index,
+                "appointment_date": appointment.appointment_date,
+                "reason": SLOT_CONFLICT_MESSAGE
+            })
+        else:
+            booked.append(row)
+    rejected.sort(key=lambda r: r["index"])
+
+    return AppointmentBulkResponse(
+        message=f"Booked {len(booked)} of {len(appointments)} appointments",
+        booked=booked,
+        rejected=rejected
+    )
+
+@router.get("/available-slots", response_model=AvailableSlotsResponse)
+async def get_available_slots(
+    start_date: date = Query(..., description="First day"),
+    end_date: date = Query(..., description="Last day (inclusive)"),
+    doctor_id: Optional[UUID] = Query(None, description="Doctor UUID"),
+    department: Optional[str] = Query(None, description="All available doctors of a department"),
+    duration_minutes: int = Query(30, ge=15, le=120, description="Shortest free interval to report"),
+    conn: Connection = Depends(get_read_db_connection),
+):
+    """Free intervals within working hours for a doctor or a department."""
+    if not doctor_id and not department:
+        raise BadRequestException("Either doctor_id or department is required")
+    if end_date < start_date:
+        raise BadRequestException("End date must be after start date")
+    if (end_date - start_date).days >= AVAILABILITY_MAX_DAYS:
+        raise BadRequestException(
+            message=f"Date range cannot exceed {AVAILABILITY_MAX_DAYS} days",
+            details={"start_date": start_date.isoformat(), "end_date": end_date.isoformat()}
+        )
+
+    rows = await AppointmentModel.available_slots(
+        conn,
+        start_date,
+        end_date,
+        duration_minutes,
+        doctor_id=doctor_id,
+        department=department,
+        day_start=settings.APPOINTMENT_DAY_START,
+        day_end=settings.APPOINTMENT_DAY_END,
+        timezone=settings.APPOINTMENT_TIMEZONE,
+        working_days=settings.APPOINTMENT_WORKING_DAYS,
+    )
+
+    doctors: Dict[UUID, Dict[str, Any]] = {}
+    for row in rows:
+        availability = doctors.setdefault(row["doctor_id"], {
+            "doctor_id": row["doctor_id"],
+            "doctor_name": row["doctor_name"],
+            "department": row["department"],
+            "free": []
+        })
+        availability["free"].append({"start_time": row["start_time"], "end_time": row["end_time"]})
+
+    return AvailableSlotsResponse(
+        start_date=start_date,
+        end_date=end_date,
+        duration_minutes=duration_minutes,
+        data=list(doctors.values())
+    )
+
+@router.get("/export")
+async def export_appointments(
+    format: str = Query("ndjson", pattern=FORMAT_PATTERN, description="ndjson or csv"),
+    from_date: Optional[date] = Query(None, description="Appointments on or after this date"),
+    to_date: Optional[date] = Query(None, description="Appointments on or before this date"),
+    doctor_id: Optional[UUID] = Query(None, description="Filter by doctor ID"),
+    patient_id: Optional[UUID] = Query(None, description="Filter by patient ID"),
+    status: Optional[str] = Query(None, description="Filter by status"),
+    token_data: Dict[str, Any] = Depends(card_room_worker_only),
+):
+    """
+    Download appointments as NDJSON or CSV in appointment order, with patient
+    and doctor names, streamed from a database cursor (app/export.py).
+    """
+    query, params = AppointmentModel.export_query(from_date, to_date, doctor_id, patient_id, status)
+    return export_response(
+        read_connection, query, *params,
+        format=format, filename="appointments", batch_size=settings.EXPORT_BATCH_SIZE
+    )
+
 @router.get("/{appointment_id}", response_model=AppointmentResponse)
 async def get_appointment(
     appointment_id: UUID = Path(..., description="Appointment UUID"),
@@ -141,7 +270,7 @@ async def list_appointments(
     from_date: Optional[datetime] = Query(None, description="Filter from date"),
     to_date: Optional[datetime] = Query(None, description="Filter to date"),
     sort: Optional[str] = Query(None, description="Sort field"),
-    conn: Connection = Depends(get_db_connection),
+    conn: Connection = Depends(get_read_db_connection),
 ):
     """List appointments with pagination and filters."""
     offset = (page - 1) * page_size
@@ -208,7 +337,7 @@ async def list_appointments(
     
     # Count query
     count_query = f"""
-        SELECT COUNT(*)
+        SELECT 1
         FROM appointments a
         JOIN doctors d ON a.doctor_id = d.id
         JOIN patients p ON a.patient_id = p.id
@@ -222,19 +351,19 @@ async def list_appointments(
     """
     
     # Execute queries
-    total = await conn.fetchval(count_query, *filter_values)
+    total = await list_counts.count(conn, count_query, *filter_values, filtered=bool(filter_values))
     results = await conn.fetch(data_query, *(filter_values + [page_size, offset]))
     
-    appointments = [dict(r) for r in results]
     pages = (total + page_size - 1) // page_size if page_size > 0 else 0
     
-    return AppointmentsResponse(
-        data=appointments,
-        total=total,
-        page=page,
-        page_size=page_size,
-        pages=pages
-    )
+    return lean_response(AppointmentsResponse, {
+        "data": results,
+        "total": total,
+        "total_exact": is_exact(total),
+        "page": page,
+        "page_size": page_size,
+        "pages": pages,
+    })
 
 @router.get("/patient/{patient_id}", response_model=List[AppointmentResponse])
 async def get_patient_appointments(
@@ -0,0 +1,32 @@
+# cardroom_service/app/routers/changes.py
+"""
+Change feed of patients and OPD assignments, for services that keep local copies.
+Only other services (with the shared SERVICE_TOKEN) may read it.
+"""
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Query
+
+from app.exceptions import BadRequestException
+from app.models import ChangeFeed
+from app.schemas import ChangeFeedResponse
+from app.security import service_only
+
+router = APIRouter(prefix="/changes", tags=["Changes"])
+
+@router.get("/", response_model=ChangeFeedResponse)
+async def get_changes(
+    since: Optional[str] = Query(None, description="Cursor of the previous page; omit to start from the beginning"),
+    limit: int = Query(500, ge=1, le=2000, description="Maximum rows per page"),
+    _: bool = Depends(service_only),
+):
+    """
+    Patients and OPD assignments inserted or updated after `since`, oldest
+    first. Soft-deleted rows are included with `is_deleted` set. Keep
+    calling with the returned `cursor` while `has_more` is true.
+    """
+    try:
+        ChangeFeed.parse_cursor(since)
+    except ValueError:
+        raise BadRequestException(f"Invalid change feed cursor: {since}")
+    return await ChangeFeed.since(since, limit)
@@ -1,25 +1,28 @@
 # cardroom_service/app/routers/opd.py
 
-from fastapi import APIRouter, Depends, Path, Query, HTTPException, status, Request
+from fastapi import APIRouter, Depends, Path, Query, HTTPException, status, Request, Response, Header
 from uuid import UUID
-from datetime import date
 from typing import Optional, List, Dict, Any
-from asyncpg import Connection
+from asyncpg import Connection, UniqueViolationError
 import uuid
-from datetime import datetime
 import logging
 
 from app.schemas import (
     OPDAssignmentCreate, OPDAssignmentUpdate, OPDAssignmentResponse,
     OPDAssignmentsResponse, BaseResponse, PatientResponse
 )
-from app.security import card_room_worker_only
-from app.models import OPDAssignmentModel, PatientModel, DoctorModel
-from app.dependencies import get_db_connection, get_transaction
-from app.exceptions import ResourceNotFoundException, BadRequestException, ServiceUnavailableException
+from app.security import card_room_worker_only, any_authenticated_user, CARD_ROOM_WORKER, ADMIN
+from app.count_strategy import is_exact
+from app.models import OPDAssignmentModel, PatientModel
+from app.dependencies import get_db_connection, get_transaction, after_commit
+from app.exceptions import ResourceNotFoundException, BadRequestException
 #from app.notifications import send_opd_assignment_notification as send_notification_to_doctor
 from app.services.auth_service import get_doctor_from_auth
 from app.services.doctor_service import send_notification_to_doctor
+from app.services.doctor_directory import doctor_directory
+from app.outbox import outbox
+from app.opd_queue import opd_queue
+from app.http_cache import not_modified
 
 router = APIRouter(
     prefix="/opd-assignments",
@@ -31,132 +34,62 @@ router = APIRouter(
     status_code=status.HTTP_201_CREATED
 )
 async def create_opd_assignment(
+    request: Request,
     assignment: OPDAssignmentCreate,
     token_data: Dict[str, Any] = Depends(card_room_worker_only),
     conn: Connection = Depends(get_transaction)   
 ):
-    """Assign a patient to a doctor's OPD."""
-    # Verify patient exists
-    patient = await PatientModel.get_by_id(assignment.patient_id)
-    if not patient:
-        raise ResourceNotFoundException("Patient", str(assignment.patient_id))
-    
-    # Fetch doctor details from auth service
-    doctor = await get_doctor_from_auth(assignment.doctor_id)
-    if not doctor:
-        raise ResourceNotFoundException("Doctor", str(assignment.doctor_id))
-    
-    # Important: Prepare and store doctor data FIRST to ensure it exists before creating the assignment
-    doctor_data = {
-        "id": doctor["id"],
-        "full_name": doctor["full_name"],
-        "department": doctor["department"],
-        "is_available": True
-    }
-    await DoctorModel.upsert(doctor_data)
-    
-    # Create assignment with the current user as assigner
+    """
+    Assign a patient to a doctor's OPD. The assignment and the doctor's
+    notification are written by one statement in the request's transaction;
+    the outbox delivers the notification once it has committed.
+    """
     assignment_data = assignment.dict()
-    assignment_data["status"] = "PENDING"
-    
     try:
-        # Create basic assignment
-        result = await OPDAssignmentModel.create(assignment_data)
-        assignment_id = result["id"]
-        
-        # Fetch full assignment with joins
-        full_assignment = await OPDAssignmentModel.get_by_id_with_joins(assignment_id)
-        if not full_assignment:
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="Failed to retrieve created assignment"
-            )
-            
-    except Exception as e:
-        if "duplicate key" in str(e).lower():
-            raise BadRequestException("This patient is already assigned to the same doctor")
-        raise
-    
-    # Send notification
-    patient_name = f"{patient['first_name']} {patient['last_name']}"
-    try:
-        await send_notification_to_doctor(
-            recipient_id=assignment.doctor_id,
-            title="New Patient Assigned",
-            message=f"Patient {patient_name} has been assigned to you for OPD consultation.",
-            entity_type="opd_assignments",
-            entity_id=full_assignment["id"]
-        )
-    except ServiceUnavailableException as e:
-        logging.error(
-            "Notification failed but OPD assignment succeeded. Error: %s - Assignment ID: %s",
-            str(e),
-            full_assignment["id"]
-        )
-    except Exception as e:
-        logging.error(
-            "Unexpected notification error. Assignment ID: %s - Error: %s",
-            full_assignment["id"],
-            str(e),
-            exc_info=True
-        )
+        created = await OPDAssignmentModel.assign(conn, assignment_data)
+        if not created["patient_found"]:
+            raise ResourceNotFoundException("Patient", str(assignment.patient_id))
+
+        if not created["doctor_found"]:
+            # Not in the local directory yet
+            if not await doctor_directory.fetch(conn, assignment.doctor_id):
+                raise ResourceNotFoundException("Doctor", str(assignment.doctor_id))
+            created = await OPDAssignmentModel.assign(conn, assignment_data)
+    except UniqueViolationError:
+        raise BadRequestException("This patient is already assigned to the same doctor")
+
+    after_commit(request, outbox.wake)
+    after_commit(request, lambda: opd_queue.apply(created))
+    return created
+
+@outbox.handler("opd_assignment")
+async def deliver_opd_assignment(assignment: Dict[str, Any]):
+    """Notify the doctor of a committed OPD assignment and broadcast it to their websockets"""
+    from app.websocket import broadcast_opd_assignment
+
+    # Raises when the doctor service is unavailable, so the outbox retries
+    await send_notification_to_doctor(
+        recipient_id=assignment["doctor_id"],
+        title="New Patient Assigned",
+        message=f"Patient {assignment['patient_name']} has been assigned to you for OPD consultation.",
+        entity_type="opd_assignments",
+        entity_id=assignment["id"]
+    )
 
     try:
-        from app.websocket import broadcast_opd_assignment
-        
-        # Get complete patient data to include in notification
-        patient = await PatientModel.get_by_id(assignment.patient_id)
-        if not patient:
-            logging.warning(f"Patient {assignment.patient_id} not found for notification")
-        
-        # Prepare assignment data with complete patient information
-        assignment_data = {
-            "id": str(full_assignment["id"]),
-            "doctor_id": str(full_assignment["doctor_id"]),
-            "patient_id": str(full_assignment["patient_id"]),
-            "status": full_assignment["status"],
-            "priority": full_assignment["priority"],
-            "notes": full_assignment.get("notes"),
-            "created_at": full_assignment["created_at"].isoformat() if isinstance(full_assignment["created_at"], datetime) else full_assignment["created_at"],
-            "doctor_name": full_assignment.get("doctor_name"),
-            "doctor_specialty": full_assignment.get("doctor_specialty"),
-            "patient_name": full_assignment.get("patient_name"),
-            "patient_registration": full_assignment.get("patient_registration"),
-            # Include complete patient data
-            "patient": {
-                "id": str(patient["id"]),
-                "registration_number": patient.get("registration_number"),
-                "first_name": patient.get("first_name"),
-                "last_name": patient.get("last_name"),
-                "date_of_birth": patient.get("date_of_birth").isoformat() if isinstance(patient.get("date_of_birth"), date) else patient.get("date_of_birth"),
-                "gender": patient.get("gender"),
-                "blood_group": patient.get("blood_group"),
-                "phone_number": patient.get("phone_number"),
-                "email": patient.get("email"),
-                "address": patient.get("address"),
-                "emergency_contact_name": patient.get("emergency_contact_name"),
-                "emergency_contact_phone": patient.get("emergency_contact_phone"),
-                "allergies": patient.get("allergies", []),
-                "medical_history": patient.get("medical_history", {})
-            } if patient else None
-        }
-        
-        # Broadcast to WebSocket connections
         await broadcast_opd_assignment(
-            assignment.doctor_id,
-            assignment.patient_id,
-            full_assignment["id"],
-            assignment_data
+            assignment["doctor_id"],
+            assignment["patient_id"],
+            assignment["id"],
+            assignment
         )
     except Exception as e:
         logging.error(
             "WebSocket notification failed but OPD assignment succeeded. Error: %s - Assignment ID: %s",
             str(e),
-            full_assignment["id"],
+            assignment["id"],
             exc_info=True
         )
-    
-    return full_assignment
 
 @router.get("/{assignment_id}", response_model=OPDAssignmentResponse)
 async def get_opd_assignment(
@@ -164,7 +97,7 @@ async def get_opd_assignment(
     conn: Connection = Depends(get_db_connection),
 ):
     """Get an OPD assignment by ID."""
-    result = await OPDAssignmentModel.get_by_id_with_joins(assignment_id)
+    result = await OPDAssignmentModel.get_by_id_with_joins(assignment_id, conn)
     if not result:
         raise ResourceNotFoundException("OPD Assignment", str(assignment_id))
     return result
@@ -176,11 +109,12 @@ async def update_opd_assignment(
     conn: Connection = Depends(get_db_connection),
 ):
     """Update an OPD assignment."""
-    existing = await OPDAssignmentModel.get_by_id(assignment_id)
+    existing = await OPDAssignmentModel.get_by_id(assignment_id, conn)
     if not existing:
         raise ResourceNotFoundException("OPD Assignment", str(assignment_id))
     
-    updated = await OPDAssignmentModel.update(assignment_id, assignment.dict(exclude_unset=True))
+    updated = await OPDAssignmentModel.update(assignment_id, assignment.dict(exclude_unset=True), conn)
+    opd_queue.apply(await OPDAssignmentModel.get_by_id_with_joins(assignment_id, conn))
     return updated
 
 @router.delete("/{assignment_id}", response_model=BaseResponse)
@@ -189,16 +123,17 @@ async def delete_opd_assignment(
     conn: Connection = Depends(get_db_connection),
 ):
     """Cancel/delete an OPD assignment."""
-    existing = await OPDAssignmentModel.get_by_id(assignment_id)
+    existing = await OPDAssignmentModel.get_by_id(assignment_id, conn)
     if not existing:
         raise ResourceNotFoundException("OPD Assignment", str(assignment_id))
     
-    success = await OPDAssignmentModel.delete(assignment_id)
+    success = await OPDAssignmentModel.delete(assignment_id, conn)
     if not success:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to delete OPD assignment"
         )
+    opd_queue.remove(assignment_id)
     
     return BaseResponse(message="OPD assignment deleted successfully")
 
@@ -231,6 +166,7 @@ async def list_opd_assignments(
     return OPDAssignmentsResponse(
         data=assignments,
         total=total,
+        total_exact=is_exact(total),
         page=page,
         page_size=page_size,
         pages=pages
@@ -251,19 +187,49 @@ async def get_patient_assignments(
 
 @router.get("/doctor/{doctor_id}", response_model=List[OPDAssignmentResponse])
 async def get_doctor_assignments(
+    request: Request,
     doctor_id: UUID = Path(..., description="Doctor UUID"),
     conn: Connection = Depends(get_db_connection),
 ):
-    """Get all patients assigned to a doctor."""
+    """Get all patients assigned to a doctor. Poll with If-None-Match: unchanged assignments answer 304."""
+    response = not_modified(request, *await OPDAssignmentModel.doctor_version(conn, doctor_id))
+    if response:
+        return response
     assignments = await OPDAssignmentModel.get_doctor_assignments(doctor_id)
     return assignments
 
+@router.get("/doctor/{doctor_id}/queue")
+async def get_doctor_queue(
+    doctor_id: UUID = Path(..., description="Doctor UUID"),
+    if_none_match: Optional[str] = Header(None),
+    token_data: Dict[str, Any] = Depends(any_authenticated_user),
+):
+    """
+    The doctor's waiting patients (PENDING and IN_PROGRESS assignments) in
+    priority order, from the in-memory OPD queue. Poll with If-None-Match:
+    an unchanged queue answers 304 without a body. /ws/opd-queue/{doctor_id}
+    streams the changes instead. Open to the doctor, card room workers and
+    admins.
+    """
+    if token_data.get("user_id") != str(doctor_id) and token_data.get("role") not in (CARD_ROOM_WORKER, ADMIN):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Insufficient permissions")
+    etag = opd_queue.etag(doctor_id)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if if_none_match == etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=opd_queue.snapshot(doctor_id), media_type="application/json", headers=headers)
+
 @router.get("/doctor/{doctor_id}/schedule", response_model=List[OPDAssignmentResponse])
 async def get_doctor_schedule(
+    request: Request,
     doctor_id: UUID = Path(..., description="Doctor UUID"),
     conn: Connection = Depends(get_db_connection),
 ):
-    """Get doctor's OPD schedule"""
+    """Get doctor's OPD schedule. Poll with If-None-Match: an unchanged schedule answers 304."""
+    response = not_modified(request, *await OPDAssignmentModel.doctor_version(conn, doctor_id))
+    if response:
+        return response
+    
     # Verify doctor exists in auth service
     doctor = await get_doctor_from_auth(doctor_id)
     if not doctor:
@@ -2,20 +2,28 @@
 """
 Router for patient-related endpoints.
 """
-from fastapi import APIRouter, Depends, Path, Query, HTTPException, status
+from fastapi import APIRouter, Depends, Path, Query, HTTPException, status, Request
 from uuid import UUID
 from typing import Optional, List, Dict, Any
+from datetime import date
 from asyncpg import Connection
 import uuid
 
 from app.schemas import (
     PatientCreate, PatientUpdate, PatientResponse, PatientSearchParams,
-    PatientsResponse, BaseResponse
+    PatientsResponse, BaseResponse, PatientBatchRequest, PatientBatchResponse,
+    PatientImportResponse, PatientImportsResponse
 )
+from app.count_strategy import is_exact
+from app.config import settings
+from app.database import get_pool, read_connection
+from app.export import FORMAT_PATTERN, export_response
+from app.responses import lean_response
+from app.patient_import import PatientImport, imports, import_slots
 from app.models import PatientModel
 from app.dependencies import get_db_connection
-from app.security import card_room_worker_only
-from app.exceptions import ResourceNotFoundException, ConflictException
+from app.security import card_room_worker_only, service_only
+from app.exceptions import ResourceNotFoundException, ConflictException, ServiceUnavailableException
 
 router = APIRouter(prefix="/patients", tags=["Patients"])
 
@@ -49,6 +57,101 @@ async def create_patient(
             )
         raise
 
+@router.post("/batch", response_model=PatientBatchResponse)
+async def get_patients_batch(
+    batch: PatientBatchRequest,
+    _: bool = Depends(service_only),
+):
+    """
+    Get many patients by ID in one query.
+    
+    Used by other services (with the shared SERVICE_TOKEN) instead of one GET
+    per patient. IDs that do not exist (or are deleted) are listed in `missing`.
+    """
+    ids = list(dict.fromkeys(batch.ids))  # de-duplicate, keep order
+    patients = await PatientModel.get_by_ids(ids)
+    
+    found = {patient["id"] for patient in patients}
+    missing = [patient_id for patient_id in ids if patient_id not in found]
+    
+    return PatientBatchResponse(data=patients, missing=missing)
+
+IMPORT_CONTENT_TYPES = {
+    "text/csv": "csv",
+    "application/x-ndjson": "ndjson",
+    "application/jsonl": "ndjson",
+}
+
+@router.post("/import", response_model=PatientImportResponse)
+async def import_patients(
+    request: Request,
+    format: Optional[str] = Query(None, pattern="^(csv|ndjson)$", description="csv or ndjson; default from the Content-Type"),
+    source: Optional[str] = Query(None, max_length=200, description="Where the records come from, e.g. the clinic"),
+    token_data: Dict[str, Any] = Depends(card_room_worker_only)
+):
+    """
+    Register many patients from a CSV or NDJSON request body (not multipart),
+    streamed and loaded with COPY; see app/patient_import.py for the file
+    format. The import is all or nothing for the valid rows. Rows that are
+    invalid, repeat a registration number of the file or are already
+    registered are skipped and listed in `errors`. Progress of running
+    imports: GET /patients/imports.
+    """
+    if format is None:
+        content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+        format = IMPORT_CONTENT_TYPES.get(content_type)
+        if format is None:
+            raise HTTPException(
+                status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+                detail="Send text/csv or application/x-ndjson, or pass format"
+            )
+
+    if import_slots.locked():
+        raise ServiceUnavailableException("Too many patient imports in progress, try again later")
+    async with import_slots:
+        patient_import = imports.add(
+            PatientImport(format, source=source, chunk_size=settings.PATIENT_IMPORT_CHUNK_SIZE)
+        )
+        pool = await get_pool()
+        async with pool.acquire() as conn:
+            return await patient_import.run(conn, request.stream())
+
+@router.get("/export")
+async def export_patients(
+    format: str = Query("ndjson", pattern=FORMAT_PATTERN, description="ndjson or csv"),
+    created_from: Optional[date] = Query(None, description="Registered on or after this date"),
+    created_to: Optional[date] = Query(None, description="Registered on or before this date"),
+    token_data: Dict[str, Any] = Depends(card_room_worker_only)
+):
+    """
+    Download patients as NDJSON or CSV, oldest registration first. The rows
+    are streamed from a database cursor, so any number of them can be
+    exported; see app/export.py.
+    """
+    query, params = PatientModel.export_query(created_from, created_to)
+    return export_response(
+        read_connection, query, *params,
+        format=format, filename="patients", batch_size=settings.EXPORT_BATCH_SIZE
+    )
+
+@router.get("/imports", response_model=PatientImportsResponse)
+async def list_patient_imports(
+    token_data: Dict[str, Any] = Depends(card_room_worker_only)
+):
+    """Running patient imports and the most recent finished ones, newest first."""
+    return PatientImportsResponse(data=[i.progress() for i in imports.list()])
+
+@router.get("/imports/{import_id}", response_model=PatientImportResponse)
+async def get_patient_import(
+    import_id: str = Path(..., description="Import ID"),
+    token_data: Dict[str, Any] = Depends(card_room_worker_only)
+):
+    """Progress of a patient import, with its error report once it has finished."""
+    patient_import = imports.get(import_id)
+    if not patient_import:
+        raise ResourceNotFoundException("Patient import", import_id)
+    return patient_import.report()
+
 @router.get("/{patient_id}", response_model=PatientResponse)
 async def get_patient(
     patient_id: UUID = Path(..., description="Patient UUID"),
@@ -115,13 +218,14 @@ async def list_patients(
     patients, total = await PatientModel.list(limit=page_size, offset=offset)
     total_pages = (total + page_size - 1) // page_size  # ceil division
     
-    return PatientsResponse(
-        data=patients,
-        total=total,
-        page=page,
-        page_size=page_size,
-        pages=total_pages 
-    )
+    return lean_response(PatientsResponse, {
+        "data": patients,
+        "total": total,
+        "total_exact": is_exact(total),
+        "page": page,
+        "page_size": page_size,
+        "pages": total_pages,
+    })
 
 @router.post("/search", response_model=PatientsResponse)
 async def search_patients(
@@ -147,10 +251,11 @@ async def search_patients(
             offset=offset
         )
     
-    return PatientsResponse(
-        data=patients,
-        total=total,
-        page=search_params.page,
-        page_size=search_params.page_size,
-        pages=max((total + search_params.page_size - 1) // search_params.page_size, 1) 
-    )
\ No newline at end of file
+    return lean_response(PatientsResponse, {
+        "data": patients,
+        "total": total,
+        "total_exact": is_exact(total),
+        "page": search_params.page,
+        "page_size": search_params.page_size,
+        "pages": max((total + search_params.page_size - 1) // search_params.page_size, 1),
+    })
\ No newline at end of file
@@ -8,11 +8,13 @@ from asyncpg import Connection
 import uuid
 
 from app.schemas import (
-    PatientResponse, PatientsResponse
+    PatientResponse, PatientsResponse, PatientSuggestionsResponse
 )
+from app.count_strategy import is_exact
 from app.models import PatientModel
-from app.dependencies import get_db_connection
+from app.dependencies import get_read_db_connection
 from app.security import card_room_worker_only
+from app.responses import lean_response
 
 router = APIRouter(prefix="/search", tags=["Search"])
 
@@ -23,57 +25,47 @@ async def advanced_patient_search(
     phone: Optional[str] = Query(None, description="Phone number"),
     page: int = Query(1, ge=1),
     page_size: int = Query(20, ge=1, le=100),
-    conn: Connection = Depends(get_db_connection)
+    conn: Connection = Depends(get_read_db_connection)
 ):
-    """Advanced search for patients with multiple criteria."""
+    """Advanced search for patients with multiple criteria, best name matches first."""
     offset = (page - 1) * page_size
     
-    conditions = ["is_deleted = FALSE"]
-    params = []
-    param_index = 1
-
-    if query:
-        conditions.append(f"(first_name ILIKE ${param_index} OR last_name ILIKE ${param_index})")
-        params.append(f"%{query}%")
-        param_index += 1
-    
-    if registration_number:
-        conditions.append(f"registration_number ILIKE ${param_index}")
-        params.append(f"%{registration_number}%")
-        param_index += 1
-    
-    if phone:
-        conditions.append(f"phone_number ILIKE ${param_index}")
-        params.append(f"%{phone}%")
-        param_index += 1
-    
-    where_clause = " AND ".join(conditions) or "TRUE"
-    
     try:
-        # Count total
-        count_query = f"SELECT COUNT(*) FROM patients WHERE {where_clause}"
-        total = await conn.fetchval(count_query, *params)
+        results, total = await PatientModel.search(
+            conn,
+            query=query,
+            registration_number=registration_number,
+            phone=phone,
+            limit=page_size,
+            offset=offset
+        )
         
-        # Get results
-        results_query = f"""
-            SELECT * FROM patients 
-            WHERE {where_clause}
-            ORDER BY created_at DESC
-            LIMIT ${param_index} OFFSET ${param_index + 1}
-        """
-        params.extend([page_size, offset])
-        results = await conn.fetch(results_query, *params)
+        return lean_response(PatientsResponse, {
+            "data": results,
+            "total": total,
+            "total_exact": is_exact(total),
+            "page": page,
+            "page_size": page_size,
+            "pages": (total + page_size - 1) // page_size,
+        })
         
-        return PatientsResponse(
-            data=[dict(r) for r in results],
-            total=total,
-            page=page,
-            page_size=page_size,
-            pages=(total + page_size - 1) // page_size
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Database error: {str(e)}"
         )
-        
+
+@router.get("/patients/autocomplete", response_model=PatientSuggestionsResponse)
+async def autocomplete_patients(
+    q: str = Query(..., min_length=1, max_length=100, description="Start of a name, registration number or phone number"),
+    limit: int = Query(10, ge=1, le=50),
+    conn: Connection = Depends(get_read_db_connection)
+):
+    """Suggestions for the registration desk search box, as the user types."""
+    try:
+        return PatientSuggestionsResponse(data=await PatientModel.autocomplete(conn, q, limit))
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Database error: {str(e)}"
-        )
\ No newline at end of file
+        )
@@ -57,6 +57,8 @@ class BaseResponse(BaseModel):
 
 class PaginatedResponse(BaseResponse):
     total: int
+    # False when total is the planner's estimate for a large list
+    total_exact: bool = True
     page: int
     page_size: int
     pages: int
@@ -75,10 +77,10 @@ class PatientBase(BaseModel):
     gender: Gender
     blood_group: Optional[BloodGroup] = None
     phone_number: str = Field(..., min_length=10, max_length=20)
-    email: Optional[EmailStr] = None
+    email: Optional[EmailStr] = Field(None, max_length=100)
     address: Optional[str] = None
-    emergency_contact_name: Optional[str] = None
-    emergency_contact_phone: Optional[str] = None
+    emergency_contact_name: Optional[str] = Field(None, max_length=100)
+    emergency_contact_phone: Optional[str] = Field(None, max_length=20)
     allergies: Optional[List[str]] = Field(default_factory=list)
     medical_history: Optional[Dict[str, Any]] = Field(default_factory=dict)
 
@@ -99,10 +101,10 @@ class PatientUpdate(BaseModel):
     gender: Optional[Gender] = None
     blood_group: Optional[BloodGroup] = None
     phone_number: Optional[str] = Field(None, min_length=10, max_length=20)
-    email: Optional[EmailStr] = None
+    email: Optional[EmailStr] = Field(None, max_length=100)
     address: Optional[str] = None
-    emergency_contact_name: Optional[str] = None
-    emergency_contact_phone: Optional[str] = None
+    emergency_contact_name: Optional[str] = Field(None, max_length=100)
+    emergency_contact_phone: Optional[str] = Field(None, max_length=20)
     allergies: Optional[List[str]] = None
     medical_history: Optional[Dict[str, Any]] = None
 
@@ -131,11 +133,85 @@ class PatientsResponse(BaseModel):
     success: bool = True
     message: str = "Operation successful"
     total: int
+    # False when total is the planner's estimate for a large list
+    total_exact: bool = True
     page: int
     page_size: int
     pages: int  # This was missing
     data: List[PatientResponse]
 
+# Autocomplete suggestions (no total, so no count query)
+class PatientSuggestion(BaseModel):
+    id: UUID4
+    registration_number: str
+    first_name: str
+    last_name: str
+    date_of_birth: date
+    gender: str
+    phone_number: str
+
+class PatientSuggestionsResponse(BaseModel):
+    success: bool = True
+    message: str = "Operation successful"
+    data: List[PatientSuggestion]
+
+# Upper bound on IDs per bulk lookup, keeps the ANY($1) array and response size bounded
+PATIENT_BATCH_MAX_IDS = 500
+
+class PatientBatchRequest(BaseModel):
+    ids: List[UUID4] = Field(..., min_length=1, max_length=PATIENT_BATCH_MAX_IDS)
+
+class PatientBatchResponse(BaseModel):
+    success: bool = True
+    message: str = "Operation successful"
+    data: List[PatientResponse]
+    missing: List[UUID4] = Field(default_factory=list)
+
+# Bulk patient import (POST /patients/import); at most this many rejected rows are listed
+PATIENT_IMPORT_MAX_ERRORS = 1000
+
+class PatientImportRow(PatientCreate):
+    """One patient of an import file, under the registration number of the clinic it comes from"""
+    registration_number: str = Field(..., min_length=1, max_length=50)
+
+    @validator('registration_number')
+    def strip_registration_number(cls, v):
+        v = v.strip()
+        if not v:
+            raise ValueError("Registration number cannot be blank")
+        return v
+
+class PatientImportError(BaseModel):
+    line: int
+    registration_number: Optional[str] = None
+    errors: List[str]
+
+class PatientImportProgress(BaseModel):
+    import_id: str
+    source: Optional[str] = None
+    format: str
+    status: str  # running, completed or failed
+    rows: int = 0
+    staged: int = 0
+    invalid: int = 0
+    duplicates: int = 0
+    existing: int = 0
+    imported: int = 0
+    started_at: datetime
+    finished_at: Optional[datetime] = None
+    error: Optional[str] = None
+
+class PatientImportResponse(PatientImportProgress):
+    success: bool = True
+    message: str = "Operation successful"
+    errors: List[PatientImportError] = Field(default_factory=list)
+    errors_truncated: bool = False
+
+class PatientImportsResponse(BaseModel):
+    success: bool = True
+    message: str = "Operation successful"
+    data: List[PatientImportProgress]
+
 # OPD Assignment models
 class OPDAssignmentBase(BaseModel):
     patient_id: UUID4
@@ -252,6 +328,41 @@ class AppointmentDateRange(BaseModel):
             raise ValueError("End date must be after start date")
         return v
 
+# Upper bound on appointments per bulk booking, all are booked with one INSERT
+APPOINTMENT_BULK_MAX = 100
+
+class AppointmentBulkCreate(BaseModel):
+    appointments: List[AppointmentCreate] = Field(..., min_length=1, max_length=APPOINTMENT_BULK_MAX)
+
+class AppointmentBulkRejection(BaseModel):
+    index: int
+    appointment_date: datetime
+    reason: str
+
+class AppointmentBulkResponse(BaseModel):
+    success: bool = True
+    message: str = "Operation successful"
+    booked: List[AppointmentResponse]
+    rejected: List[AppointmentBulkRejection] = Field(default_factory=list)
+
+class FreeInterval(BaseModel):
+    start_time: datetime
+    end_time: datetime
+
+class DoctorAvailability(BaseModel):
+    doctor_id: UUID4
+    doctor_name: str
+    department: str
+    free: List[FreeInterval]
+
+class AvailableSlotsResponse(BaseModel):
+    success: bool = True
+    message: str = "Operation successful"
+    start_date: date
+    end_date: date
+    duration_minutes: int
+    data: List[DoctorAvailability]
+
 # Doctor models (minimal for reference)
 class DoctorResponse(BaseModel):
     id: UUID4
@@ -272,4 +383,13 @@ class NotificationCreate(BaseModel):
 
 class WebSocketMessage(BaseModel):
     type: str
-    data: Dict[str, Any]
\ No newline at end of file
+    data: Dict[str, Any]
+
+# Change feed
+class ChangeFeedResponse(BaseModel):
+    success: bool = True
+    message: str = "Operation successful"
+    patients: List[Dict[str, Any]] = Field(default_factory=list)
+    opd_assignments: List[Dict[str, Any]] = Field(default_factory=list)
+    cursor: str = Field(..., description="Pass as `since` to get the changes after this page")
+    has_more: bool = False
@@ -1,11 +1,13 @@
 """
 Security utilities and JWT validation functions.
 """
+import secrets
 import httpx
-from fastapi import Depends, HTTPException, Security, Request
+from fastapi import Depends, Header, HTTPException, Security, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from typing import Optional, Dict, Any, List
 from app.config import settings
+from app.http_client import get_http_client
 import logging
 
 security = HTTPBearer()
@@ -32,30 +34,28 @@ class TokenValidator:
         
         try:
             # Call auth service to validate the token
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{settings.AUTH_SERVICE_URL}/api/auth/validate-token",
-                    json={"token": token},
-                    timeout=5.0
+            response = await get_http_client("auth").post(
+                "/api/auth/validate-token",
+                json={"token": token}
+            )
+            
+            if response.status_code != 200:
+                raise HTTPException(
+                    status_code=401,
+                    detail="Invalid authentication credentials"
                 )
-                
-                if response.status_code != 200:
-                    raise HTTPException(
-                        status_code=401,
-                        detail="Invalid authentication credentials"
-                    )
-                
-                data = response.json()
-                
-                # Store user_id and client IP in context for audit logs
-                if request and hasattr(request.state, "connection"):
-                    client_ip = request.client.host if request.client else "unknown"
-                    conn = request.state.connection
-                    await conn.execute("SET app.current_user_id TO $1", data["user_id"])
-                    await conn.execute("SET app.client_ip TO $1", client_ip)
-                
-                return data
-                
+            
+            data = response.json()
+            
+            # Store user_id and client IP in context for audit logs
+            if request and hasattr(request.state, "connection"):
+                client_ip = request.client.host if request.client else "unknown"
+                conn = request.state.connection
+                await conn.execute("SET app.current_user_id TO $1", data["user_id"])
+                await conn.execute("SET app.client_ip TO $1", client_ip)
+            
+            return data
+            
         except httpx.RequestError as e:
             logging.error(f"Error validating token: {str(e)}")
             raise HTTPException(
@@ -95,4 +95,19 @@ async def any_authenticated_user(
     token_data: Dict[str, Any] = Depends(TokenValidator.validate_token)
 ) -> Dict[str, Any]:
     """Dependency for endpoints that require any authenticated user."""
-    return token_data
\ No newline at end of file
+    return token_data
+
+async def service_only(authorization: Optional[str] = Header(None)) -> bool:
+    """Dependency for service-to-service endpoints: requires the shared SERVICE_TOKEN."""
+    if not authorization or not authorization.startswith("Bearer "):
+        raise HTTPException(
+            status_code=401,
+            detail="Invalid authorization header format. Must be 'Bearer {token}'"
+        )
+    token = authorization[len("Bearer "):].strip()
+    if not token or not secrets.compare_digest(token, settings.SERVICE_TOKEN):
+        raise HTTPException(
+            status_code=401,
+            detail="Invalid service token"
+        )
+    return True
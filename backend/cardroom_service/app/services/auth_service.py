@@ -5,27 +5,33 @@ from uuid import UUID
 import logging
 
 from app.config import settings
+from app.http_client import get_http_client
+from app.single_flight import SingleFlightCache
 from app.exceptions import ServiceUnavailableException
 
 # cardroom_service/app/services/auth_service.py
 
+# Doctor profiles change rarely; concurrent assignments to one doctor share a single lookup
+doctor_lookups = SingleFlightCache("doctors", ttl=60, stale_ttl=300, maxsize=1000)
+
 async def get_doctor_from_auth(doctor_id: UUID) -> Optional[Dict[str, Any]]:
-    """Fetch doctor information from the auth service (no authorization)."""
+    """Fetch doctor information from the auth service (no authorization), cached."""
+    return await doctor_lookups.get(str(doctor_id), lambda: _load_doctor_from_auth(doctor_id))
+
+async def _load_doctor_from_auth(doctor_id: UUID) -> Optional[Dict[str, Any]]:
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"http://auth_service:8022/users/{doctor_id}",  # <-- No headers
-                timeout=5.0
-            )
+        response = await get_http_client("auth").get(
+            f"/users/{doctor_id}"  # <-- No headers
+        )
 
-            if response.status_code == 404:
-                return None
+        if response.status_code == 404:
+            return None
 
-            if response.status_code != 200:
-                logging.error(f"Error from auth service: {response.text}")
-                raise ServiceUnavailableException("Auth service error")
+        if response.status_code != 200:
+            logging.error(f"Error from auth service: {response.text}")
+            raise ServiceUnavailableException("Auth service error")
 
-            return response.json()
+        return response.json()
 
     except httpx.RequestError as e:
         logging.error(f"Error connecting to auth service: {str(e)}")
@@ -35,18 +41,16 @@ async def get_doctor_from_auth(doctor_id: UUID) -> Optional[Dict[str, Any]]:
 async def get_doctors_from_auth() -> List[Dict[str, Any]]:
     """Fetch all doctors from the auth service."""
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"http://auth_service:8022/users/by-role/doctor",
-                timeout=5.0
-            )
-            
-            if response.status_code != 200:
-                logging.error(f"Error from auth service: {response.text}")
-                raise ServiceUnavailableException("Auth service error")
-            
-            return response.json()
-            
+        response = await get_http_client("auth").get(
+            "/users/by-role/doctor"
+        )
+        
+        if response.status_code != 200:
+            logging.error(f"Error from auth service: {response.text}")
+            raise ServiceUnavailableException("Auth service error")
+        
+        return response.json()
+        
     except httpx.RequestError as e:
         logging.error(f"Error connecting to auth service: {str(e)}")
         raise ServiceUnavailableException("Auth service unavailable")
\ No newline at end of file
@@ -0,0 +1,92 @@
+# cardroom_service/app/services/doctor_directory.py
+"""
+Local directory of doctors for OPD assignments and appointments.
+
+Assignments join the local ``doctors`` table instead of asking the auth
+service for the doctor on every request. A background worker refreshes the
+table from the auth service every DOCTOR_DIRECTORY_REFRESH_INTERVAL seconds;
+a doctor that isn't in the table yet (added since the last refresh) is looked
+up in the auth service once and stored.
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Dict, Optional
+from uuid import UUID
+
+from asyncpg import Connection
+
+from app.config import settings
+from app.models import DoctorModel
+from app.services.auth_service import get_doctor_from_auth, get_doctors_from_auth
+
+logger = logging.getLogger(__name__)
+
+
+class DoctorDirectory:
+    """Keeps the doctors table in step with the auth service"""
+
+    def __init__(self, refresh_interval: float = 300.0):
+        self.refresh_interval = refresh_interval
+        self.refreshes = 0
+        self.misses = 0
+        self.failures = 0
+        self.last_error: Optional[str] = None
+        self.last_refreshed: Optional[float] = None
+        self._pool = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def refresh(self, pool) -> int:
+        """Store all doctors of the auth service; returns the number changed"""
+        doctors = [d for d in await get_doctors_from_auth() if d.get("id") and d.get("full_name")]
+        async with pool.acquire() as conn:
+            changed = await DoctorModel.upsert_many(conn, doctors)
+        self.refreshes += 1
+        self.last_refreshed = time.time()
+        return changed
+
+    async def fetch(self, conn: Connection, doctor_id: UUID) -> Optional[Dict[str, Any]]:
+        """Look a doctor missing from the table up in the auth service and store it on ``conn``"""
+        self.misses += 1
+        doctor = await get_doctor_from_auth(doctor_id)
+        if not doctor:
+            return None
+        await DoctorModel.upsert_many(conn, [doctor])
+        return doctor
+
+    async def start(self, pool):
+        self._pool = pool
+        self._task = asyncio.create_task(self._watch())
+
+    async def _watch(self):
+        while True:
+            try:
+                changed = await self.refresh(self._pool)
+                if changed:
+                    logger.info(f"Doctor directory refreshed, {changed} doctors changed")
+                self.last_error = None
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.failures += 1
+                self.last_error = str(e)
+                logger.warning(f"Doctor directory refresh failed: {str(e)}")
+            await asyncio.sleep(self.refresh_interval)
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "running": self._task is not None,
+            "refreshes": self.refreshes,
+            "misses": self.misses,
+            "failures": self.failures,
+            "last_error": self.last_error,
+            "seconds_since_refresh": round(time.time() - self.last_refreshed, 1) if self.last_refreshed else None,
+        }
+
+
+doctor_directory = DoctorDirectory(refresh_interval=settings.DOCTOR_DIRECTORY_REFRESH_INTERVAL)
@@ -6,6 +6,7 @@ import logging
 import json
 
 from app.config import settings
+from app.http_client import get_http_client
 from app.exceptions import ServiceUnavailableException
 
 # Custom JSON encoder to handle UUID serialization
@@ -32,35 +33,33 @@ async def send_notification_to_doctor(
             "entity_id": str(entity_id)  # Convert UUID to string
         }
         
-        async with httpx.AsyncClient() as client:
-            # Use regular endpoint for standard notifications
-            response = await client.post(
-                f"{settings.DOCTOR_SERVICE_URL}/notifications/",
+        # Use regular endpoint for standard notifications
+        response = await get_http_client("doctor").post(
+            "/notifications/",
+            json=notification_data
+        )
+        
+        if response.status_code not in (200, 201):
+            logging.error(f"Error from doctor service: {response.text}")
+            raise ServiceUnavailableException("Doctor service error")
+        
+        # Try to send via WebSocket for real-time updates
+        try:
+            # Use the same data for WebSocket
+            websocket_response = await get_http_client("doctor").post(
+                "/webhooks/opd-assignments",
                 json=notification_data,
-                timeout=5.0
+                timeout=3.0  # Shorter timeout for the optional endpoint
             )
             
-            if response.status_code not in (200, 201):
-                logging.error(f"Error from doctor service: {response.text}")
-                raise ServiceUnavailableException("Doctor service error")
-            
-            # Try to send via WebSocket for real-time updates
-            try:
-                # Use the same data for WebSocket
-                websocket_response = await client.post(
-                    f"{settings.DOCTOR_SERVICE_URL}/webhooks/opd-assignments",
-                    json=notification_data,
-                    timeout=3.0  # Shorter timeout for the optional endpoint
-                )
-                
-                if websocket_response.status_code in (200, 201):
-                    logging.info(f"Real-time notification sent to doctor {recipient_id}")
-            except Exception as ws_error:
-                # Don't fail if the WebSocket notification fails
-                logging.warning(f"WebSocket notification failed (non-critical): {str(ws_error)}")
-            
-            return response.json()
-            
+            if websocket_response.status_code in (200, 201):
+                logging.info(f"Real-time notification sent to doctor {recipient_id}")
+        except Exception as ws_error:
+            # Don't fail if the WebSocket notification fails
+            logging.warning(f"WebSocket notification failed (non-critical): {str(ws_error)}")
+        
+        return response.json()
+        
     except httpx.RequestError as e:
         logging.error(f"Error connecting to doctor service: {str(e)}")
         # Don't fail the entire operation if notification fails
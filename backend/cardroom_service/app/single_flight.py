@@ -0,0 +1,156 @@
+# cardroom_service/app/single_flight.py
+"""
+Single-flight lookups backed by a bounded TTL cache.
+
+Concurrent callers asking for the same key share one in-flight load instead
+of each calling the upstream. Loaded values are kept for ``ttl`` seconds;
+after that they are still served for up to ``stale_ttl`` more seconds while a
+single background refresh runs (stale-while-revalidate). Failures are shared
+with every waiter of that flight but never cached.
+"""
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+Loader = Callable[[], Awaitable[Any]]
+
+
+def _is_not_none(value: Any) -> bool:
+    return value is not None
+
+
+class SingleFlightCache:
+    """Coalesces concurrent lookups per key and caches the results (LRU bounded)."""
+
+    def __init__(
+        self,
+        name: str,
+        ttl: float = 60.0,
+        stale_ttl: float = 0.0,
+        maxsize: int = 1024,
+        should_cache: Callable[[Any], bool] = _is_not_none,
+    ):
+        self.name = name
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.maxsize = maxsize
+        self.should_cache = should_cache
+        self._entries: "OrderedDict[Hashable, Tuple[Any, float]]" = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+
+        # Metrics
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.loads = 0
+        self.errors = 0
+
+    def _lookup(self, key: Hashable) -> Tuple[Optional[Any], Optional[float]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None, None
+        value, stored_at = entry
+        age = time.monotonic() - stored_at
+        if age >= self.ttl + self.stale_ttl:
+            del self._entries[key]
+            return None, None
+        self._entries.move_to_end(key)
+        return value, age
+
+    def peek(self, key: Hashable) -> Optional[Any]:
+        """Return a fresh cached value without loading, or None"""
+        value, age = self._lookup(key)
+        if age is None or age >= self.ttl:
+            return None
+        return value
+
+    def set(self, key: Hashable, value: Any):
+        """Store a value loaded elsewhere (e.g. from a bulk call)"""
+        self._entries[key] = (value, time.monotonic())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def set_many(self, items: Iterable[Tuple[Hashable, Any]]):
+        for key, value in items:
+            self.set(key, value)
+
+    def invalidate(self, key: Hashable):
+        self._entries.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
+
+    def _start_load(self, key: Hashable, loader: Loader) -> asyncio.Task:
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+            return task
+
+        async def run():
+            self.loads += 1
+            try:
+                value = await loader()
+            except Exception:
+                self.errors += 1
+                raise
+            finally:
+                self._inflight.pop(key, None)
+            if self.should_cache(value):
+                self.set(key, value)
+            return value
+
+        task = asyncio.create_task(run())
+        # Failures are re-raised to the waiters; mark them retrieved in case all waiters left
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        self._inflight[key] = task
+        return task
+
+    def _refresh(self, key: Hashable, loader: Loader):
+        if key in self._inflight:
+            return
+
+        def log_failure(task: asyncio.Task):
+            if not task.cancelled() and task.exception() is not None:
+                logger.warning(f"{self.name}: background refresh of {key} failed: {task.exception()}")
+
+        self._start_load(key, loader).add_done_callback(log_failure)
+
+    async def get(self, key: Hashable, loader: Loader) -> Any:
+        """
+        Return the cached value for ``key`` or load it with ``loader``.
+
+        Only one ``loader`` call per key runs at a time; concurrent callers
+        await the same result. Stale values are returned immediately while a
+        refresh runs in the background.
+        """
+        value, age = self._lookup(key)
+        if age is not None:
+            if age < self.ttl:
+                self.hits += 1
+            else:
+                self.stale_hits += 1
+                self._refresh(key, loader)
+            return value
+
+        self.misses += 1
+        # Shield so a cancelled caller does not cancel the load for the others
+        return await asyncio.shield(self._start_load(key, loader))
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "inflight": len(self._inflight),
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "loads": self.loads,
+            "errors": self.errors,
+        }
@@ -3,15 +3,17 @@ WebSocket connection manager and handler functions.
 """
 from fastapi import WebSocket, WebSocketDisconnect, Depends, Query
 from typing import Dict, Set, Any, List, Optional
-import httpx
 from datetime import datetime
 from app.config import settings
+from app.http_client import get_http_client
+import asyncio
 import json
 import logging
 import uuid
 from asyncpg import Connection
 from app.dependencies import get_db_connection
-from app.security import TokenValidator
+from app.security import TokenValidator, ADMIN, CARD_ROOM_WORKER
+from app.opd_queue import opd_queue
 
 logger = logging.getLogger(__name__)
 
@@ -60,14 +62,19 @@ class WebSocketConnectionManager:
             del self.connection_map[connection_id]
             logging.info(f"WebSocket disconnected: User {user_id}, Connection {connection_id}")
     
-    async def send_personal_message(self, user_id: str, message: Dict[str, Any]):
-        """Send message to a specific user across all their connections."""
+    async def send_personal_message(self, user_id: str, message: Dict[str, Any]) -> bool:
+        """
+        Send message to a specific user across all their connections.
+        Returns True if at least one connection received it.
+        """
+        delivered = False
         if user_id in self.active_connections:
             disconnected = set()
             
-            for websocket in self.active_connections[user_id]:
+            for websocket in list(self.active_connections[user_id]):
                 try:
                     await websocket.send_json(message)
+                    delivered = True
                 except Exception as e:
                     logging.error(f"Error sending message to {user_id}: {str(e)}")
                     disconnected.add(websocket)
@@ -75,6 +82,8 @@ class WebSocketConnectionManager:
             # Clean up any disconnected websockets
             for websocket in disconnected:
                 await self.disconnect(websocket)
+        
+        return delivered
     
     async def broadcast(self, message: Dict[str, Any], exclude: Optional[List[str]] = None):
         """Broadcast message to all connected clients, with optional exclusions."""
@@ -114,10 +123,14 @@ async def get_token_from_query(
 
 async def websocket_endpoint(
     websocket: WebSocket,
-    token_data: Dict[str, Any] = Depends(get_token_from_query),
-    db: Connection = Depends(get_db_connection)
+    token_data: Dict[str, Any] = Depends(get_token_from_query)
 ):
-    """WebSocket endpoint handler."""
+    """
+    WebSocket endpoint handler.
+    
+    Does not hold a pooled database connection: a socket lives for the whole
+    session and would otherwise pin one of the DB_MAX_CONNECTIONS slots.
+    """
     user_id = token_data.get("user_id")
     
     if not user_id:
@@ -158,6 +171,46 @@ async def websocket_endpoint(
         await connection_manager.disconnect(websocket)
 
 
+async def opd_queue_endpoint(
+    websocket: WebSocket,
+    doctor_id: uuid.UUID,
+    token_data: Dict[str, Any] = Depends(get_token_from_query)
+):
+    """
+    Stream a doctor's OPD queue: a snapshot on connect, then one diff per
+    change. Diffs carry the queue version; after a gap, or when the client
+    falls behind, a new snapshot is sent. Open to the doctor, card room
+    workers and admins.
+    """
+    if token_data.get("user_id") != str(doctor_id) and token_data.get("role") not in (CARD_ROOM_WORKER, ADMIN):
+        await websocket.close(code=1008)  # Policy violation
+        return
+
+    await websocket.accept()
+    messages = opd_queue.subscribe(doctor_id)
+
+    async def send():
+        while True:
+            await websocket.send_text(await messages.get())
+
+    async def receive():
+        # Nothing to act on; this notices the client going away
+        while True:
+            await websocket.receive_text()
+
+    tasks = [asyncio.create_task(send()), asyncio.create_task(receive())]
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            error = task.exception()
+            if error and not isinstance(error, WebSocketDisconnect):
+                logging.error(f"OPD queue stream for doctor {doctor_id} failed: {str(error)}")
+    finally:
+        for task in tasks:
+            task.cancel()
+        opd_queue.unsubscribe(doctor_id, messages)
+
+
 async def broadcast_opd_assignment(
     doctor_id: uuid.UUID,
     patient_id: uuid.UUID,
@@ -195,20 +248,17 @@ async def broadcast_opd_assignment(
     if not delivered:
         try:
             # Send via webhook - include complete message
-            async with httpx.AsyncClient() as client:
-                webhook_url = f"{settings.DOCTOR_SERVICE_URL}/webhooks/opd-assignments"
-                response = await client.post(
-                    webhook_url,
-                    json=message,
-                    headers={"Authorization": f"Bearer {settings.SERVICE_TOKEN}"},
-                    timeout=5.0
-                )
-                
-                if response.status_code != 200:
-                    logger.error(f"Webhook delivery failed: {response.status_code} - {response.text}")
-                else:
-                    logger.info(f"Assignment delivered via webhook to doctor {doctor_id_str}")
-                    delivered = True
+            response = await get_http_client("doctor").post(
+                "/webhooks/opd-assignments",
+                json=message,
+                headers={"Authorization": f"Bearer {settings.SERVICE_TOKEN}"}
+            )
+            
+            if response.status_code != 200:
+                logger.error(f"Webhook delivery failed: {response.status_code} - {response.text}")
+            else:
+                logger.info(f"Assignment delivered via webhook to doctor {doctor_id_str}")
+                delivered = True
         except Exception as e:
             logger.error(f"Webhook delivery failed: {str(e)}")
     
@@ -0,0 +1,151 @@
+"""
+Tests for appointment scheduling: the appointments_no_overlap constraint under
+concurrent bookings, bulk booking and available slots. They need the database
+of settings.DATABASE_URL.
+"""
+import asyncio
+import pytest
+import uuid
+from asyncpg import ExclusionViolationError
+from datetime import date, datetime, time, timedelta, timezone
+
+from app.database import init_db, close_db, get_pool
+from app.models import AppointmentModel
+
+# A weekday far enough ahead that no test data exists and nothing is in the past
+DAY = date.today() + timedelta(days=400)
+while DAY.isoweekday() > 5:
+    DAY += timedelta(days=1)
+
+
+def at(hour: int, minute: int = 0) -> datetime:
+    return datetime.combine(DAY, time(hour, minute), tzinfo=timezone.utc)
+
+
+def appointment(patient_id, doctor_id, start: datetime, minutes: int = 30):
+    return {
+        "patient_id": patient_id,
+        "doctor_id": doctor_id,
+        "appointment_date": start,
+        "duration_minutes": minutes,
+        "appointment_type": "CONSULTATION",
+        "status": "SCHEDULED",
+    }
+
+
+async def setup_doctor():
+    """A fresh patient and doctor, so each test starts with an empty schedule"""
+    await init_db()
+    pool = await get_pool()
+    patient_id, doctor_id = uuid.uuid4(), uuid.uuid4()
+    async with pool.acquire() as conn:
+        await conn.execute(
+            """
+            INSERT INTO patients (id, registration_number, first_name, last_name, date_of_birth, gender, phone_number)
+            VALUES ($1, $2, 'Slot', 'Test', '1990-01-01', 'MALE', '0911000000')
+            """,
+            patient_id, f"TEST-{patient_id.hex[:12]}"
+        )
+        await conn.execute(
+            "INSERT INTO doctors (id, full_name, department) VALUES ($1, 'Dr Slot Test', $2)",
+            doctor_id, f"test-{doctor_id.hex[:8]}"
+        )
+    return patient_id, doctor_id
+
+
+async def teardown_doctor(patient_id, doctor_id):
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        await conn.execute("DELETE FROM appointments WHERE doctor_id = $1", doctor_id)
+        await conn.execute("DELETE FROM doctors WHERE id = $1", doctor_id)
+        await conn.execute("DELETE FROM patients WHERE id = $1", patient_id)
+    await close_db()
+
+
+@pytest.mark.asyncio
+async def test_concurrent_bookings_of_one_slot():
+    """Of many concurrent bookings of overlapping slots exactly one commits."""
+    patient_id, doctor_id = await setup_doctor()
+    try:
+        starts = [at(9, minute) for minute in (0, 0, 0, 10, 15, 20, 25)] * 3
+        results = await asyncio.gather(
+            *(AppointmentModel.create(appointment(patient_id, doctor_id, start)) for start in starts),
+            return_exceptions=True
+        )
+
+        booked = [r for r in results if not isinstance(r, Exception)]
+        assert len(booked) == 1
+        assert all(isinstance(r, ExclusionViolationError) for r in results if isinstance(r, Exception))
+
+        pool = await get_pool()
+        async with pool.acquire() as conn:
+            overlapping = await conn.fetchval(
+                """
+                SELECT COUNT(*) FROM appointments a JOIN appointments b
+                ON a.doctor_id = b.doctor_id AND a.id < b.id AND a.slot && b.slot
+                WHERE a.doctor_id = $1
+                """,
+                doctor_id
+            )
+        assert overlapping == 0
+    finally:
+        await teardown_doctor(patient_id, doctor_id)
+
+
+@pytest.mark.asyncio
+async def test_adjacent_and_cancelled_slots_are_bookable():
+    patient_id, doctor_id = await setup_doctor()
+    try:
+        first = await AppointmentModel.create(appointment(patient_id, doctor_id, at(10)))
+        # [10:00, 10:30) and [10:30, 11:00) don't overlap
+        await AppointmentModel.create(appointment(patient_id, doctor_id, at(10, 30)))
+
+        with pytest.raises(ExclusionViolationError):
+            await AppointmentModel.create(appointment(patient_id, doctor_id, at(10, 15)))
+
+        await AppointmentModel.update(first["id"], {"status": "CANCELLED"})
+        rebooked = await AppointmentModel.create(appointment(patient_id, doctor_id, at(10)))
+        assert rebooked["id"] != first["id"]
+    finally:
+        await teardown_doctor(patient_id, doctor_id)
+
+
+@pytest.mark.asyncio
+async def test_bulk_booking_skips_conflicts():
+    patient_id, doctor_id = await setup_doctor()
+    try:
+        await AppointmentModel.create(appointment(patient_id, doctor_id, at(11)))
+
+        pool = await get_pool()
+        async with pool.acquire() as conn:
+            async with conn.transaction():
+                results = await AppointmentModel.create_many(conn, [
+                    appointment(patient_id, doctor_id, at(11, 15)),  # overlaps the booked one
+                    appointment(patient_id, doctor_id, at(12)),
+                    appointment(patient_id, doctor_id, at(12, 15)),  # overlaps the one before
+                    appointment(patient_id, doctor_id, at(13), minutes=60),
+                ])
+
+        assert [r is not None for r in results] == [False, True, False, True]
+        assert results[1]["doctor_name"] == "Dr Slot Test"
+    finally:
+        await teardown_doctor(patient_id, doctor_id)
+
+
+@pytest.mark.asyncio
+async def test_available_slots_exclude_booked_time():
+    patient_id, doctor_id = await setup_doctor()
+    try:
+        await AppointmentModel.create(appointment(patient_id, doctor_id, at(9)))
+        await AppointmentModel.create(appointment(patient_id, doctor_id, at(9, 45), minutes=15))
+
+        pool = await get_pool()
+        async with pool.acquire() as conn:
+            free = await AppointmentModel.available_slots(
+                conn, DAY, DAY, 30, doctor_id=doctor_id, day_start=time(8), day_end=time(12)
+            )
+
+        # 9:30-9:45 is too short for 30 minutes
+        assert [(r["start_time"], r["end_time"]) for r in free] == [(at(8), at(9)), (at(10), at(12))]
+    finally:
+        await teardown_doctor(patient_id, doctor_id)
@@ -0,0 +1,64 @@
+"""
+Tests for streaming exports (app/export.py). They need the database of
+settings.DATABASE_URL.
+"""
+import csv
+import io
+import json
+import pytest
+import uuid
+
+from app.database import init_db, close_db, get_pool, read_connection
+from app.export import export_rows
+from app.models import PatientModel
+
+
+async def collect(chunks) -> bytes:
+    return b"".join([chunk async for chunk in chunks])
+
+
+@pytest.mark.asyncio
+async def test_ndjson_export_streams_batches_with_json_columns():
+    await init_db()
+    prefix = f"EXP-{uuid.uuid4().hex[:8]}-"
+    pool = await get_pool()
+    try:
+        async with pool.acquire() as conn:
+            await conn.executemany(
+                """
+                INSERT INTO patients (registration_number, first_name, last_name, date_of_birth, gender,
+                                      phone_number, allergies, medical_history)
+                VALUES ($1, 'Export', 'Test', '1990-01-01', 'MALE', '0911000000', '["Dust"]', '{"asthma": true}')
+                """,
+                [(f"{prefix}{i}",) for i in range(5)]
+            )
+
+        query = f"SELECT registration_number, allergies, medical_history FROM patients WHERE registration_number LIKE '{prefix}%' ORDER BY registration_number"
+        chunks = [chunk async for chunk in export_rows(read_connection, query, batch_size=2)]
+
+        assert len(chunks) == 3
+        rows = [json.loads(line) for line in b"".join(chunks).decode().splitlines()]
+        assert [r["registration_number"] for r in rows] == [f"{prefix}{i}" for i in range(5)]
+        assert rows[0]["allergies"] == ["Dust"] and rows[0]["medical_history"] == {"asthma": True}
+    finally:
+        async with pool.acquire() as conn:
+            await conn.execute("DELETE FROM patients WHERE registration_number LIKE $1", f"{prefix}%")
+        await close_db()
+
+
+@pytest.mark.asyncio
+async def test_csv_export_has_a_header_even_without_rows():
+    await init_db()
+    try:
+        query, params = PatientModel.export_query(created_from=None, created_to=None)
+        query = query.replace("WHERE", "WHERE FALSE AND", 1)
+        body = await collect(export_rows(read_connection, query, *params, format="csv"))
+
+        rows = list(csv.reader(io.StringIO(body.decode())))
+        assert rows == [[
+            "id", "registration_number", "first_name", "last_name", "date_of_birth", "gender", "blood_group",
+            "phone_number", "email", "address", "emergency_contact_name", "emergency_contact_phone",
+            "medical_history", "allergies", "created_at", "updated_at",
+        ]]
+    finally:
+        await close_db()
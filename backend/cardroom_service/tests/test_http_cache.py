@@ -0,0 +1,84 @@
+"""
+Tests for response compression and conditional GETs (app/http_cache.py).
+"""
+import gzip
+import zlib
+
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+from app.http_cache import HTTPCacheMiddleware, not_modified
+
+PAGE = [{"id": i, "name": f"patient {i}"} for i in range(100)]
+versions = {"page": 1}
+
+app = FastAPI()
+app.add_middleware(HTTPCacheMiddleware, minimum_size=100)
+
+
+@app.get("/page")
+async def page():
+    return PAGE
+
+
+@app.get("/versioned")
+async def versioned(request: Request):
+    response = not_modified(request, versions["page"])
+    if response:
+        return response
+    return PAGE
+
+
+@app.get("/stream")
+async def stream():
+    async def rows():
+        for i in range(3):
+            yield f'{{"row": {i}}}\n'.encode()
+    return StreamingResponse(rows(), media_type="application/x-ndjson")
+
+
+client = TestClient(app)
+
+
+def test_compresses_and_answers_matching_etag_with_304():
+    small = client.get("/page", headers={"accept-encoding": "identity"})
+    assert "content-encoding" not in small.headers
+    assert small.headers["vary"] == "Accept-Encoding"
+
+    response = client.get("/page", headers={"accept-encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert int(response.headers["content-length"]) < len(small.content)
+    assert response.json() == PAGE
+    # The same weak ETag for every encoding
+    assert response.headers["etag"] == small.headers["etag"]
+    assert response.headers["etag"].startswith('W/"')
+
+    cached = client.get("/page", headers={"if-none-match": response.headers["etag"], "accept-encoding": "gzip"})
+    assert cached.status_code == 304
+    assert cached.content == b""
+    assert "content-encoding" not in cached.headers
+    assert cached.headers["etag"] == response.headers["etag"]
+
+
+def test_version_check_short_circuits_until_the_version_changes():
+    first = client.get("/versioned")
+    etag = first.headers["etag"]
+    assert client.get("/versioned", headers={"if-none-match": etag}).status_code == 304
+    assert client.get("/versioned?page=2", headers={"if-none-match": etag}).status_code == 200
+
+    versions["page"] += 1
+    changed = client.get("/versioned", headers={"if-none-match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+
+
+def test_streamed_responses_are_compressed_per_chunk():
+    with client.stream("GET", "/stream", headers={"accept-encoding": "gzip"}) as response:
+        assert response.headers["content-encoding"] == "gzip"
+        assert "content-length" not in response.headers
+        assert "etag" not in response.headers
+        raw = b"".join(response.iter_raw())
+    assert gzip.decompress(raw).decode().splitlines() == ['{"row": 0}', '{"row": 1}', '{"row": 2}']
+    # Every chunk was flushed, so the first row can be decoded on its own
+    assert zlib.decompressobj(16 + zlib.MAX_WBITS).decompress(raw[:len(raw) // 2]).startswith(b'{"row": 0}')
@@ -0,0 +1,212 @@
+"""
+Tests for OPD assignments: the single-statement assignment path, the
+outbox that notifies doctors after commit and the in-memory OPD queues.
+The async ones need the database of settings.DATABASE_URL.
+"""
+import json
+import pytest
+import uuid
+from datetime import datetime, timezone
+
+from app.database import init_db, close_db, get_pool
+from app.models import OPDAssignmentModel, DoctorModel
+from app.outbox import Outbox
+from app.opd_queue import OPDQueue
+
+
+async def setup_patient_and_doctor():
+    await init_db()
+    pool = await get_pool()
+    patient_id, doctor_id = uuid.uuid4(), uuid.uuid4()
+    async with pool.acquire() as conn:
+        await conn.execute(
+            """
+            INSERT INTO patients (id, registration_number, first_name, last_name, date_of_birth, gender, phone_number)
+            VALUES ($1, $2, 'Opd', 'Test', '1990-01-01', 'FEMALE', '0911000000')
+            """,
+            patient_id, f"TEST-{patient_id.hex[:12]}"
+        )
+        await DoctorModel.upsert_many(conn, [{"id": doctor_id, "full_name": "Dr Opd Test", "department": "OPD"}])
+    return patient_id, doctor_id
+
+
+async def teardown_patient_and_doctor(patient_id, doctor_id):
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        await conn.execute("DELETE FROM outbox WHERE payload->>'doctor_id' = $1", str(doctor_id))
+        await conn.execute("DELETE FROM opd_assignments WHERE patient_id = $1", patient_id)
+        await conn.execute("DELETE FROM doctors WHERE id = $1", doctor_id)
+        await conn.execute("DELETE FROM patients WHERE id = $1", patient_id)
+    await close_db()
+
+
+class DoctorOutbox(Outbox):
+    """An Outbox that only sees one doctor's events, leaving everyone else's queued"""
+
+    def __init__(self, doctor_id, **kwargs):
+        super().__init__(**kwargs)
+        self.doctor_id = str(doctor_id)
+
+    async def claim(self, conn):
+        rows = await conn.fetch(
+            """
+            UPDATE outbox
+            SET attempts = attempts + 1,
+                available_at = NOW() + make_interval(secs => $2 * power(2, LEAST(attempts, 10)))
+            WHERE id IN (
+                SELECT id FROM outbox
+                WHERE available_at <= NOW() AND payload->>'doctor_id' = $3
+                ORDER BY available_at, id
+                LIMIT $1
+                FOR UPDATE SKIP LOCKED
+            )
+            RETURNING id, event_type, payload, attempts
+            """,
+            self.batch_size, self.retry_delay, self.doctor_id
+        )
+        return [dict(r) for r in sorted(rows, key=lambda r: r["id"])]
+
+    async def pending(self, pool):
+        async with pool.acquire() as conn:
+            return await conn.fetchval("SELECT COUNT(*) FROM outbox WHERE payload->>'doctor_id' = $1", self.doctor_id)
+
+
+@pytest.mark.asyncio
+async def test_assign_queues_one_outbox_event():
+    patient_id, doctor_id = await setup_patient_and_doctor()
+    try:
+        pool = await get_pool()
+        async with pool.acquire() as conn:
+            async with conn.transaction():
+                created = await OPDAssignmentModel.assign(
+                    conn, {"patient_id": patient_id, "doctor_id": doctor_id, "priority": "HIGH"}
+                )
+            event = await conn.fetchrow(
+                "SELECT event_type, payload FROM outbox WHERE payload->>'doctor_id' = $1", str(doctor_id)
+            )
+
+        assert created["patient_found"] and created["doctor_found"]
+        assert created["status"] == "PENDING"
+        assert created["doctor_name"] == "Dr Opd Test"
+        assert created["patient_name"] == "Opd Test"
+        assert event["event_type"] == "opd_assignment"
+        assert f'"id": "{created["id"]}"' in event["payload"]
+    finally:
+        await teardown_patient_and_doctor(patient_id, doctor_id)
+
+
+@pytest.mark.asyncio
+async def test_assign_to_unknown_doctor_writes_nothing():
+    patient_id, doctor_id = await setup_patient_and_doctor()
+    try:
+        pool = await get_pool()
+        async with pool.acquire() as conn:
+            created = await OPDAssignmentModel.assign(conn, {"patient_id": patient_id, "doctor_id": uuid.uuid4()})
+            assignments = await conn.fetchval("SELECT COUNT(*) FROM opd_assignments WHERE patient_id = $1", patient_id)
+            events = await conn.fetchval(
+                "SELECT COUNT(*) FROM outbox WHERE payload->>'patient_id' = $1", str(patient_id)
+            )
+
+        assert created["patient_found"] and not created["doctor_found"]
+        assert created["id"] is None
+        assert assignments == 0 and events == 0
+    finally:
+        await teardown_patient_and_doctor(patient_id, doctor_id)
+
+
+@pytest.mark.asyncio
+async def test_outbox_delivers_after_commit_and_retries_failures():
+    patient_id, doctor_id = await setup_patient_and_doctor()
+    try:
+        pool = await get_pool()
+        delivered = []
+        attempts = {"count": 0}
+        outbox = DoctorOutbox(doctor_id, batch_size=10, retry_delay=0)
+
+        @outbox.handler("opd_assignment")
+        async def deliver(payload):
+            attempts["count"] += 1
+            if attempts["count"] == 1:
+                raise RuntimeError("doctor service down")
+            delivered.append(payload["id"])
+
+        async with pool.acquire() as conn:
+            tx = conn.transaction()
+            await tx.start()
+            created = await OPDAssignmentModel.assign(conn, {"patient_id": patient_id, "doctor_id": doctor_id})
+            # Not committed yet: nothing to deliver
+            assert await outbox.dispatch_once(pool) == 0
+            await tx.commit()
+
+        assert await outbox.dispatch_once(pool) == 1  # fails, stays queued
+        assert await outbox.pending(pool) == 1
+        assert await outbox.dispatch_once(pool) == 1  # retried
+        assert delivered == [str(created["id"])]
+        assert await outbox.pending(pool) == 0
+    finally:
+        await teardown_patient_and_doctor(patient_id, doctor_id)
+
+
+def queue_row(doctor_id, priority="NORMAL", minute=0, status="PENDING"):
+    return {
+        "id": uuid.uuid4(), "patient_id": uuid.uuid4(), "doctor_id": doctor_id,
+        "priority": priority, "status": status, "notes": None, "is_deleted": False,
+        "created_at": datetime(2024, 1, 1, 9, minute, tzinfo=timezone.utc),
+        "updated_at": datetime(2024, 1, 1, 9, minute, tzinfo=timezone.utc),
+    }
+
+
+def test_opd_queue_orders_by_priority_then_arrival_and_streams_diffs():
+    queue = OPDQueue()
+    doctor_id = uuid.uuid4()
+    early, late, urgent = queue_row(doctor_id, minute=1), queue_row(doctor_id, minute=2), queue_row(doctor_id, "URGENT", minute=3)
+    queue.apply(late)
+    queue.apply(early)
+    messages = queue.subscribe(doctor_id)
+    etag = queue.etag(doctor_id)
+
+    queue.apply(urgent)
+    queue.apply({**early, "status": "COMPLETED"})
+
+    snapshot = json.loads(queue.snapshot(doctor_id))
+    assert [e["id"] for e in snapshot["entries"]] == [str(urgent["id"]), str(late["id"])]
+    assert queue.etag(doctor_id) != etag
+
+    first = json.loads(messages.get_nowait())
+    assert first["type"] == "opd_queue_snapshot" and len(first["entries"]) == 2
+    upsert, remove = json.loads(messages.get_nowait()), json.loads(messages.get_nowait())
+    assert (upsert["op"], upsert["position"]) == ("upsert", 0)
+    assert remove == {"type": "opd_queue_diff", "doctor_id": str(doctor_id), "version": snapshot["version"],
+                      "op": "remove", "id": str(early["id"])}
+
+
+
+def test_opd_queue_snapshot_of_an_unknown_doctor_creates_no_queue():
+    queue = OPDQueue()
+    doctor_id = uuid.uuid4()
+
+    snapshot = json.loads(queue.snapshot(doctor_id))
+
+    assert snapshot == {"type": "opd_queue_snapshot", "doctor_id": str(doctor_id), "version": 0, "entries": []}
+    assert queue.queues == {}
+    assert queue.etag(doctor_id) == f'"{queue.epoch}-0"'
+
+@pytest.mark.asyncio
+async def test_opd_queue_reconciles_with_the_database():
+    patient_id, doctor_id = await setup_patient_and_doctor()
+    try:
+        pool = await get_pool()
+        queue = OPDQueue()
+        stale = queue_row(doctor_id)
+        queue.apply(stale)  # never written to the database
+
+        async with pool.acquire() as conn:
+            created = await OPDAssignmentModel.assign(conn, {"patient_id": patient_id, "doctor_id": doctor_id})
+
+        assert await queue.reconcile(pool) >= 1
+        entries = json.loads(queue.snapshot(doctor_id))["entries"]
+        assert [e["id"] for e in entries] == [str(created["id"])]
+        assert entries[0]["patient_name"] == "Opd Test"
+        assert await queue.reconcile(pool) == 0
+    finally:
+        await teardown_patient_and_doctor(patient_id, doctor_id)
@@ -0,0 +1,102 @@
+"""
+Tests for bulk patient import (app/patient_import.py). They need the database
+of settings.DATABASE_URL.
+"""
+import json
+import pytest
+import uuid
+
+from app.database import init_db, close_db, get_pool
+from app.patient_import import PatientImport
+
+
+async def chunked(data: bytes, size: int):
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+
+async def run_import(format: str, data: bytes, chunk_size: int = 1000, size: int = 64 * 1024):
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        return await PatientImport(format, chunk_size=chunk_size).run(conn, chunked(data, size))
+
+
+async def delete_patients(prefix: str):
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        await conn.execute("DELETE FROM patients WHERE registration_number LIKE $1", f"{prefix}%")
+    await close_db()
+
+
+@pytest.mark.asyncio
+async def test_csv_import_reports_invalid_duplicate_and_existing_rows():
+    await init_db()
+    prefix = f"IMP-{uuid.uuid4().hex[:8]}-"
+    try:
+        await run_import("csv", (
+            "registration_number,first_name,last_name,date_of_birth,gender,phone_number\n"
+            f"{prefix}0,Already,There,1980-02-03,MALE,0911000000\n"
+        ).encode())
+
+        report = await run_import("csv", (
+            "registration_number,first_name,last_name,date_of_birth,gender,phone_number,address,allergies\n"
+            f'{prefix}1,Abebe,Kebede,1990-01-01,MALE,0911000001,"Bole,\nAddis Ababa",Penicillin;Dust\n'
+            f"{prefix}2,Almaz,Tesfaye,1985-05-05,FEMALE,0911000002,,\n"
+            f"{prefix}1,Again,Kebede,1990-01-01,MALE,0911000003,,\n"
+            f"{prefix}3,Bad,Gender,1990-01-01,UNKNOWN,0911000004,,\n"
+            f"{prefix}0,Already,There,1980-02-03,MALE,0911000000,,\n"
+        ).encode(), chunk_size=2)
+
+        assert report["status"] == "completed"
+        assert (report["rows"], report["imported"], report["invalid"], report["duplicates"], report["existing"]) == (5, 2, 1, 1, 1)
+        assert [(e["line"], e["registration_number"]) for e in report["errors"]] == [
+            (5, f"{prefix}1"), (6, f"{prefix}3"), (7, f"{prefix}0")
+        ]
+        assert "first on line 2" in report["errors"][0]["errors"][0]
+
+        pool = await get_pool()
+        async with pool.acquire() as conn:
+            patient = await conn.fetchrow("SELECT * FROM patients WHERE registration_number = $1", f"{prefix}1")
+        assert patient["first_name"] == "Abebe"
+        assert patient["address"] == "Bole,\nAddis Ababa"
+        assert json.loads(patient["allergies"]) == ["Penicillin", "Dust"]
+    finally:
+        await delete_patients(prefix)
+
+
+@pytest.mark.asyncio
+async def test_values_longer_than_their_columns_are_reported_not_copied():
+    await init_db()
+    prefix = f"IMP-{uuid.uuid4().hex[:8]}-"
+    try:
+        report = await run_import("csv", (
+            "registration_number,first_name,last_name,date_of_birth,gender,phone_number,emergency_contact_phone\n"
+            f"{prefix}1,Abebe,Kebede,1990-01-01,MALE,0911000001,0911000009\n"
+            f"{prefix}2,Almaz,Tesfaye,1985-05-05,FEMALE,0911000002,{'9' * 30}\n"
+        ).encode())
+
+        assert report["status"] == "completed"
+        assert (report["imported"], report["invalid"]) == (1, 1)
+        assert report["errors"][0]["registration_number"] == f"{prefix}2"
+    finally:
+        await delete_patients(prefix)
+
+
+@pytest.mark.asyncio
+async def test_ndjson_import_across_chunk_boundaries():
+    await init_db()
+    prefix = f"IMP-{uuid.uuid4().hex[:8]}-"
+    try:
+        rows = [
+            {"registration_number": f"{prefix}{i}", "first_name": "Tigist", "last_name": "Ḥailu",
+             "date_of_birth": "2000-01-01", "gender": "FEMALE", "phone_number": f"09110000{i:02d}"}
+            for i in range(25)
+        ]
+        data = "\n".join(json.dumps(row, ensure_ascii=False) for row in rows) + "\n\n{not json}\n"
+        # Small reads split lines and multi-byte characters
+        report = await run_import("ndjson", data.encode(), chunk_size=10, size=7)
+
+        assert (report["rows"], report["imported"], report["invalid"]) == (26, 25, 1)
+        assert report["errors"][0]["line"] == 27
+    finally:
+        await delete_patients(prefix)
@@ -15,9 +15,53 @@ class Settings(BaseSettings):
     DB_PASSWORD: str = os.getenv("DB_PASSWORD", "postgres")
     DB_NAME: str = os.getenv("DB_NAME", "doctor_service")
     DATABASE_URL: str = f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+    # One pool per worker process, shared by all requests
+    DB_POOL_MIN_SIZE: int = int(os.getenv("DB_POOL_MIN_SIZE", "5"))
+    DB_POOL_MAX_SIZE: int = int(os.getenv("DB_POOL_MAX_SIZE", "20"))
+    DB_POOL_MAX_IDLE: float = float(os.getenv("DB_POOL_MAX_IDLE", "300"))
+    # Optional read replica for analytics and timeline queries
+    DB_READ_URL: str = os.getenv("DB_READ_URL", "")
+    DB_READ_POOL_MAX_SIZE: int = int(os.getenv("DB_READ_POOL_MAX_SIZE", "20"))
+    DB_READ_ACQUIRE_TIMEOUT: float = float(os.getenv("DB_READ_ACQUIRE_TIMEOUT", "2.0"))
+    # Reads of a session that wrote within this window go to the primary (read-your-writes)
+    DB_READ_STICKY_SECONDS: float = float(os.getenv("DB_READ_STICKY_SECONDS", "5"))
+    # Fall back to the primary while the replica lags more than this
+    DB_READ_MAX_LAG_SECONDS: float = float(os.getenv("DB_READ_MAX_LAG_SECONDS", "5"))
+    DB_READ_CHECK_INTERVAL: float = float(os.getenv("DB_READ_CHECK_INTERVAL", "5"))
+    # List totals: exact up to this many rows, estimated or cached (seconds) above
+    COUNT_EXACT_THRESHOLD: int = int(os.getenv("COUNT_EXACT_THRESHOLD", "10000"))
+    COUNT_CACHE_TTL: float = float(os.getenv("COUNT_CACHE_TTL", "30"))
+    # Rows fetched per cursor round trip by streaming exports (app/export.py)
+    EXPORT_BATCH_SIZE: int = int(os.getenv("EXPORT_BATCH_SIZE", "500"))
+    # Response compression (app/http_cache.py): smallest body compressed, gzip level, brotli quality
+    COMPRESSION_MINIMUM_SIZE: int = int(os.getenv("COMPRESSION_MINIMUM_SIZE", "1024"))
+    GZIP_LEVEL: int = int(os.getenv("GZIP_LEVEL", "6"))
+    BROTLI_QUALITY: int = int(os.getenv("BROTLI_QUALITY", "4"))
+    # Uploads (app/utils/storage.py): bytes per streamed chunk, largest accepted file
+    STORAGE_CHUNK_SIZE: int = int(os.getenv("STORAGE_CHUNK_SIZE", str(1024 * 1024)))
+    STORAGE_MAX_UPLOAD_SIZE: int = int(os.getenv("STORAGE_MAX_UPLOAD_SIZE", str(100 * 1024 * 1024)))
+    # File downloads (app/file_serving.py): bytes per read, bodies sent at once, seconds to wait for a slot
+    FILE_CHUNK_SIZE: int = int(os.getenv("FILE_CHUNK_SIZE", str(256 * 1024)))
+    FILE_DOWNLOAD_CONCURRENCY: int = int(os.getenv("FILE_DOWNLOAD_CONCURRENCY", "32"))
+    FILE_DOWNLOAD_QUEUE_TIMEOUT: float = float(os.getenv("FILE_DOWNLOAD_QUEUE_TIMEOUT", "10"))
     
     CARDROOM_SERVICE_URL: str = "http://cardroom_service:8023"
     LAB_SERVICE_URL: str = "http://labroom_service:8025"
+    AUTH_SERVICE_URL: str = os.getenv("AUTH_SERVICE_URL", "http://auth_service:8022")
+    # IDs per request to cardroom's bulk patient lookup (cardroom accepts at most 500)
+    CARDROOM_PATIENT_BATCH_SIZE: int = int(os.getenv("CARDROOM_PATIENT_BATCH_SIZE", "200"))
+    # Incremental sync from cardroom's change feed (seconds between polls, rows per page)
+    CARDROOM_SYNC_ENABLED: bool = os.getenv("CARDROOM_SYNC_ENABLED", "True").lower() == "true"
+    CARDROOM_SYNC_INTERVAL: float = float(os.getenv("CARDROOM_SYNC_INTERVAL", "5"))
+    CARDROOM_SYNC_BATCH_SIZE: int = int(os.getenv("CARDROOM_SYNC_BATCH_SIZE", "500"))
+    
+    # Inter-service HTTP client pool settings (per upstream)
+    HTTP_CLIENT_TIMEOUT: float = float(os.getenv("HTTP_CLIENT_TIMEOUT", "10.0"))
+    HTTP_CLIENT_MAX_CONNECTIONS: int = int(os.getenv("HTTP_CLIENT_MAX_CONNECTIONS", "20"))
+    HTTP_CLIENT_MAX_KEEPALIVE: int = int(os.getenv("HTTP_CLIENT_MAX_KEEPALIVE", "10"))
+    HTTP_CLIENT_RETRIES: int = int(os.getenv("HTTP_CLIENT_RETRIES", "2"))
+    HTTP_CLIENT_BACKOFF: float = float(os.getenv("HTTP_CLIENT_BACKOFF", "0.2"))
+    HTTP2_ENABLED: bool = os.getenv("HTTP2_ENABLED", "False").lower() == "true"
     SERVICE_TOKEN: str = "your-service-token"
     
     # Update LAB_SERVICE_URL to include http explicitly
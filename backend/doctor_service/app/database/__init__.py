@@ -1,31 +1,154 @@
 # doctor_service/app/database/__init__.py
 
+import asyncio
 import asyncpg
+import contextlib
 import logging
+from datetime import datetime
+from pathlib import Path
 from app.config import settings
+from app.count_strategy import CountStrategy
+from app.read_routing import LAG_QUERY, ReadRouter
 
 logger = logging.getLogger(__name__)
 
-# Global application-level connection pool
+# Global application-level connection pool, shared by requests and background tasks
 _app_pool = None
+_pool_lock = asyncio.Lock()
+
+# Optional read-replica pool for read-only queries (DB_READ_URL)
+_read_pool = None
+read_router = ReadRouter(
+    "doctor",
+    sticky_seconds=settings.DB_READ_STICKY_SECONDS,
+    max_lag=settings.DB_READ_MAX_LAG_SECONDS,
+    check_interval=settings.DB_READ_CHECK_INTERVAL,
+)
+
+# Totals of paginated lists
+list_counts = CountStrategy(exact_threshold=settings.COUNT_EXACT_THRESHOLD, cache_ttl=settings.COUNT_CACHE_TTL)
+
+async def init_connection(conn):
+    """Per-connection setup, run once when the pool opens a physical connection."""
+    # Configure date handling
+    await conn.set_type_codec(
+        'date',
+        encoder=lambda d: d if isinstance(d, str) else (d.date() if isinstance(d, datetime) else d).isoformat(),
+        decoder=lambda s: datetime.strptime(s, '%Y-%m-%d').date(),
+        schema='pg_catalog',
+        format='text'
+    )
 
 async def get_app_pool():
-    """Get the application-level connection pool."""
+    """Get the application-level connection pool, creating it on first use."""
     global _app_pool
     if _app_pool is None:
-        logger.info("Initializing application-level database pool")
-        _app_pool = await asyncpg.create_pool(
-            dsn=settings.DATABASE_URL,
-            min_size=2,
-            max_size=10,
-            command_timeout=60.0
-        )
+        async with _pool_lock:
+            if _app_pool is None:
+                logger.info("Initializing application-level database pool")
+                _app_pool = await asyncpg.create_pool(
+                    dsn=settings.DATABASE_URL,
+                    min_size=settings.DB_POOL_MIN_SIZE,
+                    max_size=settings.DB_POOL_MAX_SIZE,
+                    max_inactive_connection_lifetime=settings.DB_POOL_MAX_IDLE,
+                    command_timeout=60.0,
+                    init=init_connection
+                )
     return _app_pool
 
+# Migrations applied at startup to databases that don't have them yet, keyed by
+# a table they create. Fresh databases get them from docker-compose's init scripts.
+MIGRATIONS_DIR = Path(__file__).resolve().parents[2] / "migrations"
+STARTUP_MIGRATIONS = [
+    ("lab_request_rollup_daily", "add_lab_request_rollups.sql"),
+    ("sync_cursors", "add_cardroom_change_sync.sql"),
+]
+
+async def apply_missing_migrations(pool):
+    """Apply each of STARTUP_MIGRATIONS whose table is missing, once across workers."""
+    async with pool.acquire() as conn:
+        for table, filename in STARTUP_MIGRATIONS:
+            if await conn.fetchval("SELECT to_regclass($1)", table) is not None:
+                continue
+            sql = await asyncio.to_thread((MIGRATIONS_DIR / filename).read_text)
+            async with conn.transaction():
+                # Workers starting together wait here; the first one applies it
+                await conn.execute("SELECT pg_advisory_xact_lock(hashtext('doctor_service_migrations'))")
+                if await conn.fetchval("SELECT to_regclass($1)", table) is not None:
+                    continue
+                logger.info(f"Applying migration {filename}")
+                await conn.execute(sql)
+
 async def close_app_pool():
     """Close the application-level connection pool."""
     global _app_pool
     if _app_pool is not None:
         logger.info("Closing application-level database pool")
         await _app_pool.close()
-        _app_pool = None
\ No newline at end of file
+        _app_pool = None
+
+class ReadPool:
+    """Read-only view of the replica pool that falls back to the primary."""
+
+    def __init__(self, replica: asyncpg.Pool, primary: asyncpg.Pool):
+        self._replica = replica
+        self._primary = primary
+
+    @contextlib.asynccontextmanager
+    async def acquire(self):
+        try:
+            conn = await self._replica.acquire(timeout=settings.DB_READ_ACQUIRE_TIMEOUT)
+        except (OSError, asyncio.TimeoutError, asyncpg.PostgresError, asyncpg.InterfaceError) as e:
+            read_router.replica_failed(e)
+            async with self._primary.acquire() as conn:
+                yield conn
+            return
+        try:
+            yield conn
+        finally:
+            await self._replica.release(conn)
+
+async def open_read_pool():
+    """Open the read-replica pool if one is configured; reads stay on the primary otherwise."""
+    global _read_pool
+    if not settings.DB_READ_URL or _read_pool is not None:
+        return
+    logger.info("Initializing read-replica database pool")
+    # Connections are opened on demand so startup does not depend on the replica
+    _read_pool = await asyncpg.create_pool(
+        dsn=settings.DB_READ_URL,
+        min_size=0,
+        max_size=settings.DB_READ_POOL_MAX_SIZE,
+        max_inactive_connection_lifetime=settings.DB_POOL_MAX_IDLE,
+        command_timeout=60.0,
+        init=init_connection
+    )
+    await read_router.start(lambda: _read_pool.fetchval(LAG_QUERY))
+
+async def get_read_pool():
+    """
+    Get a pool for read-only queries.
+
+    Uses the read replica when one is configured, healthy and the current
+    session has not written recently; otherwise the primary pool.
+    """
+    primary = await get_app_pool()
+    if _read_pool is not None and read_router.use_replica():
+        return ReadPool(_read_pool, primary)
+    return primary
+
+@contextlib.asynccontextmanager
+async def read_connection():
+    """A connection for read-only queries, from get_read_pool()"""
+    pool = await get_read_pool()
+    async with pool.acquire() as conn:
+        yield conn
+
+async def close_read_pool():
+    """Close the read-replica pool."""
+    global _read_pool
+    await read_router.stop()
+    if _read_pool is not None:
+        logger.info("Closing read-replica database pool")
+        await _read_pool.close()
+        _read_pool = None
@@ -20,6 +20,8 @@ CREATE TABLE IF NOT EXISTS lab_request_files (
     file_size INTEGER NOT NULL,
     description TEXT NULL,
     uploaded_by UUID NOT NULL REFERENCES users(id),
+    -- SHA-256 of the content; the file is stored once per hash (app/utils/storage.py)
+    content_hash VARCHAR(64) NULL,
     created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
 );
 
@@ -47,6 +49,7 @@ CREATE TABLE IF NOT EXISTS lab_request_comments (
 );
 
 CREATE INDEX IF NOT EXISTS idx_lab_request_files ON lab_request_files(lab_request_id);
+CREATE INDEX IF NOT EXISTS idx_lab_request_files_content_hash ON lab_request_files(content_hash);
 CREATE INDEX IF NOT EXISTS idx_lab_request_history ON lab_request_history(lab_request_id);
 CREATE INDEX IF NOT EXISTS idx_lab_request_comments ON lab_request_comments(lab_request_id);
 -- Users table (for reference and foreign keys)
@@ -209,6 +212,13 @@ CREATE TABLE IF NOT EXISTS notifications (
      read_at TIMESTAMP WITH TIME ZONE
  );
 
+-- How far the cardroom change feed sync has read (app/services/cardroom_sync.py)
+CREATE TABLE IF NOT EXISTS sync_cursors (
+    name VARCHAR(50) PRIMARY KEY,
+    cursor TEXT NOT NULL,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
 
 
 
@@ -4,32 +4,32 @@ import jwt
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from typing import Optional, Dict, List, Any
-from datetime import datetime
 from app.config import settings
+from app.database import get_app_pool, get_read_pool
 from app.exceptions import UnauthorizedException
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/token")
 
-async def get_db_pool():
-    """Create and return a database connection pool."""
-    pool = await asyncpg.create_pool(
-        dsn=settings.DATABASE_URL,
-        min_size=5,
-        max_size=20
-    )
-    try:
-        yield pool
-    finally:
-        await pool.close()
-        
-async def init_connection(conn):
-    # Configure date handling
-    await conn.set_type_codec(
-        'date',
-        encoder=lambda d: d.isoformat(),
-        decoder=lambda s: datetime.strptime(s, '%Y-%m-%d').date(),
-        format='text'
-    )
+async def get_db_pool() -> asyncpg.Pool:
+    """Return the process-wide database connection pool."""
+    return await get_app_pool()
+
+async def get_read_db_pool():
+    """Pool for read-only endpoints: the read replica when usable, else the primary."""
+    return await get_read_pool()
+
+async def get_db_connection():
+    """Acquire one pooled connection for the duration of the request."""
+    pool = await get_app_pool()
+    async with pool.acquire() as conn:
+        yield conn
+
+async def get_db_transaction():
+    """Acquire a pooled connection and run the whole request in one transaction."""
+    pool = await get_app_pool()
+    async with pool.acquire() as conn:
+        async with conn.transaction():
+            yield conn
 
 async def get_current_user(token: str = Depends(oauth2_scheme)):
     """Decode JWT token to get current user."""
@@ -87,7 +87,6 @@ from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from typing import Optional
 
-from app.config import settings
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
 async def get_current_doctor(token: str = Depends(oauth2_scheme)):
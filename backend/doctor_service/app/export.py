@@ -0,0 +1,133 @@
+# doctor_service/app/export.py
+"""
+Streaming NDJSON and CSV exports.
+
+List endpoints build the whole page in memory and are paginated; exports of a
+year of data would be assembled from hundreds of pages. ``export_response``
+instead runs the query through a server-side cursor and streams the rows as
+they are fetched, ``batch_size`` at a time, so memory stays constant however
+many rows there are and the first rows go out as soon as the first batch is
+fetched. The response has no Content-Length (chunked transfer encoding).
+
+The cursor runs in a read-only REPEATABLE READ transaction, so an export is
+one consistent snapshot even while rows are being written. ``connect`` opens
+the connection for the stream itself: a connection from a request dependency
+is released before a streamed body is sent. json/jsonb columns are exported
+as JSON values in NDJSON and as their JSON text in CSV.
+"""
+import csv
+import io
+import json
+import logging
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from typing import Any, AsyncContextManager, AsyncIterator, Callable, Dict, List, Set
+from uuid import UUID
+
+from fastapi.responses import StreamingResponse
+
+logger = logging.getLogger(__name__)
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+# Query parameter pattern of the export format
+FORMAT_PATTERN = "^(ndjson|csv)$"
+
+Connect = Callable[[], AsyncContextManager[Any]]
+
+
+def json_default(value: Any) -> Any:
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, (UUID, Decimal, timedelta)):
+        return str(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def csv_value(value: Any) -> Any:
+    if value is None:
+        return ""
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, default=json_default)
+    return value
+
+
+class NDJSONEncoder:
+    def __init__(self, json_columns: Set[str]):
+        self.json_columns = json_columns
+
+    def encode(self, rows: List[Any]) -> bytes:
+        lines = []
+        for row in rows:
+            values: Dict[str, Any] = dict(row)
+            for column in self.json_columns:
+                if isinstance(values.get(column), str):
+                    values[column] = json.loads(values[column])
+            lines.append(json.dumps(values, default=json_default))
+        return ("\n".join(lines) + "\n").encode()
+
+
+class CSVEncoder:
+    def __init__(self, columns: List[str]):
+        self.columns = columns
+        self.header = True
+
+    def encode(self, rows: List[Any]) -> bytes:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if self.header:
+            writer.writerow(self.columns)
+            self.header = False
+        writer.writerows([csv_value(value) for value in row.values()] for row in rows)
+        return buffer.getvalue().encode()
+
+
+async def export_rows(connect: Connect, query: str, *args, format: str = "ndjson",
+                      batch_size: int = 500) -> AsyncIterator[bytes]:
+    """The rows of ``query`` encoded as ``format``, one chunk per batch"""
+    async with connect() as conn:
+        async with conn.transaction(isolation="repeatable_read", readonly=True):
+            statement = await conn.prepare(query)
+            attributes = statement.get_attributes()
+            if format == "csv":
+                encoder = CSVEncoder([a.name for a in attributes])
+                yield encoder.encode([])  # the header, before the first fetch
+            else:
+                encoder = NDJSONEncoder({a.name for a in attributes if a.type.name in ("json", "jsonb")})
+            cursor = await statement.cursor(*args)
+            while True:
+                rows = await cursor.fetch(batch_size)
+                if not rows:
+                    break
+                yield encoder.encode(rows)
+
+
+async def logged(chunks: AsyncIterator[bytes], filename: str) -> AsyncIterator[bytes]:
+    # Headers are already sent when a failure happens mid-stream; the body just ends
+    sent = 0
+    try:
+        async for chunk in chunks:
+            sent += len(chunk)
+            yield chunk
+    except Exception as e:
+        logger.error(f"Export {filename} failed after {sent} bytes: {str(e)}")
+        raise
+
+
+def export_response(connect: Connect, query: str, *args, format: str = "ndjson",
+                    filename: str = "export", batch_size: int = 500) -> StreamingResponse:
+    """A streamed download of the rows of ``query``"""
+    filename = f"{filename}.{format}"
+    return StreamingResponse(
+        logged(export_rows(connect, query, *args, format=format, batch_size=batch_size), filename),
+        media_type=MEDIA_TYPES[format],
+        headers={
+            "Content-Disposition": f'attachment; filename="{filename}"',
+            # Don't let a proxy buffer the stream
+            "X-Accel-Buffering": "no",
+        },
+    )
@@ -9,7 +9,6 @@ from contextlib import asynccontextmanager
 
 from fastapi import FastAPI, Depends, HTTPException, WebSocket, WebSocketDisconnect, Request, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
 from fastapi.exceptions import RequestValidationError
 from fastapi.responses import JSONResponse
 from dotenv import load_dotenv
@@ -19,14 +18,20 @@ import asyncpg
 from app.config import settings
 from app.dependencies import get_db_pool, get_current_doctor
 from app.websocket import manager, get_websocket_user
-from app.notifications import get_user_notifications, mark_notification_as_read
+from app.notifications import get_user_notifications, mark_notification_as_read, notification_version
 from app.exceptions import DatabaseException
 
 from app.routers import (
     patients, appointments, lab_requests, ai_diagnosis,
     medical_reports, notifications, sync, lab_results_ws, inter_service, opd_ws, opd_webhook
 )
-from app.database import get_app_pool, close_app_pool  # application-level pool
+from app.database import get_app_pool, close_app_pool, apply_missing_migrations, open_read_pool, close_read_pool, read_router  # application-level pool
+from app.read_routing import ReadRoutingMiddleware
+from app.responses import ORJSONResponse
+from app.http_cache import HTTPCacheMiddleware, not_modified
+from app.file_serving import RangeStaticFiles
+from app.http_client import http_clients
+from app.services.cardroom_sync import cardroom_sync
 
 from fastapi import WebSocket, WebSocketDisconnect, Request, status, Path
 
@@ -46,42 +51,40 @@ async def lifespan(app: FastAPI):
     # Startup logic
     startup_time = time.time()
     logger.info("Doctor Service starting up...")
+    # One database pool per worker, shared by requests and background tasks
+    await get_app_pool()
+    logger.info("Initialized application-level database pool")
+    # Tables added after the database was created (analytics rollups, sync cursors)
+    await apply_missing_migrations(await get_app_pool())
+    # Read replica for analytics/timeline queries, when DB_READ_URL is set
+    await open_read_pool()
+    # Long-lived, pooled HTTP clients for inter-service calls
+    http_clients.startup()
+    # Keep local patients and assignments in step with cardroom's change feed
+    if settings.CARDROOM_SYNC_ENABLED:
+        await cardroom_sync.start(await get_app_pool())
+    # Connect WebSocket to labroom service
+    from app.utils.lab_request_ws_client import get_ws_connection
+    asyncio.create_task(get_ws_connection())
+    logger.info("Initializing WebSocket connection to lab service")
     yield  # <-- allow FastAPI to start
     # Shutdown logic
     logger.info("Doctor Service shutting down...")
+    await cardroom_sync.stop()
+    await http_clients.aclose()
+    await close_read_pool()
+    await close_app_pool()
+    logger.info("Closed application-level database pool")
 
 # Create FastAPI app with lifespan manager
 app = FastAPI(
     title="Doctor Service API",
     description="API for doctor-related functionalities including AI diagnosis.",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
 )
 
-# Startup events
-@app.on_event("startup")
-async def startup_event():
-    # Initialize DB pool
-    await get_app_pool()
-    logger.info("Initialized application-level database pool")
-    # Initialize HTTP client in cardroom_service
-    from app.services.cardroom_service import http_client
-    # Connect WebSocket to labroom service
-    from app.utils.lab_request_ws_client import get_ws_connection
-    asyncio.create_task(get_ws_connection())
-    logger.info("Initializing WebSocket connection to lab service")
-
-# Shutdown events
-@app.on_event("shutdown")
-async def shutdown_event():
-    # Clean up HTTP client
-    from app.services.cardroom_service import cleanup
-    await cleanup()
-    logger.info("Cleaned up HTTP resources")
-    # Close DB pool
-    await close_app_pool()
-    logger.info("Closed application-level database pool")
-
 # Exception handlers
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
@@ -99,6 +102,14 @@ async def generic_exception_handler(request: Request, exc: Exception):
         content={"detail": "An internal server error occurred."},
     )
 
+# Compression, ETags and 304s, inside CORS so that 304s carry the CORS headers too
+app.add_middleware(
+    HTTPCacheMiddleware,
+    minimum_size=settings.COMPRESSION_MINIMUM_SIZE,
+    gzip_level=settings.GZIP_LEVEL,
+    brotli_quality=settings.BROTLI_QUALITY,
+)
+
 # CORS
 app.add_middleware(
     CORSMiddleware,
@@ -108,6 +119,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Route read-only queries to the read replica, keeping sessions that just wrote on the primary
+app.add_middleware(ReadRoutingMiddleware, router=read_router)
+
 # Include routers
 app.include_router(notifications.router)
 app.include_router(patients.router)
@@ -121,8 +135,8 @@ app.include_router(sync.router, prefix="/sync", tags=["sync"])
 app.include_router(opd_ws.router)
 app.include_router(opd_webhook.router)
 
-# Static files
-app.mount("/files", StaticFiles(directory="storage"), name="files")
+# Static files (byte ranges and content ETags)
+app.mount("/files", RangeStaticFiles(directory="storage"), name="files")
 
 # Health endpoints
 @app.get("/", tags=["Root"], include_in_schema=False)
@@ -133,9 +147,25 @@ async def read_root():
 async def health_check():
     return {"status": "healthy", "service": "doctor_service"}
 
+@app.get("/health/http-clients")
+async def http_clients_health():
+    """Connection reuse, retry and pool-wait metrics of the inter-service HTTP clients"""
+    return {"service": "doctor_service", "upstreams": http_clients.metrics()}
+
+@app.get("/health/db-replica")
+async def db_replica_health():
+    """Read replica health, replication lag and read routing decisions"""
+    return {"service": "doctor_service", "replica": read_router.metrics()}
+
+@app.get("/health/cardroom-sync")
+async def cardroom_sync_health():
+    """Progress of the incremental sync from cardroom's change feed"""
+    return {"service": "doctor_service", "sync": cardroom_sync.metrics()}
+
 # Notifications endpoints
 @app.get("/notifications")
 async def get_notifications(
+    request: Request,
     limit: int = 50,
     offset: int = 0,
     unread_only: bool = False,
@@ -143,6 +173,13 @@ async def get_notifications(
     current_doctor = Depends(get_current_doctor)
 ):
     try:
+        # Pollers that already have the current notifications get a 304
+        user_id = uuid.UUID(current_doctor["id"])
+        async with pool.acquire() as conn:
+            version = await notification_version(conn, user_id, unread_only)
+        response = not_modified(request, user_id, *version)
+        if response:
+            return response
         result = await get_user_notifications(
             pool, uuid.UUID(current_doctor["id"]), limit, offset, unread_only
         )
@@ -175,7 +212,7 @@ async def websocket_endpoint(websocket: WebSocket):
     if not user or user.get("role") != "doctor":
         await websocket.close(code=1008, reason="Only doctors can connect")
         return
-    conn_id = await manager.connect(websocket, user["id"])
+    conn_id = await manager.connect(websocket, user["id"], role=user.get("role"))
     try:
         await websocket.send_text('{"type":"connected","message":"Connected"}')
         while True:
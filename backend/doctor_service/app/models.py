@@ -2,10 +2,10 @@
 import uuid
 import json
 from fastapi import HTTPException, status
-from datetime import datetime, date
+from datetime import datetime, date, timedelta
 import asyncpg
 import logging
-from typing import Optional, Dict, List, Any, Union
+from typing import Optional, Dict, List, Any, Tuple, Union
 from app.notifications import create_notification_for_role
 from app.exceptions import DatabaseException
 
@@ -92,6 +92,16 @@ class Patient:
             record = await conn.fetchrow(query, patient_id)
             return cls.row_to_dict(record)
 
+    @classmethod
+    async def get_by_ids(cls, pool, patient_ids: List[uuid.UUID]):
+        async with pool.acquire() as conn:
+            query = """
+                SELECT * FROM patients 
+                WHERE id = ANY($1::uuid[]) AND is_active = true
+            """
+            records = await conn.fetch(query, list(patient_ids))
+            return [cls.row_to_dict(record) for record in records]
+
     @classmethod
     async def get_assigned_patients(cls, pool, doctor_id: uuid.UUID):
         async with pool.acquire() as conn:
@@ -130,165 +140,191 @@ class Patient:
                     datetime.now()
                 )
 
-    @classmethod
-    async def upsert_patient(cls, pool: asyncpg.Pool, patient_data: Dict[str, Any]) -> Dict:
-        """Upsert patient with complete data from cardroom service"""
+    # Columns written by upsert_patients, in the order of _normalize_patient's rows
+    UPSERT_COLUMNS = (
+        "id", "registration_number", "first_name", "last_name", "date_of_birth",
+        "gender", "blood_group", "phone_number", "email", "address",
+        "emergency_contact_name", "emergency_contact_phone", "allergies", "medical_history",
+    )
+
+    # One statement for the whole batch. Fields the payload leaves out keep the stored
+    # value (or get a placeholder for new patients); rows whose values don't change are
+    # not written and not returned.
+    UPSERT_QUERY = """
+        INSERT INTO patients AS p (
+            id, registration_number, first_name, last_name, date_of_birth,
+            gender, blood_group, phone_number, email, address,
+            emergency_contact_name, emergency_contact_phone,
+            allergies, medical_history, created_at, updated_at, is_active
+        )
+        SELECT
+            i.id,
+            COALESCE(i.registration_number, cur.registration_number, 'TEMP-' || left(md5(random()::text), 8)),
+            COALESCE(i.first_name, cur.first_name, 'Unknown'),
+            COALESCE(i.last_name, cur.last_name, 'Unknown'),
+            COALESCE(i.date_of_birth, cur.date_of_birth, CURRENT_DATE),
+            COALESCE(i.gender, cur.gender, 'Unknown'),
+            COALESCE(i.blood_group, cur.blood_group),
+            COALESCE(i.phone_number, cur.phone_number, 'Unknown'),
+            COALESCE(i.email, cur.email),
+            COALESCE(i.address, cur.address),
+            COALESCE(i.emergency_contact_name, cur.emergency_contact_name),
+            COALESCE(i.emergency_contact_phone, cur.emergency_contact_phone),
+            COALESCE(i.allergies::jsonb, cur.allergies, '[]'::jsonb),
+            COALESCE(i.medical_history::jsonb, cur.medical_history, '{}'::jsonb),
+            NOW(), NOW(), true
+        FROM unnest(
+            $1::uuid[], $2::text[], $3::text[], $4::text[], $5::date[], $6::text[], $7::text[],
+            $8::text[], $9::text[], $10::text[], $11::text[], $12::text[], $13::text[], $14::text[]
+        ) AS i(
+            id, registration_number, first_name, last_name, date_of_birth, gender, blood_group,
+            phone_number, email, address, emergency_contact_name, emergency_contact_phone,
+            allergies, medical_history
+        )
+        LEFT JOIN patients cur ON cur.id = i.id
+        ON CONFLICT (id) DO UPDATE SET
+            registration_number = EXCLUDED.registration_number,
+            first_name = EXCLUDED.first_name,
+            last_name = EXCLUDED.last_name,
+            date_of_birth = EXCLUDED.date_of_birth,
+            gender = EXCLUDED.gender,
+            blood_group = EXCLUDED.blood_group,
+            phone_number = EXCLUDED.phone_number,
+            email = EXCLUDED.email,
+            address = EXCLUDED.address,
+            emergency_contact_name = EXCLUDED.emergency_contact_name,
+            emergency_contact_phone = EXCLUDED.emergency_contact_phone,
+            allergies = EXCLUDED.allergies,
+            medical_history = EXCLUDED.medical_history,
+            updated_at = NOW()
+        WHERE (p.registration_number, p.first_name, p.last_name, p.date_of_birth, p.gender,
+               p.blood_group, p.phone_number, p.email, p.address, p.emergency_contact_name,
+               p.emergency_contact_phone, p.allergies, p.medical_history)
+              IS DISTINCT FROM
+              (EXCLUDED.registration_number, EXCLUDED.first_name, EXCLUDED.last_name,
+               EXCLUDED.date_of_birth, EXCLUDED.gender, EXCLUDED.blood_group, EXCLUDED.phone_number,
+               EXCLUDED.email, EXCLUDED.address, EXCLUDED.emergency_contact_name,
+               EXCLUDED.emergency_contact_phone, EXCLUDED.allergies, EXCLUDED.medical_history)
+        RETURNING *
+    """
+
+    @staticmethod
+    def _parse_birth_date(raw_date) -> Optional[date]:
+        """Date of birth from a cardroom payload; None when missing or unparseable"""
+        if not raw_date:
+            return None
+        if isinstance(raw_date, datetime):
+            return raw_date.date()
+        if isinstance(raw_date, date):
+            return raw_date
         try:
-            # Get patient ID
-            patient_id = patient_data.get('id')
-            if isinstance(patient_id, str):
-                patient_id = uuid.UUID(patient_id)
-            elif not patient_id:
-                patient_id = uuid.uuid4()
-                logger.warning(f"Generated new UUID for patient: {patient_id}")
-            
-            # Extract date fields for proper handling
-            birth_date = patient_data.get('date_of_birth')
-            if birth_date:
-                if isinstance(birth_date, str):
-                    try:
-                        from datetime import datetime
-                        # Try to parse ISO format or similar
-                        birth_date = datetime.fromisoformat(birth_date.replace('Z', '+00:00')).date()
-                    except (ValueError, TypeError):
-                        # Fallback to a simpler parsing
-                        for fmt in ('%Y-%m-%d', '%d/%m/%Y', '%m/%d/%Y'):
-                            try:
-                                from datetime import datetime
-                                birth_date = datetime.strptime(birth_date, fmt).date()
-                                break
-                            except ValueError:
-                                continue
-            
-            # Handle JSON fields
-            allergies = patient_data.get('allergies', [])
-            medical_history = patient_data.get('medical_history', {})
-            
-            if isinstance(allergies, str):
-                try:
-                    allergies = json.loads(allergies)
-                except json.JSONDecodeError:
-                    allergies = []
-                    
-            if isinstance(medical_history, str):
-                try:
-                    medical_history = json.loads(medical_history)
-                except json.JSONDecodeError:
-                    medical_history = {}
-            
-            # Convert to JSON strings for PostgreSQL
-            allergies_json = json.dumps(allergies)
-            medical_history_json = json.dumps(medical_history)
-            
-            async with pool.acquire() as conn:
-                # Check if patient exists
-                exists = await conn.fetchval(
-                    "SELECT EXISTS(SELECT 1 FROM patients WHERE id = $1)",
-                    patient_id
-                )
-                
-                if exists:
-                    # Update existing patient
-                    query = """
-                        UPDATE patients
-                        SET 
-                            registration_number = COALESCE($2, registration_number),
-                            first_name = COALESCE($3, first_name),
-                            last_name = COALESCE($4, last_name),
-                            date_of_birth = COALESCE($5, date_of_birth),
-                            gender = COALESCE($6, gender),
-                            blood_group = COALESCE($7, blood_group),
-                            phone_number = COALESCE($8, phone_number),
-                            email = COALESCE($9, email),
-                            address = COALESCE($10, address),
-                            emergency_contact_name = COALESCE($11, emergency_contact_name),
-                            emergency_contact_phone = COALESCE($12, emergency_contact_phone),
-                            allergies = COALESCE($13::jsonb, allergies),
-                            medical_history = COALESCE($14::jsonb, medical_history),
-                            updated_at = NOW()
-                        WHERE id = $1
-                        RETURNING *
-                    """
-                    
-                    record = await conn.fetchrow(
-                        query,
-                        patient_id,
-                        patient_data.get('registration_number'),
-                        patient_data.get('first_name') or patient_data.get('name', '').split(' ')[0],
-                        patient_data.get('last_name') or ' '.join(patient_data.get('name', '').split(' ')[1:]),
-                        birth_date,
-                        patient_data.get('gender'),
-                        patient_data.get('blood_group'),
-                        patient_data.get('phone_number'),
-                        patient_data.get('email'),
-                        patient_data.get('address'),
-                        patient_data.get('emergency_contact_name'),
-                        patient_data.get('emergency_contact_phone'),
-                        allergies_json,
-                        medical_history_json
-                    )
-                else:
-                    # Insert new patient
-                    query = """
-                        INSERT INTO patients (
-                            id, registration_number, first_name, last_name, date_of_birth,
-                            gender, blood_group, phone_number, email, address,
-                            emergency_contact_name, emergency_contact_phone,
-                            allergies, medical_history, created_at, updated_at, is_active
-                        )
-                        VALUES (
-                            $1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12,
-                            $13::jsonb, $14::jsonb, NOW(), NOW(), true
-                        )
-                        RETURNING *
-                    """
-                    
-                    # Extract first/last name from name if needed
-                    first_name = patient_data.get('first_name')
-                    last_name = patient_data.get('last_name')
-                    
-                    if not first_name and not last_name and patient_data.get('name'):
-                        name_parts = patient_data.get('name', '').split(' ')
-                        first_name = name_parts[0]
-                        last_name = ' '.join(name_parts[1:]) if len(name_parts) > 1 else ''
-                    
-                    record = await conn.fetchrow(
-                        query,
-                        patient_id,
-                        patient_data.get('registration_number') or f"TEMP-{uuid.uuid4().hex[:8]}",
-                        first_name or 'Unknown',
-                        last_name or 'Unknown',
-                        birth_date or datetime.now().date(),
-                        patient_data.get('gender') or 'Unknown',
-                        patient_data.get('blood_group'),
-                        patient_data.get('phone_number') or 'Unknown',
-                        patient_data.get('email'),
-                        patient_data.get('address'),
-                        patient_data.get('emergency_contact_name'),
-                        patient_data.get('emergency_contact_phone'),
-                        allergies_json,
-                        medical_history_json
-                    )
-                
-                # Ensure doctor-patient assignment is recorded if doctor_id is provided
-                doctor_id = patient_data.get('doctor_id')
-                if doctor_id:
-                    if isinstance(doctor_id, str):
-                        doctor_id = uuid.UUID(doctor_id)
-                    
-                    # Insert patient assignment
+            # ISO format or similar
+            return datetime.fromisoformat(str(raw_date).replace('Z', '+00:00')).date()
+        except (ValueError, TypeError):
+            pass
+        for fmt in ('%Y-%m-%d', '%d/%m/%Y', '%m/%d/%Y'):
+            try:
+                return datetime.strptime(raw_date, fmt).date()
+            except (ValueError, TypeError):
+                continue
+        return None
+
+    @staticmethod
+    def _json_field(value, default) -> Optional[str]:
+        """JSON text for a jsonb column, or None to keep the stored value"""
+        if value is None:
+            return None
+        if isinstance(value, str):
+            try:
+                value = json.loads(value)
+            except json.JSONDecodeError:
+                value = default
+        return json.dumps(value)
+
+    @classmethod
+    def _normalize_patient(cls, patient_data: Dict[str, Any]) -> tuple:
+        """One row of UPSERT_COLUMNS from a cardroom patient payload"""
+        patient_id = patient_data.get('id')
+        if isinstance(patient_id, str):
+            patient_id = uuid.UUID(patient_id)
+        elif not patient_id:
+            patient_id = uuid.uuid4()
+            logger.warning(f"Generated new UUID for patient: {patient_id}")
+
+        first_name = patient_data.get('first_name')
+        last_name = patient_data.get('last_name')
+        if not first_name and not last_name and patient_data.get('name'):
+            name_parts = patient_data['name'].split(' ')
+            first_name = name_parts[0]
+            last_name = ' '.join(name_parts[1:])
+
+        return (
+            patient_id,
+            patient_data.get('registration_number') or None,
+            first_name or None,
+            last_name or None,
+            cls._parse_birth_date(patient_data.get('date_of_birth')),
+            patient_data.get('gender') or None,
+            patient_data.get('blood_group'),
+            patient_data.get('phone_number') or None,
+            patient_data.get('email'),
+            patient_data.get('address'),
+            patient_data.get('emergency_contact_name'),
+            patient_data.get('emergency_contact_phone'),
+            cls._json_field(patient_data.get('allergies'), []),
+            cls._json_field(patient_data.get('medical_history'), {}),
+        )
+
+    @classmethod
+    async def upsert_patients(cls, pool: asyncpg.Pool, patients: List[Dict[str, Any]]) -> List[Dict]:
+        """
+        Store a batch of cardroom patients with a single INSERT ... ON CONFLICT
+        DO UPDATE; returns the patients that were inserted or changed.
+        Assignments carried in the payloads (doctor_id) are recorded too.
+        """
+        rows = {}
+        assignments = set()
+        for patient_data in patients:
+            try:
+                row = cls._normalize_patient(patient_data)
+            except (ValueError, TypeError, AttributeError) as e:
+                logger.warning(f"Skipping patient with invalid data: {e}")
+                continue
+            # A row can only be upserted once per statement; the last payload wins
+            rows[row[0]] = row
+            doctor_id = patient_data.get('doctor_id')
+            if doctor_id:
+                assignments.add((row[0], uuid.UUID(str(doctor_id))))
+
+        if not rows:
+            return []
+
+        columns = [list(column) for column in zip(*rows.values())]
+        async with pool.acquire() as conn:
+            async with conn.transaction():
+                records = await conn.fetch(cls.UPSERT_QUERY, *columns)
+
+                if assignments:
+                    patient_ids, doctor_ids = zip(*assignments)
                     await conn.execute(
                         """
                         INSERT INTO patient_doctor_assignments
                         (id, patient_id, doctor_id, assigned_at, is_active)
-                        VALUES ($1, $2, $3, NOW(), true)
+                        SELECT a.id, a.patient_id, a.doctor_id, NOW(), true
+                        FROM unnest($1::uuid[], $2::uuid[], $3::uuid[]) AS a(id, patient_id, doctor_id)
                         ON CONFLICT (patient_id, doctor_id, is_active) DO NOTHING
                         """,
-                        uuid.uuid4(), patient_id, doctor_id
+                        [uuid.uuid4() for _ in patient_ids], list(patient_ids), list(doctor_ids)
                     )
-                
-                return cls.row_to_dict(record)
-                
+
+        return [cls.row_to_dict(record) for record in records]
+
+    @classmethod
+    async def upsert_patient(cls, pool: asyncpg.Pool, patient_data: Dict[str, Any]) -> Dict:
+        """Upsert patient with complete data from cardroom service"""
+        try:
+            changed = await cls.upsert_patients(pool, [patient_data])
+            return changed[0] if changed else patient_data
         except Exception as e:
             logger.error(f"Patient sync error: {e}", exc_info=True)
             # Return partial data rather than failing completely
@@ -368,6 +404,47 @@ class MedicalRecord:
 
             return cls.row_to_dict(record)
 
+    @staticmethod
+    def export_query(
+        doctor_id: uuid.UUID,
+        patient_id: Optional[uuid.UUID] = None,
+        from_date: Optional[date] = None,
+        to_date: Optional[date] = None,
+    ) -> Tuple[str, List[Any]]:
+        """
+        Query and parameters of a medical record export: the records a doctor
+        may read (their own and those of their assigned patients), created
+        between the dates (inclusive), oldest first.
+        """
+        conditions = [
+            "mr.is_active = true",
+            """(mr.doctor_id = $1 OR EXISTS (
+                SELECT 1 FROM patient_doctor_assignments pda
+                WHERE pda.patient_id = mr.patient_id AND pda.doctor_id = $1 AND pda.is_active = true
+            ))""",
+        ]
+        params: List[Any] = [doctor_id]
+        if patient_id:
+            params.append(patient_id)
+            conditions.append(f"mr.patient_id = ${len(params)}")
+        if from_date:
+            params.append(from_date)
+            conditions.append(f"mr.created_at >= ${len(params)}")
+        if to_date:
+            params.append(to_date + timedelta(days=1))
+            conditions.append(f"mr.created_at < ${len(params)}")
+        query = f"""
+            SELECT mr.id, mr.patient_id, p.registration_number AS patient_registration,
+                   p.first_name || ' ' || p.last_name AS patient_name, mr.doctor_id,
+                   mr.diagnosis, mr.treatment, mr.notes, mr.medications, mr.vital_signs,
+                   mr.follow_up_date, mr.created_at, mr.updated_at
+            FROM medical_records mr
+            LEFT JOIN patients p ON p.id = mr.patient_id
+            WHERE {" AND ".join(conditions)}
+            ORDER BY mr.created_at, mr.id
+        """
+        return query, params
+
     @classmethod
     async def get_by_id(
         cls, pool, record_id: uuid.UUID, patient_id: uuid.UUID, doctor_id: uuid.UUID
@@ -813,6 +890,19 @@ class NotificationModel(BaseModel):
         )
         return cls.row_to_dict(record)
 
+    @staticmethod
+    async def user_version(conn, user_id) -> Tuple[Any, ...]:
+        """Changes whenever one of the user's notifications is added, read or removed"""
+        row = await conn.fetchrow(
+            """
+            SELECT COUNT(*), MAX(created_at), COUNT(*) FILTER (WHERE is_read)
+            FROM notifications
+            WHERE recipient_id = $1
+            """,
+            user_id
+        )
+        return tuple(row)
+
     @classmethod
     async def get_user_notifications(cls, conn, user_id, limit, offset):
         query = """
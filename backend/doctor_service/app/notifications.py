@@ -3,8 +3,8 @@ import uuid
 import asyncpg
 import json
 import logging
-import httpx
 from app.config import settings
+from app.http_client import get_http_client
 from typing import Dict, List, Any, Optional
 from datetime import datetime
 
@@ -65,6 +65,58 @@ async def create_notification_for_role(
             
         return notifications
 
+async def fan_out_notification(
+    conn,
+    role: str,
+    title: str,
+    content: str,
+    notification_type: str,
+    related_id: Optional[uuid.UUID] = None
+) -> List[Dict[str, Any]]:
+    """
+    Create one notification for every active user with a role in a single
+    INSERT ... SELECT, so the round trips don't grow with the headcount.
+    Returns the notifications with the recipient's email; the caller sends
+    them on with push_notifications and send_bulk_email once its
+    transaction is committed.
+    """
+    query = """
+        WITH recipients AS (
+            SELECT id, email FROM users
+            WHERE role = $1 AND is_active = true
+        ), inserted AS (
+            INSERT INTO notifications (recipient_id, message, notification_type, entity_id, is_read)
+            SELECT id, $2, $3, $4, false FROM recipients
+            RETURNING *
+        )
+        SELECT inserted.*, recipients.email
+        FROM inserted
+        JOIN recipients ON recipients.id = inserted.recipient_id
+    """
+    records = await conn.fetch(query, role, f"{title}: {content}", notification_type, related_id)
+    return [dict(record) for record in records]
+
+async def push_notifications(notifications: List[Dict[str, Any]]) -> None:
+    """Send notifications via WebSocket to those recipients who are connected."""
+    for notification in notifications:
+        try:
+            await manager.send_personal_message(
+                str(notification["recipient_id"]),
+                {
+                    "type": "notification",
+                    "data": {
+                        "id": str(notification["id"]),
+                        "message": notification["message"],
+                        "notification_type": notification["notification_type"],
+                        "entity_id": str(notification["entity_id"]) if notification.get("entity_id") else None,
+                        "created_at": notification["created_at"].isoformat(),
+                        "is_read": notification["is_read"]
+                    }
+                }
+            )
+        except Exception as e:
+            logging.error(f"Failed to send notification via WebSocket: {str(e)}")
+
 async def create_notification(
     pool,
     user_id: uuid.UUID,
@@ -131,8 +183,8 @@ async def mark_notification_as_read(
     async with pool.acquire() as conn:
         query = """
             UPDATE notifications
-            SET is_read = true, updated_at = NOW()
-            WHERE id = $1 AND user_id = $2
+            SET is_read = true, read_at = NOW()
+            WHERE id = $1 AND recipient_id = $2
             RETURNING *
         """
         
@@ -143,6 +195,15 @@ async def mark_notification_as_read(
             
         return dict(record)
 
+async def notification_version(conn, user_id: uuid.UUID, unread_only: bool = False) -> tuple:
+    """Changes whenever get_user_notifications would return something else"""
+    condition = "recipient_id = $1 AND is_read = false" if unread_only else "recipient_id = $1"
+    row = await conn.fetchrow(
+        f"SELECT COUNT(*), MAX(created_at), COUNT(*) FILTER (WHERE is_read) FROM notifications WHERE {condition}",
+        user_id
+    )
+    return tuple(row)
+
 async def get_user_notifications(
     pool,
     user_id: uuid.UUID,
@@ -152,7 +213,7 @@ async def get_user_notifications(
 ) -> Dict[str, Any]:
     """Get notifications for a user."""
     async with pool.acquire() as conn:
-        conditions = ["user_id = $1"]
+        conditions = ["recipient_id = $1"]
         params = [user_id]
         
         if unread_only:
@@ -193,8 +254,7 @@ async def send_notification_to_lab_service(
 ) -> bool:
     """Send a notification to the lab service for a specific lab technician."""
     try:
-        lab_service_url = settings.LAB_SERVICE_URL
-        notification_endpoint = f"{lab_service_url}/inter-service/notifications"
+        notification_endpoint = "/inter-service/notifications"
         
         # Prepare notification data
         notification_data = {
@@ -212,16 +272,15 @@ async def send_notification_to_lab_service(
             notification_data["entity_type"] = entity_type
             
         # Send the notification to the lab service
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                notification_endpoint,
-                json=notification_data,
-                timeout=10.0  # Set a reasonable timeout
-            )
-            
-            response.raise_for_status()  # Raise exception for non-2xx responses
-            return True
-            
+        response = await get_http_client("labroom").post(
+            notification_endpoint,
+            json=notification_data,
+            timeout=10.0  # Set a reasonable timeout
+        )
+        
+        response.raise_for_status()  # Raise exception for non-2xx responses
+        return True
+        
     except Exception as e:
         logger.error(f"Failed to send notification to lab service: {str(e)}")
         return False
\ No newline at end of file
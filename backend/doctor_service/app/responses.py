@@ -0,0 +1,121 @@
+# doctor_service/app/responses.py
+"""
+JSON responses encoded with orjson.
+
+``ORJSONResponse`` is the app's default response class. orjson encodes
+datetimes, dates and enums natively, so handlers don't need to stringify them
+first. ``default`` covers the rest the way FastAPI's ``jsonable_encoder``
+would (asyncpg's UUID subclass, Decimal, timedelta, sets, asyncpg records,
+pydantic models).
+
+With a ``response_model`` FastAPI validates every row the handler returns and
+then serializes the validated models; for a page of rows that were just read
+from our own database that is most of the time spent on the request.
+``lean_response`` is the shortcut for such trusted rows: it projects them onto
+the fields of the response model (so the output has the same shape, aliases
+and defaults) without validating them, and returns a response FastAPI sends
+as it is. The ``response_model`` stays on the route for the OpenAPI schema.
+json/jsonb columns that asyncpg returns as text are embedded as they are.
+"""
+import typing
+from datetime import timedelta
+from decimal import Decimal
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from uuid import UUID
+
+import orjson
+from asyncpg import Record
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+OPTIONS = orjson.OPT_NON_STR_KEYS
+
+
+def default(value: Any) -> Any:
+    # orjson only encodes uuid.UUID itself natively, not the subclass asyncpg returns
+    if isinstance(value, UUID):
+        return str(value)
+    if isinstance(value, Decimal):
+        return int(value) if value.as_tuple().exponent >= 0 else float(value)
+    if isinstance(value, timedelta):
+        return value.total_seconds()
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    if isinstance(value, Record):
+        return dict(value)
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json", by_alias=True) if hasattr(value, "model_dump") else value.dict(by_alias=True)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    return orjson.dumps(content, default=default, option=OPTIONS)
+
+
+class ORJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+# (alias, name, default, projection of nested models, whether JSON text is embedded)
+FieldSpec = Tuple[str, str, Any, Optional[Callable[[Any], Any]], bool]
+
+
+def nested(annotation: Any) -> Tuple[Optional[Callable[[Any], Any]], bool]:
+    """How to project a value of ``annotation``, and whether it is a JSON container"""
+    origin = typing.get_origin(annotation)
+    if origin is typing.Union:
+        args = [arg for arg in typing.get_args(annotation) if arg is not type(None)]
+        return nested(args[0]) if len(args) == 1 else (None, False)
+    if origin is list:
+        args = typing.get_args(annotation)
+        item, _ = nested(args[0]) if args else (None, False)
+        if item is None:
+            return None, True
+        return (lambda values: None if values is None else [item(value) for value in values]), False
+    if origin is dict or annotation in (dict, list):
+        return None, True
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return projection(annotation), False
+    return None, False
+
+
+@lru_cache(maxsize=None)
+def fields(model: type) -> List[FieldSpec]:
+    result = []
+    # pydantic 2 has model_fields, pydantic 1 __fields__
+    for name, field in (getattr(model, "model_fields", None) or model.__fields__).items():
+        if hasattr(field, "is_required"):
+            value = None if field.is_required() else field.get_default(call_default_factory=True)
+        else:
+            value = None if field.required else field.get_default()
+        project, json_text = nested(field.annotation)
+        result.append((field.alias or name, name, value, project, json_text))
+    return result
+
+
+def projection(model: type) -> Callable[[Any], Any]:
+    """A function that projects a row (dict or record) onto the fields of ``model``"""
+    def project(row: Any) -> Any:
+        if row is None or isinstance(row, BaseModel):
+            return row
+        result = {}
+        for alias, name, default_value, project_nested, json_text in fields(model):
+            value = row.get(alias, row.get(name))
+            if value is None:
+                value = default_value
+            elif project_nested is not None:
+                value = project_nested(value)
+            elif json_text and isinstance(value, str):
+                # json/jsonb text from the database, already valid JSON
+                value = orjson.Fragment(value)
+            result[alias] = value
+        return result
+    return project
+
+
+def lean_response(model: type, content: Any, status_code: int = 200,
+                  headers: Optional[Dict[str, str]] = None) -> ORJSONResponse:
+    """``content`` (trusted database rows) shaped as ``model`` without validating it"""
+    return ORJSONResponse(projection(model)(content), status_code=status_code, headers=headers)
@@ -13,6 +13,7 @@ from ..dependencies import get_db_pool
 from ..websocket import manager
 from ..notifications import create_notification
 from ..config import settings
+from ..http_client import get_http_client
 
 logger = logging.getLogger(__name__)
 
@@ -201,29 +202,27 @@ async def get_lab_results_by_request_id(
     """
     try:
         # First, verify the lab request exists
-        lab_service_url = settings.LAB_SERVICE_URL
-        endpoint = f"{lab_service_url}/api/inter-service/lab-requests/{lab_request_id}/results"
+        endpoint = f"/api/inter-service/lab-requests/{lab_request_id}/results"
         
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                endpoint,
-                headers={"Authorization": f"Bearer {settings.SERVICE_TOKEN}"},
-                timeout=10.0
+        response = await get_http_client("labroom").get(
+            endpoint,
+            headers={"Authorization": f"Bearer {settings.SERVICE_TOKEN}"},
+            timeout=10.0
+        )
+        
+        if response.status_code == 200:
+            return response.json()
+        elif response.status_code == 404:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"No lab results found for request ID: {lab_request_id}"
+            )
+        else:
+            logger.error(f"Failed to fetch lab results from lab service. Status: {response.status_code}")
+            raise HTTPException(
+                status_code=status.HTTP_502_BAD_GATEWAY,
+                detail="Failed to fetch lab results from lab service"
             )
-            
-            if response.status_code == 200:
-                return response.json()
-            elif response.status_code == 404:
-                raise HTTPException(
-                    status_code=status.HTTP_404_NOT_FOUND,
-                    detail=f"No lab results found for request ID: {lab_request_id}"
-                )
-            else:
-                logger.error(f"Failed to fetch lab results from lab service. Status: {response.status_code}")
-                raise HTTPException(
-                    status_code=status.HTTP_502_BAD_GATEWAY,
-                    detail="Failed to fetch lab results from lab service"
-                )
     except httpx.RequestError as e:
         logger.error(f"Error connecting to lab service: {str(e)}")
         raise HTTPException(
@@ -245,24 +244,22 @@ async def get_lab_result_by_id(result_id: uuid.UUID = Path(...)):
     This endpoint queries the lab service for result details.
     """
     try:
-        lab_service_url = settings.LAB_SERVICE_URL
-        endpoint = f"{lab_service_url}/api/inter-service/lab-results/{result_id}"
+        endpoint = f"/api/inter-service/lab-results/{result_id}"
+        
+        response = await get_http_client("labroom").get(
+            endpoint,
+            headers={"Authorization": f"Bearer {settings.SERVICE_TOKEN}"},
+            timeout=10.0
+        )
         
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                endpoint,
-                headers={"Authorization": f"Bearer {settings.SERVICE_TOKEN}"},
-                timeout=10.0
+        if response.status_code == 200:
+            return response.json()
+        else:
+            logger.error(f"Failed to fetch lab result from lab service. Status: {response.status_code}")
+            raise HTTPException(
+                status_code=status.HTTP_502_BAD_GATEWAY,
+                detail="Failed to fetch lab result from lab service"
             )
-            
-            if response.status_code == 200:
-                return response.json()
-            else:
-                logger.error(f"Failed to fetch lab result from lab service. Status: {response.status_code}")
-                raise HTTPException(
-                    status_code=status.HTTP_502_BAD_GATEWAY,
-                    detail="Failed to fetch lab result from lab service"
-                )
     except httpx.RequestError as e:
         logger.error(f"Error connecting to lab service: {str(e)}")
         raise HTTPException(
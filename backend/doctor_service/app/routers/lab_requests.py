@@ -8,11 +8,15 @@ from fastapi import APIRouter, Depends, HTTPException, status, Query, Path, Body
 from pydantic import BaseModel
 import logging
 from app import models, schemas
-from app.dependencies import get_db_pool, get_current_doctor, validate_doctor_patient_access
+from app.count_strategy import is_exact
+from app.database import list_counts
+from app.responses import lean_response
+from app.file_serving import RangeFileResponse
+from app.dependencies import get_db_pool, get_read_db_pool, get_current_doctor, validate_doctor_patient_access
 from app.exceptions import PatientNotFoundException, LabRequestNotFoundException, DatabaseException
-from app.notifications import create_notification_for_role, create_notification
-from app.utils.email import send_email
-from app.utils.storage import save_file_to_storage, get_file_url
+from app.notifications import create_notification_for_role, create_notification, fan_out_notification, push_notifications
+from app.utils.email import send_bulk_email
+from app.utils.storage import save_upload_to_storage, get_blob_path
 from app.utils.lab_service import create_lab_request_in_lab_service
 
 router = APIRouter(prefix="/lab-requests", tags=["lab requests"])
@@ -23,6 +27,9 @@ LAB_REQUEST_PRIORITIES = ["routine", "urgent", "stat"]  # stat is higher priorit
 ALLOWED_LAB_RESULT_MIME_TYPES = ["application/pdf", "image/jpeg", "image/png", "application/msword", 
                                "application/vnd.openxmlformats-officedocument.wordprocessingml.document"]
 
+def file_download_url(request_id: uuid.UUID, file_id: uuid.UUID) -> str:
+    return f"{router.prefix}/{request_id}/files/{file_id}"
+
 # Add a new helper function to initialize the WebSocket connection
 async def initialize_lab_ws_connection(doctor_id: str):
     """Initialize WebSocket connection to lab service for lab requests."""
@@ -108,49 +115,27 @@ async def create_lab_request(
                 f"with {request_data.urgency} urgency."
             )
             
-            # Directly create the notification in the database
-            notification_id = uuid.uuid4()
-            
-            # Find lab technicians
-            lab_techs_query = """
-                SELECT id FROM users
-                WHERE role = 'lab_technician' AND is_active = true
-            """
-            
-            lab_techs = await conn.fetch(lab_techs_query)
-            
-            # Create notification for each lab technician
-            for tech in lab_techs:
-                tech_id = tech['id']
-                notif_query = """
-                    INSERT INTO notifications (
-                        id, recipient_id, message, notification_type, entity_id, is_read
+            # Notify all lab technicians in one statement
+            notifications = await fan_out_notification(
+                conn,
+                "lab_technician",
+                notification_title,
+                notification_content,
+                "new_lab_request",
+                request_id
+            )
+            background_tasks.add_task(push_notifications, notifications)
+            
+            # If urgent, also queue one email job for all of them
+            if request_data.urgency in ["urgent", "stat"]:
+                tech_emails = [n["email"] for n in notifications if n.get("email")]
+                if tech_emails:
+                    background_tasks.add_task(
+                        send_bulk_email,
+                        recipients=tech_emails,
+                        subject=notification_title,
+                        content=f"{notification_content}\n\nPlease log in to the system to process this request."
                     )
-                    VALUES ($1, $2, $3, $4, $5, false)
-                """
-                
-                await conn.execute(
-                    notif_query,
-                    uuid.uuid4(),  # unique ID for each notification
-                    tech_id,
-                    f"{notification_title}: {notification_content}",
-                    "new_lab_request",
-                    request_id
-                )
-                
-                # If urgent, also queue email
-                if request_data.urgency in ["urgent", "stat"]:
-                    # Get tech email
-                    email_query = "SELECT email FROM users WHERE id = $1"
-                    tech_email = await conn.fetchval(email_query, tech_id)
-                    
-                    if tech_email:
-                        background_tasks.add_task(
-                            send_email,
-                            recipient=tech_email,
-                            subject=notification_title,
-                            content=f"{notification_content}\n\nPlease log in to the system to process this request."
-                        )
             
             # Synchronize the lab request with the lab service
             # Add this to background tasks to avoid blocking the doctor's workflow
@@ -266,20 +251,9 @@ async def get_lab_requests(
                 detail="Invalid sort_order parameter. Must be one of: asc, desc"
             )
         
-        # Build query with filters
+        # Build query with filters; the filters go into the count query too, which skips
+        # the file aggregate
         query = """
-            SELECT lr.*, 
-                   p.first_name || ' ' || p.last_name as patient_name,
-                   u.full_name as doctor_name,
-                   COALESCE(array_length(lr_files.file_ids, 1), 0) as file_count
-            FROM lab_requests lr
-            JOIN patients p ON lr.patient_id = p.id
-            JOIN users u ON lr.doctor_id = u.id
-            LEFT JOIN (
-                SELECT lab_request_id, array_agg(id) as file_ids
-                FROM lab_request_files
-                GROUP BY lab_request_id
-            ) lr_files ON lr.id = lr_files.lab_request_id
             WHERE lr.doctor_id = $1 AND lr.is_active = true
         """
         
@@ -322,10 +296,27 @@ async def get_lab_requests(
             params.append(date_to)
             param_index += 1
             
-        # Add count query for pagination
         count_query = f"""
-            SELECT COUNT(*)
-            FROM ({query}) as filtered_requests
+            SELECT 1
+            FROM lab_requests lr
+            JOIN patients p ON lr.patient_id = p.id
+            JOIN users u ON lr.doctor_id = u.id
+            {query}
+        """
+        query = f"""
+            SELECT lr.*, 
+                   p.first_name || ' ' || p.last_name as patient_name,
+                   u.full_name as doctor_name,
+                   COALESCE(array_length(lr_files.file_ids, 1), 0) as file_count
+            FROM lab_requests lr
+            JOIN patients p ON lr.patient_id = p.id
+            JOIN users u ON lr.doctor_id = u.id
+            LEFT JOIN (
+                SELECT lab_request_id, array_agg(id) as file_ids
+                FROM lab_request_files
+                GROUP BY lab_request_id
+            ) lr_files ON lr.id = lr_files.lab_request_id
+            {query}
         """
         
         # Add sorting and pagination
@@ -335,19 +326,19 @@ async def get_lab_requests(
         
         async with pool.acquire() as conn:
             # Get total count
-            total = await conn.fetchval(count_query, *params[:-2])
+            total = await list_counts.count(conn, count_query, *params[:-2])
             
             # Get paginated records
             records = await conn.fetch(query, *params)
-            lab_requests = [dict(record) for record in records]
             
             # Calculate dashboard metrics
             metrics = await get_lab_request_metrics(pool, doctor_id)
             
-            return {
+            return lean_response(schemas.LabRequestsListResponse, {
                 "success": True,
-                "lab_requests": lab_requests,
+                "lab_requests": records,
                 "total": total,
+                "total_exact": is_exact(total),
                 "metrics": metrics,
                 "filters_applied": {
                     "status": status,
@@ -358,7 +349,7 @@ async def get_lab_requests(
                     "date_from": date_from.isoformat() if date_from else None,
                     "date_to": date_to.isoformat() if date_to else None,
                 }
-            }
+            })
             
     except Exception as e:
         raise DatabaseException(detail=f"Failed to get lab requests: {str(e)}")
@@ -419,7 +410,7 @@ async def get_lab_request(
             
             for file_record in file_records:
                 file_dict = dict(file_record)
-                file_dict["download_url"] = get_file_url(file_dict["id"], "lab_request_file")
+                file_dict["download_url"] = file_download_url(request_id, file_dict["id"])
                 files.append(file_dict)
                 
             # Get lab comments
@@ -591,6 +582,7 @@ async def update_lab_request(
 # ==== DELETE LAB REQUEST ====
 @router.delete("/{request_id}/permanent", response_model=schemas.BaseResponse)
 async def delete_lab_request(
+    background_tasks: BackgroundTasks,
     request_id: uuid.UUID = Path(...),
     deletion_reason: str = Query(None, description="Reason for deletion"),
     pool = Depends(get_db_pool),
@@ -679,14 +671,16 @@ async def delete_lab_request(
                     f"for patient {patient_name}.\n\nReason: {deletion_note}"
                 )
                 
-                await create_notification_for_role(
-                    pool,
+                notifications = await fan_out_notification(
+                    conn,
                     "lab_technician",
                     notification_title,
                     notification_content,
                     "lab_request_deleted",
                     request_id
                 )
+                # Sent once the transaction has committed
+                background_tasks.add_task(push_notifications, notifications)
                 
                 return {
                     "success": True,
@@ -703,6 +697,7 @@ async def delete_lab_request(
 # ==== CANCEL LAB REQUEST ====
 @router.delete("/{request_id}", response_model=schemas.BaseResponse)
 async def cancel_lab_request(
+    background_tasks: BackgroundTasks,
     request_id: uuid.UUID = Path(...),
     cancellation_reason: str = Query(None, description="Reason for cancellation"),
     pool = Depends(get_db_pool),
@@ -784,14 +779,16 @@ async def cancel_lab_request(
                     f"for patient {patient_name}.\n\nReason: {cancel_note}"
                 )
                 
-                await create_notification_for_role(
-                    pool,
+                notifications = await fan_out_notification(
+                    conn,
                     "lab_technician",
                     notification_title,
                     notification_content,
                     "lab_request_cancelled",
                     request_id
                 )
+                # Sent once the transaction has committed
+                background_tasks.add_task(push_notifications, notifications)
                 
                 return {
                     "success": True,
@@ -915,25 +912,18 @@ async def upload_file_to_lab_request(
             if not record:
                 raise LabRequestNotFoundException()
             
-            # Read file content
-            file_content = await file.read()
-            file_size = len(file_content)
-            
-            # Save file to storage and get file ID
-            file_id = await save_file_to_storage(
-                file_content, 
-                file.filename, 
-                file.content_type, 
-                "lab_request_file"
-            )
+            # Stream the file into storage (content-addressed, so a repeated scan is stored once)
+            stored = await save_upload_to_storage(file, "lab_request_file")
+            file_id = uuid.uuid4()
+            file_size = stored.size
             
             # Save file metadata in database
             file_query = """
                 INSERT INTO lab_request_files (
                     id, lab_request_id, filename, file_type, file_size, 
-                    description, uploaded_by
+                    description, uploaded_by, content_hash
                 )
-                VALUES ($1, $2, $3, $4, $5, $6, $7)
+                VALUES ($1, $2, $3, $4, $5, $6, $7, $8)
                 RETURNING id, filename, file_type, file_size, description, created_at
             """
             
@@ -945,11 +935,12 @@ async def upload_file_to_lab_request(
                 file.content_type,
                 file_size,
                 file_description,
-                doctor_id
+                doctor_id,
+                stored.content_hash
             )
             
             file_data = dict(file_record)
-            file_data["download_url"] = get_file_url(file_id, "lab_request_file")
+            file_data["download_url"] = file_download_url(request_id, file_id)
             
             # Add history record
             history_id = uuid.uuid4()
@@ -1010,12 +1001,48 @@ async def upload_file_to_lab_request(
     except Exception as e:
         raise DatabaseException(detail=f"Failed to upload file: {str(e)}")
 
+# ==== DOWNLOAD LAB REQUEST FILE ====
+@router.get("/{request_id}/files/{file_id}")
+async def download_lab_request_file(
+    request_id: uuid.UUID = Path(...),
+    file_id: uuid.UUID = Path(...),
+    pool = Depends(get_db_pool),
+    doctor_id: uuid.UUID = Query(..., description="Doctor ID from frontend"),
+):
+    """Download a file attached to a lab request."""
+    async with pool.acquire() as conn:
+        file_record = await conn.fetchrow(
+            """
+            SELECT f.filename, f.file_type, f.content_hash
+            FROM lab_request_files f
+            JOIN lab_requests lr ON lr.id = f.lab_request_id
+            WHERE f.id = $1 AND f.lab_request_id = $2 AND lr.doctor_id = $3 AND lr.is_active = true
+            """,
+            file_id, request_id, doctor_id
+        )
+    
+    if not file_record or not file_record["content_hash"]:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="File not found")
+    
+    file_path = get_blob_path(file_record["content_hash"])
+    if not file_path.exists():
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="File not found")
+    
+    # Stored under its content hash, so the hash is the ETag and the file never changes
+    return RangeFileResponse(
+        file_path,
+        content_hash=file_record["content_hash"],
+        immutable=True,
+        media_type=file_record["file_type"],
+        filename=file_record["filename"]
+    )
+
 # ==== ANALYTICS AND REPORTING ====
 @router.get("/analytics/summary", response_model=schemas.LabRequestAnalyticsSummary)
 async def get_lab_request_analytics(
     date_from: Optional[date] = Query(None, description="Start date for analytics"),
     date_to: Optional[date] = Query(None, description="End date for analytics"),
-    pool = Depends(get_db_pool),
+    pool = Depends(get_read_db_pool),
     doctor_id: uuid.UUID = Query(..., description="Doctor ID from frontend"),
 ):
     """Get analytics and summary statistics for lab requests."""
@@ -1027,78 +1054,45 @@ async def get_lab_request_analytics(
             date_from = date_to - timedelta(days=30)
             
         async with pool.acquire() as conn:
-            # Get status counts
-            status_query = """
-                SELECT status, COUNT(*) as count
-                FROM lab_requests
-                WHERE doctor_id = $1 
-                AND is_active = true
-                AND DATE(created_at) BETWEEN $2 AND $3
-                GROUP BY status
-            """
-            
-            status_records = await conn.fetch(status_query, doctor_id, date_from, date_to)
-            status_counts = {record["status"]: record["count"] for record in status_records}
-            
-            # Get counts by test type
-            test_type_query = """
-                SELECT test_type, COUNT(*) as count
-                FROM lab_requests
-                WHERE doctor_id = $1 
-                AND is_active = true
-                AND DATE(created_at) BETWEEN $2 AND $3
-                GROUP BY test_type
-                ORDER BY count DESC
-                LIMIT 10
+            # Read the doctor's daily rollup rows for the range (maintained by triggers,
+            # see migrations/add_lab_request_rollups.sql) and aggregate them here
+            rollup_query = """
+                SELECT bucket, test_type, urgency, status, request_count,
+                       turnaround_seconds, turnaround_count
+                FROM lab_request_rollup_daily
+                WHERE doctor_id = $1
+                AND bucket BETWEEN $2 AND $3
+                AND request_count <> 0
             """
             
-            test_type_records = await conn.fetch(test_type_query, doctor_id, date_from, date_to)
-            test_type_counts = [dict(record) for record in test_type_records]
-            
-            # Get counts by urgency
-            urgency_query = """
-                SELECT urgency, COUNT(*) as count
-                FROM lab_requests
-                WHERE doctor_id = $1 
-                AND is_active = true
-                AND DATE(created_at) BETWEEN $2 AND $3
-                GROUP BY urgency
-            """
-            
-            urgency_records = await conn.fetch(urgency_query, doctor_id, date_from, date_to)
-            urgency_counts = {record["urgency"]: record["count"] for record in urgency_records}
-            
-            # Get trend data (requests per day/week)
-            trend_query = """
-                SELECT DATE(created_at) as date, COUNT(*) as count
-                FROM lab_requests
-                WHERE doctor_id = $1 
-                AND is_active = true
-                AND DATE(created_at) BETWEEN $2 AND $3
-                GROUP BY DATE(created_at)
-                ORDER BY date
-            """
-            
-            trend_records = await conn.fetch(trend_query, doctor_id, date_from, date_to)
-            trend_data = [dict(record) for record in trend_records]
-            
-            # Get average turnaround time (from request to result)
-            turnaround_query = """
-                SELECT 
-                    EXTRACT(EPOCH FROM AVG(
-                        CASE 
-                            WHEN status = 'completed' THEN updated_at - created_at
-                            ELSE NULL
-                        END
-                    ))/3600 as avg_hours
-                FROM lab_requests
-                WHERE doctor_id = $1 
-                AND is_active = true
-                AND status = 'completed'
-                AND DATE(created_at) BETWEEN $2 AND $3
-            """
-            
-            avg_turnaround_hours = await conn.fetchval(turnaround_query, doctor_id, date_from, date_to)
+            rollup_records = await conn.fetch(rollup_query, doctor_id, date_from, date_to)
+            
+            status_counts: Dict[str, int] = {}
+            test_type_totals: Dict[str, int] = {}
+            urgency_counts: Dict[str, int] = {}
+            daily_counts: Dict[date, int] = {}
+            turnaround_seconds = 0.0
+            turnaround_count = 0
+            for record in rollup_records:
+                count = record["request_count"]
+                status_counts[record["status"]] = status_counts.get(record["status"], 0) + count
+                test_type_totals[record["test_type"]] = test_type_totals.get(record["test_type"], 0) + count
+                urgency_counts[record["urgency"]] = urgency_counts.get(record["urgency"], 0) + count
+                daily_counts[record["bucket"]] = daily_counts.get(record["bucket"], 0) + count
+                turnaround_seconds += record["turnaround_seconds"]
+                turnaround_count += record["turnaround_count"]
+            
+            # Top 10 test types
+            test_type_counts = [
+                {"test_type": test_type, "count": count}
+                for test_type, count in sorted(test_type_totals.items(), key=lambda item: -item[1])[:10]
+            ]
+            
+            # Trend data (requests per day)
+            trend_data = [{"date": day, "count": daily_counts[day]} for day in sorted(daily_counts)]
+            
+            # Average turnaround time (from request to result)
+            avg_turnaround_hours = turnaround_seconds / turnaround_count / 3600 if turnaround_count else None
             
             return {
                 "success": True,
@@ -1139,31 +1133,26 @@ async def get_lab_technicians(pool) -> List[Dict[str, Any]]:
 async def get_lab_request_metrics(pool, doctor_id: uuid.UUID) -> Dict[str, Any]:
     """Get lab request metrics for dashboard."""
     async with pool.acquire() as conn:
-        # Get counts by status
-        status_query = """
-            SELECT status, COUNT(*) as count
-            FROM lab_requests
-            WHERE doctor_id = $1 AND is_active = true
-            GROUP BY status
-        """
-        
-        status_records = await conn.fetch(status_query, doctor_id)
-        status_counts = {record["status"]: record["count"] for record in status_records}
-        
-        # Get pending urgent/stat requests count
-        urgent_query = """
-            SELECT COUNT(*) FROM lab_requests
-            WHERE doctor_id = $1 AND is_active = true 
-            AND status = 'pending' AND (urgency = 'urgent' OR urgency = 'stat')
+        # Counts by status and urgency from the trigger-maintained rollups
+        totals_query = """
+            SELECT urgency, status, request_count
+            FROM lab_request_rollup_totals
+            WHERE doctor_id = $1
         """
         
-        urgent_count = await conn.fetchval(urgent_query, doctor_id)
+        totals_records = await conn.fetch(totals_query, doctor_id)
+        status_counts: Dict[str, int] = {}
+        urgent_count = 0
+        for record in totals_records:
+            status_counts[record["status"]] = status_counts.get(record["status"], 0) + record["request_count"]
+            # Pending urgent/stat requests
+            if record["status"] == "pending" and record["urgency"] in ("urgent", "stat"):
+                urgent_count += record["request_count"]
         
         # Get today's new requests count
         today_query = """
-            SELECT COUNT(*) FROM lab_requests
-            WHERE doctor_id = $1 AND is_active = true 
-            AND DATE(created_at) = CURRENT_DATE
+            SELECT COALESCE(SUM(request_count), 0)::bigint FROM lab_request_rollup_daily
+            WHERE doctor_id = $1 AND bucket = CURRENT_DATE
         """
         
         today_count = await conn.fetchval(today_query, doctor_id)
@@ -2,9 +2,9 @@
 import uuid
 import json
 import asyncio
-from typing import Dict, Any, Optional
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends, Query, Path
-from ..websocket import manager
+from typing import Dict, Any
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends, Path
+from ..websocket import manager, get_websocket_user
 from ..models import LabRequest
 from ..schemas import LabResultNotification
 from ..dependencies import get_db_pool
@@ -14,11 +14,17 @@ router = APIRouter(prefix="/ws", tags=["WebSockets"])
 @router.websocket("/lab-results/{doctor_id}")
 async def lab_results_websocket(
     websocket: WebSocket,
-    doctor_id: str,
-    token: Optional[str] = Query(None)
+    doctor_id: str
 ):
     """WebSocket endpoint for receiving real-time lab results."""
-    connection_id = await manager.connect(websocket, doctor_id)
+    user = await get_websocket_user(websocket)
+    if not user:
+        return
+    # Only the doctor themself may subscribe under their id
+    if user["id"] != doctor_id:
+        await websocket.close(code=1008, reason="Token does not belong to this doctor")
+        return
+    connection_id = await manager.connect(websocket, user["id"], role=user.get("role"))
     
     try:
         # Send initial connection message
@@ -1,5 +1,5 @@
 # doctor_service/app/routers/notifications.py
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from uuid import UUID
 from typing import Optional
 from asyncpg import Connection
@@ -10,6 +10,7 @@ from datetime import datetime
 from app.schemas import NotificationCreate, NotificationResponse, NotificationsResponse
 from app.models import NotificationModel
 from app.dependencies import get_db_pool
+from app.http_cache import not_modified
 from app.websocket import manager
 
 router = APIRouter(prefix="/notifications", tags=["Notifications"])
@@ -35,12 +36,17 @@ async def create_notification(
 
 @router.get("/", response_model=NotificationsResponse)
 async def get_user_notifications(
+    request: Request,
     user_id: UUID4,
     page: int = 1,
     page_size: int = 20,
     conn: Connection = Depends(get_db_pool),
 ):
-    """Get notifications for a specific user."""
+    """Get notifications for a specific user. Poll with If-None-Match: no news answers 304."""
+    response = not_modified(request, *await NotificationModel.user_version(conn, user_id))
+    if response:
+        return response
+    
     # Calculate offset
     offset = (page - 1) * page_size
     
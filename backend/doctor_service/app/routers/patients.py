@@ -1,10 +1,14 @@
 import uuid
-from typing import List, Dict, Any
+from datetime import date
+from typing import List, Dict, Any, Optional
 import logging
 import asyncpg
 from fastapi import APIRouter, Depends, HTTPException, Query, Path, Request, status
 from app import models, schemas
-from app.dependencies import get_db_pool
+from app.dependencies import get_db_pool, get_read_db_pool
+from app.config import settings
+from app.database import read_connection
+from app.export import FORMAT_PATTERN, export_response
 from fastapi.security import OAuth2PasswordBearer
 from app.exceptions import PatientNotFoundException, DatabaseException
 from app.services.cardroom_service import get_assigned_patients, get_patient_details
@@ -30,6 +34,24 @@ logger.setLevel(logging.INFO)  # or DEBUG
 
 # doctor_service/app/routers/patients.py
 
+@router.get("/medical-records/export")
+async def export_medical_records(
+    doctor_id: uuid.UUID = Query(..., description="Doctor ID from frontend"),
+    format: str = Query("ndjson", regex=FORMAT_PATTERN, description="ndjson or csv"),
+    patient_id: Optional[uuid.UUID] = Query(None, description="Only this patient's records"),
+    from_date: Optional[date] = Query(None, description="Created on or after this date"),
+    to_date: Optional[date] = Query(None, description="Created on or before this date"),
+):
+    """
+    Download the medical records the doctor can access as NDJSON or CSV,
+    oldest first, streamed from a database cursor (app/export.py).
+    """
+    query, params = models.MedicalRecord.export_query(doctor_id, patient_id, from_date, to_date)
+    return export_response(
+        read_connection, query, *params,
+        format=format, filename="medical_records", batch_size=settings.EXPORT_BATCH_SIZE
+    )
+
 @router.get("/", response_model=PatientsListResponse)
 async def get_assigned_patients_list(
     doctor_id: str = Query(..., description="Doctor ID"),
@@ -330,7 +352,7 @@ from ..services.timeline_service import get_patient_timeline_fast
 async def get_patient_status_timeline(
     patient_id: uuid.UUID = Path(..., description="Patient UUID"),
     doctor_id: uuid.UUID = Query(..., description="Doctor ID from frontend"),
-    pool = Depends(get_db_pool)
+    pool = Depends(get_read_db_pool)
 ):
     """
     High-performance endpoint to get patient status timeline.
@@ -3,6 +3,7 @@ import logging
 from ..dependencies import get_db_pool
 from ..models import UserModel
 from ..schemas import UserSync
+from ..websocket import manager
 import asyncpg
 
 # Setup logging
@@ -43,6 +44,9 @@ async def sync_user(
 ):
     logger.info(f"Received sync request for user: {user_data.id}")
     
+    # Keep the websocket role index in step with the user directory
+    manager.update_user_role(user_data.id, user_data.role, user_data.is_active)
+    
     try:
         existing_user = await UserModel.get_user_by_id(conn, user_data.id)
         
@@ -323,6 +323,8 @@ class LabRequestResponse(BaseResponse):
 class LabRequestsListResponse(BaseResponse):
     lab_requests: List[LabRequestInfo]
     total: int
+    # False when total is the planner's estimate for a large list
+    total_exact: bool = True
 
 class AppointmentsListResponse(BaseResponse):
     appointments: List[AppointmentResponse]
@@ -1,6 +1,7 @@
 # doctor_service/app/services/auth_service.py
 import httpx
 import logging
+from app.http_client import get_http_client
 from fastapi import HTTPException, status
 from typing import Dict, Any
 
@@ -10,13 +11,12 @@ logger = logging.getLogger(__name__)
 async def extract_doctor_from_auth_service(token: str) -> Dict[str, Any]:
     try:
         headers = {"Authorization": f"Bearer {token}"}
-        async with httpx.AsyncClient() as client:
-            response = await client.get("http://auth_service:8022/users/me", headers=headers)
-            if response.status_code != 200:
-                raise HTTPException(status_code=response.status_code, detail="Auth failed to get current doctor")
-            user = response.json()
-            if user.get("role") != "doctor":
-                raise HTTPException(status_code=403, detail="Access restricted to doctors only")
-            return user
+        response = await get_http_client("auth").get("/users/me", headers=headers)
+        if response.status_code != 200:
+            raise HTTPException(status_code=response.status_code, detail="Auth failed to get current doctor")
+        user = response.json()
+        if user.get("role") != "doctor":
+            raise HTTPException(status_code=403, detail="Access restricted to doctors only")
+        return user
     except httpx.RequestError as e:
         raise HTTPException(status_code=503, detail=f"Auth service unavailable: {str(e)}")
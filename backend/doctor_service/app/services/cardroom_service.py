@@ -8,6 +8,7 @@ from datetime import date
 import uuid
 from uuid import UUID
 from typing import List, Dict, Any, Optional, Tuple
+import asyncpg
 from asyncpg import Pool
 from fastapi import HTTPException
 from functools import lru_cache
@@ -15,20 +16,15 @@ from datetime import datetime, timedelta
 from app.models import Patient
 from app.config import settings
 from app.database import get_app_pool  # Import the app-level pool
+from app.http_client import get_http_client
+from app.single_flight import SingleFlightCache
 
 
 logger = logging.getLogger(__name__)
 
-# Connection pool for HTTP requests with sensible defaults
-http_client = httpx.AsyncClient(
-    timeout=10.0,
-    limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
-    transport=httpx.AsyncHTTPTransport(retries=3)
-)
-
-# In-memory cache for patient data
-CACHE = {}
+# In-memory cache for patient data; concurrent lookups of one patient share a single request
 CACHE_TTL = 300  # seconds
+patient_cache = SingleFlightCache("patients", ttl=CACHE_TTL, stale_ttl=CACHE_TTL, maxsize=5000)
 CACHE_LOCK = asyncio.Lock()
 _SYNC_IN_PROGRESS = {}  # Track ongoing syncs by doctor_id
 
@@ -80,37 +76,25 @@ async def _safe_db_operation(func, *args, **kwargs):
         logger.error(f"Database operation failed: {str(e)}")
         return None
 
-async def get_patient_details(patient_id: UUID, request_pool=None) -> dict:
-    """Fetch patient details with cache support"""
-    cache_key = f"patient:{str(patient_id)}"
+async def _load_patient(patient_id: UUID) -> dict:
+    """Fetch one patient from cardroom and store it locally"""
+    response = await get_http_client("cardroom").get(f"/api/patients/{patient_id}")
+    response.raise_for_status()
+    patient_data = response.json()
     
-    # Try cache first for better performance
-    cached_data = CACHE.get(cache_key)
-    if cached_data and (datetime.now() - cached_data['timestamp']).total_seconds() < CACHE_TTL:
-        logger.debug(f"Cache hit for patient {patient_id}")
-        return cached_data['data']
+    # Store in database without awaiting result
+    # Use a safe background task that handles its own pool
+    asyncio.create_task(
+        _safe_db_operation(Patient.upsert_patient, patient_data)
+    )
     
-    # Not in cache, fetch from cardroom service
+    return patient_data
+
+async def get_patient_details(patient_id: UUID, request_pool=None) -> dict:
+    """Fetch patient details with cache support"""
     try:
-        response = await http_client.get(
-            f"{settings.CARDROOM_SERVICE_URL}/api/patients/{patient_id}"
-        )
-        response.raise_for_status()
-        patient_data = response.json()
-        
-        # Store in cache
-        CACHE[cache_key] = {
-            'data': patient_data,
-            'timestamp': datetime.now()
-        }
-        
-        # Store in database without awaiting result
-        # Use a safe background task that handles its own pool
-        asyncio.create_task(
-            _safe_db_operation(Patient.upsert_patient, patient_data)
-        )
-            
-        return patient_data
+        # Cached, or one shared cardroom request for all concurrent callers
+        return await patient_cache.get(str(patient_id), lambda: _load_patient(patient_id))
         
     except httpx.HTTPStatusError as e:
         if e.response.status_code == 404:
@@ -147,6 +131,103 @@ async def get_patient_details(patient_id: UUID, request_pool=None) -> dict:
             detail=f"Failed to fetch patient data: {str(e)}"
         )
 
+def _cache_patients(patients: List[Dict[str, Any]]):
+    """Store a batch of patients in the cache"""
+    patient_cache.set_many((str(patient['id']), patient) for patient in patients)
+
+async def _upsert_patients(pool: Pool, patients: List[Dict[str, Any]]):
+    """Store a batch of cardroom patients locally, in one statement"""
+    try:
+        changed = await Patient.upsert_patients(pool, patients)
+    except asyncpg.UniqueViolationError as e:
+        # e.g. a registration number that moved to another patient; store the rest one by one
+        logger.warning(f"Bulk patient sync conflicted, storing patients individually: {str(e)}")
+        for patient in patients:
+            await Patient.upsert_patient(pool, patient)
+        return
+    logger.info(f"Synced {len(patients)} patients, {len(changed)} new or changed")
+
+async def _fetch_patient_chunk(patient_ids: List[str]) -> List[Dict[str, Any]]:
+    """Look up one chunk of patients through cardroom's bulk endpoint"""
+    response = await get_http_client("cardroom").post(
+        "/api/patients/batch", json={"ids": patient_ids},
+        headers={"Authorization": f"Bearer {settings.SERVICE_TOKEN}"}
+    )
+    response.raise_for_status()
+    return response.json()["data"]
+
+async def _fetch_patients_individually(patient_ids: List[str], request_pool=None) -> List[Dict[str, Any]]:
+    """Per-patient lookups, for cardroom instances without the bulk endpoint"""
+    semaphore = asyncio.Semaphore(5)  # Limit concurrent requests
+    
+    async def fetch_with_limit(pid):
+        async with semaphore:
+            return await get_patient_details(pid, request_pool)
+    
+    patients = []
+    for result in await asyncio.gather(*(fetch_with_limit(pid) for pid in patient_ids), return_exceptions=True):
+        if isinstance(result, Exception):
+            logger.error(f"Error in patient batch processing: {str(result)}")
+        elif result:
+            patients.append(result)
+    return patients
+
+async def get_patients_bulk(patient_ids, request_pool=None) -> Dict[str, Dict[str, Any]]:
+    """
+    Fetch many patients at once, keyed by patient ID.
+    
+    Cached patients are served directly; the rest are looked up through
+    cardroom's bulk endpoint in chunks of CARDROOM_PATIENT_BATCH_SIZE and
+    cached together. Chunks that fail fall back to the local database.
+    """
+    ids = list(dict.fromkeys(str(pid) for pid in patient_ids if pid))
+    patients = {}
+    misses = []
+    
+    for pid in ids:
+        cached_data = patient_cache.peek(pid)
+        if cached_data is not None:
+            patients[pid] = cached_data
+        else:
+            misses.append(pid)
+    
+    if not misses:
+        return patients
+    
+    batch_size = settings.CARDROOM_PATIENT_BATCH_SIZE
+    chunks = [misses[i:i + batch_size] for i in range(0, len(misses), batch_size)]
+    results = await asyncio.gather(*(_fetch_patient_chunk(chunk) for chunk in chunks), return_exceptions=True)
+    
+    fetched = []
+    failed = []
+    for chunk, result in zip(chunks, results):
+        if isinstance(result, httpx.HTTPStatusError) and result.response.status_code in (404, 405):
+            # Older cardroom without the bulk endpoint
+            logger.warning("Cardroom bulk patient lookup unavailable, fetching individually")
+            patients.update({str(p['id']): p for p in await _fetch_patients_individually(chunk, request_pool)})
+        elif isinstance(result, Exception):
+            logger.error(f"Bulk patient lookup failed for {len(chunk)} patients: {str(result)}")
+            failed.extend(chunk)
+        else:
+            fetched.extend(result)
+    
+    if fetched:
+        _cache_patients(fetched)
+        # Store in database without awaiting result
+        asyncio.create_task(_safe_db_operation(_upsert_patients, fetched))
+        patients.update({str(p['id']): p for p in fetched})
+    
+    if failed:
+        # Fallback to local database if available
+        try:
+            pool = request_pool or await get_app_pool()
+            for patient in await Patient.get_by_ids(pool, [UUID(pid) for pid in failed]):
+                patients[str(patient['id'])] = patient
+        except Exception as db_error:
+            logger.error(f"Database fallback error: {str(db_error)}")
+    
+    return patients
+
 async def get_assigned_patients(doctor_id: UUID, request_pool=None) -> List[Dict[str, Any]]:
     """Fetch all patients assigned to a doctor efficiently using batched requests"""
     doctor_id_str = str(doctor_id)
@@ -161,23 +242,19 @@ async def get_assigned_patients(doctor_id: UUID, request_pool=None) -> List[Dict
         
         # Try to use optimized batch endpoint
         try:
-            batch_url = f"{settings.CARDROOM_SERVICE_URL}/api/opd-assignments/doctor/{doctor_id}/patients"
+            batch_url = f"/api/opd-assignments/doctor/{doctor_id}/patients"
             logger.info(f"Fetching patients in batch from {batch_url}")
             
-            response = await http_client.get(batch_url, timeout=15.0)
+            response = await get_http_client("cardroom").get(batch_url, timeout=15.0)
             response.raise_for_status()
             patients = response.json()
             
-            # Cache and store each patient
-            for patient in patients:
-                cache_key = f"patient:{patient['id']}"
-                CACHE[cache_key] = {
-                    'data': patient,
-                    'timestamp': datetime.now()
-                }
+            # Cache and store the whole batch
+            _cache_patients(patients)
+            if patients:
                 # Store in DB without awaiting, using safe background task
                 asyncio.create_task(
-                    _safe_db_operation(Patient.upsert_patient, patient)
+                    _safe_db_operation(_upsert_patients, patients)
                 )
             
             logger.info(f"Successfully fetched {len(patients)} patients in batch")
@@ -188,35 +265,18 @@ async def get_assigned_patients(doctor_id: UUID, request_pool=None) -> List[Dict
             logger.warning(f"Batch endpoint failed, using fallback method: {str(e)}")
             
             # Get assignments via schedule endpoint
-            schedule_url = f"{settings.CARDROOM_SERVICE_URL}/api/opd-assignments/doctor/{doctor_id}/schedule"
+            schedule_url = f"/api/opd-assignments/doctor/{doctor_id}/schedule"
             logger.info(f"Fetching assignments from {schedule_url}")
             
-            response = await http_client.get(schedule_url)
+            response = await get_http_client("cardroom").get(schedule_url)
             response.raise_for_status()
             assignments = response.json()
             
             # Get unique patient IDs from assignments
             patient_ids = set(assignment.get('patient_id') for assignment in assignments if assignment.get('patient_id'))
             
-            # Batch process patients with concurrency limit
-            patients = []
-            semaphore = asyncio.Semaphore(5)  # Limit concurrent requests
-            
-            async def fetch_with_limit(pid):
-                async with semaphore:
-                    return await get_patient_details(pid, request_pool)
-            
-            # Create tasks for all patient IDs
-            tasks = [fetch_with_limit(pid) for pid in patient_ids]
-            
-            # Process results as they complete
-            for completed_task in asyncio.as_completed(tasks):
-                try:
-                    patient = await completed_task
-                    if patient:
-                        patients.append(patient)
-                except Exception as task_error:
-                    logger.error(f"Error in patient batch processing: {str(task_error)}")
+            # Bulk lookup instead of one request per patient
+            patients = list((await get_patients_bulk(patient_ids, request_pool)).values())
             
             logger.info(f"Fetched {len(patients)} patients via fallback method")
             return patients
@@ -254,10 +314,6 @@ async def _background_sync(doctor_id: UUID):
     except Exception as e:
         logger.error(f"Background sync failed: {str(e)}")
 
-# Clean up HTTP client on application shutdown
-async def cleanup():
-    await http_client.aclose()
-
 # Background task for syncing
 async def background_sync_patients(pool: Pool, doctor_id: UUID):
     """Background task to sync patients for a doctor"""
@@ -276,20 +332,19 @@ async def get_doctor_appointments_from_cardroom(
     end_date: date
 ):
     """Fetch appointments from Cardroom Service"""
-    url = f"http://cardroom_service:8023/api/appointments/doctor/{doctor_id}/schedule"
+    url = f"/api/appointments/doctor/{doctor_id}/schedule"
     
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                url,
-                json={
-                    "start_date": start_date.isoformat(),
-                    "end_date": end_date.isoformat()
-                },
-                timeout=10.0
-            )
-            response.raise_for_status()
-            return response.json()
+        response = await get_http_client("cardroom").post(
+            url,
+            json={
+                "start_date": start_date.isoformat(),
+                "end_date": end_date.isoformat()
+            },
+            timeout=10.0
+        )
+        response.raise_for_status()
+        return response.json()
             
     except httpx.HTTPStatusError as e:
         raise HTTPException(
@@ -310,13 +365,12 @@ async def update_cardroom_appointment(
 ):
     """Update appointment in Cardroom Service"""
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.patch(
-                f"http://cardroom_service:8023/api/appointments/{appointment_id}",
-                json={"status": status, "notes": notes}
-            )
-            response.raise_for_status()
-            return response.json()
+        response = await get_http_client("cardroom").patch(
+            f"/api/appointments/{appointment_id}",
+            json={"status": status, "notes": notes}
+        )
+        response.raise_for_status()
+        return response.json()
             
     except httpx.HTTPStatusError as e:
         raise HTTPException(
@@ -330,12 +384,9 @@ async def get_single_appointment_from_cardroom(
 ):
     """Get single appointment directly from Cardroom Service"""
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"http://cardroom_service:8023/api/appointments/{appointment_id}"
-            )
-            response.raise_for_status()
-            return response.json()
+        response = await get_http_client("cardroom").get(f"/api/appointments/{appointment_id}")
+        response.raise_for_status()
+        return response.json()
             
     except httpx.HTTPStatusError as e:
         if e.response.status_code == 404:
@@ -429,35 +480,34 @@ async def get_patient_opd_assignments(patient_id: UUID, doctor_id: UUID) -> List
     events = []
     
     try:
-        # Use existing http_client with retry logic
-        url = f"{settings.CARDROOM_SERVICE_URL}/api/opd-assignments/patient/{patient_id}"
+        # Shared cardroom client with keep-alive and retry logic
+        url = f"/api/opd-assignments/patient/{patient_id}"
         
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url, timeout=10.0)
-            
-            if response.status_code != 200:
-                logger.error(f"Failed to fetch OPD assignments: {response.status_code} - {response.text}")
-                return events
-                
-            assignments = response.json()
+        response = await get_http_client("cardroom").get(url, timeout=10.0)
+        
+        if response.status_code != 200:
+            logger.error(f"Failed to fetch OPD assignments: {response.status_code} - {response.text}")
+            return events
             
-            for assignment in assignments:
-                # Only include assignments to the current doctor
-                if assignment.get("doctor_id") == str(doctor_id):
-                    created_at = assignment.get("created_at")
-                    if created_at:
-                        if isinstance(created_at, str):
-                            created_at = datetime.fromisoformat(created_at.replace("Z", "+00:00"))
-                            
-                        events.append(PatientStatusEntry(
-                            status="ASSIGNED_OPD",
-                            timestamp=created_at,
-                            details={
-                                "assignment_id": assignment.get("id"),
-                                "doctor_name": assignment.get("doctor_name", "Unknown Doctor"),
-                                "priority": assignment.get("priority", "NORMAL")
-                            }
-                        ))
+        assignments = response.json()
+        
+        for assignment in assignments:
+            # Only include assignments to the current doctor
+            if assignment.get("doctor_id") == str(doctor_id):
+                created_at = assignment.get("created_at")
+                if created_at:
+                    if isinstance(created_at, str):
+                        created_at = datetime.fromisoformat(created_at.replace("Z", "+00:00"))
+                        
+                    events.append(PatientStatusEntry(
+                        status="ASSIGNED_OPD",
+                        timestamp=created_at,
+                        details={
+                            "assignment_id": assignment.get("id"),
+                            "doctor_name": assignment.get("doctor_name", "Unknown Doctor"),
+                            "priority": assignment.get("priority", "NORMAL")
+                        }
+                    ))
         
         return events
     except Exception as e:
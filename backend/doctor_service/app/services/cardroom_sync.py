@@ -0,0 +1,203 @@
+# doctor_service/app/services/cardroom_sync.py
+"""
+Incremental sync of patients and OPD assignments from cardroom's change feed.
+
+A background worker polls ``GET /api/changes?since=<cursor>`` every
+CARDROOM_SYNC_INTERVAL seconds and applies only the rows that changed since
+the last poll, in pages of CARDROOM_SYNC_BATCH_SIZE: patients with one bulk
+upsert (one by one if it conflicts, skipping rows that still do), OPD
+assignments as local patient-doctor assignments. Cached patients
+are refreshed in place, so lookups see cardroom's changes within seconds
+instead of after the cache TTL. The cursor is kept in ``sync_cursors``
+(created at startup if missing, see app/database); a page may be applied twice
+after a crash, which the upserts tolerate.
+"""
+import asyncio
+import logging
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+import asyncpg
+import httpx
+
+from app.config import settings
+from app.http_client import get_http_client
+from app.models import Patient
+
+logger = logging.getLogger(__name__)
+
+CURSOR_NAME = "cardroom"
+
+
+class CardroomChangeSync:
+    """Polls cardroom's change feed and applies the changes locally"""
+
+    def __init__(self, interval: float = 5.0, batch_size: int = 500, max_backoff: float = 300.0):
+        self.interval = interval
+        self.batch_size = batch_size
+        self.max_backoff = max_backoff
+        self.cursor: Optional[str] = None
+        self.pages = 0
+        self.patient_changes = 0
+        self.assignment_changes = 0
+        self.skipped_patients = 0
+        self.failures = 0
+        self.last_error: Optional[str] = None
+        self.last_synced: Optional[float] = None
+        self._pool = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def load_cursor(self, pool) -> Optional[str]:
+        async with pool.acquire() as conn:
+            return await conn.fetchval("SELECT cursor FROM sync_cursors WHERE name = $1", CURSOR_NAME)
+
+    async def fetch_page(self) -> Dict[str, Any]:
+        params = {"limit": self.batch_size}
+        if self.cursor:
+            params["since"] = self.cursor
+        response = await get_http_client("cardroom").get(
+            "/api/changes/", params=params, headers={"Authorization": f"Bearer {settings.SERVICE_TOKEN}"}
+        )
+        response.raise_for_status()
+        return response.json()
+
+    async def apply(self, pool, page: Dict[str, Any]):
+        """Apply one page of changes and store its cursor"""
+        from app.services.cardroom_service import patient_cache
+
+        patients = page.get("patients") or []
+        live = [p for p in patients if not p.get("is_deleted")]
+        deleted = [uuid.UUID(str(p["id"])) for p in patients if p.get("is_deleted")]
+        if live:
+            await self.upsert_patients(pool, live)
+
+        assignments = [
+            a for a in page.get("opd_assignments") or []
+            if not a.get("is_deleted") and a.get("patient_id") and a.get("doctor_id")
+        ]
+        async with pool.acquire() as conn:
+            async with conn.transaction():
+                if deleted:
+                    await conn.execute(
+                        "UPDATE patients SET is_active = false, updated_at = NOW() WHERE id = ANY($1::uuid[])",
+                        deleted
+                    )
+                if assignments:
+                    # Skips doctors and patients that aren't known locally (yet)
+                    await conn.execute(
+                        """
+                        INSERT INTO patient_doctor_assignments
+                        (id, patient_id, doctor_id, assigned_at, is_active)
+                        SELECT a.id, a.patient_id, a.doctor_id, NOW(), true
+                        FROM unnest($1::uuid[], $2::uuid[], $3::uuid[]) AS a(id, patient_id, doctor_id)
+                        WHERE EXISTS (SELECT 1 FROM patients p WHERE p.id = a.patient_id)
+                          AND EXISTS (SELECT 1 FROM users u WHERE u.id = a.doctor_id)
+                        ON CONFLICT (patient_id, doctor_id, is_active) DO NOTHING
+                        """,
+                        [uuid.uuid4() for _ in assignments],
+                        [uuid.UUID(str(a["patient_id"])) for a in assignments],
+                        [uuid.UUID(str(a["doctor_id"])) for a in assignments]
+                    )
+                await conn.execute(
+                    """
+                    INSERT INTO sync_cursors (name, cursor, updated_at)
+                    VALUES ($1, $2, NOW())
+                    ON CONFLICT (name) DO UPDATE SET cursor = EXCLUDED.cursor, updated_at = NOW()
+                    """,
+                    CURSOR_NAME, page["cursor"]
+                )
+
+        # Refresh patients that are cached, drop deleted ones
+        patient_cache.set_many(
+            (str(p["id"]), p) for p in live if patient_cache.peek(str(p["id"])) is not None
+        )
+        for patient_id in deleted:
+            patient_cache.invalidate(str(patient_id))
+
+        self.cursor = page["cursor"]
+        self.pages += 1
+        self.patient_changes += len(patients)
+        self.assignment_changes += len(assignments)
+
+    async def upsert_patients(self, pool, patients: List[Dict[str, Any]]):
+        """
+        Store a page of patients in one statement, or one by one if it conflicts.
+        Patients that still conflict (e.g. a registration number held by another
+        local patient) are skipped and logged, so the cursor moves past them.
+        """
+        try:
+            await Patient.upsert_patients(pool, patients)
+            return
+        except asyncpg.UniqueViolationError as e:
+            logger.warning(f"Bulk patient sync conflicted, storing patients individually: {str(e)}")
+        for patient in patients:
+            try:
+                await Patient.upsert_patients(pool, [patient])
+            except asyncpg.UniqueViolationError as e:
+                self.skipped_patients += 1
+                logger.error(f"Skipped cardroom patient {patient.get('id')}: {str(e)}")
+
+    async def sync_once(self, pool) -> int:
+        """Apply all pending changes; returns the number of changed rows"""
+        if self.cursor is None:
+            self.cursor = await self.load_cursor(pool)
+        applied = 0
+        while True:
+            page = await self.fetch_page()
+            await self.apply(pool, page)
+            applied += len(page.get("patients") or []) + len(page.get("opd_assignments") or [])
+            if not page.get("has_more"):
+                break
+        self.last_synced = time.time()
+        return applied
+
+    async def start(self, pool):
+        self._pool = pool
+        self._task = asyncio.create_task(self._watch())
+
+    async def _watch(self):
+        delay = self.interval
+        while True:
+            try:
+                applied = await self.sync_once(self._pool)
+                if applied:
+                    logger.info(f"Applied {applied} changes from cardroom")
+                self.last_error = None
+                delay = self.interval
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.failures += 1
+                self.last_error = str(e)
+                if isinstance(e, httpx.HTTPStatusError) and e.response.status_code == 404:
+                    logger.warning("Cardroom has no change feed, retrying later")
+                else:
+                    logger.error(f"Cardroom change sync failed: {str(e)}")
+                # Back off while cardroom or the database is unavailable
+                delay = min(delay * 2, self.max_backoff)
+            await asyncio.sleep(delay)
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "running": self._task is not None,
+            "cursor": self.cursor,
+            "pages": self.pages,
+            "patient_changes": self.patient_changes,
+            "assignment_changes": self.assignment_changes,
+            "skipped_patients": self.skipped_patients,
+            "failures": self.failures,
+            "last_error": self.last_error,
+            "seconds_since_sync": round(time.time() - self.last_synced, 1) if self.last_synced else None,
+        }
+
+
+cardroom_sync = CardroomChangeSync(
+    interval=settings.CARDROOM_SYNC_INTERVAL,
+    batch_size=settings.CARDROOM_SYNC_BATCH_SIZE,
+)
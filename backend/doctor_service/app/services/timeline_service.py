@@ -1,6 +1,5 @@
 import asyncio
 import asyncpg
-import httpx
 from datetime import datetime, timedelta
 from typing import List, Dict, Any, Optional
 from uuid import UUID
@@ -8,6 +7,7 @@ import logging
 from functools import lru_cache
 import json
 from ..schemas import PatientStatusEntry
+from ..http_client import get_http_client
 
 logger = logging.getLogger(__name__)
 
@@ -193,25 +193,26 @@ async def get_patient_timeline_fast(
     # Fallback to a minimal implementation that makes just one external call
     try:
         # Attempt to get key data via HTTP for better performance
-        async with httpx.AsyncClient(timeout=2.0) as client:  # Short timeout for fast response
-            patient_url = f"http://cardroom_service:8023/api/patients/quick-view/{patient_id}"
-            try:
-                response = await client.get(
-                    patient_url,
-                    headers={"X-Service-Token": "internal_token"},
-                )
-                if response.status_code == 200:
-                    patient_data = response.json()
-                    timeline = create_timeline_from_quickview(patient_data, doctor_id)
-                    
-                    # Cache the result
-                    TIMELINE_CACHE[cache_key] = {
-                        'timeline': timeline,
-                        'timestamp': datetime.now().timestamp()
-                    }
-                    return timeline
-            except Exception as api_err:
-                logger.warning(f"Quick view API failed: {str(api_err)}")
+        patient_url = f"/api/patients/quick-view/{patient_id}"
+        try:
+            response = await get_http_client("cardroom").get(
+                patient_url,
+                headers={"X-Service-Token": "internal_token"},
+                timeout=2.0,  # Short timeout for fast response
+                retries=0
+            )
+            if response.status_code == 200:
+                patient_data = response.json()
+                timeline = create_timeline_from_quickview(patient_data, doctor_id)
+                
+                # Cache the result
+                TIMELINE_CACHE[cache_key] = {
+                    'timeline': timeline,
+                    'timestamp': datetime.now().timestamp()
+                }
+                return timeline
+        except Exception as api_err:
+            logger.warning(f"Quick view API failed: {str(api_err)}")
     except Exception as e:
         logger.error(f"Fallback error: {str(e)}")
     
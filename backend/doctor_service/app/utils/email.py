@@ -1,7 +1,7 @@
 import smtplib
 from email.message import EmailMessage
 import os
-from typing import Optional
+from typing import List, Optional
 import logging
 
 # Configure logging
@@ -44,9 +44,41 @@ class EmailService:
             logger.error(f"Failed to send email: {str(e)}")
             return False
 
+    async def send_bulk_email(
+        self,
+        recipients: List[str],
+        subject: str,
+        content: str
+    ) -> int:
+        """Send the same email to each recipient over one SMTP connection; returns how many were sent"""
+        sent = 0
+        try:
+            with smtplib.SMTP(self.smtp_server, self.smtp_port) as server:
+                server.starttls()
+                server.login(self.smtp_username, self.smtp_password)
+                for recipient in recipients:
+                    msg = EmailMessage()
+                    msg["Subject"] = subject
+                    msg["From"] = self.from_email
+                    msg["To"] = recipient
+                    msg.set_content(content)
+                    try:
+                        server.send_message(msg)
+                        sent += 1
+                    except smtplib.SMTPException as e:
+                        logger.error(f"Failed to send email to {recipient}: {str(e)}")
+        except Exception as e:
+            logger.error(f"Failed to send emails: {str(e)}")
+        logger.info(f"Email sent to {sent} of {len(recipients)} recipients")
+        return sent
+
 # Singleton instance
 email_service = EmailService()
 
 async def send_email(recipient: str, subject: str, content: str) -> bool:
     """Helper function for sending emails"""
-    return await email_service.send_email(recipient, subject, content)
\ No newline at end of file
+    return await email_service.send_email(recipient, subject, content)
+
+async def send_bulk_email(recipients: List[str], subject: str, content: str) -> int:
+    """Helper function for sending one email to many recipients"""
+    return await email_service.send_bulk_email(recipients, subject, content)
@@ -12,9 +12,10 @@ async def log_lab_request_event(
     user_id: Optional[str] = None
 ):
     """Log lab request events to the database for tracking."""
-    conn = await get_db_pool()
+    # The process-wide pool: borrow a connection, never close it
+    pool = await get_db_pool()
     
-    try:
+    async with pool.acquire() as conn:
         query = """
         INSERT INTO lab_request_events 
         (lab_request_id, event_type, user_id, details)
@@ -28,5 +29,3 @@ async def log_lab_request_event(
             user_id, 
             json.dumps(details, default=str)
         )
-    finally:
-        await conn.close()
\ No newline at end of file
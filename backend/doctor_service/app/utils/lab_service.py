@@ -5,6 +5,7 @@ import asyncio
 import logging
 from datetime import datetime
 from app.config import settings
+from app.http_client import get_http_client
 from .lab_request_ws_client import send_lab_request_via_ws
 
 logger = logging.getLogger(__name__)
@@ -19,8 +20,7 @@ async def send_notification_to_lab_tech(
 ) -> bool:
     """Send a notification to a lab technician through the lab service API."""
     try:
-        lab_service_url = settings.LAB_SERVICE_URL
-        notification_endpoint = f"{lab_service_url}/api/inter-service/notifications"
+        notification_endpoint = "/api/inter-service/notifications"
         
         # Prepare notification data
         notification_data = {
@@ -35,15 +35,14 @@ async def send_notification_to_lab_tech(
             notification_data["entity_id"] = str(lab_request_id)
             notification_data["entity_type"] = "lab_request"
         
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                notification_endpoint,
-                json=notification_data,
-                timeout=10.0
-            )
-            
-            response.raise_for_status()
-            return True
+        response = await get_http_client("labroom").post(
+            notification_endpoint,
+            json=notification_data,
+            timeout=10.0
+        )
+        
+        response.raise_for_status()
+        return True
     except Exception as e:
         logger.error(f"Failed to send notification to lab service: {e}")
         return False
@@ -55,21 +54,19 @@ async def process_lab_request(
 ) -> bool:
     """Process a lab request by calling the lab service API."""
     try:
-        lab_service_url = settings.LAB_SERVICE_URL
-        process_endpoint = f"{lab_service_url}/api/inter-service/lab-requests/{lab_request_id}/process"
+        process_endpoint = f"/api/inter-service/lab-requests/{lab_request_id}/process"
         
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                process_endpoint,
-                params={
-                    "technician_id": str(technician_id),
-                    "status": status
-                },
-                timeout=10.0
-            )
-            
-            response.raise_for_status()
-            return True
+        response = await get_http_client("labroom").post(
+            process_endpoint,
+            params={
+                "technician_id": str(technician_id),
+                "status": status
+            },
+            timeout=10.0
+        )
+        
+        response.raise_for_status()
+        return True
     except Exception as e:
         logger.error(f"Failed to process lab request: {e}")
         return False
@@ -96,8 +93,7 @@ async def create_lab_request_in_lab_service(lab_request: Dict[str, Any], max_ret
         logger.warning(f"WebSocket delivery failed, falling back to HTTP: {str(e)}")
     
     # HTTP fallback - check for duplicate error to avoid it
-    lab_service_url = settings.LAB_SERVICE_URL
-    create_endpoint = f"{lab_service_url}/api/inter-service/lab-requests"
+    create_endpoint = "/api/inter-service/lab-requests"
     
     # Convert UUID fields to strings for JSON serialization
     serialized_request = {}
@@ -113,27 +109,27 @@ async def create_lab_request_in_lab_service(lab_request: Dict[str, Any], max_ret
     
     while retry_count < max_retries:
         try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                logger.info(f"Sending lab request to lab service at {create_endpoint}")
-                
-                response = await client.post(
-                    create_endpoint,
-                    json=serialized_request,
-                    timeout=30.0
-                )
+            logger.info(f"Sending lab request to lab service at {create_endpoint}")
+            
+            response = await get_http_client("labroom").post(
+                create_endpoint,
+                json=serialized_request,
+                timeout=30.0,
+                retries=0  # this loop owns the retry/backoff policy
+            )
+            
+            # Handle success case
+            if response.status_code == 200 or response.status_code == 201:
+                logger.info(f"Successfully synchronized lab request {serialized_request.get('id')} with lab service via HTTP")
+                return True
+            # Handle duplicate key error - if it's already created, consider it a success
+            elif response.status_code == 500 and "duplicate key value" in response.text:
+                logger.info(f"Lab request {serialized_request.get('id')} already exists in lab service (created via WebSocket)")
+                return True
+            else:
+                logger.error(f"Failed to create lab request in lab service. Status code: {response.status_code}, Response: {response.text}")
+                return False
                 
-                # Handle success case
-                if response.status_code == 200 or response.status_code == 201:
-                    logger.info(f"Successfully synchronized lab request {serialized_request.get('id')} with lab service via HTTP")
-                    return True
-                # Handle duplicate key error - if it's already created, consider it a success
-                elif response.status_code == 500 and "duplicate key value" in response.text:
-                    logger.info(f"Lab request {serialized_request.get('id')} already exists in lab service (created via WebSocket)")
-                    return True
-                else:
-                    logger.error(f"Failed to create lab request in lab service. Status code: {response.status_code}, Response: {response.text}")
-                    return False
-                    
         except httpx.ConnectError as e:
             retry_count += 1
             wait_time = 2 ** retry_count  # Exponential backoff
@@ -153,22 +149,20 @@ async def create_lab_request_in_lab_service(lab_request: Dict[str, Any], max_ret
 
 async def fetch_lab_result(lab_result_id: uuid.UUID) -> Optional[Dict[str, Any]]:
     """Fetch a lab result from the lab service."""
-    lab_service_url = settings.LAB_SERVICE_URL
-    result_endpoint = f"{lab_service_url}/api/inter-service/lab-results/{lab_result_id}"
+    result_endpoint = f"/api/inter-service/lab-results/{lab_result_id}"
     
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                result_endpoint,
-                headers={"Authorization": f"Bearer {settings.SERVICE_TOKEN}"},
-                timeout=10.0
-            )
-            
-            if response.status_code == 200:
-                return response.json()
-            else:
-                logging.error(f"Failed to fetch lab result. Status: {response.status_code}, Response: {response.text}")
-                return None
+        response = await get_http_client("labroom").get(
+            result_endpoint,
+            headers={"Authorization": f"Bearer {settings.SERVICE_TOKEN}"},
+            timeout=10.0
+        )
+        
+        if response.status_code == 200:
+            return response.json()
+        else:
+            logging.error(f"Failed to fetch lab result. Status: {response.status_code}, Response: {response.text}")
+            return None
     except Exception as e:
         logging.error(f"Error fetching lab result: {str(e)}")
         return None
\ No newline at end of file
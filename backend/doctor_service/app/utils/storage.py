@@ -1,10 +1,28 @@
-import uuid
+"""
+Local file storage for uploads.
+
+Uploads are streamed in chunks of ``STORAGE_CHUNK_SIZE`` into a temp file
+under ``storage/tmp`` while they are hashed (SHA-256). The file writes and
+hashing run in a worker thread, so memory per upload stays at one chunk and
+the event loop doesn't block on disk. The size limit (``STORAGE_MAX_UPLOAD_SIZE``)
+is enforced as the chunks arrive.
+
+Finished uploads are stored content-addressed as ``storage/blobs/ab/cd/<sha256>``:
+an upload whose content is already stored (the same scan attached to several
+requests) only drops its temp file. Rows that reference a file keep its
+``content_hash``; blobs are never modified, so they can be shared freely.
+"""
+import asyncio
+import hashlib
 import os
-from fastapi import UploadFile, HTTPException
-from typing import Optional
+import tempfile
+from fastapi import UploadFile, HTTPException, status
+from typing import NamedTuple, Optional
 import logging
 from pathlib import Path
 
+from app.config import settings
+
 # Configure logging
 logger = logging.getLogger(__name__)
 
@@ -15,62 +33,104 @@ ALLOWED_FILE_TYPES = {
     "medical_report": ["pdf", "txt"]
 }
 
+
+class StoredFile(NamedTuple):
+    content_hash: str
+    size: int
+    path: Path
+    # Whether the same content was already stored
+    deduplicated: bool
+
+
 class StorageService:
-    def __init__(self):
-        self.storage_path = STORAGE_PATH
-        self.storage_path.mkdir(parents=True, exist_ok=True)
-
-    async def save_file_to_storage(
-        self,
-        file_content: bytes,
-        original_filename: str,
-        content_type: str,
-        file_category: str
-    ) -> str:
-        """Save file to local storage and return file UUID"""
+    def __init__(self, storage_path: Path = STORAGE_PATH, chunk_size: int = settings.STORAGE_CHUNK_SIZE,
+                 max_size: int = settings.STORAGE_MAX_UPLOAD_SIZE):
+        self.storage_path = storage_path
+        self.blob_path = storage_path / "blobs"
+        self.tmp_path = storage_path / "tmp"
+        self.chunk_size = chunk_size
+        self.max_size = max_size
+        for path in (self.storage_path, self.blob_path, self.tmp_path):
+            path.mkdir(parents=True, exist_ok=True)
+
+    def check_file_type(self, original_filename: str, file_category: str) -> str:
+        """The file's extension, if it is allowed for ``file_category``"""
+        allowed_types = ALLOWED_FILE_TYPES.get(file_category, [])
+        if not allowed_types:
+            raise ValueError(f"Invalid file category: {file_category}")
+
+        file_extension = (original_filename or "").split('.')[-1].lower()
+        if file_extension not in allowed_types:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Invalid file type for {file_category}. Allowed: {', '.join(allowed_types)}"
+            )
+        return file_extension
+
+    def get_blob_path(self, content_hash: str) -> Path:
+        return self.blob_path / content_hash[:2] / content_hash[2:4] / content_hash
+
+    async def save_upload(self, file: UploadFile, file_category: str, max_size: Optional[int] = None) -> StoredFile:
+        """Stream ``file`` into the blob store and return where it was stored"""
+        self.check_file_type(file.filename, file_category)
+        max_size = self.max_size if max_size is None else max_size
+
+        fd, tmp_name = tempfile.mkstemp(dir=self.tmp_path, prefix="upload-")
+        digest = hashlib.sha256()
+        size = 0
         try:
-            # Validate file type
-            allowed_types = ALLOWED_FILE_TYPES.get(file_category, [])
-            if not allowed_types:
-                raise ValueError(f"Invalid file category: {file_category}")
-            
-            file_extension = original_filename.split('.')[-1].lower()
-            if file_extension not in allowed_types:
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Invalid file type for {file_category}. Allowed: {', '.join(allowed_types)}"
-                )
-
-            # Generate unique filename
-            file_uuid = str(uuid.uuid4())
-            filename = f"{file_uuid}.{file_extension}"
-            file_path = self.storage_path / file_category / filename
-            
-            # Ensure directory exists
-            file_path.parent.mkdir(parents=True, exist_ok=True)
-            
-            # Save file
-            with open(file_path, "wb") as f:
-                f.write(file_content)
-            
-            logger.info(f"File saved: {filename}")
-            return file_uuid
-        except Exception as e:
-            logger.error(f"File save failed: {str(e)}")
+            with os.fdopen(fd, "wb") as out:
+                while True:
+                    # UploadFile reads from its spooled file in a thread once it is on disk
+                    chunk = await file.read(self.chunk_size)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    if size > max_size:
+                        raise HTTPException(
+                            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                            detail=f"File is larger than the {max_size // (1024 * 1024)} MB limit"
+                        )
+                    await asyncio.to_thread(self._write_chunk, out, digest, chunk)
+            stored = await asyncio.to_thread(self._store_blob, tmp_name, digest.hexdigest(), size)
+        except BaseException:
+            await asyncio.to_thread(self._discard, tmp_name)
             raise
 
-    def get_file_url(self, file_id: str, file_category: str) -> Optional[str]:
-        """Generate access URL for a stored file"""
-        base_url = os.getenv("FILE_BASE_URL", "http://localhost:8000/files")
-        return f"{base_url}/{file_category}/{file_id}"
+        logger.info(f"File stored: {stored.content_hash} ({size} bytes{', deduplicated' if stored.deduplicated else ''})")
+        return stored
+
+    @staticmethod
+    def _write_chunk(out, digest, chunk: bytes) -> None:
+        # hashlib releases the GIL for large buffers, so both run off the loop
+        digest.update(chunk)
+        out.write(chunk)
+
+    def _store_blob(self, tmp_name: str, content_hash: str, size: int) -> StoredFile:
+        path = self.get_blob_path(content_hash)
+        if path.exists():
+            os.unlink(tmp_name)
+            return StoredFile(content_hash, size, path, True)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        os.chmod(tmp_name, 0o444)
+        # Atomic; a concurrent upload of the same content replaces it with identical bytes
+        os.replace(tmp_name, path)
+        return StoredFile(content_hash, size, path, False)
+
+    @staticmethod
+    def _discard(tmp_name: str) -> None:
+        try:
+            os.unlink(tmp_name)
+        except FileNotFoundError:
+            pass
 
 # Singleton instance
 storage_service = StorageService()
 
-async def save_file_to_storage(*args, **kwargs) -> str:
-    """Helper function for saving files"""
-    return await storage_service.save_file_to_storage(*args, **kwargs)
+async def save_upload_to_storage(file: UploadFile, file_category: str, max_size: Optional[int] = None) -> StoredFile:
+    """Helper function for saving uploads"""
+    return await storage_service.save_upload(file, file_category, max_size)
 
-def get_file_url(file_id: str, file_category: str) -> Optional[str]:
-    """Helper function for generating file URLs"""
-    return storage_service.get_file_url(file_id, file_category)
\ No newline at end of file
+def get_blob_path(content_hash: str) -> Path:
+    """Helper function for locating a stored file"""
+    return storage_service.get_blob_path(content_hash)
@@ -3,7 +3,7 @@ import asyncio
 import json
 import uuid
 import logging
-from typing import Dict, List, Set, Any
+from typing import Dict, List, Set, Any, Optional
 from fastapi import WebSocket, WebSocketDisconnect, Depends
 import jwt
 
@@ -16,10 +16,18 @@ class ConnectionManager:
         self.active_connections: Dict[str, Dict[str, WebSocket]] = {}
         # Keep track of connection to user mapping
         self.connection_to_user: Dict[str, str] = {}
+        # Known roles of connected users: {user_id: role}, fed by token claims and sync/users
+        self.user_roles: Dict[str, str] = {}
+        # Connected users per role: {role: {user_id}}
+        self.role_members: Dict[str, Set[str]] = {}
         
-    async def connect(self, websocket: WebSocket, user_id: str):
+    async def connect(self, websocket: WebSocket, user_id: str, role: Optional[str] = None):
         await websocket.accept()
         
+        user_id = str(user_id)
+        if role:
+            self.user_roles[user_id] = role
+        
         # Generate a unique connection ID
         connection_id = str(uuid.uuid4())
         
@@ -30,6 +38,7 @@ class ConnectionManager:
         # Add this connection
         self.active_connections[user_id][connection_id] = websocket
         self.connection_to_user[connection_id] = user_id
+        self._index_user(user_id)
         
         # Return the connection ID for later reference
         return connection_id
@@ -47,10 +56,37 @@ class ConnectionManager:
             # If no more connections for this user, clean up
             if not self.active_connections[user_id]:
                 del self.active_connections[user_id]
+                self._unindex_user(user_id)
+                self.user_roles.pop(user_id, None)
                 
         # Remove from connection tracking
         del self.connection_to_user[connection_id]
         
+    def _index_user(self, user_id: str):
+        role = self.user_roles.get(user_id)
+        if role:
+            self.role_members.setdefault(role, set()).add(user_id)
+            
+    def _unindex_user(self, user_id: str):
+        for role in list(self.role_members):
+            members = self.role_members[role]
+            members.discard(user_id)
+            if not members:
+                del self.role_members[role]
+                
+    def update_user_role(self, user_id, role: Optional[str], is_active: bool = True):
+        """Refresh a user's role membership, e.g. after a sync from auth_service."""
+        user_id = str(user_id)
+        self._unindex_user(user_id)
+        
+        if not role or not is_active:
+            self.user_roles.pop(user_id, None)
+            return
+            
+        self.user_roles[user_id] = role
+        if user_id in self.active_connections:
+            self._index_user(user_id)
+            
     async def send_personal_message(self, user_id, message):
         """
         Send a message to a specific user via WebSocket.
@@ -77,15 +113,15 @@ class ConnectionManager:
             for websocket in user_connections.values():
                 await websocket.send_text(json.dumps(message))
                 
-    async def broadcast_to_role(self, message: Dict[str, Any], role: str, pool):
-        """Send message to all users with specific role"""
-        async with pool.acquire() as conn:
-            query = "SELECT id FROM users WHERE role = $1 AND is_active = true"
-            user_ids = await conn.fetch(query, role)
-            
-            for record in user_ids:
-                user_id = str(record['id'])
-                await self.send_personal_message(message, user_id)
+    async def broadcast_to_role(self, message: Dict[str, Any], role: str, pool=None):
+        """Send message to all connected users with specific role.
+        
+        Served from the in-memory role index, so only connected members are
+        visited and no database round trip is needed. ``pool`` is accepted for
+        backwards compatibility and ignored.
+        """
+        for user_id in list(self.role_members.get(role, ())):
+            await self.send_personal_message(user_id, message)
 
 # Create a global connection manager
 manager = ConnectionManager()
@@ -0,0 +1,10 @@
+-- doctor_service/migrations/add_cardroom_change_sync.sql
+-- Stores how far the cardroom change feed sync (CARDROOM_SYNC_ENABLED) has
+-- read the feed. Part of init.sql for new databases; doctor_service applies it
+-- at startup to databases that don't have the table yet. Safe to re-run.
+
+CREATE TABLE IF NOT EXISTS sync_cursors (
+    name VARCHAR(50) PRIMARY KEY,
+    cursor TEXT NOT NULL,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
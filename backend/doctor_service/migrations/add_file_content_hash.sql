@@ -0,0 +1,10 @@
+-- doctor_service/migrations/add_file_content_hash.sql
+-- Run this on the doctor_db before deploying content-addressed file storage
+-- (app/utils/storage.py). Files uploaded earlier have no content hash and
+-- can't be downloaded through /lab-requests/{id}/files/{file_id}.
+-- Safe to re-run.
+
+ALTER TABLE lab_request_files ADD COLUMN IF NOT EXISTS content_hash VARCHAR(64) NULL;
+
+-- Which rows share a stored file, before it can be removed
+CREATE INDEX IF NOT EXISTS idx_lab_request_files_content_hash ON lab_request_files(content_hash);
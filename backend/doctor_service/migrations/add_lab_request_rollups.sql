@@ -0,0 +1,129 @@
+-- doctor_service/migrations/add_lab_request_rollups.sql
+-- Run this on the doctor_db to add incrementally maintained lab request analytics
+-- rollups (used by /lab-requests/analytics/summary and the lab request metrics).
+-- Safe to re-run. To rebuild the rollups from lab_requests later:
+--     SELECT lab_request_rollups_backfill();
+
+-- Requests created per day, per doctor
+CREATE TABLE IF NOT EXISTS lab_request_rollup_daily (
+    bucket DATE NOT NULL,
+    doctor_id UUID NOT NULL,
+    test_type VARCHAR(100) NOT NULL,
+    urgency VARCHAR(20) NOT NULL,
+    status VARCHAR(20) NOT NULL,
+    request_count BIGINT NOT NULL DEFAULT 0,
+    turnaround_seconds DOUBLE PRECISION NOT NULL DEFAULT 0,
+    turnaround_count BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (doctor_id, bucket, test_type, urgency, status)
+);
+
+-- All-time totals of active requests, per doctor
+CREATE TABLE IF NOT EXISTS lab_request_rollup_totals (
+    doctor_id UUID NOT NULL,
+    urgency VARCHAR(20) NOT NULL,
+    status VARCHAR(20) NOT NULL,
+    request_count BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (doctor_id, urgency, status)
+);
+
+CREATE OR REPLACE FUNCTION lab_request_rollup_apply(
+    p_created_at TIMESTAMP WITH TIME ZONE,
+    p_updated_at TIMESTAMP WITH TIME ZONE,
+    p_doctor_id UUID,
+    p_test_type VARCHAR,
+    p_urgency VARCHAR,
+    p_status VARCHAR,
+    p_delta INTEGER
+) RETURNS VOID AS $$
+DECLARE
+    -- A missing status is the column default
+    v_status VARCHAR := COALESCE(p_status, 'pending');
+    v_turnaround DOUBLE PRECISION := 0;
+    v_turnaround_count INTEGER := 0;
+BEGIN
+    IF v_status = 'completed' AND p_updated_at IS NOT NULL THEN
+        v_turnaround := EXTRACT(EPOCH FROM (p_updated_at - p_created_at)) * p_delta;
+        v_turnaround_count := p_delta;
+    END IF;
+
+    IF p_created_at IS NOT NULL THEN
+        INSERT INTO lab_request_rollup_daily AS r
+            (bucket, doctor_id, test_type, urgency, status, request_count, turnaround_seconds, turnaround_count)
+        VALUES
+            (p_created_at::date, p_doctor_id, p_test_type, p_urgency, v_status,
+             p_delta, v_turnaround, v_turnaround_count)
+        ON CONFLICT (doctor_id, bucket, test_type, urgency, status) DO UPDATE SET
+            request_count = r.request_count + EXCLUDED.request_count,
+            turnaround_seconds = r.turnaround_seconds + EXCLUDED.turnaround_seconds,
+            turnaround_count = r.turnaround_count + EXCLUDED.turnaround_count;
+    END IF;
+
+    INSERT INTO lab_request_rollup_totals AS r (doctor_id, urgency, status, request_count)
+    VALUES (p_doctor_id, p_urgency, v_status, p_delta)
+    ON CONFLICT (doctor_id, urgency, status) DO UPDATE SET
+        request_count = r.request_count + EXCLUDED.request_count;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION lab_request_rollup_trigger()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.is_active THEN
+        PERFORM lab_request_rollup_apply(
+            OLD.created_at, OLD.updated_at, OLD.doctor_id, OLD.test_type, OLD.urgency, OLD.status, -1);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.is_active THEN
+        PERFORM lab_request_rollup_apply(
+            NEW.created_at, NEW.updated_at, NEW.doctor_id, NEW.test_type, NEW.urgency, NEW.status, 1);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE TRIGGER lab_request_rollup_insert_delete
+AFTER INSERT OR DELETE ON lab_requests
+FOR EACH ROW EXECUTE FUNCTION lab_request_rollup_trigger();
+
+-- Only updates of rolled-up columns touch the rollups
+-- (updated_at counts: it is the completion time of completed requests)
+CREATE OR REPLACE TRIGGER lab_request_rollup_update
+AFTER UPDATE OF created_at, updated_at, doctor_id, test_type, urgency, status, is_active
+ON lab_requests
+FOR EACH ROW
+WHEN ((OLD.created_at, OLD.updated_at, OLD.doctor_id, OLD.test_type, OLD.urgency, OLD.status, OLD.is_active)
+      IS DISTINCT FROM
+      (NEW.created_at, NEW.updated_at, NEW.doctor_id, NEW.test_type, NEW.urgency, NEW.status, NEW.is_active))
+EXECUTE FUNCTION lab_request_rollup_trigger();
+
+-- Rebuild all rollups from lab_requests. Blocks writes to lab_requests while it runs.
+CREATE OR REPLACE FUNCTION lab_request_rollups_backfill()
+RETURNS BIGINT AS $$
+DECLARE
+    v_rows BIGINT;
+BEGIN
+    LOCK TABLE lab_requests IN SHARE MODE;
+    TRUNCATE lab_request_rollup_daily, lab_request_rollup_totals;
+
+    INSERT INTO lab_request_rollup_daily
+    SELECT created_at::date, doctor_id, test_type, urgency, COALESCE(status, 'pending'),
+           COUNT(*),
+           COALESCE(SUM(EXTRACT(EPOCH FROM (updated_at - created_at)))
+                    FILTER (WHERE status = 'completed' AND updated_at IS NOT NULL), 0),
+           COUNT(*) FILTER (WHERE status = 'completed' AND updated_at IS NOT NULL)
+    FROM lab_requests
+    WHERE is_active AND created_at IS NOT NULL
+    GROUP BY 1, 2, 3, 4, 5;
+
+    INSERT INTO lab_request_rollup_totals
+    SELECT doctor_id, urgency, COALESCE(status, 'pending'), COUNT(*)
+    FROM lab_requests
+    WHERE is_active
+    GROUP BY 1, 2, 3;
+
+    SELECT COALESCE(SUM(request_count), 0) INTO v_rows FROM lab_request_rollup_totals;
+    RETURN v_rows;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Load existing data
+SELECT lab_request_rollups_backfill();
@@ -0,0 +1,82 @@
+import json
+import uuid
+
+import httpx
+import pytest
+
+from app.http_client import UpstreamClient, http_clients
+from app.services import cardroom_service
+from app.single_flight import SingleFlightCache
+
+
+@pytest.fixture
+def cardroom(monkeypatch):
+    """Route the shared cardroom client to an in-process handler"""
+    requests = []
+
+    def handler(request):
+        ids = json.loads(request.content)["ids"]
+        requests.append(ids)
+        return httpx.Response(200, json={"data": [{"id": pid} for pid in ids], "missing": []})
+
+    client = UpstreamClient("cardroom", "http://cardroom.test")
+    client._client = httpx.AsyncClient(base_url="http://cardroom.test", transport=httpx.MockTransport(handler))
+    monkeypatch.setitem(http_clients._clients, "cardroom", client)
+
+    async def no_db(*args, **kwargs):
+        return None
+
+    monkeypatch.setattr(cardroom_service, "_safe_db_operation", no_db)
+    monkeypatch.setattr(cardroom_service.settings, "CARDROOM_PATIENT_BATCH_SIZE", 2)
+    monkeypatch.setattr(cardroom_service, "patient_cache", SingleFlightCache("patients", ttl=60))
+    return requests
+
+
+@pytest.mark.asyncio
+async def test_bulk_lookup_is_chunked_and_cached(cardroom):
+    ids = [uuid.uuid4() for _ in range(5)]
+
+    patients = await cardroom_service.get_patients_bulk(ids + ids[:1])
+
+    assert set(patients) == {str(pid) for pid in ids}
+    assert [len(chunk) for chunk in cardroom] == [2, 2, 1]
+
+    # Second lookup is served from the cache
+    await cardroom_service.get_patients_bulk(ids)
+    assert len(cardroom) == 3
+
+
+@pytest.mark.asyncio
+async def test_patient_batch_is_stored_with_one_upsert(monkeypatch):
+    calls = []
+
+    async def upsert_patients(pool, patients):
+        calls.append(list(patients))
+        return patients[:1]
+
+    monkeypatch.setattr(cardroom_service.Patient, "upsert_patients", upsert_patients)
+    patients = [{"id": str(uuid.uuid4())} for _ in range(3)]
+
+    await cardroom_service._upsert_patients(None, patients)
+
+    assert calls == [patients]
+
+
+def test_patient_payload_normalization():
+    from app.models import Patient
+
+    pid = uuid.uuid4()
+    row = dict(zip(Patient.UPSERT_COLUMNS, Patient._normalize_patient({
+        "id": str(pid),
+        "name": "Abebe Kebede Tadesse",
+        "date_of_birth": "1990-05-01T00:00:00Z",
+        "allergies": '["penicillin"]',
+        "gender": "",
+    })))
+
+    assert row["id"] == pid
+    assert (row["first_name"], row["last_name"]) == ("Abebe", "Kebede Tadesse")
+    assert row["date_of_birth"].isoformat() == "1990-05-01"
+    assert row["allergies"] == '["penicillin"]'
+    # Missing fields keep the stored value
+    assert row["gender"] is None and row["medical_history"] is None
@@ -0,0 +1,70 @@
+import httpx
+import pytest
+
+from app.http_client import UpstreamClient, http_clients
+from app.services.cardroom_sync import CardroomChangeSync
+
+
+@pytest.fixture
+def feed(monkeypatch):
+    """Cardroom change feed with three pages"""
+    pages = {
+        None: {"patients": [{"id": "p1"}], "opd_assignments": [], "cursor": "10.1", "has_more": True},
+        "10.1": {"patients": [], "opd_assignments": [{"id": "a1"}], "cursor": "10.2", "has_more": True},
+        "10.2": {"patients": [], "opd_assignments": [], "cursor": "10.2", "has_more": False},
+    }
+    requests = []
+
+    def handler(request):
+        since = request.url.params.get("since")
+        requests.append(since)
+        return httpx.Response(200, json=pages[since])
+
+    client = UpstreamClient("cardroom", "http://cardroom.test")
+    client._client = httpx.AsyncClient(base_url="http://cardroom.test", transport=httpx.MockTransport(handler))
+    monkeypatch.setitem(http_clients._clients, "cardroom", client)
+    return requests
+
+
+@pytest.mark.asyncio
+async def test_sync_pages_through_the_feed(feed):
+    sync = CardroomChangeSync(batch_size=1)
+    sync.cursor = ""
+    applied = []
+
+    async def apply(pool, page):
+        applied.append(page["cursor"])
+        sync.cursor = page["cursor"]
+
+    sync.apply = apply
+
+    assert await sync.sync_once(None) == 2
+    assert feed == [None, "10.1", "10.2"]
+    assert applied == ["10.1", "10.2", "10.2"]
+    assert sync.metrics()["seconds_since_sync"] is not None
+
+
+@pytest.mark.asyncio
+async def test_conflicting_patients_are_skipped_not_retried(monkeypatch):
+    import asyncpg
+    from app.models import Patient
+
+    stored = []
+
+    async def upsert_patients(pool, patients):
+        if any(p["registration_number"] == "TAKEN" for p in patients):
+            raise asyncpg.UniqueViolationError("duplicate key value violates unique constraint")
+        stored.extend(p["id"] for p in patients)
+        return patients
+
+    monkeypatch.setattr(Patient, "upsert_patients", upsert_patients)
+    sync = CardroomChangeSync()
+
+    await sync.upsert_patients(None, [
+        {"id": "p1", "registration_number": "R1"},
+        {"id": "p2", "registration_number": "TAKEN"},
+        {"id": "p3", "registration_number": "R3"},
+    ])
+
+    assert stored == ["p1", "p3"]
+    assert sync.metrics()["skipped_patients"] == 1
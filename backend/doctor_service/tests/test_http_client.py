@@ -0,0 +1,64 @@
+import httpx
+import pytest
+
+from app.http_client import UpstreamClient
+
+
+def make_client(handler, retries=2):
+    client = UpstreamClient("cardroom", "http://cardroom.test", retries=retries, backoff=0)
+    client._client = httpx.AsyncClient(
+        base_url="http://cardroom.test", transport=httpx.MockTransport(handler)
+    )
+    return client
+
+
+@pytest.mark.asyncio
+async def test_idempotent_request_retries_on_503():
+    calls = []
+
+    def handler(request):
+        calls.append(request.url.path)
+        return httpx.Response(503 if len(calls) < 3 else 200, json={"ok": True})
+
+    client = make_client(handler)
+    response = await client.get("/api/patients/1")
+
+    assert response.status_code == 200
+    assert calls == ["/api/patients/1"] * 3
+    assert client.metrics()["retries"] == 2
+    await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_post_is_not_replayed_on_server_error():
+    calls = []
+
+    def handler(request):
+        calls.append(request.method)
+        return httpx.Response(503)
+
+    client = make_client(handler)
+    response = await client.post("/sync/users", json={})
+
+    assert response.status_code == 503
+    assert calls == ["POST"]
+    await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_connect_errors_are_retried_then_raised():
+    calls = []
+
+    def handler(request):
+        calls.append(request.method)
+        raise httpx.ConnectError("connection refused", request=request)
+
+    client = make_client(handler, retries=1)
+    with pytest.raises(httpx.ConnectError):
+        await client.post("/sync/users", json={})
+
+    assert calls == ["POST", "POST"]
+    metrics = client.metrics()
+    assert metrics["errors"] == 2
+    assert metrics["retries"] == 1
+    await client.aclose()
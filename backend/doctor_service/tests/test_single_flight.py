@@ -0,0 +1,67 @@
+import asyncio
+
+import pytest
+
+from app.single_flight import SingleFlightCache
+
+
+@pytest.mark.asyncio
+async def test_concurrent_lookups_share_one_load():
+    cache = SingleFlightCache("test", ttl=60)
+    calls = []
+
+    async def loader():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {"id": "p1"}
+
+    results = await asyncio.gather(*(cache.get("p1", loader) for _ in range(10)))
+
+    assert len(calls) == 1
+    assert all(result == {"id": "p1"} for result in results)
+    assert cache.metrics()["coalesced"] == 9
+
+    # Served from cache afterwards
+    await cache.get("p1", loader)
+    assert len(calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_failures_are_shared_but_not_cached():
+    cache = SingleFlightCache("test", ttl=60)
+    calls = []
+
+    async def loader():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        raise RuntimeError("upstream down")
+
+    results = await asyncio.gather(*(cache.get("p1", loader) for _ in range(3)), return_exceptions=True)
+    assert len(calls) == 1
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+    with pytest.raises(RuntimeError):
+        await cache.get("p1", loader)
+    assert len(calls) == 2
+
+
+@pytest.mark.asyncio
+async def test_stale_value_is_served_while_refreshing():
+    cache = SingleFlightCache("test", ttl=0, stale_ttl=60)
+    cache.set("p1", "old")
+
+    async def loader():
+        return "new"
+
+    assert await cache.get("p1", loader) == "old"
+    await asyncio.sleep(0)
+    await asyncio.sleep(0)
+    assert cache._entries["p1"][0] == "new"
+
+
+def test_cache_is_bounded():
+    cache = SingleFlightCache("test", ttl=60, maxsize=2)
+    cache.set_many([("a", 1), ("b", 2), ("c", 3)])
+
+    assert cache.peek("a") is None
+    assert cache.peek("c") == 3
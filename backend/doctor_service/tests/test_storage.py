@@ -0,0 +1,39 @@
+import hashlib
+import io
+import os
+
+import pytest
+from fastapi import HTTPException, UploadFile
+
+from app.utils.storage import StorageService
+
+
+def upload(content: bytes, filename: str = "scan.png") -> UploadFile:
+    return UploadFile(file=io.BytesIO(content), filename=filename)
+
+
+@pytest.mark.asyncio
+async def test_uploads_are_streamed_and_stored_once_per_content(tmp_path):
+    storage = StorageService(tmp_path, chunk_size=1000, max_size=10_000)
+    content = os.urandom(4500)
+
+    first = await storage.save_upload(upload(content), "lab_request_file")
+    second = await storage.save_upload(upload(content, "copy.png"), "lab_request_file")
+
+    assert first.content_hash == hashlib.sha256(content).hexdigest()
+    assert first.size == 4500 and not first.deduplicated
+    assert second.deduplicated and second.path == first.path
+    assert first.path.read_bytes() == content
+    assert list(storage.tmp_path.iterdir()) == []
+
+
+@pytest.mark.asyncio
+async def test_uploads_over_the_limit_are_rejected_and_discarded(tmp_path):
+    storage = StorageService(tmp_path, chunk_size=1000, max_size=2500)
+
+    with pytest.raises(HTTPException) as error:
+        await storage.save_upload(upload(os.urandom(3000)), "lab_request_file")
+
+    assert error.value.status_code == 413
+    assert list(storage.tmp_path.iterdir()) == []
+    assert list(storage.blob_path.iterdir()) == []
@@ -0,0 +1,81 @@
+import jwt
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+from app.config import settings
+from app.routers import lab_results_ws
+from app.websocket import ConnectionManager
+
+
+class FakeWebSocket:
+    def __init__(self):
+        self.sent = []
+
+    async def accept(self):
+        pass
+
+    async def send_json(self, message):
+        self.sent.append(message)
+
+
+@pytest.mark.asyncio
+async def test_broadcast_to_role_uses_connected_members_only():
+    manager = ConnectionManager()
+    doctor_ws = FakeWebSocket()
+    tech_ws = FakeWebSocket()
+
+    await manager.connect(doctor_ws, "doctor-1", role="doctor")
+    await manager.connect(tech_ws, "tech-1", role="lab_technician")
+    # Known but offline doctor must not be visited
+    manager.update_user_role("doctor-2", "doctor")
+
+    await manager.broadcast_to_role({"type": "ping"}, "doctor")
+
+    assert doctor_ws.sent == [{"type": "ping"}]
+    assert tech_ws.sent == []
+    assert manager.role_members["doctor"] == {"doctor-1"}
+
+
+@pytest.mark.asyncio
+async def test_role_index_follows_disconnect_and_sync():
+    manager = ConnectionManager()
+    ws = FakeWebSocket()
+
+    # Role learned from sync/users before the user connects without claims
+    manager.update_user_role("user-1", "doctor")
+    connection_id = await manager.connect(ws, "user-1")
+    assert "user-1" in manager.role_members["doctor"]
+
+    # Role change moves the user between indexes
+    manager.update_user_role("user-1", "admin")
+    assert "doctor" not in manager.role_members
+    assert manager.role_members["admin"] == {"user-1"}
+
+    # Deactivation drops the user from every index
+    manager.update_user_role("user-1", "admin", is_active=False)
+    assert manager.role_members == {}
+
+    manager.update_user_role("user-1", "doctor")
+    manager.disconnect(connection_id)
+    assert manager.role_members == {}
+    # Roles of disconnected users aren't kept
+    assert manager.user_roles == {}
+
+
+def test_lab_results_socket_requires_the_doctors_own_token():
+    app = FastAPI()
+    app.include_router(lab_results_ws.router)
+    client = TestClient(app)
+    token = jwt.encode({"sub": "doctor-1", "role": "doctor"}, settings.JWT_SECRET_KEY, algorithm=settings.JWT_ALGORITHM)
+
+    for url in ("/ws/lab-results/doctor-1", f"/ws/lab-results/doctor-2?token={token}"):
+        with pytest.raises(WebSocketDisconnect):
+            with client.websocket_connect(url) as ws:
+                ws.receive_json()
+
+    with client.websocket_connect(f"/ws/lab-results/doctor-1?token={token}") as ws:
+        assert ws.receive_json()["doctor_id"] == "doctor-1"
+        assert lab_results_ws.manager.user_roles["doctor-1"] == "doctor"
+    assert "doctor-1" not in lab_results_ws.manager.user_roles
@@ -0,0 +1,92 @@
+# labroom_service/app/count_strategy.py
+"""
+Total counts for paginated list endpoints.
+
+On large tables ``SELECT COUNT(*)`` with the list's filters costs more than
+fetching the page itself. ``CountStrategy.count`` asks the planner how many
+rows the list query will return (``EXPLAIN``, based on table statistics) and
+then:
+
+* counts exactly when that is at most ``exact_threshold`` rows,
+* returns the planner's estimate for larger unfiltered lists,
+* counts exactly for larger filtered lists (estimates of filtered queries
+  can be far off) and caches the result for ``cache_ttl`` seconds, so a
+  popular filter combination is counted once per window.
+
+Totals are ``Total`` ints carrying ``exact``; endpoints report it next to the
+total (``total_exact``) so clients can present estimates as approximate.
+"""
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional, Tuple
+
+
+class Total(int):
+    """A row count that knows whether it is exact or a planner estimate."""
+
+    exact: bool
+
+    def __new__(cls, value: int, exact: bool = True):
+        total = super().__new__(cls, value)
+        total.exact = exact
+        return total
+
+
+def _cache_key(query: str, args: Tuple[Any, ...]) -> Optional[Hashable]:
+    key = (query, tuple(tuple(a) if isinstance(a, list) else a for a in args))
+    try:
+        hash(key)
+    except TypeError:
+        return None
+    return key
+
+
+class CountStrategy:
+    """Picks an exact, estimated or cached total for a list query."""
+
+    def __init__(self, exact_threshold: int = 10000, cache_ttl: float = 30.0, max_entries: int = 1024):
+        self.exact_threshold = exact_threshold
+        self.cache_ttl = cache_ttl
+        self.max_entries = max_entries
+        self._cache: "OrderedDict[Hashable, Tuple[float, Total]]" = OrderedDict()
+
+    async def estimate(self, conn, query: str, *args) -> int:
+        """The planner's row estimate for ``query``"""
+        plan = await conn.fetchval(f"EXPLAIN (FORMAT JSON) {query}", *args)
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]["Plan"]["Plan Rows"])
+
+    async def count(self, conn, query: str, *args, filtered: bool = True) -> Total:
+        """
+        Total rows of ``query``, the list query without ORDER BY, LIMIT or
+        OFFSET. ``filtered`` is False when only the default filters (e.g.
+        ``is_deleted = FALSE``) apply, which allows returning an estimate.
+        """
+        key = _cache_key(query, args)
+        cached = self._cache.get(key) if key is not None else None
+        if cached is not None:
+            if cached[0] > time.monotonic():
+                return cached[1]
+            del self._cache[key]
+
+        estimate = await self.estimate(conn, query, *args)
+        if estimate <= self.exact_threshold:
+            # Cheap enough to count on every request, and never stale
+            return Total(await conn.fetchval(f"SELECT COUNT(*) FROM ({query}) AS counted", *args))
+
+        if filtered:
+            total = Total(await conn.fetchval(f"SELECT COUNT(*) FROM ({query}) AS counted", *args))
+        else:
+            total = Total(estimate, exact=False)
+        if key is not None:
+            self._cache[key] = (time.monotonic() + self.cache_ttl, total)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+        return total
+
+
+def is_exact(total: int) -> bool:
+    """Whether ``total`` is an exact count (plain ints are)"""
+    return getattr(total, "exact", True)
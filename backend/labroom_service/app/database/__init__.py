@@ -1,29 +1,126 @@
 import os
 import uuid
+import asyncio
+import contextlib
 import asyncpg
 from typing import Dict, List, Any, Optional, Union
 from datetime import datetime, timezone
 from ..config import settings
+from ..count_strategy import CountStrategy
+from ..read_routing import LAG_QUERY, ReadRouter
+from .partitions import PartitionMaintainer
+from .pool import ManagedPool, DEFAULT_WORKLOAD
+from .rollups import apply_rollups
 
-# Connection pool
-pool: Optional[asyncpg.Pool] = None
+# Connection pool, shared by all workloads
+pool: Optional[ManagedPool] = None
+# Optional read-replica pool for read-only queries (DATABASE_READ_URL)
+replica_pool: Optional[ManagedPool] = None
+read_router = ReadRouter(
+    "labroom",
+    sticky_seconds=settings.DATABASE_READ_STICKY_SECONDS,
+    max_lag=settings.DATABASE_READ_MAX_LAG_SECONDS,
+    check_interval=settings.DATABASE_READ_CHECK_INTERVAL,
+)
+# Totals of paginated lists
+list_counts = CountStrategy(exact_threshold=settings.COUNT_EXACT_THRESHOLD, cache_ttl=settings.COUNT_CACHE_TTL)
+# Tables partitioned by month, and their partition column
+PARTITIONED_TABLES = {
+    "lab_requests": "created_at",
+    "lab_results": "created_at",
+    "lab_request_events": "event_timestamp",
+}
+partition_maintainer = PartitionMaintainer(
+    "labroom",
+    PARTITIONED_TABLES,
+    months_ahead=settings.DATABASE_PARTITION_MONTHS_AHEAD,
+    retention_months=settings.DATABASE_PARTITION_RETENTION_MONTHS,
+    archive_schema=settings.DATABASE_PARTITION_ARCHIVE_SCHEMA,
+    interval=settings.DATABASE_PARTITION_CHECK_INTERVAL,
+)
+_init_lock = asyncio.Lock()
 
-async def get_connection():
-    """Get a database connection from the pool"""
+async def get_connection(workload: str = DEFAULT_WORKLOAD):
+    """
+    Get a database connection from the pool.
+    
+    Must be returned with release_connection(); prefer `async with connection()`.
+    """
+    if pool is None:
+        await init_db()
+    return await pool.acquire(workload)
+
+async def get_read_connection(workload: str = DEFAULT_WORKLOAD):
+    """
+    Get a connection for read-only queries.
+    
+    Comes from the read replica when one is configured, healthy and the
+    current session has not written recently; otherwise from the primary.
+    Must be returned with release_connection().
+    """
     if pool is None:
         await init_db()
-    return await pool.acquire()
+    if replica_pool is not None and read_router.use_replica():
+        try:
+            return await replica_pool.acquire(workload, timeout=settings.DATABASE_READ_ACQUIRE_TIMEOUT)
+        except (OSError, asyncio.TimeoutError, asyncpg.PostgresError, asyncpg.InterfaceError) as e:
+            read_router.replica_failed(e)
+    return await pool.acquire(workload)
+
+async def release_connection(conn):
+    """Return a connection obtained from get_connection() or get_read_connection() to its pool"""
+    if replica_pool is not None and replica_pool.owns(conn):
+        await replica_pool.release(conn)
+    elif pool is not None:
+        await pool.release(conn)
+
+def connection(workload: str = DEFAULT_WORKLOAD):
+    """Async context manager that acquires and releases a pooled connection"""
+    return pool.acquire(workload)
+
+@contextlib.asynccontextmanager
+async def read_connection(workload: str = DEFAULT_WORKLOAD):
+    """Async context manager around get_read_connection()"""
+    conn = await get_read_connection(workload)
+    try:
+        yield conn
+    finally:
+        await release_connection(conn)
+
+def _workload_caps() -> Dict[str, int]:
+    return {
+        "lab_requests": settings.DATABASE_LAB_REQUESTS_MAX_CONNECTIONS,
+        "lab_results": settings.DATABASE_LAB_RESULTS_MAX_CONNECTIONS,
+        "reports": settings.DATABASE_REPORTS_MAX_CONNECTIONS,
+    }
 
 async def init_db():
     """Initialize the database connection pool and schema"""
+    global pool
+    async with _init_lock:
+        if pool is not None:
+            return
+        await _init_db()
+
+async def _init_db():
     global pool
     try:
         # Create connection pool
-        pool = await asyncpg.create_pool(
+        managed_pool = ManagedPool(
             dsn=settings.DATABASE_URL,
-            min_size=5,
+            min_size=settings.DATABASE_MIN_CONNECTIONS,
             max_size=settings.DATABASE_MAX_CONNECTIONS,
+            workloads=_workload_caps(),
+            hold_warning=settings.DATABASE_HOLD_WARNING_SECONDS,
+            command_timeout=settings.DATABASE_CONNECTION_TIMEOUT,
+            # Previously applied by the lab request/result pools to a single connection only
+            server_settings={"work_mem": "10MB", "random_page_cost": "1.1"},
         )
+        await managed_pool.open()
+        pool = managed_pool
+        
+        if settings.DATABASE_READ_URL:
+            await _init_replica()
         
         # Initialize schema
         async with pool.acquire() as conn:
@@ -34,19 +131,68 @@ async def init_db():
             with open(init_sql_path, 'r') as f:
                 init_sql = f.read()
                 await conn.execute(init_sql)
+            
+            # Monthly partitions (converts the tables of a fresh database that nothing references)
+            await partition_maintainer.run(conn)
+            
+            # Feed of the newest lab requests for /lab-requests/fast
+            with open(os.path.join(current_dir, 'recent_requests.sql'), 'r') as f:
+                await conn.execute(f.read())
+            
+            # Trigger-maintained analytics rollups
+            await apply_rollups(conn)
+        
+        await partition_maintainer.start(pool)
                 
         print("Database initialized successfully")
     except Exception as e:
         print(f"Error initializing database: {e}")
         raise
 
+async def _init_replica():
+    """Open the read-replica pool; reads stay on the primary if it is unreachable"""
+    global replica_pool
+    replica = ManagedPool(
+        dsn=settings.DATABASE_READ_URL,
+        # Connections are opened on demand so startup does not depend on the replica
+        min_size=0,
+        max_size=settings.DATABASE_READ_MAX_CONNECTIONS,
+        workloads=_workload_caps(),
+        hold_warning=settings.DATABASE_HOLD_WARNING_SECONDS,
+        command_timeout=settings.DATABASE_CONNECTION_TIMEOUT,
+        server_settings={"work_mem": "10MB", "random_page_cost": "1.1"},
+    )
+    await replica.open()
+    replica_pool = replica
+    await read_router.start(lambda: replica.fetchval(LAG_QUERY))
+
 async def close_db():
-    """Close the database connection pool"""
-    global pool
+    """Close the database connection pools"""
+    global pool, replica_pool
+    await partition_maintainer.stop()
+    await read_router.stop()
+    if replica_pool:
+        await replica_pool.close()
+        replica_pool = None
     if pool:
         await pool.close()
         pool = None
 
+def pool_metrics() -> Dict[str, Any]:
+    """Acquire wait, in-use and churn metrics of the connection pool"""
+    return pool.metrics() if pool else {}
+
+def replica_metrics() -> Dict[str, Any]:
+    """Routing decisions, replica health and replica pool metrics"""
+    return {
+        **read_router.metrics(),
+        "pool": replica_pool.metrics() if replica_pool else {},
+    }
+
+def partition_metrics() -> Dict[str, Any]:
+    """Partition maintenance settings and the outcome of the last run"""
+    return partition_maintainer.metrics()
+
 # Helper functions for common database operations
 async def execute_with_transaction(query: str, *args, conn=None):
     """Execute a query with a transaction"""
@@ -68,11 +214,11 @@ async def execute_with_transaction(query: str, *args, conn=None):
         if should_release and conn:
             await pool.release(conn)
 
-async def fetch_one(query: str, *args, conn=None) -> Optional[Dict[str, Any]]:
-    """Fetch a single row as a dictionary"""
+async def fetch_one(query: str, *args, conn=None, readonly: bool = False) -> Optional[Dict[str, Any]]:
+    """Fetch a single row as a dictionary; readonly queries may be served by the read replica"""
     should_release = False
     if not conn:
-        conn = await pool.acquire()
+        conn = await get_read_connection() if readonly else await pool.acquire()
         should_release = True
         
     try:
@@ -82,13 +228,13 @@ async def fetch_one(query: str, *args, conn=None) -> Optional[Dict[str, Any]]:
         return None
     finally:
         if should_release and conn:
-            await pool.release(conn)
+            await release_connection(conn)
 
-async def fetch_all(query: str, *args, conn=None) -> List[Dict[str, Any]]:
-    """Fetch all rows as dictionaries"""
+async def fetch_all(query: str, *args, conn=None, readonly: bool = False) -> List[Dict[str, Any]]:
+    """Fetch all rows as dictionaries; readonly queries may be served by the read replica"""
     should_release = False
     if not conn:
-        conn = await pool.acquire()
+        conn = await get_read_connection() if readonly else await pool.acquire()
         should_release = True
         
     try:
@@ -96,7 +242,7 @@ async def fetch_all(query: str, *args, conn=None) -> List[Dict[str, Any]]:
         return [dict(row) for row in rows]
     finally:
         if should_release and conn:
-            await pool.release(conn)
+            await release_connection(conn)
 
 async def insert(table: str, data: Dict[str, Any], returning: str = "id", conn=None) -> Any:
     """Insert data into a table and return the specified column"""
@@ -23,10 +23,13 @@ BEGIN
     END IF;
 END$$;
 
--- Step 2: Rename old enum if exists
+-- Step 2: Rename old enum if exists and its values differ
+-- (re-typing the column rewrites every lab request, so skip it when up to date)
 DO $$
 BEGIN
-    IF EXISTS (SELECT 1 FROM pg_type WHERE typname = 'test_priority') THEN
+    IF EXISTS (SELECT 1 FROM pg_type WHERE typname = 'test_priority')
+       AND ARRAY(SELECT e.enumlabel::text FROM pg_enum e JOIN pg_type t ON t.oid = e.enumtypid
+                 WHERE t.typname = 'test_priority' ORDER BY e.enumsortorder) IS DISTINCT FROM ARRAY['high', 'medium', 'low'] THEN
         ALTER TYPE test_priority RENAME TO test_priority_old;
     END IF;
 END$$;
@@ -44,7 +47,7 @@ DO $$
 BEGIN
     IF EXISTS (
         SELECT 1 FROM information_schema.columns 
-        WHERE table_name='lab_requests' AND column_name='priority'
+        WHERE table_name='lab_requests' AND column_name='priority' AND udt_name <> 'test_priority'
     ) THEN
         ALTER TABLE lab_requests 
         ALTER COLUMN priority TYPE test_priority 
@@ -72,10 +75,25 @@ BEGIN
 END$$;
 
 -- ---------- TEST TYPE ENUM ----------
--- Step 1: Rename old test_type if exists
+-- Step 1: Rename old test_type if exists and its values differ
 DO $$
 BEGIN
-    IF EXISTS (SELECT 1 FROM pg_type WHERE typname = 'test_type') THEN
+    IF EXISTS (SELECT 1 FROM pg_type WHERE typname = 'test_type')
+       AND ARRAY(SELECT e.enumlabel::text FROM pg_enum e JOIN pg_type t ON t.oid = e.enumtypid
+                 WHERE t.typname = 'test_type' ORDER BY e.enumsortorder) IS DISTINCT FROM ARRAY[
+            'complete_blood_count',
+            'comprehensive_metabolic_panel',
+            'lipid_panel',
+            'liver_function_test',
+            'thyroid_panel',
+            'urinalysis',
+            'hba1c',
+            'chest_xray',
+            'ecg',
+            'covid19_test',
+            'allergy_test',
+            'vitamin_d_test'
+       ] THEN
         ALTER TYPE test_type RENAME TO test_type_old;
     END IF;
 END$$;
@@ -106,7 +124,7 @@ DO $$
 BEGIN
     IF EXISTS (
         SELECT 1 FROM information_schema.columns 
-        WHERE table_name='lab_requests' AND column_name='test_type'
+        WHERE table_name='lab_requests' AND column_name='test_type' AND udt_name <> 'test_type'
     ) THEN
         ALTER TABLE lab_requests 
         ALTER COLUMN test_type TYPE test_type 
@@ -192,6 +210,9 @@ CREATE INDEX IF NOT EXISTS idx_lab_results_lab_request_id ON lab_results(lab_req
 CREATE INDEX IF NOT EXISTS idx_lab_notifications_recipient_id ON lab_notifications(recipient_id);
 CREATE INDEX IF NOT EXISTS idx_lab_notifications_lab_request_id ON lab_notifications(lab_request_id);
 
+-- Creation time, used by the list endpoints, indexes and analytics rollups
+ALTER TABLE lab_requests ADD COLUMN IF NOT EXISTS created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW();
+
 -- Add is_read flag to lab_requests
 ALTER TABLE lab_requests ADD COLUMN IF NOT EXISTS is_read BOOLEAN NOT NULL DEFAULT FALSE;
 ALTER TABLE lab_requests ADD COLUMN IF NOT EXISTS read_at TIMESTAMP WITH TIME ZONE;
@@ -37,33 +37,8 @@ CREATE INDEX IF NOT EXISTS idx_lab_requests_notes_trigram ON lab_requests
 USING gin (notes gin_trgm_ops)
 WHERE is_deleted = FALSE;
 
--- Create a materialized view for common queries
-CREATE MATERIALIZED VIEW IF NOT EXISTS mv_recent_lab_requests AS
-SELECT 
-    id, patient_id, doctor_id, technician_id, test_type, 
-    priority, status, created_at, updated_at
-FROM lab_requests
-WHERE is_deleted = FALSE
-ORDER BY created_at DESC
-LIMIT 500;
-
--- Create index on the materialized view
-CREATE UNIQUE INDEX IF NOT EXISTS idx_mv_recent_lab_requests ON mv_recent_lab_requests(id);
-
--- Function to refresh the materialized view
-CREATE OR REPLACE FUNCTION refresh_mv_recent_lab_requests()
-RETURNS TRIGGER AS $$
-BEGIN
-    REFRESH MATERIALIZED VIEW CONCURRENTLY mv_recent_lab_requests;
-    RETURN NULL;
-END;
-$$ LANGUAGE plpgsql;
-
--- Trigger to refresh the view on changes
-CREATE TRIGGER refresh_mv_recent_lab_requests_trigger
-AFTER INSERT OR UPDATE OR DELETE ON lab_requests
-FOR EACH STATEMENT
-EXECUTE FUNCTION refresh_mv_recent_lab_requests();
+-- The recent requests feed (lab_requests_recent) is created at service startup,
+-- see recent_requests.sql
 
 -- Add partial indexes for common filters
 CREATE INDEX IF NOT EXISTS idx_lab_requests_pending ON lab_requests(created_at DESC)
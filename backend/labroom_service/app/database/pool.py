@@ -0,0 +1,261 @@
+"""
+Managed asyncpg pool with workload classes, leak detection and metrics.
+
+All labroom database access goes through one physical pool. Callers name the
+workload they belong to ("default", "lab_requests", "lab_results",
+"reports"); each workload has its own cap on concurrently held connections so
+a burst of report queries cannot starve request handling.
+
+Every acquire is tracked until it is released: connections held longer than
+``hold_warning`` seconds are logged together with the code that acquired
+them, and the pool reports acquire wait times, in-use counts and connection
+churn through ``metrics()``.
+"""
+import asyncio
+import logging
+import sys
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import asyncpg
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKLOAD = "default"
+
+
+class _Lease:
+    __slots__ = ("workload", "acquired_at", "caller", "warned")
+
+    def __init__(self, workload: str, caller: str):
+        self.workload = workload
+        self.acquired_at = time.monotonic()
+        self.caller = caller
+        self.warned = False
+
+
+class _WorkloadStats:
+    def __init__(self, cap: int):
+        self.cap = cap
+        self.in_use = 0
+        self.max_in_use = 0
+        self.waiting = 0
+        self.acquires = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "cap": self.cap,
+            "in_use": self.in_use,
+            "max_in_use": self.max_in_use,
+            "waiting": self.waiting,
+            "acquires": self.acquires,
+            "timeouts": self.timeouts,
+            "wait_avg_ms": round(self.wait_total / self.acquires * 1000, 3) if self.acquires else 0.0,
+            "wait_max_ms": round(self.wait_max * 1000, 3),
+        }
+
+
+def _caller() -> str:
+    """Location of the first frame outside the database package"""
+    frame = sys._getframe(2)
+    while frame is not None and f"{__package__.replace('.', '/')}/" in frame.f_code.co_filename.replace("\\", "/"):
+        frame = frame.f_back
+    if frame is None:
+        return "unknown"
+    return f"{frame.f_code.co_filename}:{frame.f_lineno} in {frame.f_code.co_name}"
+
+
+class _Acquire:
+    """Result of ``ManagedPool.acquire``: awaitable, or usable with ``async with``."""
+
+    __slots__ = ("_pool", "_workload", "_timeout", "_caller", "_conn")
+
+    def __init__(self, pool: "ManagedPool", workload: str, timeout: Optional[float], caller: str):
+        self._pool = pool
+        self._workload = workload
+        self._timeout = timeout
+        self._caller = caller
+        self._conn = None
+
+    def __await__(self):
+        return self._pool._acquire(self._workload, self._timeout, self._caller).__await__()
+
+    async def __aenter__(self):
+        self._conn = await self._pool._acquire(self._workload, self._timeout, self._caller)
+        return self._conn
+
+    async def __aexit__(self, *exc):
+        conn, self._conn = self._conn, None
+        await self._pool.release(conn)
+
+
+class ManagedPool:
+    """One asyncpg pool shared by named workload classes with separate caps."""
+
+    def __init__(
+        self,
+        dsn: str,
+        min_size: int,
+        max_size: int,
+        workloads: Dict[str, int],
+        hold_warning: float = 30.0,
+        init: Optional[Callable[[asyncpg.Connection], Awaitable[None]]] = None,
+        **pool_kwargs,
+    ):
+        self.dsn = dsn
+        self.min_size = min_size
+        self.max_size = max_size
+        self.hold_warning = hold_warning
+        self._init = init
+        self._pool_kwargs = pool_kwargs
+        self._pool: Optional[asyncpg.Pool] = None
+        self._watchdog: Optional[asyncio.Task] = None
+
+        workloads = {DEFAULT_WORKLOAD: max_size, **workloads}
+        self._limits = {name: asyncio.Semaphore(min(cap, max_size)) for name, cap in workloads.items()}
+        self._stats = {name: _WorkloadStats(min(cap, max_size)) for name, cap in workloads.items()}
+        self._leases: Dict[int, _Lease] = {}
+
+        # Metrics
+        self.connections_opened = 0
+        self.held_too_long = 0
+        self.unknown_releases = 0
+
+    async def open(self):
+        self._pool = await asyncpg.create_pool(
+            dsn=self.dsn,
+            min_size=self.min_size,
+            max_size=self.max_size,
+            init=self._on_connect,
+            **self._pool_kwargs,
+        )
+        self._watchdog = asyncio.create_task(self._watch())
+        logger.info(
+            f"Database pool opened ({self.min_size}-{self.max_size} connections, "
+            f"workloads: {', '.join(f'{n}={s.cap}' for n, s in self._stats.items())})"
+        )
+
+    async def close(self):
+        if self._watchdog:
+            self._watchdog.cancel()
+            self._watchdog = None
+        for lease in self._leases.values():
+            logger.warning(f"Connection still held at shutdown ({lease.workload}), acquired at {lease.caller}")
+        if self._pool:
+            await self._pool.close()
+            self._pool = None
+
+    async def _on_connect(self, conn: asyncpg.Connection):
+        self.connections_opened += 1
+        if self._init:
+            await self._init(conn)
+
+    def acquire(self, workload: str = DEFAULT_WORKLOAD, timeout: Optional[float] = None) -> _Acquire:
+        """Acquire a connection; await it, or use ``async with pool.acquire() as conn``."""
+        if workload not in self._limits:
+            raise ValueError(f"Unknown database workload: {workload}")
+        return _Acquire(self, workload, timeout, _caller())
+
+    async def _acquire(self, workload: str, timeout: Optional[float], caller: str):
+        stats = self._stats[workload]
+        limit = self._limits[workload]
+        started = time.monotonic()
+
+        stats.waiting += 1
+        try:
+            if timeout is None:
+                await limit.acquire()
+            else:
+                await asyncio.wait_for(limit.acquire(), timeout)
+            try:
+                remaining = None if timeout is None else max(timeout - (time.monotonic() - started), 0.001)
+                conn = await self._pool.acquire(timeout=remaining)
+            except BaseException:
+                limit.release()
+                raise
+        except asyncio.TimeoutError:
+            stats.timeouts += 1
+            raise
+        finally:
+            stats.waiting -= 1
+
+        wait = time.monotonic() - started
+        stats.acquires += 1
+        stats.wait_total += wait
+        stats.wait_max = max(stats.wait_max, wait)
+        stats.in_use += 1
+        stats.max_in_use = max(stats.max_in_use, stats.in_use)
+        self._leases[id(conn)] = _Lease(workload, caller)
+        return conn
+
+    def owns(self, conn) -> bool:
+        """Whether ``conn`` is currently leased from this pool"""
+        return id(conn) in self._leases
+
+    async def release(self, conn):
+        """Return a connection to the pool (never ``conn.close()`` a pooled connection)."""
+        if conn is None:
+            return
+        lease = self._leases.pop(id(conn), None)
+        if lease is None:
+            self.unknown_releases += 1
+            logger.warning(f"Releasing a connection that was not acquired through the managed pool ({_caller()})")
+        else:
+            held = time.monotonic() - lease.acquired_at
+            if held > self.hold_warning and not lease.warned:
+                self.held_too_long += 1
+                logger.warning(f"Connection ({lease.workload}) held for {held:.1f}s, acquired at {lease.caller}")
+            self._stats[lease.workload].in_use -= 1
+            self._limits[lease.workload].release()
+        await self._pool.release(conn)
+
+    async def _watch(self):
+        """Report connections that are held too long (likely leaked) while they are still held."""
+        interval = max(self.hold_warning / 2, 1.0)
+        while True:
+            await asyncio.sleep(interval)
+            now = time.monotonic()
+            for lease in list(self._leases.values()):
+                if not lease.warned and now - lease.acquired_at > self.hold_warning:
+                    lease.warned = True
+                    self.held_too_long += 1
+                    logger.warning(
+                        f"Connection ({lease.workload}) held for {now - lease.acquired_at:.1f}s "
+                        f"without release, acquired at {lease.caller}"
+                    )
+
+    def metrics(self) -> Dict[str, Any]:
+        size = self._pool.get_size() if self._pool else 0
+        return {
+            "size": size,
+            "idle": self._pool.get_idle_size() if self._pool else 0,
+            "min_size": self.min_size,
+            "max_size": self.max_size,
+            "in_use": len(self._leases),
+            "connections_opened": self.connections_opened,
+            # Connections closed by the pool (idle expiry, errors); high values mean churn
+            "connections_closed": max(self.connections_opened - size, 0),
+            "held_too_long": self.held_too_long,
+            "unknown_releases": self.unknown_releases,
+            "workloads": {name: stats.as_dict() for name, stats in self._stats.items()},
+        }
+
+    # Pass-through for code that uses the pool directly
+    async def execute(self, query: str, *args, workload: str = DEFAULT_WORKLOAD, **kwargs):
+        async with self.acquire(workload) as conn:
+            return await conn.execute(query, *args, **kwargs)
+
+    async def fetch(self, query: str, *args, workload: str = DEFAULT_WORKLOAD, **kwargs):
+        async with self.acquire(workload) as conn:
+            return await conn.fetch(query, *args, **kwargs)
+
+    async def fetchrow(self, query: str, *args, workload: str = DEFAULT_WORKLOAD, **kwargs):
+        async with self.acquire(workload) as conn:
+            return await conn.fetchrow(query, *args, **kwargs)
+
+    async def fetchval(self, query: str, *args, workload: str = DEFAULT_WORKLOAD, **kwargs):
+        async with self.acquire(workload) as conn:
+            return await conn.fetchval(query, *args, **kwargs)
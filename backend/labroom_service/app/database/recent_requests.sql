@@ -0,0 +1,134 @@
+-- Incrementally maintained feed of the most recent lab requests
+-- Applied at startup after init.sql (idempotent); read by /lab-requests/fast.
+--
+-- lab_requests_recent holds the newest non-deleted lab requests, about
+-- lab_requests_recent_cap() of them (trimmed lazily, so a few more). It is
+-- always a prefix of lab_requests by created_at: every non-deleted request at
+-- least as new as the oldest row in the feed is in the feed. Row triggers keep
+-- it in sync, touching only the changed request.
+--
+-- This replaces mv_recent_lab_requests, whose statement trigger ran
+-- REFRESH MATERIALIZED VIEW CONCURRENTLY (a scan of lab_requests) on every write.
+
+-- Serialize concurrent startups (all statements below run in one transaction)
+SELECT pg_advisory_xact_lock(hashtext('lab_requests_recent'));
+
+DROP TRIGGER IF EXISTS refresh_mv_recent_lab_requests_trigger ON lab_requests;
+DROP FUNCTION IF EXISTS refresh_mv_recent_lab_requests();
+DROP MATERIALIZED VIEW IF EXISTS mv_recent_lab_requests;
+
+CREATE TABLE IF NOT EXISTS lab_requests_recent (
+    id UUID PRIMARY KEY,
+    patient_id UUID NOT NULL,
+    doctor_id UUID NOT NULL,
+    technician_id UUID,
+    test_type TEXT NOT NULL,
+    priority TEXT NOT NULL,
+    status TEXT NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE NOT NULL,
+    updated_at TIMESTAMP WITH TIME ZONE NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_lab_requests_recent_created_at ON lab_requests_recent(created_at DESC);
+
+-- The largest /lab-requests/fast limit is 500; the rest is headroom for the technician filter
+CREATE OR REPLACE FUNCTION lab_requests_recent_cap()
+RETURNS INTEGER AS $$ SELECT 1000 $$ LANGUAGE sql IMMUTABLE;
+
+CREATE OR REPLACE FUNCTION lab_requests_recent_trim()
+RETURNS VOID AS $$
+DECLARE
+    v_cutoff TIMESTAMP WITH TIME ZONE;
+BEGIN
+    SELECT created_at INTO v_cutoff FROM lab_requests_recent
+    ORDER BY created_at DESC
+    OFFSET lab_requests_recent_cap() LIMIT 1;
+    IF v_cutoff IS NOT NULL THEN
+        DELETE FROM lab_requests_recent WHERE created_at <= v_cutoff;
+    END IF;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION lab_requests_recent_sync()
+RETURNS TRIGGER AS $$
+DECLARE
+    v_oldest TIMESTAMP WITH TIME ZONE;
+BEGIN
+    IF TG_OP = 'UPDATE' AND
+       (OLD.patient_id, OLD.doctor_id, OLD.technician_id, OLD.test_type, OLD.priority,
+        OLD.status, OLD.created_at, OLD.updated_at, OLD.is_deleted)
+       IS NOT DISTINCT FROM
+       (NEW.patient_id, NEW.doctor_id, NEW.technician_id, NEW.test_type, NEW.priority,
+        NEW.status, NEW.created_at, NEW.updated_at, NEW.is_deleted) THEN
+        RETURN NULL;
+    END IF;
+
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        IF TG_OP = 'DELETE' OR NEW.is_deleted OR NEW.created_at IS DISTINCT FROM OLD.created_at THEN
+            DELETE FROM lab_requests_recent WHERE id = OLD.id;
+        ELSE
+            UPDATE lab_requests_recent SET
+                patient_id = NEW.patient_id,
+                doctor_id = NEW.doctor_id,
+                technician_id = NEW.technician_id,
+                test_type = NEW.test_type::text,
+                priority = NEW.priority::text,
+                status = NEW.status::text,
+                updated_at = NEW.updated_at
+            WHERE id = NEW.id;
+            IF FOUND THEN
+                RETURN NULL;
+            END IF;
+        END IF;
+    END IF;
+
+    IF TG_OP = 'DELETE' OR NEW.is_deleted THEN
+        RETURN NULL;
+    END IF;
+
+    -- Only add requests that keep the feed a prefix of lab_requests
+    SELECT MIN(created_at) INTO v_oldest FROM lab_requests_recent;
+    IF v_oldest IS NULL THEN
+        IF EXISTS (
+            SELECT 1 FROM lab_requests
+            WHERE created_at > NEW.created_at AND is_deleted = FALSE AND id <> NEW.id
+        ) THEN
+            RETURN NULL;
+        END IF;
+    ELSIF NEW.created_at < v_oldest THEN
+        RETURN NULL;
+    END IF;
+
+    INSERT INTO lab_requests_recent
+        (id, patient_id, doctor_id, technician_id, test_type, priority, status, created_at, updated_at)
+    VALUES
+        (NEW.id, NEW.patient_id, NEW.doctor_id, NEW.technician_id, NEW.test_type::text,
+         NEW.priority::text, NEW.status::text, NEW.created_at, NEW.updated_at)
+    ON CONFLICT (id) DO NOTHING;
+
+    -- Now and then drop the rows beyond the cap. Always the oldest ones, so the feed stays a
+    -- prefix; one trimmer at a time, the others just skip it.
+    IF random() < 0.1 AND pg_try_advisory_xact_lock(hashtext('lab_requests_recent_trim')) THEN
+        PERFORM lab_requests_recent_trim();
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Changes are checked in the function, see lab_request_rollup_update in rollups.sql
+CREATE OR REPLACE TRIGGER lab_requests_recent_sync
+AFTER INSERT OR UPDATE OR DELETE ON lab_requests
+FOR EACH ROW EXECUTE FUNCTION lab_requests_recent_sync();
+
+-- (Re)load the newest requests; a no-op when the feed is already in sync
+INSERT INTO lab_requests_recent
+    (id, patient_id, doctor_id, technician_id, test_type, priority, status, created_at, updated_at)
+SELECT id, patient_id, doctor_id, technician_id, test_type::text, priority::text, status::text,
+       created_at, updated_at
+FROM lab_requests
+WHERE is_deleted = FALSE
+ORDER BY created_at DESC
+LIMIT lab_requests_recent_cap()
+ON CONFLICT (id) DO NOTHING;
+
+SELECT lab_requests_recent_trim();
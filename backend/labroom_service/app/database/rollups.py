@@ -0,0 +1,50 @@
+"""
+Analytics rollups for lab_requests.
+
+rollups.sql installs hourly, daily and all-time rollup tables that row
+triggers on lab_requests keep up to date, so the analytics dashboard never
+scans lab_requests. The first startup after installing them loads the
+existing data; to rebuild them later (e.g. after a bulk load with triggers
+disabled) run, from labroom_service/::
+
+    python -m app.database.rollups
+"""
+import asyncio
+import logging
+import os
+
+import asyncpg
+
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+ROLLUPS_SQL = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'rollups.sql')
+
+async def apply_rollups(conn) -> None:
+    """Install (or update) the rollup tables and triggers; backfill them the first time"""
+    with open(ROLLUPS_SQL, 'r') as f:
+        await conn.execute(f.read())
+    if not await conn.fetchval("SELECT EXISTS (SELECT 1 FROM lab_request_rollup_meta)"):
+        logger.info("Backfilling lab request analytics rollups")
+        rows = await backfill_rollups(conn)
+        logger.info(f"Analytics rollups backfilled from {rows} lab requests")
+
+async def backfill_rollups(conn) -> int:
+    """Rebuild the rollups from lab_requests; writes to lab_requests wait until it is done"""
+    async with conn.transaction():
+        return await conn.fetchval("SELECT lab_request_rollups_backfill()")
+
+async def main() -> None:
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    conn = await asyncpg.connect(settings.DATABASE_URL)
+    try:
+        with open(ROLLUPS_SQL, 'r') as f:
+            await conn.execute(f.read())
+        rows = await backfill_rollups(conn)
+        logger.info(f"Analytics rollups rebuilt from {rows} lab requests")
+    finally:
+        await conn.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
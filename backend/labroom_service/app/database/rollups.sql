@@ -0,0 +1,204 @@
+-- Incrementally maintained analytics rollups for lab_requests
+-- Applied at startup after init.sql (idempotent). Existing data is loaded with
+-- lab_request_rollups_backfill(); see app/database/rollups.py.
+--
+-- Every non-deleted lab request contributes one count (and its turnaround
+-- once completed) to one row of each rollup. Row triggers on lab_requests
+-- subtract the old contribution and add the new one, so the dashboard reads a
+-- handful of small rows instead of scanning lab_requests.
+
+-- Serialize concurrent startups (all statements below run in one transaction)
+SELECT pg_advisory_xact_lock(hashtext('lab_request_rollups'));
+
+-- ---------- ROLLUP TABLES ----------
+-- Requests created per hour (bucket in the database time zone)
+CREATE TABLE IF NOT EXISTS lab_request_rollup_hourly (
+    bucket TIMESTAMP WITH TIME ZONE NOT NULL,
+    test_type TEXT NOT NULL,
+    priority TEXT NOT NULL,
+    status TEXT NOT NULL,
+    request_count BIGINT NOT NULL DEFAULT 0,
+    turnaround_seconds DOUBLE PRECISION NOT NULL DEFAULT 0,
+    turnaround_count BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (bucket, test_type, priority, status)
+);
+
+-- Requests created per day, by doctor and technician
+-- (technician_id is the zero UUID for unassigned requests)
+CREATE TABLE IF NOT EXISTS lab_request_rollup_daily (
+    bucket DATE NOT NULL,
+    doctor_id UUID NOT NULL,
+    technician_id UUID NOT NULL,
+    test_type TEXT NOT NULL,
+    priority TEXT NOT NULL,
+    status TEXT NOT NULL,
+    is_read BOOLEAN NOT NULL,
+    request_count BIGINT NOT NULL DEFAULT 0,
+    turnaround_seconds DOUBLE PRECISION NOT NULL DEFAULT 0,
+    turnaround_count BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (bucket, doctor_id, technician_id, test_type, priority, status, is_read)
+);
+
+-- All-time totals of current requests; size depends on staff and categories, not volume
+CREATE TABLE IF NOT EXISTS lab_request_rollup_totals (
+    doctor_id UUID NOT NULL,
+    technician_id UUID NOT NULL,
+    test_type TEXT NOT NULL,
+    priority TEXT NOT NULL,
+    status TEXT NOT NULL,
+    is_read BOOLEAN NOT NULL,
+    request_count BIGINT NOT NULL DEFAULT 0,
+    turnaround_seconds DOUBLE PRECISION NOT NULL DEFAULT 0,
+    turnaround_count BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (doctor_id, technician_id, test_type, priority, status, is_read)
+);
+
+-- Set once the rollups have been loaded from existing data
+CREATE TABLE IF NOT EXISTS lab_request_rollup_meta (
+    id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+    backfilled_at TIMESTAMP WITH TIME ZONE NOT NULL
+);
+
+-- ---------- MAINTENANCE ----------
+CREATE OR REPLACE FUNCTION lab_request_rollup_apply(
+    p_created_at TIMESTAMP WITH TIME ZONE,
+    p_completed_at TIMESTAMP WITH TIME ZONE,
+    p_doctor_id UUID,
+    p_technician_id UUID,
+    p_test_type TEXT,
+    p_priority TEXT,
+    p_status TEXT,
+    p_is_read BOOLEAN,
+    p_delta INTEGER
+) RETURNS VOID AS $$
+DECLARE
+    v_technician_id UUID := COALESCE(p_technician_id, '00000000-0000-0000-0000-000000000000');
+    v_turnaround DOUBLE PRECISION := 0;
+    v_turnaround_count INTEGER := 0;
+BEGIN
+    IF p_status = 'completed' AND p_completed_at IS NOT NULL THEN
+        v_turnaround := EXTRACT(EPOCH FROM (p_completed_at - p_created_at)) * p_delta;
+        v_turnaround_count := p_delta;
+    END IF;
+
+    INSERT INTO lab_request_rollup_hourly AS r
+        (bucket, test_type, priority, status, request_count, turnaround_seconds, turnaround_count)
+    VALUES
+        (date_trunc('hour', p_created_at), p_test_type, p_priority, p_status,
+         p_delta, v_turnaround, v_turnaround_count)
+    ON CONFLICT (bucket, test_type, priority, status) DO UPDATE SET
+        request_count = r.request_count + EXCLUDED.request_count,
+        turnaround_seconds = r.turnaround_seconds + EXCLUDED.turnaround_seconds,
+        turnaround_count = r.turnaround_count + EXCLUDED.turnaround_count;
+
+    INSERT INTO lab_request_rollup_daily AS r
+        (bucket, doctor_id, technician_id, test_type, priority, status, is_read,
+         request_count, turnaround_seconds, turnaround_count)
+    VALUES
+        (p_created_at::date, p_doctor_id, v_technician_id, p_test_type, p_priority, p_status, p_is_read,
+         p_delta, v_turnaround, v_turnaround_count)
+    ON CONFLICT (bucket, doctor_id, technician_id, test_type, priority, status, is_read) DO UPDATE SET
+        request_count = r.request_count + EXCLUDED.request_count,
+        turnaround_seconds = r.turnaround_seconds + EXCLUDED.turnaround_seconds,
+        turnaround_count = r.turnaround_count + EXCLUDED.turnaround_count;
+
+    INSERT INTO lab_request_rollup_totals AS r
+        (doctor_id, technician_id, test_type, priority, status, is_read,
+         request_count, turnaround_seconds, turnaround_count)
+    VALUES
+        (p_doctor_id, v_technician_id, p_test_type, p_priority, p_status, p_is_read,
+         p_delta, v_turnaround, v_turnaround_count)
+    ON CONFLICT (doctor_id, technician_id, test_type, priority, status, is_read) DO UPDATE SET
+        request_count = r.request_count + EXCLUDED.request_count,
+        turnaround_seconds = r.turnaround_seconds + EXCLUDED.turnaround_seconds,
+        turnaround_count = r.turnaround_count + EXCLUDED.turnaround_count;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION lab_request_rollup_trigger()
+RETURNS TRIGGER AS $$
+BEGIN
+    -- Only updates of rolled-up columns touch the rollups
+    IF TG_OP = 'UPDATE' AND
+       (OLD.created_at, OLD.completed_at, OLD.doctor_id, OLD.technician_id, OLD.test_type,
+        OLD.priority, OLD.status, OLD.is_read, OLD.is_deleted)
+       IS NOT DISTINCT FROM
+       (NEW.created_at, NEW.completed_at, NEW.doctor_id, NEW.technician_id, NEW.test_type,
+        NEW.priority, NEW.status, NEW.is_read, NEW.is_deleted) THEN
+        RETURN NULL;
+    END IF;
+
+    IF TG_OP IN ('UPDATE', 'DELETE') AND NOT OLD.is_deleted THEN
+        PERFORM lab_request_rollup_apply(
+            OLD.created_at, OLD.completed_at, OLD.doctor_id, OLD.technician_id,
+            OLD.test_type::text, OLD.priority::text, OLD.status::text, OLD.is_read, -1);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NOT NEW.is_deleted THEN
+        PERFORM lab_request_rollup_apply(
+            NEW.created_at, NEW.completed_at, NEW.doctor_id, NEW.technician_id,
+            NEW.test_type::text, NEW.priority::text, NEW.status::text, NEW.is_read, 1);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE TRIGGER lab_request_rollup_insert_delete
+AFTER INSERT OR DELETE ON lab_requests
+FOR EACH ROW EXECUTE FUNCTION lab_request_rollup_trigger();
+
+-- No UPDATE OF or WHEN clause: init.sql re-types the enum columns at startup,
+-- which Postgres refuses for columns a trigger definition depends on
+CREATE OR REPLACE TRIGGER lab_request_rollup_update
+AFTER UPDATE ON lab_requests
+FOR EACH ROW EXECUTE FUNCTION lab_request_rollup_trigger();
+
+-- Rebuild all rollups from lab_requests. Blocks writes to lab_requests while it runs.
+CREATE OR REPLACE FUNCTION lab_request_rollups_backfill()
+RETURNS BIGINT AS $$
+DECLARE
+    v_rows BIGINT;
+BEGIN
+    LOCK TABLE lab_requests IN SHARE MODE;
+    TRUNCATE lab_request_rollup_hourly, lab_request_rollup_daily, lab_request_rollup_totals;
+
+    CREATE TEMPORARY TABLE lab_request_rollup_source AS
+    SELECT
+        created_at,
+        doctor_id,
+        COALESCE(technician_id, '00000000-0000-0000-0000-000000000000') AS technician_id,
+        test_type::text AS test_type,
+        priority::text AS priority,
+        status::text AS status,
+        is_read,
+        CASE WHEN status = 'completed' AND completed_at IS NOT NULL
+            THEN EXTRACT(EPOCH FROM (completed_at - created_at)) ELSE 0 END AS turnaround_seconds,
+        CASE WHEN status = 'completed' AND completed_at IS NOT NULL THEN 1 ELSE 0 END AS turnaround_count
+    FROM lab_requests
+    WHERE is_deleted = FALSE;
+
+    INSERT INTO lab_request_rollup_hourly
+    SELECT date_trunc('hour', created_at), test_type, priority, status,
+           COUNT(*), SUM(turnaround_seconds), SUM(turnaround_count)
+    FROM lab_request_rollup_source
+    GROUP BY 1, 2, 3, 4;
+
+    INSERT INTO lab_request_rollup_daily
+    SELECT created_at::date, doctor_id, technician_id, test_type, priority, status, is_read,
+           COUNT(*), SUM(turnaround_seconds), SUM(turnaround_count)
+    FROM lab_request_rollup_source
+    GROUP BY 1, 2, 3, 4, 5, 6, 7;
+
+    INSERT INTO lab_request_rollup_totals
+    SELECT doctor_id, technician_id, test_type, priority, status, is_read,
+           COUNT(*), SUM(turnaround_seconds), SUM(turnaround_count)
+    FROM lab_request_rollup_source
+    GROUP BY 1, 2, 3, 4, 5, 6;
+
+    SELECT COUNT(*) INTO v_rows FROM lab_request_rollup_source;
+    DROP TABLE lab_request_rollup_source;
+
+    INSERT INTO lab_request_rollup_meta (backfilled_at) VALUES (NOW())
+    ON CONFLICT (id) DO UPDATE SET backfilled_at = EXCLUDED.backfilled_at;
+    RETURN v_rows;
+END;
+$$ LANGUAGE plpgsql;
@@ -1,11 +1,19 @@
 from fastapi import Depends, HTTPException, status, Query
 from typing import Dict, Any, Optional
 import uuid
-from .database import get_connection, fetch_one
+from .database import get_connection, release_connection, fetch_one
 from .security import get_current_user, require_lab_technician
 from .models import LabRequest, LabResult
 from .exceptions import NotFoundException
 
+async def get_db_connection():
+    """Request-scoped pooled connection, released when the request finishes."""
+    conn = await get_connection()
+    try:
+        yield conn
+    finally:
+        await release_connection(conn)
+
 async def get_lab_request(
     request_id: uuid.UUID,
     lab_technician_id: Optional[uuid.UUID] = None,
@@ -47,7 +55,7 @@ async def get_lab_request(
         
         return lab_request
     finally:
-        await conn.close()
+        await release_connection(conn)
 
 async def get_lab_result(
     result_id: uuid.UUID,
@@ -73,7 +81,7 @@ async def get_lab_result(
         
         return lab_result
     finally:
-        await conn.close()
+        await release_connection(conn)
 
 async def get_paginated_params(
     page: int = Query(1, ge=1),
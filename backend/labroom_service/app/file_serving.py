@@ -0,0 +1,225 @@
+# labroom_service/app/file_serving.py
+"""
+Serving stored files (lab result images, lab request attachments, reports).
+
+``RangeFileResponse`` is a FileResponse with:
+
+* byte ranges: a single ``Range: bytes=...`` is answered with 206 and that
+  slice, so a viewer seeking in a large scan or a resumed download fetches
+  only what it needs. ``If-Range`` falls back to the whole file once the file
+  changed, an unsatisfiable range gets 416, and several ranges in one request
+  get the whole file (which HTTP allows).
+* a strong ETag of the content (SHA-256) and 304 for a matching
+  If-None-Match. Content-addressed files pass the hash they are stored under;
+  other files are hashed once, in a worker thread, and the hash is kept per
+  inode, size and mtime.
+* ``Cache-Control``: files that are never rewritten (uploads, blobs) are
+  ``immutable`` and browsers don't revalidate them at all; others are
+  revalidated against the ETag.
+* sendfile: when the server offers the ASGI ``http.response.zerocopy``
+  extension the file descriptor and offset are handed to it and the kernel
+  copies the bytes. Otherwise the file is read in ``FILE_CHUNK_SIZE`` chunks in
+  a worker thread.
+* at most ``FILE_DOWNLOAD_CONCURRENCY`` bodies sent at once per process. A
+  download that waits longer than ``FILE_DOWNLOAD_QUEUE_TIMEOUT`` for a slot
+  gets 503 with Retry-After, so bulk downloads can't starve the API of its
+  threads and file descriptors.
+
+``RangeStaticFiles`` serves a directory the same way, for upload mounts.
+Files are always sent as they are stored: the compression middleware leaves
+responses with ``Accept-Ranges`` alone, so ranges stay byte offsets of the file.
+"""
+import asyncio
+import hashlib
+import os
+import stat as stat_module
+from collections import OrderedDict
+from email.utils import formatdate
+from typing import Optional, Tuple, Union
+
+from fastapi.responses import FileResponse, Response
+from fastapi.staticfiles import StaticFiles
+from starlette.datastructures import Headers
+
+from app.config import settings
+from app.http_cache import etag_matches
+
+IMMUTABLE = "private, max-age=31536000, immutable"
+REVALIDATE = "private, no-cache"
+
+download_slots = asyncio.Semaphore(settings.FILE_DOWNLOAD_CONCURRENCY)
+
+# (device, inode, size, mtime) -> SHA-256, or the task still computing it
+_hashes: "OrderedDict[Tuple[int, int, int, int], Union[str, asyncio.Task]]" = OrderedDict()
+HASH_CACHE_SIZE = 4096
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    The first and last byte of a single ``bytes=`` range, or None for the whole
+    file. Raises RangeNotSatisfiable if the range lies outside the file.
+    """
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    first, sep, last = header[6:].strip().partition("-")
+    if not sep:
+        return None
+    try:
+        if not first:
+            # Suffix range: the last N bytes
+            length = int(last)
+            if length <= 0 or size == 0:
+                raise RangeNotSatisfiable()
+            return max(size - length, 0), size - 1
+        start = int(first)
+        end = int(last) if last else None
+    except ValueError:
+        return None
+    if start < 0 or (end is not None and end < start):
+        return None
+    if start >= size:
+        raise RangeNotSatisfiable()
+    return start, size - 1 if end is None else min(end, size - 1)
+
+
+def hash_file(path: str, chunk_size: int = 1024 * 1024) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def file_key(stat_result: os.stat_result) -> Tuple[int, int, int, int]:
+    return stat_result.st_dev, stat_result.st_ino, stat_result.st_size, stat_result.st_mtime_ns
+
+
+async def content_hash(path: str, stat_result: os.stat_result) -> str:
+    """SHA-256 of the file, computed once per version of it"""
+    key = file_key(stat_result)
+    cached = _hashes.get(key)
+    if isinstance(cached, str):
+        _hashes.move_to_end(key)
+        return cached
+    if cached is None:
+        # Concurrent first requests for the file share one hashing pass
+        cached = _hashes[key] = asyncio.ensure_future(asyncio.to_thread(hash_file, path))
+    try:
+        digest = await cached
+    except BaseException:
+        if _hashes.get(key) is cached:
+            del _hashes[key]
+        raise
+    _hashes[key] = digest
+    while len(_hashes) > HASH_CACHE_SIZE:
+        _hashes.popitem(last=False)
+    return digest
+
+
+def remember_hash(path: str, digest: str) -> None:
+    """Record the hash of a file that was just written (and hashed on the way)"""
+    _hashes[file_key(os.stat(path))] = digest
+
+
+class RangeFileResponse(FileResponse):
+    """A FileResponse with ranges, content ETags, Cache-Control and a concurrency limit"""
+
+    chunk_size = settings.FILE_CHUNK_SIZE
+
+    def __init__(self, path: Union[str, "os.PathLike[str]"], *, content_hash: Optional[str] = None,
+                 immutable: bool = False, **kwargs):
+        super().__init__(path, **kwargs)
+        self.content_hash = content_hash
+        self.headers["accept-ranges"] = "bytes"
+        self.headers["cache-control"] = IMMUTABLE if immutable else REVALIDATE
+
+    async def __call__(self, scope, receive, send):
+        try:
+            stat_result = self.stat_result or await asyncio.to_thread(os.stat, self.path)
+        except FileNotFoundError:
+            await Response("File not found", status_code=404)(scope, receive, send)
+            return
+        size = stat_result.st_size
+        etag = f'"{self.content_hash or await content_hash(str(self.path), stat_result)}"'
+        self.headers["etag"] = etag
+        self.headers["last-modified"] = formatdate(stat_result.st_mtime, usegmt=True)
+
+        request_headers = Headers(scope=scope)
+        if etag_matches(request_headers.get("if-none-match"), etag):
+            headers = {k: v for k, v in self.headers.items() if k in ("etag", "cache-control", "last-modified")}
+            await Response(status_code=304, headers=headers)(scope, receive, send)
+            return
+
+        byte_range = None
+        if_range = request_headers.get("if-range")
+        # A stale If-Range (or a weak ETag / date in it) means: send the whole file
+        if self.status_code == 200 and (if_range is None or if_range == etag):
+            try:
+                byte_range = parse_range(request_headers.get("range"), size)
+            except RangeNotSatisfiable:
+                await Response(status_code=416, headers={"content-range": f"bytes */{size}"})(scope, receive, send)
+                return
+
+        if byte_range is None:
+            start, end, status_code = 0, size - 1, self.status_code
+        else:
+            start, end = byte_range
+            status_code = 206
+            self.headers["content-range"] = f"bytes {start}-{end}/{size}"
+        length = end - start + 1 if size else 0
+        self.headers["content-length"] = str(length)
+
+        try:
+            await asyncio.wait_for(download_slots.acquire(), settings.FILE_DOWNLOAD_QUEUE_TIMEOUT)
+        except asyncio.TimeoutError:
+            await Response("Too many concurrent downloads", status_code=503, headers={"retry-after": "1"})(scope, receive, send)
+            return
+        try:
+            await send({"type": "http.response.start", "status": status_code, "headers": self.raw_headers})
+            if scope["method"].upper() == "HEAD" or length == 0:
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+            elif "http.response.zerocopy" in scope.get("extensions", {}):
+                await self.send_zerocopy(send, start, length)
+            else:
+                await self.send_chunks(send, start, length)
+        finally:
+            download_slots.release()
+        if self.background is not None:
+            await self.background()
+
+    async def send_zerocopy(self, send, start: int, length: int) -> None:
+        with open(self.path, "rb") as f:
+            await send({"type": "http.response.zerocopy", "file": f, "offset": start, "count": length,
+                        "more_body": False})
+
+    async def send_chunks(self, send, start: int, length: int) -> None:
+        with open(self.path, "rb") as f:
+            await asyncio.to_thread(f.seek, start)
+            remaining = length
+            while remaining > 0:
+                chunk = await asyncio.to_thread(f.read, min(self.chunk_size, remaining))
+                if not chunk:
+                    # The file was truncated under us; end the body rather than hang
+                    break
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+            if remaining > 0:
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+
+class RangeStaticFiles(StaticFiles):
+    """StaticFiles whose files are served by RangeFileResponse"""
+
+    def __init__(self, *args, immutable: bool = False, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.immutable = immutable
+
+    def file_response(self, full_path, stat_result: os.stat_result, scope, status_code: int = 200) -> Response:
+        if not stat_module.S_ISREG(stat_result.st_mode):
+            return super().file_response(full_path, stat_result, scope, status_code)
+        return RangeFileResponse(full_path, stat_result=stat_result, status_code=status_code,
+                                 immutable=self.immutable)
@@ -0,0 +1,238 @@
+# labroom_service/app/http_client.py
+"""
+Shared, long-lived HTTP clients for inter-service calls.
+
+One pooled ``httpx.AsyncClient`` per upstream service is kept for the life of
+the worker, so calls reuse keep-alive connections instead of paying for a TCP
+(and TLS) handshake every time. Each upstream has its own connection limits,
+timeouts and retry/backoff policy, and records connection reuse and pool-wait
+metrics that are exposed through ``/health/http-clients``.
+"""
+import asyncio
+import logging
+import random
+import time
+from typing import Any, Dict, Optional
+
+import httpx
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+# Methods that are safe to replay after the request may have reached the upstream
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+# Upstream answers that are worth retrying for idempotent requests
+RETRY_STATUS_CODES = {502, 503, 504}
+# Failures where the request never left this process, so any method can be retried
+CONNECT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class UpstreamClient:
+    """Pooled HTTP client for one upstream service with retries and metrics."""
+
+    def __init__(
+        self,
+        name: str,
+        base_url: str,
+        timeout: float = 10.0,
+        max_connections: int = 20,
+        max_keepalive_connections: int = 10,
+        keepalive_expiry: float = 30.0,
+        retries: int = 2,
+        backoff: float = 0.2,
+        http2: bool = False,
+    ):
+        self.name = name
+        self.base_url = base_url
+        self.retries = retries
+        self.backoff = backoff
+
+        if http2 and not _http2_available():
+            logger.warning(f"HTTP/2 requested for {name} but the h2 package is not installed; using HTTP/1.1")
+            http2 = False
+        self.http2 = http2
+
+        self._client = httpx.AsyncClient(
+            base_url=base_url,
+            timeout=timeout,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections,
+                keepalive_expiry=keepalive_expiry,
+            ),
+            http2=http2,
+        )
+
+        # Metrics
+        self.requests = 0
+        self.errors = 0
+        self.retried = 0
+        self.connections_opened = 0
+        self.pool_wait_total = 0.0
+        self.pool_wait_max = 0.0
+
+    @property
+    def is_closed(self) -> bool:
+        return self._client.is_closed
+
+    def _backoff_delay(self, attempt: int) -> float:
+        # Exponential backoff with full jitter
+        return random.uniform(0, self.backoff * (2 ** (attempt - 1)))
+
+    async def request(self, method: str, url: str, *, retries: Optional[int] = None, **kwargs) -> httpx.Response:
+        """
+        Send a request, retrying transient failures.
+
+        Connection failures are retried for every method. Timeouts after the
+        request was sent and 502/503/504 answers are only retried for
+        idempotent methods.
+        """
+        max_retries = self.retries if retries is None else retries
+        idempotent = method.upper() in IDEMPOTENT_METHODS
+        extensions = dict(kwargs.pop("extensions", None) or {})
+        attempt = 0
+
+        while True:
+            timing = {"started": time.perf_counter(), "first_event": None}
+
+            async def trace(event_name: str, info: Dict[str, Any], timing=timing):
+                # The first transport event marks the end of waiting for a pool slot
+                if timing["first_event"] is None and (
+                    event_name == "connection.connect_tcp.started"
+                    or event_name.endswith("send_request_headers.started")
+                ):
+                    timing["first_event"] = time.perf_counter()
+                if event_name == "connection.connect_tcp.complete":
+                    self.connections_opened += 1
+
+            self.requests += 1
+            try:
+                response = await self._client.request(
+                    method, url, extensions={**extensions, "trace": trace}, **kwargs
+                )
+            except httpx.TransportError as e:
+                self._record_wait(timing)
+                self.errors += 1
+                if attempt < max_retries and (idempotent or isinstance(e, CONNECT_ERRORS)):
+                    attempt += 1
+                    self.retried += 1
+                    logger.warning(f"{self.name} {method} {url} failed ({e!r}), retry {attempt}/{max_retries}")
+                    await asyncio.sleep(self._backoff_delay(attempt))
+                    continue
+                raise
+
+            self._record_wait(timing)
+            if response.status_code in RETRY_STATUS_CODES and idempotent and attempt < max_retries:
+                await response.aclose()
+                attempt += 1
+                self.retried += 1
+                logger.warning(f"{self.name} {method} {url} returned {response.status_code}, retry {attempt}/{max_retries}")
+                await asyncio.sleep(self._backoff_delay(attempt))
+                continue
+            return response
+
+    def _record_wait(self, timing: Dict[str, Any]):
+        if timing["first_event"] is None:
+            return
+        wait = timing["first_event"] - timing["started"]
+        self.pool_wait_total += wait
+        self.pool_wait_max = max(self.pool_wait_max, wait)
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("POST", url, **kwargs)
+
+    async def put(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("PUT", url, **kwargs)
+
+    async def patch(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("PATCH", url, **kwargs)
+
+    async def delete(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("DELETE", url, **kwargs)
+
+    async def aclose(self):
+        await self._client.aclose()
+
+    def metrics(self) -> Dict[str, Any]:
+        attempts = self.requests
+        return {
+            "base_url": self.base_url,
+            "http2": self.http2,
+            "requests": attempts,
+            "errors": self.errors,
+            "retries": self.retried,
+            "connections_opened": self.connections_opened,
+            "connections_reused": max(attempts - self.errors - self.connections_opened, 0),
+            "pool_wait_avg_ms": round(self.pool_wait_total / attempts * 1000, 3) if attempts else 0.0,
+            "pool_wait_max_ms": round(self.pool_wait_max * 1000, 3),
+        }
+
+
+def _upstreams() -> Dict[str, Dict[str, Any]]:
+    """Per-upstream client configuration"""
+    defaults = {
+        "timeout": settings.HTTP_CLIENT_TIMEOUT,
+        "max_connections": settings.HTTP_CLIENT_MAX_CONNECTIONS,
+        "max_keepalive_connections": settings.HTTP_CLIENT_MAX_KEEPALIVE,
+        "retries": settings.HTTP_CLIENT_RETRIES,
+        "backoff": settings.HTTP_CLIENT_BACKOFF,
+        "http2": settings.HTTP2_ENABLED,
+    }
+    return {
+        "doctor": {**defaults, "base_url": settings.DOCTOR_SERVICE_URL},
+        # Patient lookups; the configured URL already carries the /api prefix
+        "cardroom": {**defaults, "base_url": settings.CARDROOM_SERVICE_URL, "timeout": 5.0},
+        "auth": {**defaults, "base_url": settings.AUTH_SERVICE_URL, "timeout": 5.0},
+    }
+
+
+class HTTPClientRegistry:
+    """Registry of per-upstream clients, opened at startup and closed at shutdown."""
+
+    def __init__(self):
+        self._clients: Dict[str, UpstreamClient] = {}
+
+    def startup(self):
+        for name, options in _upstreams().items():
+            if name not in self._clients or self._clients[name].is_closed:
+                self._clients[name] = UpstreamClient(name, **options)
+        logger.info(f"Initialized HTTP clients: {', '.join(sorted(self._clients))}")
+
+    def get(self, name: str) -> UpstreamClient:
+        client = self._clients.get(name)
+        if client is None or client.is_closed:
+            # Used outside the application lifespan (scripts, tests)
+            self.startup()
+            client = self._clients.get(name)
+        if client is None:
+            raise KeyError(f"Unknown upstream service: {name}")
+        return client
+
+    async def aclose(self):
+        for client in self._clients.values():
+            await client.aclose()
+        self._clients.clear()
+        logger.info("Closed HTTP clients")
+
+    def metrics(self) -> Dict[str, Dict[str, Any]]:
+        return {name: client.metrics() for name, client in self._clients.items()}
+
+
+http_clients = HTTPClientRegistry()
+
+
+def get_http_client(name: str) -> UpstreamClient:
+    """Get the shared client for an upstream service"""
+    return http_clients.get(name)
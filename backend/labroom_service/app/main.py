@@ -9,7 +9,12 @@ import asyncio
 from typing import Dict, Any
 from app.routers import lab_requests, history, lab_results, notification_route, sync, analytics, reports, inter_service, websocket_routes
 from .config import settings
-from .database import init_db, close_db
+from .database import init_db, close_db, partition_metrics, pool_metrics, read_router, replica_metrics
+from .read_routing import ReadRoutingMiddleware
+from .responses import ORJSONResponse
+from .http_cache import HTTPCacheMiddleware
+from .file_serving import RangeStaticFiles
+from .http_client import http_clients
 from .exceptions import LabServiceException
 from .security import get_current_user
 from .websocket import websocket_endpoint
@@ -30,11 +35,20 @@ app = FastAPI(
     docs_url="/api/docs",    
     redoc_url="/api/redoc",
     openapi_url="/api/openapi.json",
+    default_response_class=ORJSONResponse,
 )
 
 # Mount static files
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
+# Compression, ETags and 304s, inside CORS so that 304s carry the CORS headers too
+app.add_middleware(
+    HTTPCacheMiddleware,
+    minimum_size=settings.COMPRESSION_MINIMUM_SIZE,
+    gzip_level=settings.GZIP_LEVEL,
+    brotli_quality=settings.BROTLI_QUALITY,
+)
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -44,11 +58,14 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Route read-only queries to the read replica, keeping sessions that just wrote on the primary
+app.add_middleware(ReadRoutingMiddleware, router=read_router)
+
 # Create uploads directory if it doesn't exist
 os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
 
-# Mount uploads directory
-app.mount("/uploads", StaticFiles(directory=settings.UPLOAD_DIR), name="uploads")
+# Mount uploads directory (byte ranges and content ETags; uploads are never rewritten, so immutable)
+app.mount("/uploads", RangeStaticFiles(directory=settings.UPLOAD_DIR, immutable=True), name="uploads")
 
 # Exception handler for custom exceptions
 @app.exception_handler(LabServiceException)
@@ -100,18 +117,41 @@ app.add_websocket_route("/ws", websocket_endpoint)
 async def startup_event():
     await init_db()
     logging.info("Database initialized")
+    # Long-lived, pooled HTTP clients for inter-service calls
+    http_clients.startup()
 
 # Shutdown event
 @app.on_event("shutdown")
 async def shutdown_event():
     await close_db()
     logging.info("Database connection closed")
+    await http_clients.aclose()
 
 # Health check endpoint
 @app.get("/health", tags=["Health"])
 async def health_check():
     return {"status": "healthy", "service": "labroom_service"}
 
+@app.get("/health/http-clients", tags=["Health"])
+async def http_clients_health():
+    """Connection reuse, retry and pool-wait metrics of the inter-service HTTP clients"""
+    return {"service": "labroom_service", "upstreams": http_clients.metrics()}
+
+@app.get("/health/db-pool", tags=["Health"])
+async def db_pool_health():
+    """Acquire wait, in-use and churn metrics of the database pool, per workload"""
+    return {"service": "labroom_service", "pool": pool_metrics()}
+
+@app.get("/health/db-replica", tags=["Health"])
+async def db_replica_health():
+    """Read replica health, replication lag and read routing decisions"""
+    return {"service": "labroom_service", "replica": replica_metrics()}
+
+@app.get("/health/db-partitions", tags=["Health"])
+async def db_partitions_health():
+    """Monthly partition maintenance of the lab request, result and event tables"""
+    return {"service": "labroom_service", "partitions": partition_metrics()}
+
 # Version endpoint
 @app.get("/version", tags=["Health"])
 async def version():
@@ -5,7 +5,7 @@ import asyncio
 from typing import Dict, List, Any, Optional, Set
 from datetime import datetime
 import logging
-from .database import get_connection, insert, fetch_one, fetch_all
+from .database import get_connection, release_connection, insert, fetch_one, fetch_all
 from .models import Notification, NotificationType
 from .websocket import connected_clients, broadcast_to_user
 
@@ -72,7 +72,7 @@ async def create_notification(
         logger.error(f"Failed to create notification: {str(e)}")
         return None
     finally:
-        await conn.close()
+        await release_connection(conn)
 
 async def notify_test_result_ready(
     lab_result_id: str,  # Changed from UUID to str
@@ -140,7 +140,7 @@ async def mark_notification_as_read(notification_id: uuid.UUID) -> bool:
         result = await fetch_one(query, str(notification_id), conn=conn)
         return result is not None
     finally:
-        await conn.close()
+        await release_connection(conn)
 
 async def get_unread_notifications(user_id: uuid.UUID, limit: int = 50) -> List[Notification]:
     """Get unread notifications for a user"""
@@ -157,7 +157,7 @@ async def get_unread_notifications(user_id: uuid.UUID, limit: int = 50) -> List[
         rows = await fetch_all(query, str(user_id), limit, conn=conn)
         return [Notification.from_db_row(row) for row in rows]
     finally:
-        await conn.close()
+        await release_connection(conn)
 
 async def get_all_notifications(
     user_id: uuid.UUID, 
@@ -200,4 +200,4 @@ async def get_all_notifications(
             "pages": total_pages
         }
     finally:
-        await conn.close()
\ No newline at end of file
+        await release_connection(conn)
\ No newline at end of file
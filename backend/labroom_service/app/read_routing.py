@@ -0,0 +1,206 @@
+# labroom_service/app/read_routing.py
+"""
+Read/write routing between the primary database and an optional read replica.
+
+Read-only queries that opt in (reports, analytics, list and history endpoints)
+are sent to the replica, everything else stays on the primary. The replica is
+skipped when:
+
+* no replica is configured,
+* the last health check failed or measured more replication lag than allowed,
+* the current request writes (any method other than GET/HEAD/OPTIONS), or
+* the same session wrote within the last ``sticky_seconds`` (read-your-writes).
+
+Sessions are identified by the request's bearer token (hashed) or, without
+one, by the client address. ``ReadRoutingMiddleware`` records writes and
+exposes the session of the current request to ``ReadRouter.use_replica``.
+"""
+import asyncio
+import contextvars
+import hashlib
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+# Reports replication lag in seconds on a replica, 0 on a primary
+LAG_QUERY = """
+    SELECT CASE WHEN pg_is_in_recovery()
+        THEN COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+        ELSE 0 END
+"""
+
+# Session key of the request being handled and whether it must stay on the primary
+_session: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("read_routing_session", default=None)
+_primary_only: contextvars.ContextVar[bool] = contextvars.ContextVar("read_routing_primary_only", default=False)
+
+
+class ReadRouter:
+    """Decides whether a read may use the replica, and tracks replica health."""
+
+    def __init__(
+        self,
+        name: str,
+        sticky_seconds: float = 5.0,
+        max_lag: float = 5.0,
+        check_interval: float = 5.0,
+        max_sessions: int = 10000,
+    ):
+        self.name = name
+        self.sticky_seconds = sticky_seconds
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.max_sessions = max_sessions
+        self.enabled = False
+        self.healthy = False
+        self.lag: Optional[float] = None
+        self._writes: "OrderedDict[str, float]" = OrderedDict()
+        self._probe: Optional[Callable[[], Awaitable[float]]] = None
+        self._task: Optional[asyncio.Task] = None
+
+        # Metrics
+        self.replica_reads = 0
+        self.primary_reads = 0
+        self.sticky_reads = 0
+        self.fallbacks = 0
+
+    def mark_write(self, session: Optional[str] = None):
+        """Keep reads of ``session`` on the primary for the stickiness window"""
+        session = session or _session.get()
+        if not session:
+            return
+        self._writes[session] = time.monotonic()
+        self._writes.move_to_end(session)
+        while len(self._writes) > self.max_sessions:
+            self._writes.popitem(last=False)
+
+    def is_sticky(self, session: Optional[str] = None) -> bool:
+        session = session or _session.get()
+        if not session:
+            return False
+        written_at = self._writes.get(session)
+        if written_at is None:
+            return False
+        if time.monotonic() - written_at >= self.sticky_seconds:
+            del self._writes[session]
+            return False
+        return True
+
+    def use_replica(self) -> bool:
+        """Whether a read-only query of the current request should go to the replica"""
+        if not self.enabled:
+            return False
+        if _primary_only.get() or self.is_sticky():
+            self.sticky_reads += 1
+            self.primary_reads += 1
+            return False
+        if not self.healthy:
+            self.fallbacks += 1
+            self.primary_reads += 1
+            return False
+        self.replica_reads += 1
+        return True
+
+    def replica_failed(self, error: BaseException):
+        """Stop using the replica until the next successful health check"""
+        self.fallbacks += 1
+        if self.healthy:
+            logger.warning(f"{self.name}: read replica unavailable ({error!r}), reading from the primary")
+        self.healthy = False
+
+    async def check(self) -> bool:
+        """Measure replication lag once and update the replica's health"""
+        try:
+            lag = float(await asyncio.wait_for(self._probe(), timeout=max(self.check_interval, 1.0)))
+        except Exception as e:
+            self.lag = None
+            self.replica_failed(e)
+            return False
+        self.lag = lag
+        healthy = lag <= self.max_lag
+        if healthy != self.healthy:
+            if healthy:
+                logger.info(f"{self.name}: read replica available (lag {lag:.1f}s)")
+            else:
+                logger.warning(f"{self.name}: read replica lagging by {lag:.1f}s, reading from the primary")
+        self.healthy = healthy
+        return healthy
+
+    async def start(self, probe: Callable[[], Awaitable[float]]):
+        """Enable routing; ``probe`` returns the replica's replication lag in seconds"""
+        self._probe = probe
+        self.enabled = True
+        if not await self.check():
+            logger.warning(f"{self.name}: read replica not usable at startup, reading from the primary")
+        self._task = asyncio.create_task(self._watch())
+
+    async def _watch(self):
+        while True:
+            await asyncio.sleep(self.check_interval)
+            await self.check()
+
+    async def stop(self):
+        self.enabled = False
+        self.healthy = False
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "healthy": self.healthy,
+            "lag_seconds": self.lag,
+            "max_lag_seconds": self.max_lag,
+            "sticky_seconds": self.sticky_seconds,
+            "sticky_sessions": len(self._writes),
+            "replica_reads": self.replica_reads,
+            "primary_reads": self.primary_reads,
+            "sticky_reads": self.sticky_reads,
+            "fallbacks": self.fallbacks,
+        }
+
+
+def session_key(headers: Dict[bytes, bytes], client: Optional[tuple]) -> Optional[str]:
+    authorization = headers.get(b"authorization")
+    if authorization:
+        return hashlib.blake2b(authorization, digest_size=12).hexdigest()
+    if client:
+        return f"client:{client[0]}"
+    return None
+
+
+class ReadRoutingMiddleware:
+    """
+    ASGI middleware that scopes routing decisions to the requesting session.
+
+    ``read_only_paths`` lists POST endpoints that only read (searches, bulk
+    lookups); they neither count as writes nor start a stickiness window.
+    """
+
+    def __init__(self, app, router: ReadRouter, read_only_paths: Iterable[str] = ()):
+        self.app = app
+        self.router = router
+        self.read_only_paths = {path.rstrip("/") for path in read_only_paths}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        writes = scope["method"] not in SAFE_METHODS and scope["path"].rstrip("/") not in self.read_only_paths
+        session = session_key(dict(scope["headers"]), scope.get("client"))
+        session_token = _session.set(session)
+        primary_token = _primary_only.set(writes)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            if writes:
+                # Start the window once the write has been handled
+                self.router.mark_write(session)
+            _primary_only.reset(primary_token)
+            _session.reset(session_token)
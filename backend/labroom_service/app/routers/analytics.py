@@ -6,7 +6,7 @@ from datetime import datetime, date, timedelta
 import json
 
 from ..schemas import AnalyticsResponse, AnalyticsMetrics
-from ..database import get_connection, fetch_all
+from ..database import get_read_connection, release_connection, fetch_all
 from ..models import TestStatus, TestPriority, TestType
 from ..exceptions import DatabaseException
 
@@ -27,24 +27,45 @@ async def get_analytics_dashboard(
     if not from_date:
         from_date = to_date - timedelta(days=7)
     
-    conn = await get_connection()
+    conn = await get_read_connection("reports")
     
     try:
-        # Get total requests today
+        # All figures come from the trigger-maintained rollups (see database/rollups.sql),
+        # so the cost does not grow with the size of lab_requests
+        
+        # Requests created today (hourly buckets, today in the database time zone)
         today_query = """
-            SELECT COUNT(*) FROM lab_requests
-            WHERE DATE(created_at) = CURRENT_DATE AND is_deleted = FALSE
+            SELECT COALESCE(SUM(request_count), 0)::bigint FROM lab_request_rollup_hourly
+            WHERE bucket >= CURRENT_DATE
         """
         total_today = await conn.fetchval(today_query)
         
-        # Get pending vs completed requests
-        status_query = """
-            SELECT status, COUNT(*) as count FROM lab_requests
-            WHERE is_deleted = FALSE
-            GROUP BY status
+        # Current status, priority and read state of all requests, with turnaround totals
+        totals_query = """
+            SELECT status, priority, is_read,
+                   SUM(request_count)::bigint AS count,
+                   SUM(turnaround_seconds) AS turnaround_seconds,
+                   SUM(turnaround_count)::bigint AS turnaround_count
+            FROM lab_request_rollup_totals
+            GROUP BY status, priority, is_read
         """
-        status_rows = await conn.fetch(status_query)
-        status_breakdown = {row["status"]: row["count"] for row in status_rows}
+        totals_rows = await conn.fetch(totals_query)
+        
+        status_breakdown: Dict[str, int] = {}
+        priority_breakdown: Dict[str, int] = {}
+        unread_count = 0
+        turnaround_seconds = 0.0
+        turnaround_count = 0
+        for row in totals_rows:
+            count = row["count"]
+            if count <= 0:
+                continue
+            status_breakdown[row["status"]] = status_breakdown.get(row["status"], 0) + count
+            priority_breakdown[row["priority"]] = priority_breakdown.get(row["priority"], 0) + count
+            if not row["is_read"]:
+                unread_count += count
+            turnaround_seconds += row["turnaround_seconds"]
+            turnaround_count += row["turnaround_count"]
         
         # Calculate metrics
         pending = sum(status_breakdown.get(status, 0) for status in [
@@ -53,55 +74,30 @@ async def get_analytics_dashboard(
         ])
         completed = status_breakdown.get(TestStatus.COMPLETED.value, 0)
         
-        # Get unread requests count
-        unread_query = """
-            SELECT COUNT(*) FROM lab_requests
-            WHERE is_read = FALSE AND is_deleted = FALSE
-        """
-        unread_count = await conn.fetchval(unread_query)
+        # Average response time (in hours) of completed requests
+        avg_response_time = turnaround_seconds / turnaround_count / 3600 if turnaround_count else None
         
-        # Calculate average response time (in hours)
-        response_time_query = """
-            SELECT AVG(EXTRACT(EPOCH FROM (completed_at - created_at))/3600) as avg_hours
-            FROM lab_requests
-            WHERE status = $1 AND completed_at IS NOT NULL
-            AND created_at IS NOT NULL AND is_deleted = FALSE
-        """
-        avg_response_time = await conn.fetchval(response_time_query, TestStatus.COMPLETED.value)
-        
-        # Get daily requests data for the selected time period
+        # Daily requests and test type breakdown for the selected time period
         daily_query = """
-            SELECT DATE(created_at) as request_date, COUNT(*) as count
-            FROM lab_requests
-            WHERE created_at BETWEEN $1 AND $2 AND is_deleted = FALSE
-            GROUP BY DATE(created_at)
-            ORDER BY request_date
+            SELECT bucket AS request_date, test_type, SUM(request_count)::bigint AS count
+            FROM lab_request_rollup_daily
+            WHERE bucket BETWEEN $1 AND $2
+            GROUP BY bucket, test_type
+            HAVING SUM(request_count) > 0
+            ORDER BY bucket
         """
-        daily_rows = await conn.fetch(daily_query, from_date, to_date + timedelta(days=1))
-        daily_data = [{"date": row["request_date"].isoformat(), "count": row["count"]} 
-                      for row in daily_rows]
+        daily_rows = await conn.fetch(daily_query, from_date, to_date)
         
-        # Get test type breakdown
-        test_type_query = """
-            SELECT test_type, COUNT(*) as count
-            FROM lab_requests
-            WHERE created_at BETWEEN $1 AND $2 AND is_deleted = FALSE
-            GROUP BY test_type
-            ORDER BY count DESC
-        """
-        test_type_rows = await conn.fetch(test_type_query, from_date, to_date + timedelta(days=1))
-        test_type_data = [{"test_type": row["test_type"], "count": row["count"]} 
-                          for row in test_type_rows]
+        daily_counts: Dict[date, int] = {}
+        test_type_counts: Dict[str, int] = {}
+        for row in daily_rows:
+            daily_counts[row["request_date"]] = daily_counts.get(row["request_date"], 0) + row["count"]
+            test_type_counts[row["test_type"]] = test_type_counts.get(row["test_type"], 0) + row["count"]
         
-        # Get priority breakdown
-        priority_query = """
-            SELECT priority, COUNT(*) as count
-            FROM lab_requests
-            WHERE is_deleted = FALSE
-            GROUP BY priority
-        """
-        priority_rows = await conn.fetch(priority_query)
-        priority_breakdown = {row["priority"]: row["count"] for row in priority_rows}
+        daily_data = [{"date": request_date.isoformat(), "count": count}
+                      for request_date, count in daily_counts.items()]
+        test_type_data = [{"test_type": test_type, "count": count}
+                          for test_type, count in sorted(test_type_counts.items(), key=lambda item: -item[1])]
         
         # Build metrics
         metrics = AnalyticsMetrics(
@@ -124,4 +120,4 @@ async def get_analytics_dashboard(
     except Exception as e:
         raise DatabaseException(detail=f"Failed to fetch analytics data: {str(e)}")
     finally:
-        await conn.close()
\ No newline at end of file
+        await release_connection(conn)
\ No newline at end of file
@@ -6,7 +6,8 @@ from datetime import datetime, date, timedelta
 import json
 
 from ..schemas import LabRequestHistoryResponse, LabRequestEvent
-from ..database import get_connection, fetch_all
+from ..count_strategy import is_exact
+from ..database import get_read_connection, release_connection, fetch_all, list_counts
 from ..exceptions import NotFoundException, DatabaseException
 
 router = APIRouter(prefix="/history", tags=["History"])
@@ -19,7 +20,7 @@ async def get_lab_request_history(
     """
     Get the complete history/audit trail for a specific lab request.
     """
-    conn = await get_connection()
+    conn = await get_read_connection()
     
     try:
         # Check if lab request exists
@@ -72,7 +73,7 @@ async def get_lab_request_history(
     except Exception as e:
         raise DatabaseException(detail=f"Failed to fetch history data: {str(e)}")
     finally:
-        await conn.close()
+        await release_connection(conn)
 
 @router.get("/lab-technician/{tech_id}", response_model=Dict[str, Any])
 async def get_lab_technician_history(
@@ -92,7 +93,7 @@ async def get_lab_technician_history(
     if not from_date:
         from_date = to_date - timedelta(days=30)
     
-    conn = await get_connection()
+    conn = await get_read_connection()
     
     try:
         # Build query - modified to not rely on patients table
@@ -101,7 +102,7 @@ async def get_lab_technician_history(
             FROM lab_request_events lre
             JOIN lab_requests lr ON lre.lab_request_id = lr.id
             WHERE lre.user_id = $1
-            AND DATE(lre.event_timestamp) BETWEEN $2 AND $3
+            AND lre.event_timestamp >= $2::date AND lre.event_timestamp < $3::date + 1
         """]
         
         params = [str(tech_id), from_date, to_date]
@@ -113,13 +114,12 @@ async def get_lab_technician_history(
             params.append(event_type)
             param_index += 1
         
+        # Count total matching records
+        total = await list_counts.count(conn, ' '.join(query_parts), *params)
+        
         # Add ordering
         query_parts.append("ORDER BY lre.event_timestamp DESC")
         
-        # Count total matching records
-        count_query = f"SELECT COUNT(*) FROM ({' '.join(query_parts)}) as filtered_events"
-        total = await conn.fetchval(count_query, *params)
-        
         # Add pagination
         offset = (page - 1) * page_size
         query_parts.append(f"LIMIT ${param_index} OFFSET ${param_index + 1}")
@@ -150,6 +150,7 @@ async def get_lab_technician_history(
             "events": events,
             "pagination": {
                 "total": total,
+                "total_exact": is_exact(total),
                 "page": page,
                 "page_size": page_size,
                 "total_pages": total_pages
@@ -159,4 +160,4 @@ async def get_lab_technician_history(
     except Exception as e:
         raise DatabaseException(detail=f"Failed to fetch history data: {str(e)}")
     finally:
-        await conn.close()
\ No newline at end of file
+        await release_connection(conn)
\ No newline at end of file
@@ -8,7 +8,7 @@ from pydantic import BaseModel
 from datetime import datetime
 
 # Add these imports for database functions and models
-from ..database import get_connection, insert, update, fetch_one, fetch_all, soft_delete
+from ..database import get_connection, release_connection, insert, update, fetch_one, fetch_all, soft_delete
 from ..models import TestStatus, TestPriority, TestType
 
 router = APIRouter(prefix="/inter-service", tags=["Inter-Service Communication"])
@@ -69,7 +69,7 @@ async def get_lab_result_for_service(
         
         return response_data
     finally:
-        await conn.close()
+        await release_connection(conn)
 
 @router.get("/lab-requests/{request_id}/results", response_model=Dict[str, Any])
 async def get_results_for_lab_request(
@@ -143,7 +143,7 @@ async def get_results_for_lab_request(
             detail=f"Failed to fetch lab results: {str(e)}"
         )
     finally:
-        await conn.close()
+        await release_connection(conn)
 
 @router.post("/lab-requests", response_model=Dict[str, Any])
 async def receive_lab_request_from_doctor(
@@ -425,7 +425,7 @@ async def receive_lab_request_from_doctor(
             detail=f"Failed to process lab request: {str(e)}"
         )
     finally:
-        await conn.close()
+        await release_connection(conn)
 
 @router.post("/notifications", response_model=Dict[str, Any])
 async def receive_notification(
@@ -19,7 +19,11 @@ from ..schemas import (
 )
 from ..models import TestStatus, TestPriority, TestType, LabRequest
 from ..dependencies import get_lab_request
-from ..database import get_connection, insert, update, fetch_one, fetch_all, soft_delete
+from ..database import get_connection, get_read_connection, read_connection, release_connection, insert, update, fetch_one, fetch_all, soft_delete
+from ..export import FORMAT_PATTERN, export_response
+from ..responses import lean_response
+from ..http_cache import not_modified
+from ..config import settings
 from ..service.external_services import fetch_patient_details, fetch_doctor_details
 from ..notifications import notify_lab_request_assigned, create_notification
 from ..exceptions import (
@@ -35,57 +39,13 @@ logger = logging.getLogger(__name__)
 request_cache = TTLCache(maxsize=2000, ttl=600)
 detail_cache = TTLCache(maxsize=1000, ttl=300)
 
-# Create a connection pool specifically for lab requests
-lab_request_pool = None
-
-async def init_lab_request_pool():
-    """Initialize a dedicated connection pool for lab requests"""
-    global lab_request_pool
-    from ..config import settings
-    import asyncpg
-    
-    if not lab_request_pool:
-        try:
-            lab_request_pool = await asyncpg.create_pool(
-                dsn=settings.DATABASE_URL,
-                min_size=5,
-                max_size=20,
-                command_timeout=60,
-            )
-            
-            # Set optimal PostgreSQL connection settings
-            if lab_request_pool:
-                async with lab_request_pool.acquire() as conn:
-                    # Set work_mem for complex sorting operations
-                    await conn.execute("SET work_mem = '10MB'")
-                    # Use indexes aggressively
-                    await conn.execute("SET random_page_cost = 1.1")
-                    
-            logger.info("Lab request pool initialized successfully")
-            return lab_request_pool
-        except Exception as e:
-            logger.error(f"Error initializing lab request pool: {str(e)}")
-            # Fall back to the default connection
-            return None
-    
-    return lab_request_pool
-
 async def get_lab_request_connection():
-    """Get a connection from the lab request pool or fall back to default"""
-    pool = await init_lab_request_pool()
-    if pool:
-        return await pool.acquire()
-    else:
-        # Fall back to default connection
-        return await get_connection()
+    """Get a connection from the pool's lab_requests workload"""
+    return await get_connection("lab_requests")
 
 async def release_lab_request_connection(conn):
     """Release a connection back to the pool"""
-    if lab_request_pool and conn:
-        try:
-            await lab_request_pool.release(conn)
-        except Exception as e:
-            logger.error(f"Error releasing connection: {str(e)}")
+    await release_connection(conn)
 
 async def create_optimized_indexes():
     """Create optimized indexes for lab requests queries"""
@@ -133,12 +93,11 @@ async def create_optimized_indexes():
     except Exception as e:
         logger.error(f"Error creating optimized indexes: {str(e)}")
     finally:
-        await conn.close()
+        await release_connection(conn)
 
 # These functions must be registered in main.py with app.on_event("startup")
 async def startup_event():
     """Initialize the lab request module"""
-    await init_lab_request_pool()
     await create_optimized_indexes()
 
 router = APIRouter(prefix="/lab-requests", tags=["Lab Requests"])
@@ -184,7 +143,7 @@ async def create_lab_request(
         
         return LabRequestResponse(**row)
     finally:
-        await conn.close()
+        await release_connection(conn)
 
 @router.get("/", response_model=PaginatedResponse)
 async def get_lab_requests(
@@ -213,10 +172,10 @@ async def get_lab_requests(
     # Check cache first
     if cache_key in request_cache:
         logger.info("Returning lab requests from cache")
-        return request_cache[cache_key]
+        return lean_response(PaginatedResponse, request_cache[cache_key])
     
     # Use the dedicated connection pool
-    conn = await get_lab_request_connection()
+    conn = await get_read_connection("lab_requests")
     
     try:
         # Start timer for performance tracking
@@ -231,8 +190,7 @@ async def get_lab_requests(
         params = []
         
         # PART 1: Use a more efficient query structure
-        base_query = """
-        SELECT 
+        columns = """
             lr.id,
             lr.patient_id,
             lr.doctor_id,
@@ -248,6 +206,8 @@ async def get_lab_requests(
             lr.due_date,
             lr.is_read,
             lr.read_at
+        """
+        base_query = """
         FROM lab_requests lr
         WHERE lr.is_deleted = FALSE
         """
@@ -307,7 +267,7 @@ async def get_lab_requests(
             if filter_conditions:
                 count_query += " AND " + " AND ".join(filter_conditions)
         
-        # Add ordering and limit for main query
+        # Add ordering and limit for main query (all but the select list, which the version check replaces)
         main_query = base_query + " ORDER BY lr.created_at DESC, lr.id DESC"
         
         # Add pagination
@@ -353,8 +313,14 @@ async def get_lab_requests(
                     # Estimate total to avoid query failure
                     total = size * page * 2  # Just an approximation
             
+            # Cheap version check first: only the ids and updated_at of the page's rows
+            keys = await conn.fetch(f"SELECT lr.id, lr.updated_at {main_query}", *params, timeout=10.0)
+            response = not_modified(request, total, [tuple(key) for key in keys])
+            if response:
+                return response
+            
             # Execute main query to get the data
-            rows = await conn.fetch(main_query, *params, timeout=10.0)
+            rows = await conn.fetch(f"SELECT {columns} {main_query}", *params, timeout=10.0)
         except asyncio.TimeoutError:
             logger.error("Query execution timed out, trying fallback query")
             # Fallback to simpler, faster query if timeout occurs
@@ -412,7 +378,7 @@ async def get_lab_requests(
         if execution_time < 5.0:
             request_cache[cache_key] = response
         
-        return response
+        return lean_response(PaginatedResponse, response)
     except Exception as e:
         logger.error(f"Error fetching lab requests: {str(e)}")
         raise HTTPException(
@@ -439,29 +405,36 @@ async def get_lab_requests_fast(
         logger.info("Returning fast lab requests from cache")
         return request_cache[cache_key]
     
-    conn = await get_lab_request_connection()
+    conn = await get_read_connection("lab_requests")
     try:
         start_time = time.time()
         
-        # Super optimized query with minimal filtering
-        query = """
-        SELECT lr.id, lr.patient_id, lr.doctor_id, lr.test_type, lr.priority, 
-               lr.status, lr.created_at, lr.updated_at
-        FROM lab_requests lr
-        WHERE lr.is_deleted = FALSE
-        """
-        
         params = []
+        technician_filter = ""
         if labtechnician_id:
-            query += " AND (lr.technician_id = $1 OR lr.technician_id IS NULL)"
+            technician_filter = " AND (technician_id = $1 OR technician_id IS NULL)"
             params.append(str(labtechnician_id))
-        
-        # Add order and limit
-        query += "\nORDER BY lr.created_at DESC LIMIT $" + str(len(params) + 1)
         params.append(limit)
-        
-        # Execute with short timeout
-        rows = await conn.fetch(query, *params, timeout=5.0)
+        limit_param = "$" + str(len(params))
+        
+        # The trigger-maintained feed holds the newest requests (see recent_requests.sql)
+        feed_query = f"""
+        SELECT id, patient_id, doctor_id, test_type, priority, status, created_at, updated_at
+        FROM lab_requests_recent
+        WHERE TRUE{technician_filter}
+        ORDER BY created_at DESC LIMIT {limit_param}
+        """
+        rows = await conn.fetch(feed_query, *params, timeout=5.0)
+        
+        # Too few matches in the feed (technician filter, deletions): read lab_requests
+        if len(rows) < limit:
+            query = f"""
+            SELECT id, patient_id, doctor_id, test_type, priority, status, created_at, updated_at
+            FROM lab_requests
+            WHERE is_deleted = FALSE{technician_filter}
+            ORDER BY created_at DESC LIMIT {limit_param}
+            """
+            rows = await conn.fetch(query, *params, timeout=5.0)
         results = [dict(row) for row in rows]
         
         execution_time = time.time() - start_time
@@ -484,6 +457,47 @@ async def get_lab_requests_fast(
     finally:
         await release_lab_request_connection(conn)
 
+@router.get("/export")
+async def export_lab_requests(
+    format: str = Query("ndjson", pattern=FORMAT_PATTERN, description="ndjson or csv"),
+    from_date: Optional[datetime] = Query(None, description="Requested at or after"),
+    to_date: Optional[datetime] = Query(None, description="Requested before"),
+    status: Optional[TestStatus] = None,
+    patient_id: Optional[uuid.UUID] = None,
+    doctor_id: Optional[uuid.UUID] = None,
+    labtechnician_id: Optional[uuid.UUID] = Query(None, description="Only this technician's requests"),
+):
+    """
+    Download lab requests as NDJSON or CSV, oldest first, streamed from a
+    database cursor (app/export.py). Bound the export with from_date/to_date:
+    they filter on the partition column, so other months are skipped.
+    """
+    conditions = ["is_deleted = FALSE"]
+    params: List[Any] = []
+    for column, value in (
+        ("created_at >=", from_date),
+        ("created_at <", to_date),
+        ("status =", status.value if status else None),
+        ("patient_id =", patient_id),
+        ("doctor_id =", doctor_id),
+        ("technician_id =", labtechnician_id),
+    ):
+        if value is not None:
+            params.append(value)
+            conditions.append(f"{column} ${len(params)}")
+
+    query = f"""
+        SELECT id, patient_id, doctor_id, technician_id, test_type, priority, status,
+               notes, diagnosis_notes, created_at, updated_at, completed_at, due_date
+        FROM lab_requests
+        WHERE {" AND ".join(conditions)}
+        ORDER BY created_at, id
+    """
+    return export_response(
+        lambda: read_connection("reports"), query, *params,
+        format=format, filename="lab_requests", batch_size=settings.EXPORT_BATCH_SIZE
+    )
+
 @router.get(
     "/{request_id}",
     response_model=None,
@@ -521,60 +535,35 @@ async def get_lab_request_by_id(
         if include_details:
             conn = await get_lab_request_connection()
             try:
-                # Execute the fallback queries in parallel
-                tasks = []
+                # Patient and doctor lookups are shared with concurrent requests
+                # for the same IDs and run on their own connections
+                tasks = [
+                    ("patient_details", asyncio.create_task(fetch_patient_details(lab_request.patient_id))),
+                    ("doctor_details", asyncio.create_task(fetch_doctor_details(lab_request.doctor_id))),
+                ]
                 
-                # Prepare patient details query
-                async def get_patient():
-                    try:
-                        patient_query = "SELECT * FROM patients WHERE id = $1"
-                        return await fetch_one(patient_query, str(lab_request.patient_id), conn=conn)
-                    except Exception as e:
-                        logger.error(f"Error fetching patient: {e}")
-                        return {"patient_id": str(lab_request.patient_id), "info": "Basic patient info"}
-                
-                tasks.append(("patient_details", asyncio.create_task(get_patient())))
-                
-                # Prepare doctor details query
-                async def get_doctor():
-                    try:
-                        doctor_query = "SELECT * FROM users WHERE id = $1"
-                        return await fetch_one(doctor_query, str(lab_request.doctor_id), conn=conn)
-                    except Exception as e:
-                        logger.error(f"Error fetching doctor: {e}")
-                        return {"doctor_id": str(lab_request.doctor_id), "info": "Basic doctor info"}
-                
-                tasks.append(("doctor_details", asyncio.create_task(get_doctor())))
-                
-                # Prepare technician details query if assigned
+                # A connection runs one query at a time, so these go sequentially on ours
                 if lab_request.technician_id:
-                    async def get_technician():
-                        try:
-                            tech_query = "SELECT * FROM users WHERE id = $1"
-                            return await fetch_one(tech_query, str(lab_request.technician_id), conn=conn)
-                        except Exception as e:
-                            logger.error(f"Error fetching technician: {e}")
-                            return {"technician_id": str(lab_request.technician_id), "info": "Basic technician info"}
-                    
-                    tasks.append(("technician_details", asyncio.create_task(get_technician())))
-                
-                # Prepare lab result query
-                async def get_result():
                     try:
-                        result_query = """
-                        SELECT * FROM lab_results
-                        WHERE lab_request_id = $1 AND is_deleted = FALSE
-                        ORDER BY created_at DESC
-                        LIMIT 1
-                        """
-                        return await fetch_one(result_query, str(lab_request.id), conn=conn)
+                        tech_query = "SELECT * FROM users WHERE id = $1"
+                        response_data["technician_details"] = await fetch_one(tech_query, str(lab_request.technician_id), conn=conn)
                     except Exception as e:
-                        logger.error(f"Error fetching lab result: {e}")
-                        return None
+                        logger.error(f"Error fetching technician: {e}")
+                        response_data["technician_details"] = {"technician_id": str(lab_request.technician_id), "info": "Basic technician info"}
                 
-                tasks.append(("lab_result", asyncio.create_task(get_result())))
+                try:
+                    result_query = """
+                    SELECT * FROM lab_results
+                    WHERE lab_request_id = $1 AND is_deleted = FALSE
+                    ORDER BY created_at DESC
+                    LIMIT 1
+                    """
+                    response_data["lab_result"] = await fetch_one(result_query, str(lab_request.id), conn=conn)
+                except Exception as e:
+                    logger.error(f"Error fetching lab result: {e}")
+                    response_data["lab_result"] = None
                 
-                # Execute all queries in parallel
+                # Collect the shared lookups
                 for key, task in tasks:
                     try:
                         response_data[key] = await task
@@ -683,7 +672,7 @@ async def update_lab_request(
                 # Log error but continue with update
                 logger.error(f"Error creating notification: {str(e)}")
             finally:
-                await conn.close()
+                await release_connection(conn)
     
     # Perform update
     conn = await get_connection()
@@ -703,7 +692,7 @@ async def update_lab_request(
         
         return LabRequestResponse(**updated_row)
     finally:
-        await conn.close()
+        await release_connection(conn)
 
 @router.delete("/{request_id}", response_model=StatusResponse)
 async def delete_lab_request(
@@ -744,7 +733,7 @@ async def delete_lab_request(
             message=f"Lab request {request_id} has been deleted"
         )
     finally:
-        await conn.close()
+        await release_connection(conn)
 
 @router.post("/{request_id}/assign", response_model=LabRequestResponse)
 async def assign_lab_request(
@@ -815,7 +804,7 @@ async def assign_lab_request(
         
         return LabRequestResponse(**updated_row)
     finally:
-        await conn.close()
+        await release_connection(conn)
 
 # Don't update the update/patch/delete methods - they are not performance-critical
 
@@ -891,7 +880,7 @@ async def update_lab_request(
                 # Log error but continue with update
                 logger.error(f"Error creating notification: {str(e)}")
             finally:
-                await conn.close()
+                await release_connection(conn)
     
     # Perform update
     conn = await get_connection()
@@ -913,7 +902,7 @@ async def update_lab_request(
         
         return LabRequestResponse(**updated_row)
     finally:
-        await conn.close()
+        await release_connection(conn)
 
 @router.delete("/{request_id}", response_model=StatusResponse)
 async def delete_lab_request(
@@ -950,7 +939,7 @@ async def delete_lab_request(
             message=f"Lab request {request_id} has been deleted"
         )
     finally:
-        await conn.close()
+        await release_connection(conn)
 
 @router.post("/{request_id}/assign", response_model=LabRequestResponse)
 async def assign_lab_request(
@@ -1017,7 +1006,7 @@ async def assign_lab_request(
         
         return LabRequestResponse(**updated_row)
     finally:
-        await conn.close()
+        await release_connection(conn)
         
 # Add to labroom_service/app/routes/lab_requests.py
 
@@ -1047,4 +1036,4 @@ async def get_recent_lab_requests(limit: int = 10):
             
         return {"requests": requests}
     finally:
-        await conn.close()
\ No newline at end of file
+        await release_connection(conn)
\ No newline at end of file
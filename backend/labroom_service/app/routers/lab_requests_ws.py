@@ -5,7 +5,7 @@ import logging
 from typing import Dict, Any, Optional
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Query, Header, status
 from datetime import datetime
-from ..database import get_connection, insert, fetch_one
+from ..database import get_connection, release_connection, insert, fetch_one
 from ..models import TestStatus, TestPriority, TestType
 from ..websocket import broadcast_lab_request
 from ..exceptions import BadRequestException
@@ -209,4 +209,4 @@ async def process_incoming_lab_request(lab_request_data: Dict[str, Any]) -> Dict
         return response
         
     finally:
-        await conn.close()
\ No newline at end of file
+        await release_connection(conn)
\ No newline at end of file
@@ -1,5 +1,6 @@
 import uuid
 import os
+import hashlib
 import shutil
 import json
 import time
@@ -34,7 +35,8 @@ from ..schemas import (
 )
 from ..models import LabRequest, TestStatus, TestType
 from ..dependencies import get_lab_request, get_lab_result
-from ..database import get_connection, insert, update, fetch_one, fetch_all, soft_delete
+from ..database import get_connection, get_read_connection, read_connection, release_connection, insert, update, fetch_one, fetch_all, soft_delete
+from ..export import FORMAT_PATTERN, export_response
 from ..service.external_services import fetch_patient_details, fetch_doctor_details
 from ..notifications import notify_test_result_ready
 from ..service.doctor_service import notify_doctor_of_lab_result
@@ -45,6 +47,7 @@ from ..exceptions import (
     LabRequestAlreadyProcessedException
 )
 from ..config import settings
+from ..file_serving import remember_hash
 
 router = APIRouter(prefix="/lab-results", tags=["Lab Results"])
 
@@ -55,54 +58,13 @@ results_cache = TTLCache(maxsize=1000, ttl=300)  # 5 minute TTL
 detail_cache = TTLCache(maxsize=500, ttl=180)    # 3 minute TTL
 images_cache = TTLCache(maxsize=500, ttl=180)     # 3 minute TTL
 
-# Create a dedicated connection pool for lab results
-lab_results_pool = None
-
-async def init_lab_results_pool():
-    """Initialize a dedicated connection pool for lab results"""
-    global lab_results_pool
-    import asyncpg
-    
-    if not lab_results_pool:
-        try:
-            lab_results_pool = await asyncpg.create_pool(
-                dsn=settings.DATABASE_URL,
-                min_size=5,
-                max_size=20,
-                command_timeout=60,
-            )
-            
-            # Set optimal PostgreSQL settings
-            if lab_results_pool:
-                async with lab_results_pool.acquire() as conn:
-                    # Set work_mem for complex sorting operations
-                    await conn.execute("SET work_mem = '10MB'")
-                    # Use indexes aggressively
-                    await conn.execute("SET random_page_cost = 1.1")
-                    
-            logger.info("Lab results pool initialized successfully")
-            return lab_results_pool
-        except Exception as e:
-            logger.error(f"Error initializing lab results pool: {str(e)}")
-            return None
-    
-    return lab_results_pool
-
 async def get_lab_results_connection():
-    """Get a connection from the lab results pool or fall back to default"""
-    pool = await init_lab_results_pool()
-    if pool:
-        return await pool.acquire()
-    else:
-        return await get_connection()
+    """Get a connection from the pool's lab_results workload"""
+    return await get_connection("lab_results")
 
 async def release_lab_results_connection(conn):
     """Release a connection back to the pool"""
-    if lab_results_pool and conn:
-        try:
-            await lab_results_pool.release(conn)
-        except Exception as e:
-            logger.error(f"Error releasing connection: {str(e)}")
+    await release_connection(conn)
 
 async def create_optimized_indexes():
     """Create optimized indexes for lab results queries"""
@@ -159,12 +121,11 @@ async def create_optimized_indexes():
     except Exception as e:
         logger.error(f"Error creating optimized indexes: {str(e)}")
     finally:
-        await conn.close()
+        await release_connection(conn)
 
 # Initialize lab results system
 async def startup_event():
     """Initialize the lab results module"""
-    await init_lab_results_pool()
     await create_optimized_indexes()
 
 @router.post("/", response_model=LabResultResponse, status_code=status.HTTP_201_CREATED)
@@ -223,7 +184,7 @@ async def create_lab_result(
         except Exception as e:
             logger.error(f"Error auto-assigning technician: {str(e)}")
         finally:
-            await conn.close()
+            await release_connection(conn)
     elif lab_request.technician_id != lab_technician_id:
         # If a different technician is already assigned, reject
         raise HTTPException(
@@ -393,7 +354,7 @@ async def get_all_lab_results(
     start_time = time.time()
     
     # Get a database connection
-    conn = await get_lab_results_connection()
+    conn = await get_read_connection("lab_results")
     
     try:
         # Prepare query parameters
@@ -560,7 +521,7 @@ async def get_lab_results_fast(
         logger.info("Returning fast lab results from cache")
         return results_cache[cache_key]
     
-    conn = await get_lab_results_connection()
+    conn = await get_read_connection("lab_results")
     try:
         start_time = time.time()
         
@@ -606,6 +567,46 @@ async def get_lab_results_fast(
     finally:
         await release_lab_results_connection(conn)
 
+@router.get("/export")
+async def export_lab_results(
+    format: str = Query("ndjson", pattern=FORMAT_PATTERN, description="ndjson or csv"),
+    start_date: Optional[datetime] = Query(None, description="Results created at or after"),
+    end_date: Optional[datetime] = Query(None, description="Results created before"),
+    test_type: Optional[str] = Query(None, description="Filter by test type"),
+    patient_id: Optional[uuid.UUID] = Query(None, description="Filter by patient ID"),
+    doctor_id: Optional[uuid.UUID] = Query(None, description="Filter by requesting doctor ID"),
+):
+    """
+    Download lab results with their request's patient, doctor and test type as
+    NDJSON or CSV, oldest first, streamed from a database cursor
+    (app/export.py). start_date/end_date filter on the partition column.
+    """
+    conditions = ["r.is_deleted = FALSE", "q.is_deleted = FALSE"]
+    params: List[Any] = []
+    for column, value in (
+        ("r.created_at >=", start_date),
+        ("r.created_at <", end_date),
+        ("q.test_type::text =", test_type),
+        ("q.patient_id =", patient_id),
+        ("q.doctor_id =", doctor_id),
+    ):
+        if value is not None:
+            params.append(value)
+            conditions.append(f"{column} ${len(params)}")
+
+    query = f"""
+        SELECT r.id, r.lab_request_id, q.patient_id, q.doctor_id, q.test_type,
+               r.result_data, r.conclusion, r.image_paths, r.created_at, r.updated_at
+        FROM lab_results r
+        JOIN lab_requests q ON q.id = r.lab_request_id
+        WHERE {" AND ".join(conditions)}
+        ORDER BY r.created_at, r.id
+    """
+    return export_response(
+        lambda: read_connection("reports"), query, *params,
+        format=format, filename="lab_results", batch_size=settings.EXPORT_BATCH_SIZE
+    )
+
 @router.get("/{result_id}", response_model=LabResultDetailResponse)
 async def get_lab_result_by_id(
     result_id: uuid.UUID = Path(...),
@@ -927,7 +928,7 @@ async def update_lab_result(
                 
         return LabResultResponse(**updated_row)
     finally:
-        await conn.close()
+        await release_connection(conn)
 
 @router.delete("/{result_id}", response_model=StatusResponse)
 async def delete_lab_result(
@@ -1010,7 +1011,7 @@ async def delete_lab_result(
             message=f"Lab result {result_id} has been deleted"
         )
     finally:
-        await conn.close()
+        await release_connection(conn)
 
 @router.get("/{result_id}/images", response_model=List[ImageUploadResponse])
 async def get_result_images(
@@ -1156,7 +1157,7 @@ async def upload_result_image(
                     detail="Not authorized to upload images for this result"
                 )
     finally:
-        await conn.close()
+        await release_connection(conn)
 
     # Validate file type
     if file.content_type not in settings.ALLOWED_IMAGE_TYPES:
@@ -1174,10 +1175,12 @@ async def upload_result_image(
 
     try:
         # Save file using aiofiles for non-blocking I/O
+        digest = hashlib.sha256()
         async with aiofiles.open(file_path, "wb") as buffer:
             # Read in chunks for better memory usage
             chunk_size = 1024 * 1024  # 1MB chunks
             while chunk := await file.read(chunk_size):
+                digest.update(chunk)
                 await buffer.write(chunk)
 
         # Check file size
@@ -1187,6 +1190,8 @@ async def upload_result_image(
             raise FileUploadException(
                 f"File size {file_size} exceeds maximum {settings.MAX_IMAGE_SIZE_MB}MB"
             )
+        # The ETag of /uploads/... responses, so the first download doesn't hash the file again
+        remember_hash(file_path, digest.hexdigest())
 
         # Update result record
         conn = await get_connection()
@@ -1248,7 +1253,7 @@ async def upload_result_image(
             # Clear image cache
             images_cache.clear()
         finally:
-            await conn.close()
+            await release_connection(conn)
 
         return ImageUploadResponse(
             file_path=relative_path,
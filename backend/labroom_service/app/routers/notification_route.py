@@ -6,7 +6,7 @@ from typing import Dict, Any, Optional
 from fastapi import APIRouter, Depends, HTTPException, status, Body, Request, Path, Query
 from pydantic import BaseModel, UUID4, Field
 from datetime import datetime
-from ..database import get_connection, insert, update, fetch_one
+from ..database import get_connection, release_connection, insert, update, fetch_one
 from ..models import NotificationType, TestStatus
 from ..notifications import create_notification
 from ..schemas import StatusResponse, LabRequestResponse
@@ -105,7 +105,7 @@ async def receive_service_notification(
             detail=f"Failed to process notification: {str(e)}"
         )
     finally:
-        await conn.close()
+        await release_connection(conn)
 
 # Add a lab request update endpoint for direct processing
 @router.post("/lab-requests/{request_id}/process", response_model=StatusResponse)
@@ -192,7 +192,7 @@ async def process_lab_request(
             detail=f"Failed to process lab request: {str(e)}"
         )
     finally:
-        await conn.close()
+        await release_connection(conn)
         
 
 # Update the create_lab_request_from_service function in labroom_service/app/routes/notification_routes.py
@@ -243,7 +243,7 @@ async def create_lab_request_from_service(
             detail=f"Failed to create lab request: {str(e)}"
         )
     finally:
-        await conn.close()
+        await release_connection(conn)
 
 
 @router.patch("/{request_id}/mark-read", response_model=LabRequestResponse)
@@ -310,7 +310,7 @@ async def mark_lab_request_as_read(
         
         return LabRequestResponse(**updated_row)
     finally:
-        await conn.close()
+        await release_connection(conn)
 
 @router.patch("/{request_id}/mark-unread", response_model=LabRequestResponse)
 async def mark_lab_request_as_unread(
@@ -376,4 +376,4 @@ async def mark_lab_request_as_unread(
         
         return LabRequestResponse(**updated_row)
     finally:
-        await conn.close()
\ No newline at end of file
+        await release_connection(conn)
\ No newline at end of file
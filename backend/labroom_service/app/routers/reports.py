@@ -12,7 +12,7 @@ from typing import List, Optional, Dict, Any, Tuple, Union
 from fastapi import APIRouter, Depends, Query, Path, HTTPException, status, Body, BackgroundTasks
 from datetime import datetime, date, timedelta
 import json
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.responses import JSONResponse
 from math import ceil
 import logging
 
@@ -43,9 +43,11 @@ from itertools import groupby
 from operator import itemgetter
 
 from ..schemas import ReportGenerateRequest, ReportResponse
-from ..database import get_connection, fetch_all, insert
+from ..count_strategy import is_exact
+from ..database import get_connection, get_read_connection, release_connection, fetch_all, insert, list_counts
 from ..exceptions import NotFoundException, DatabaseException
 from ..config import settings
+from ..file_serving import RangeFileResponse
 
 # Constants for retry policy
 MAX_DB_RETRIES = 3
@@ -63,16 +65,17 @@ async def get_report_data(start_date, end_date):
     while retries < MAX_DB_RETRIES:
         conn = None
         try:
-            conn = await get_connection()
+            conn = await get_read_connection("reports")
             
-            # Query for lab requests within date range
+            # Query for lab requests within date range (a range on created_at itself,
+            # so only the monthly partitions in range are scanned)
             query = """
                 SELECT lr.id, lr.patient_id, lr.doctor_id, lr.technician_id, 
                        lr.test_type, lr.priority, lr.status, lr.notes,
                        lr.created_at, lr.updated_at, lr.completed_at,
                        lr.is_read, lr.read_at
                 FROM lab_requests lr
-                WHERE DATE(lr.created_at) BETWEEN $1 AND $2
+                WHERE lr.created_at >= $1::date AND lr.created_at < $2::date + 1
                 ORDER BY lr.created_at ASC
             """
             
@@ -202,7 +205,7 @@ async def get_report_data(start_date, end_date):
                 "trend_data": trend_data
             }
             
-            await conn.close()
+            await release_connection(conn)
             return report_data
             
         except Exception as e:
@@ -212,7 +215,7 @@ async def get_report_data(start_date, end_date):
             
             if conn:
                 try:
-                    await conn.close()
+                    await release_connection(conn)
                 except:
                     pass
                     
@@ -1179,7 +1182,7 @@ async def generate_pdf_report(
         
         while db_update_retries < MAX_DB_RETRIES:
             try:
-                conn = await get_connection()
+                conn = await get_connection("reports")
                 
                 # Use a more robust query WITHOUT updated_at column
                 update_query = """
@@ -1193,7 +1196,7 @@ async def generate_pdf_report(
                 
                 if result:
                     logger.info(f"Successfully updated database record for report {report_id} with file path: {file_path}")
-                    await conn.close()
+                    await release_connection(conn)
                     conn = None
                     break
                 else:
@@ -1206,7 +1209,7 @@ async def generate_pdf_report(
                 
                 if conn:
                     try:
-                        await conn.close()
+                        await release_connection(conn)
                         conn = None
                     except:
                         pass
@@ -1232,7 +1235,7 @@ async def generate_pdf_report(
         # Update the database with the error state if possible
         try:
             if not conn:
-                conn = await get_connection()
+                conn = await get_connection("reports")
                 
             error_message = f"error_{str(e)[:100]}"  # Truncate long error messages
             
@@ -1250,7 +1253,7 @@ async def generate_pdf_report(
         finally:
             if conn:
                 try:
-                    await conn.close()
+                    await release_connection(conn)
                 except:
                     pass
                 
@@ -1744,7 +1747,7 @@ async def generate_txt_report(
         
         # Update the lab_reports table with the file path
         logger.debug("Updating database with file path")
-        conn = await get_connection()
+        conn = await get_connection("reports")
         try:
             # Use update query WITHOUT updated_at field
             update_query = "UPDATE lab_reports SET file_path = $1 WHERE id = $2"
@@ -1754,7 +1757,7 @@ async def generate_txt_report(
             # Don't raise - the file was still generated
         finally:
             if conn:
-                await conn.close()
+                await release_connection(conn)
         
         return file_path
     except Exception as e:
@@ -1771,7 +1774,7 @@ async def generate_txt_report(
         # Update the database with the error state if possible
         try:
             if not conn:
-                conn = await get_connection()
+                conn = await get_connection("reports")
                 
             error_message = f"error_{str(e)[:100]}"  # Truncate long error messages
             await conn.execute(
@@ -1782,7 +1785,7 @@ async def generate_txt_report(
             logger.error(f"Failed to update error status: {str(update_error)}")
         finally:
             if conn:
-                await conn.close()
+                await release_connection(conn)
                 
         raise
 
@@ -1861,7 +1864,7 @@ async def generate_report(
         retries = 0
         while retries < MAX_DB_RETRIES:
             try:
-                conn = await get_connection()
+                conn = await get_connection("reports")
                 
                 report_query = """
                     INSERT INTO lab_reports (
@@ -1882,7 +1885,7 @@ async def generate_report(
                     temp_path
                 )
                 
-                await conn.close()
+                await release_connection(conn)
                 conn = None
                 break
             except Exception as db_error:
@@ -1891,7 +1894,7 @@ async def generate_report(
                 
                 if conn:
                     try:
-                        await conn.close()
+                        await release_connection(conn)
                         conn = None
                     except:
                         pass
@@ -1949,7 +1952,7 @@ async def generate_report(
         # Ensure connection is closed
         if conn:
             try:
-                await conn.close()
+                await release_connection(conn)
             except:
                 pass
 
@@ -1979,7 +1982,7 @@ async def download_report(
         
         while retries < MAX_DB_RETRIES:
             try:
-                conn = await get_connection()
+                conn = await get_connection("reports")
                 
                 # Check if report exists
                 query = """
@@ -1992,7 +1995,7 @@ async def download_report(
                 if row:
                     report = dict(row)
                     
-                await conn.close()
+                await release_connection(conn)
                 conn = None
                 break
             except Exception as db_error:
@@ -2001,7 +2004,7 @@ async def download_report(
                 
                 if conn:
                     try:
-                        await conn.close()
+                        await release_connection(conn)
                         conn = None
                     except:
                         pass
@@ -2064,10 +2067,10 @@ async def download_report(
         else:
             media_type = "application/octet-stream"
         
-        # Return file with error handling
+        # Return file with error handling (byte ranges, ETag of the content)
         try:
-            return FileResponse(
-                path=report["file_path"],
+            return RangeFileResponse(
+                report["file_path"],
                 filename=filename,
                 media_type=media_type
             )
@@ -2091,7 +2094,7 @@ async def download_report(
         # Ensure connection is closed
         if conn:
             try:
-                await conn.close()
+                await release_connection(conn)
             except:
                 pass
 
@@ -2151,11 +2154,10 @@ async def list_reports(
         
         while retries < MAX_DB_RETRIES:
             try:
-                conn = await get_connection()
+                conn = await get_read_connection("reports")
                 
                 # Get total count
-                count_query = f"SELECT COUNT(*) FROM ({' '.join(query_parts)}) as filtered_reports"
-                total = await conn.fetchval(count_query, *params)
+                total = await list_counts.count(conn, ' '.join(query_parts), *params, filtered=bool(params))
                 
                 # Add ordering and pagination
                 query_parts.append("ORDER BY created_at DESC")
@@ -2168,7 +2170,7 @@ async def list_reports(
                 # Execute main query
                 rows = await conn.fetch(' '.join(query_parts), *params)
                 
-                await conn.close()
+                await release_connection(conn)
                 conn = None
                 break
             except Exception as db_error:
@@ -2177,7 +2179,7 @@ async def list_reports(
                 
                 if conn:
                     try:
-                        await conn.close()
+                        await release_connection(conn)
                         conn = None
                     except:
                         pass
@@ -2239,6 +2241,7 @@ async def list_reports(
             "reports": reports,
             "pagination": {
                 "total": total,
+                "total_exact": is_exact(total),
                 "page": current_page,
                 "page_size": page_size,
                 "total_pages": total_pages
@@ -2258,6 +2261,6 @@ async def list_reports(
         # Ensure connection is closed
         if conn:
             try:
-                await conn.close()
+                await release_connection(conn)
             except:
                 pass
\ No newline at end of file
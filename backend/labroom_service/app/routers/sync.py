@@ -1,6 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Header
 import logging
-from ..database import get_connection
+from ..dependencies import get_db_connection
 from ..models import UserModel
 from ..schemas import UserSync
 import asyncpg
@@ -39,7 +39,7 @@ async def verify_service_token(authorization: str = Header(...)):
 async def sync_user(
     user_data: UserSync,
     _ = Depends(verify_service_token),
-    conn: asyncpg.Connection = Depends(get_connection)
+    conn: asyncpg.Connection = Depends(get_db_connection)
 ):
     logger.info(f"Received sync request for user: {user_data.id}")
     
@@ -2,7 +2,7 @@
 
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
 from typing import Dict, Any
-from ..database import get_connection, insert, fetch_one
+from ..database import get_connection, release_connection, insert, fetch_one
 from ..websocket import broadcast_lab_request
 import logging, json, uuid
 from datetime import datetime
@@ -106,4 +106,4 @@ async def process_incoming_lab_request(lab_request_data: Dict[str, Any]) -> None
         logger.info(f"Broadcast new lab request {inserted['id']}")
 
     finally:
-        await conn.close()
+        await release_connection(conn)
@@ -1,10 +1,10 @@
 import uuid
 import json
-import httpx
 import logging
 from typing import Dict, Any, Optional
 from datetime import datetime
 from ..config import settings
+from ..http_client import get_http_client
 
 logger = logging.getLogger(__name__)
 
@@ -23,8 +23,7 @@ async def notify_doctor_of_lab_result(
     the lab result in real-time.
     """
     try:
-        doctor_service_url = settings.DOCTOR_SERVICE_URL
-        notification_endpoint = f"{doctor_service_url}/inter-service/lab-results"
+        notification_endpoint = "/inter-service/lab-results"
         
         # Prepare notification data - include the FULL result_data
         notification_data = {
@@ -62,20 +61,19 @@ async def notify_doctor_of_lab_result(
             except Exception as e:
                 logger.error(f"Error creating result summary: {str(e)}")
         
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                notification_endpoint,
-                json=notification_data,
-                headers={"Authorization": f"Bearer {settings.SERVICE_TOKEN}"},
-                timeout=10.0
-            )
-            
-            if response.status_code == 200:
-                logger.info(f"Lab result notification sent to doctor {doctor_id}")
-                return True
-            else:
-                logger.error(f"Failed to send lab result notification. Status: {response.status_code}, Response: {response.text}")
-                return False
+        response = await get_http_client("doctor").post(
+            notification_endpoint,
+            json=notification_data,
+            headers={"Authorization": f"Bearer {settings.SERVICE_TOKEN}"},
+            timeout=10.0
+        )
+        
+        if response.status_code == 200:
+            logger.info(f"Lab result notification sent to doctor {doctor_id}")
+            return True
+        else:
+            logger.error(f"Failed to send lab result notification. Status: {response.status_code}, Response: {response.text}")
+            return False
     except Exception as e:
         logger.error(f"Error sending lab result notification: {str(e)}")
         return False
\ No newline at end of file
@@ -1,40 +1,68 @@
-import aiohttp
-import json
+import hashlib
 import httpx
+import json
 import uuid
 from typing import Dict, Any, Optional
 import logging
 from ..config import settings
+from ..http_client import get_http_client
+from ..single_flight import SingleFlightCache
 from ..exceptions import ExternalServiceException
 # Add missing import
-from ..database import get_connection
+from ..database import get_connection, release_connection
 
 logger = logging.getLogger(__name__)
 
+
+def _is_complete(details: Dict[str, Any]) -> bool:
+    """Only cache real records, not error or placeholder answers"""
+    return bool(details) and "error" not in details and "info" not in details
+
+
+def _lookup_key(entity_id: uuid.UUID, token: Optional[str]) -> tuple:
+    """
+    Upstream lookups are made with the caller's token, so their answers are
+    only shared between calls with that same token; local lookups are shared
+    by everyone.
+    """
+    if settings.USE_EXTERNAL_SERVICES and token:
+        return str(entity_id), hashlib.sha256(token.encode()).hexdigest()
+    return str(entity_id), None
+
+
+# Concurrent lookups of the same patient/doctor share one upstream call
+patient_lookups = SingleFlightCache("patients", ttl=300, stale_ttl=300, maxsize=5000, should_cache=_is_complete)
+doctor_lookups = SingleFlightCache("doctors", ttl=300, stale_ttl=300, maxsize=1000, should_cache=_is_complete)
+
+
 async def fetch_patient_details(patient_id: uuid.UUID, token: Optional[str] = None) -> Dict[str, Any]:
     """
     Fetch patient details from the patient service.
     
     If token is not provided, a simplified approach will be used.
+    Results are cached and concurrent lookups are coalesced.
     """
+    return await patient_lookups.get(
+        _lookup_key(patient_id, token), lambda: _fetch_patient_details(patient_id, token)
+    )
+
+async def _fetch_patient_details(patient_id: uuid.UUID, token: Optional[str] = None) -> Dict[str, Any]:
     try:
         # Check if we need to use the actual API
         if settings.USE_EXTERNAL_SERVICES and token:
-            patient_service_url = settings.PATIENT_SERVICE_URL
-            endpoint = f"{patient_service_url}/api/patients/{patient_id}"
+            endpoint = f"/patients/{patient_id}"
             
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    endpoint,
-                    headers={"Authorization": f"Bearer {token}"},
-                    timeout=5.0
-                )
-                
-                if response.status_code == 200:
-                    return response.json()
-                else:
-                    logger.error(f"Failed to fetch patient details. Status: {response.status_code}, Response: {response.text}")
-                    return {"error": "Failed to fetch patient details", "patient_id": str(patient_id)}
+            response = await get_http_client("cardroom").get(
+                endpoint,
+                headers={"Authorization": f"Bearer {token}"},
+                timeout=5.0
+            )
+            
+            if response.status_code == 200:
+                return response.json()
+            else:
+                logger.error(f"Failed to fetch patient details. Status: {response.status_code}, Response: {response.text}")
+                return {"error": "Failed to fetch patient details", "patient_id": str(patient_id)}
         
         # Simplified approach - fetch from local database if available
         conn = await get_connection()
@@ -53,7 +81,7 @@ async def fetch_patient_details(patient_id: uuid.UUID, token: Optional[str] = No
             logger.error(f"Error fetching patient from local DB: {str(e)}")
             return {"patient_id": str(patient_id), "info": "Basic patient info"}
         finally:
-            await conn.close()
+            await release_connection(conn)
             
     except Exception as e:
         logger.error(f"Error fetching patient details: {str(e)}")
@@ -64,25 +92,29 @@ async def fetch_doctor_details(doctor_id: uuid.UUID, token: Optional[str] = None
     Fetch doctor details from the doctor service.
     
     If token is not provided, a simplified approach will be used.
+    Results are cached and concurrent lookups are coalesced.
     """
+    return await doctor_lookups.get(
+        _lookup_key(doctor_id, token), lambda: _fetch_doctor_details(doctor_id, token)
+    )
+
+async def _fetch_doctor_details(doctor_id: uuid.UUID, token: Optional[str] = None) -> Dict[str, Any]:
     try:
         # Check if we need to use the actual API
         if settings.USE_EXTERNAL_SERVICES and token:
-            doctor_service_url = settings.DOCTOR_SERVICE_URL
-            endpoint = f"{doctor_service_url}/api/doctors/{doctor_id}"
+            endpoint = f"/api/doctors/{doctor_id}"
+            
+            response = await get_http_client("doctor").get(
+                endpoint,
+                headers={"Authorization": f"Bearer {token}"},
+                timeout=5.0
+            )
             
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    endpoint,
-                    headers={"Authorization": f"Bearer {token}"},
-                    timeout=5.0
-                )
-                
-                if response.status_code == 200:
-                    return response.json()
-                else:
-                    logger.error(f"Failed to fetch doctor details. Status: {response.status_code}, Response: {response.text}")
-                    return {"error": "Failed to fetch doctor details", "doctor_id": str(doctor_id)}
+            if response.status_code == 200:
+                return response.json()
+            else:
+                logger.error(f"Failed to fetch doctor details. Status: {response.status_code}, Response: {response.text}")
+                return {"error": "Failed to fetch doctor details", "doctor_id": str(doctor_id)}
         
         # Simplified approach - fetch from local database if available
         conn = await get_connection()
@@ -101,7 +133,7 @@ async def fetch_doctor_details(doctor_id: uuid.UUID, token: Optional[str] = None
             logger.error(f"Error fetching doctor from local DB: {str(e)}")
             return {"doctor_id": str(doctor_id), "info": "Basic doctor info"}
         finally:
-            await conn.close()
+            await release_connection(conn)
             
     except Exception as e:
         logger.error(f"Error fetching doctor details: {str(e)}")
@@ -113,25 +145,24 @@ async def send_notification_to_doctor(
     token: str
 ) -> Dict[str, Any]:
     """Send notification to a doctor via doctor_service"""
-    url = f"{settings.DOCTOR_SERVICE_URL}/notifications"
+    url = "/notifications"
     
     try:
-        async with aiohttp.ClientSession() as session:
-            headers = {
-                "Authorization": f"Bearer {token}",
-                "Content-Type": "application/json"
-            }
-            async with session.post(
-                url, 
-                headers=headers, 
-                data=json.dumps(notification_data)
-            ) as response:
-                if response.status not in (200, 201):
-                    error_text = await response.text()
-                    logger.error(f"Error sending notification to doctor: {error_text}")
-                    raise ExternalServiceException("Doctor Service", f"Status {response.status}: {error_text}")
-                
-                return await response.json()
-    except aiohttp.ClientError as e:
+        headers = {
+            "Authorization": f"Bearer {token}",
+            "Content-Type": "application/json"
+        }
+        response = await get_http_client("doctor").post(
+            url, 
+            headers=headers, 
+            content=json.dumps(notification_data)
+        )
+        if response.status_code not in (200, 201):
+            error_text = response.text
+            logger.error(f"Error sending notification to doctor: {error_text}")
+            raise ExternalServiceException("Doctor Service", f"Status {response.status_code}: {error_text}")
+        
+        return response.json()
+    except httpx.RequestError as e:
         logger.error(f"Connection error with doctor_service: {str(e)}")
         raise ExternalServiceException("Doctor Service", str(e))
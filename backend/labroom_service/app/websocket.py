@@ -6,6 +6,7 @@ from fastapi import WebSocket, WebSocketDisconnect, Depends, Query, status
 import logging
 import jwt
 from .config import settings
+from .responses import dumps
 
 logger = logging.getLogger(__name__)
 
@@ -91,7 +92,7 @@ async def websocket_endpoint(websocket: WebSocket):
                 # Handle mark as read request
                 if "lab_request_id" in message:
                     lab_request_id = message["lab_request_id"]
-                    from .database import get_connection, update
+                    from .database import get_connection, release_connection, update
                     
                     conn = await get_connection()
                     try:
@@ -138,7 +139,7 @@ async def websocket_endpoint(websocket: WebSocket):
                                 "timestamp": datetime.now().isoformat()
                             })
                     finally:
-                        await conn.close()
+                        await release_connection(conn)
             
     except WebSocketDisconnect:
         # Remove client on disconnect
@@ -188,22 +189,11 @@ async def broadcast_lab_request(lab_request_id: str, event_type: str, data: Dict
         "debug_info": "broadcast_message_v2"  # Add debug info to identify this version
     }
     
-    # Add the provided data to the message after ensuring UUIDs are converted to strings
+    # Add the provided data to the message (dumps encodes UUIDs and datetimes)
     if data:
-        # Helper function to recursively convert UUIDs to strings in nested dictionaries
-        def convert_uuids_to_strings(obj):
-            if isinstance(obj, dict):
-                return {k: convert_uuids_to_strings(v) for k, v in obj.items()}
-            elif isinstance(obj, list):
-                return [convert_uuids_to_strings(item) for item in obj]
-            elif isinstance(obj, uuid.UUID):
-                return str(obj)
-            else:
-                return obj
-                
-        # Convert any UUIDs in data to strings
-        data = convert_uuids_to_strings(data)
         message.update(data)
+    # Encoded once for all clients
+    text = dumps(message).decode()
     
     # Log the broadcast attempt
     logger.info(f"Broadcasting message about lab request {lab_request_id} to all connected clients")
@@ -214,7 +204,7 @@ async def broadcast_lab_request(lab_request_id: str, event_type: str, data: Dict
     # Loop through all connected clients
     for client_id, websocket in active_connections.items():
         try:
-            await websocket.send_json(message)
+            await websocket.send_text(text)
             logger.info(f"Message sent to client: {client_id}")
         except Exception as e:
             logger.error(f"Failed to send message to client {client_id}: {str(e)}")
@@ -5,12 +5,10 @@ import logging
 from typing import Dict, Any, Optional
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Query
 from datetime import datetime
+from app.websocket import active_connections
 
 logger = logging.getLogger(__name__)
 
-# Dictionary to track active connections
-active_connections = {}
-
 # labroom_service/app/ws_routes.py
 async def lab_requests_websocket(
     websocket: WebSocket,
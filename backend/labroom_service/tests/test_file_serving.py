@@ -0,0 +1,72 @@
+"""
+Tests for ranged file downloads (app/file_serving.py).
+"""
+import hashlib
+import os
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.file_serving import RangeFileResponse, RangeStaticFiles, parse_range, RangeNotSatisfiable
+from app.http_cache import HTTPCacheMiddleware
+
+
+@pytest.fixture
+def served(tmp_path):
+    content = os.urandom(100_000)
+    (tmp_path / "scan.dcm").write_bytes(content)
+    (tmp_path / "report.txt").write_bytes(b"lab report\n" * 1000)
+
+    app = FastAPI()
+    app.add_middleware(HTTPCacheMiddleware, minimum_size=100)
+    app.mount("/uploads", RangeStaticFiles(directory=str(tmp_path), immutable=True), name="uploads")
+
+    @app.get("/report")
+    async def report():
+        return RangeFileResponse(str(tmp_path / "report.txt"), media_type="text/plain", filename="report.txt")
+
+    return TestClient(app), content
+
+
+def test_parse_range():
+    assert parse_range("bytes=0-99", 1000) == (0, 99)
+    assert parse_range("bytes=900-", 1000) == (900, 999)
+    assert parse_range("bytes=-100", 1000) == (900, 999)
+    assert parse_range("bytes=500-5000", 1000) == (500, 999)
+    assert parse_range("bytes=0-1,5-9", 1000) is None
+    assert parse_range("bytes=9-1", 1000) is None
+    assert parse_range("items=0-1", 1000) is None
+    with pytest.raises(RangeNotSatisfiable):
+        parse_range("bytes=1000-", 1000)
+
+
+def test_ranges_etags_and_cache_headers(served):
+    client, content = served
+    etag = f'"{hashlib.sha256(content).hexdigest()}"'
+
+    full = client.get("/uploads/scan.dcm")
+    assert full.status_code == 200 and full.content == content
+    assert full.headers["etag"] == etag
+    assert full.headers["accept-ranges"] == "bytes"
+    assert "immutable" in full.headers["cache-control"]
+
+    part = client.get("/uploads/scan.dcm", headers={"range": "bytes=1000-1999"})
+    assert part.status_code == 206
+    assert part.content == content[1000:2000]
+    assert part.headers["content-range"] == f"bytes 1000-1999/{len(content)}"
+
+    stale = client.get("/uploads/scan.dcm", headers={"range": "bytes=0-9", "if-range": '"other"'})
+    assert stale.status_code == 200 and len(stale.content) == len(content)
+
+    assert client.get("/uploads/scan.dcm", headers={"range": "bytes=200000-"}).status_code == 416
+    assert client.get("/uploads/scan.dcm", headers={"if-none-match": etag}).status_code == 304
+
+
+def test_ranged_text_is_sent_uncompressed(served):
+    client, _ = served
+    response = client.get("/report", headers={"accept-encoding": "gzip", "range": "bytes=0-10"})
+    assert response.status_code == 206
+    assert "content-encoding" not in response.headers
+    assert response.content == b"lab report\n"
+    assert response.headers["cache-control"] == "private, no-cache"